@@ -1,3 +1,9 @@
 # RA-YOLO 改进模块
-from .asc_module import ASCModule, C2f_ASC, ChannelAttention, SpatialAttention, CoordinateAttention
-from .kpr_loss import ASORLoss, probiou_loss, kfiou_loss, RotatedBBoxLoss
+from .asc_module import ASCModule, C2f_ASC, ChannelAttention, SpatialAttention, CoordinateAttention, set_asc_checkpoint
+from .kpr_loss import ASORLoss, probiou_loss, kfiou_loss, RotatedBBoxLoss, ProbIoUFunction, KFIoUFunction
+
+try:  # YAML 中可以写 C2f_ASC (models/improved/yolo_modules.py)
+    from .yolo_modules import register_ultralytics_modules
+    register_ultralytics_modules()
+except ImportError:  # 未安装 ultralytics
+    pass
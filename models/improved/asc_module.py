@@ -14,10 +14,13 @@ ASC (Attention-Spatial-Channel) Module for Enhanced Feature Extraction
 - 轮廓细节与背景对比度低
 """
 
+import contextlib
+
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
 import math
+from torch.utils.checkpoint import checkpoint
 
 
 class ChannelAttention(nn.Module):
@@ -58,12 +61,13 @@ class SpatialAttention(nn.Module):
         self.conv = nn.Conv2d(2, 1, kernel_size, padding=padding, bias=False)
         self.sigmoid = nn.Sigmoid()
 
-    def forward(self, x):
+    def forward(self, x, inplace: bool = False):
         avg_out = torch.mean(x, dim=1, keepdim=True)
         max_out, _ = torch.max(x, dim=1, keepdim=True)
         combined = torch.cat([avg_out, max_out], dim=1)
         attention = self.sigmoid(self.conv(combined))
-        return x * attention
+        # inplace: x 为调用方不再使用的中间结果且不需要梯度时, 直接在x上相乘, 不再分配一张全尺寸特征图
+        return x.mul_(attention) if inplace else x * attention
 
 
 class CoordinateAttention(nn.Module):
@@ -75,9 +79,6 @@ class CoordinateAttention(nn.Module):
 
     def __init__(self, channels: int, reduction: int = 32):
         super().__init__()
-        self.pool_h = nn.AdaptiveAvgPool2d((None, 1))
-        self.pool_w = nn.AdaptiveAvgPool2d((1, None))
-
         mid_channels = max(8, channels // reduction)
         self.conv1 = nn.Conv2d(channels, mid_channels, 1, bias=False)
         self.bn1 = nn.BatchNorm2d(mid_channels)
@@ -87,13 +88,15 @@ class CoordinateAttention(nn.Module):
         self.conv_w = nn.Conv2d(mid_channels, channels, 1, bias=False)
         self.sigmoid = nn.Sigmoid()
 
-    def forward(self, x):
+    def forward(self, x, inplace: bool = False):
         identity = x
         n, c, h, w = x.size()
 
         # 水平和垂直方向的编码
-        x_h = self.pool_h(x)           # (N, C, H, 1)
-        x_w = self.pool_w(x).permute(0, 1, 3, 2)  # (N, C, W, 1) -> (N, C, W, 1)
+        # 用mean代替AdaptiveAvgPool2d((None, 1))/((1, None)): 数值等价,
+        # 且ONNX导出不依赖输入尺寸能被输出尺寸整除 (动态分辨率可导出)
+        x_h = x.mean(dim=3, keepdim=True)                     # (N, C, H, 1)
+        x_w = x.mean(dim=2, keepdim=True).permute(0, 1, 3, 2)  # (N, C, 1, W) -> (N, C, W, 1)
 
         y = torch.cat([x_h, x_w], dim=2)  # (N, C, H+W, 1)
         y = self.act(self.bn1(self.conv1(y)))
@@ -104,6 +107,8 @@ class CoordinateAttention(nn.Module):
         a_h = self.sigmoid(self.conv_h(x_h))
         a_w = self.sigmoid(self.conv_w(x_w))
 
+        if inplace:
+            return identity.mul_(a_h).mul_(a_w)
         return identity * a_h * a_w
 
 
@@ -113,23 +118,68 @@ class ASCModule(nn.Module):
     整合通道注意力、空间注意力和坐标注意力
     
     流程: Input -> CA -> SA -> CoordAttn -> Output + Residual
+
+    显存:
+    - checkpoint=True (或 set_asc_checkpoint): 训练时三个注意力分支与残差融合不保存中间结果,
+      反向传播时重新计算 (梯度检查点), 每个模块只保留输入; 用计算换显存, 适合高分辨率训练。
+      重新计算后恢复坐标注意力BN的 running_mean/var 与 num_batches_tracked (每步只更新一次)
+    - 不需要梯度时 (推理/验证) SA与坐标注意力直接在CA的输出上原地相乘, 残差融合也原地完成;
+      需要梯度时这些特征图都被反向传播用到, 不能原地修改, 因此这一项只降低推理/验证显存, 训练显存靠 checkpoint
     """
 
-    def __init__(self, channels: int, reduction: int = 16):
+    def __init__(self, channels: int, reduction: int = 16, checkpoint: bool = False):
         super().__init__()
         self.channel_attn = ChannelAttention(channels, reduction)
         self.spatial_attn = SpatialAttention(kernel_size=7)
         self.coord_attn = CoordinateAttention(channels, reduction=32)
+        self.checkpoint = checkpoint
 
         # 残差连接的权重学习
         self.alpha = nn.Parameter(torch.ones(1) * 0.5)
 
-    def forward(self, x):
-        residual = x
+    def _forward(self, x):
+        inplace = not torch.is_grad_enabled()
         out = self.channel_attn(x)
-        out = self.spatial_attn(out)
-        out = self.coord_attn(out)
-        return self.alpha * out + (1 - self.alpha) * residual
+        out = self.spatial_attn(out, inplace=inplace)
+        out = self.coord_attn(out, inplace=inplace)
+        # alpha * out + (1 - alpha) * x, 一次计算 (不需要梯度时写回out);
+        # lerp 要求权重与特征同dtype, autocast / half 推理下 float32 的 alpha 需转换
+        alpha = self.alpha.to(out.dtype)
+        x = x.to(out.dtype)
+        if inplace:
+            return out.lerp_(x, 1 - alpha)
+        return torch.lerp(x, out, alpha)
+
+    @contextlib.contextmanager
+    def _recompute_context(self):
+        """反向传播中重新计算时BN会再次更新运行统计量, 结束后恢复为首次前向后的值"""
+        saved = [(buf, buf.clone()) for m in self.modules()
+                 if isinstance(m, nn.modules.batchnorm._BatchNorm) for buf in m.buffers()]
+        try:
+            yield
+        finally:
+            with torch.no_grad():
+                for buf, value in saved:
+                    buf.copy_(value)
+
+    def forward(self, x):
+        if self.checkpoint and self.training and torch.is_grad_enabled():
+            return checkpoint(self._forward, x, use_reentrant=False,
+                              context_fn=lambda: (contextlib.nullcontext(), self._recompute_context()))
+        return self._forward(x)
+
+
+def set_asc_checkpoint(model: nn.Module, enabled: bool = True) -> int:
+    """
+    打开/关闭模型中所有 ASCModule 的梯度检查点
+
+    Returns:
+        设置的 ASCModule 个数
+    """
+    modules = [m for m in model.modules() if isinstance(m, ASCModule)]
+    for m in modules:
+        m.checkpoint = enabled
+    return len(modules)
 
 
 class C2f_ASC(nn.Module):
@@ -141,7 +191,7 @@ class C2f_ASC(nn.Module):
     """
 
     def __init__(self, c1: int, c2: int, n: int = 1, shortcut: bool = False,
-                 g: int = 1, e: float = 0.5):
+                 g: int = 1, e: float = 0.5, checkpoint: bool = False):
         super().__init__()
         self.c = int(c2 * e)
         self.cv1 = nn.Conv2d(c1, 2 * self.c, 1, 1)
@@ -150,7 +200,7 @@ class C2f_ASC(nn.Module):
         self.bottlenecks = nn.ModuleList(
             [self._make_bottleneck(self.c, self.c, shortcut, g) for _ in range(n)]
         )
-        self.asc = ASCModule(c2)
+        self.asc = ASCModule(c2, checkpoint=checkpoint)
 
     def _make_bottleneck(self, c1, c2, shortcut, g):
         return nn.Sequential(
@@ -6,6 +6,9 @@ ASOR (Adaptive Synergy Oriented Regression) Loss for OBB Detection
 1. ProbIoU: 将旋转框建模为高斯分布，计算分布间的相似度
 2. KFIoU: 基于卡尔曼滤波思想的旋转IoU
 3. ASOR-Loss: 自适应权重融合ProbIoU和KFIoU
+4. ProbIoUFunction / KFIoUFunction: 逐元素闭式前向与手推的解析反向传播,
+   只保存两组输入框; probiou_loss / kfiou_loss 使用它们,
+   原来逐步autograd的实现保留为 probiou_loss_autograd / kfiou_loss_autograd (对照与gradcheck)
 
 优势:
 - 解决角度周期性问题(0°和180°等价)
@@ -22,7 +25,7 @@ import torch
 import torch.nn as nn
 import torch.nn.functional as F
 import math
-from typing import Tuple
+from typing import Dict, List, Optional, Tuple
 
 
 def xy_wh_r_to_gaussian(pred: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
@@ -56,9 +59,9 @@ def xy_wh_r_to_gaussian(pred: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]
     return mu, sigma
 
 
-def probiou_loss(pred: torch.Tensor, target: torch.Tensor, eps: float = 1e-6) -> torch.Tensor:
+def probiou_loss_autograd(pred: torch.Tensor, target: torch.Tensor, eps: float = 1e-6) -> torch.Tensor:
     """
-    ProbIoU损失
+    ProbIoU损失 (逐步autograd实现, ProbIoUFunction 的对照)
     将旋转框建模为二维高斯分布，通过Bhattacharyya距离计算相似度
     
     Args:
@@ -102,9 +105,9 @@ def probiou_loss(pred: torch.Tensor, target: torch.Tensor, eps: float = 1e-6) ->
     return loss.clamp(min=0, max=2)
 
 
-def kfiou_loss(pred: torch.Tensor, target: torch.Tensor, eps: float = 1e-6) -> torch.Tensor:
+def kfiou_loss_autograd(pred: torch.Tensor, target: torch.Tensor, eps: float = 1e-6) -> torch.Tensor:
     """
-    KFIoU损失
+    KFIoU损失 (逐步autograd实现, KFIoUFunction 的对照)
     基于卡尔曼滤波的旋转IoU计算
     
     通过建模预测框和真实框的高斯分布交集来近似IoU
@@ -138,6 +141,160 @@ def kfiou_loss(pred: torch.Tensor, target: torch.Tensor, eps: float = 1e-6) -> t
     return loss
 
 
+# ==================== 解析反向传播 ====================
+#
+# 框 (x, y, w, h, θ) 的高斯: a = w²/48, b = h²/48 (即 (w/2)²/12), c = cosθ, s = sinθ
+#   Σ00 = a·c² + b·s²,  Σ11 = a·s² + b·c²,  Σ01 = (a - b)·c·s,  det Σ = a·b
+# 两框的 Σ 相加后记为 A = Σ00, B = Σ11, C = Σ01, D = AB - C²; d = μp - μt
+#   q = B·dx² + A·dy² - 2C·dx·dy  (d^T adj(Σ) d)
+# 反向传播先求损失对 (A, B, C, d, a, b) 的梯度, 再由 _gaussian_backward 链式到 (x, y, w, h, θ)
+
+def _gaussian(box: torch.Tensor) -> Dict[str, torch.Tensor]:
+    """xy_wh_r_to_gaussian 的逐元素形式: 协方差的三个独立元素与反向传播要用的中间量"""
+    x, y, w, h, angle = box.unbind(-1)
+    a, b = w * w / 48, h * h / 48
+    cos, sin = torch.cos(angle), torch.sin(angle)
+    c2, s2, cs = cos * cos, sin * sin, cos * sin
+    return {'x': x, 'y': y, 'w': w, 'h': h, 'a': a, 'b': b, 'c2': c2, 's2': s2, 'cs': cs,
+            's00': a * c2 + b * s2, 's11': a * s2 + b * c2, 's01': (a - b) * cs}
+
+
+def _gaussian_backward(g: Dict[str, torch.Tensor], g_s00: torch.Tensor, g_s11: torch.Tensor,
+                       g_s01: torch.Tensor, g_a: torch.Tensor, g_b: torch.Tensor,
+                       g_x: torch.Tensor, g_y: torch.Tensor) -> torch.Tensor:
+    """损失对 (Σ00, Σ11, Σ01, a, b, x, y) 的梯度 -> 对 (x, y, w, h, θ) 的梯度, (..., 5)"""
+    g_a = g_a + g_s00 * g['c2'] + g_s11 * g['s2'] + g_s01 * g['cs']
+    g_b = g_b + g_s00 * g['s2'] + g_s11 * g['c2'] - g_s01 * g['cs']
+    # dΣ00/dθ = -(a-b)·sin2θ, dΣ11/dθ = (a-b)·sin2θ, dΣ01/dθ = (a-b)·cos2θ
+    g_r = (g['a'] - g['b']) * (2 * (g_s11 - g_s00) * g['cs'] + g_s01 * (g['c2'] - g['s2']))
+    return torch.stack([g_x, g_y, g_a * g['w'] / 24, g_b * g['h'] / 24, g_r], dim=-1)
+
+
+def _pair_terms(p: Dict[str, torch.Tensor], t: Dict[str, torch.Tensor], scale: float):
+    """A, B, C = scale·(Σp + Σt); 返回 (dx, dy, A, B, C, D, q)"""
+    dx, dy = p['x'] - t['x'], p['y'] - t['y']
+    A, B, C = (p['s00'] + t['s00']) * scale, (p['s11'] + t['s11']) * scale, (p['s01'] + t['s01']) * scale
+    return dx, dy, A, B, C, A * B - C * C, B * dx * dx + A * dy * dy - 2 * C * dx * dy
+
+
+def _pair_backward(ctx, p, t, scale, g_A, g_B, g_C, g_dx, g_dy, g_ab_p, g_ab_t):
+    """两组框的梯度; g_ab_*: 损失对各自 det Σ = a·b 的直接梯度; 不需要梯度的输入返回None"""
+    grads = []
+    for g, sign, g_ab, needed in ((p, 1, g_ab_p, ctx.needs_input_grad[0]), (t, -1, g_ab_t, ctx.needs_input_grad[1])):
+        grads.append(_gaussian_backward(g, g_A * scale, g_B * scale, g_C * scale, g_ab * g['b'], g_ab * g['a'],
+                                        g_dx * sign, g_dy * sign) if needed else None)
+    return grads
+
+
+def _probiou_terms(p, t, eps: float):
+    dx, dy, A, B, C, D, q = _pair_terms(p, t, 0.5)
+    D_eps, dp_eps, dt_eps = D + eps, p['a'] * p['b'] + eps, t['a'] * t['b'] + eps
+    mahal = q / D_eps
+    bd = 0.125 * mahal + 0.5 * torch.log(D_eps) - 0.25 * torch.log(dp_eps) - 0.25 * torch.log(dt_eps)
+    loss = 1 - torch.exp(-bd)
+    return loss, (dx, dy, A, B, C, D_eps, mahal, dp_eps, dt_eps, bd)
+
+
+class ProbIoUFunction(torch.autograd.Function):
+    """
+    ProbIoU损失 (与 probiou_loss_autograd 相同) 的闭式前向与解析反向传播
+
+    前向只有逐元素运算 (不构造2x2矩阵与matmul); 反向传播只保存 pred / target 与 eps,
+    中间量在反向时重新计算. 反向传播由可求导的张量运算组成, 支持二阶导
+    """
+
+    @staticmethod
+    def forward(ctx, pred: torch.Tensor, target: torch.Tensor, eps: float = 1e-6) -> torch.Tensor:
+        ctx.save_for_backward(pred, target)
+        ctx.eps = eps
+        loss, _ = _probiou_terms(_gaussian(pred), _gaussian(target), eps)
+        return loss.clamp(min=0, max=2)
+
+    @staticmethod
+    def backward(ctx, grad: torch.Tensor):
+        pred, target = ctx.saved_tensors
+        p, t = _gaussian(pred), _gaussian(target)
+        loss, (dx, dy, A, B, C, D_eps, mahal, dp_eps, dt_eps, bd) = _probiou_terms(p, t, ctx.eps)
+        # loss = 1 - exp(-bd), clamp 在 [0, 2] 之外没有梯度
+        g_bd = grad * torch.exp(-bd) * ((loss >= 0) & (loss <= 2))
+        # bd = q/(8·D_eps) + 0.5·log(D_eps) - 0.25·log(a_p·b_p + eps) - 0.25·log(a_t·b_t + eps)
+        g_q = g_bd * 0.125 / D_eps
+        g_D = g_bd * (0.5 - 0.125 * mahal) / D_eps
+        g_A = g_q * dy * dy + g_D * B
+        g_B = g_q * dx * dx + g_D * A
+        g_C = -2 * (g_q * dx * dy + g_D * C)
+        g_dx = 2 * g_q * (B * dx - C * dy)
+        g_dy = 2 * g_q * (A * dy - C * dx)
+        g_pred, g_target = _pair_backward(ctx, p, t, 0.5, g_A, g_B, g_C, g_dx, g_dy,
+                                          -0.25 * g_bd / dp_eps, -0.25 * g_bd / dt_eps)
+        return g_pred, g_target, None
+
+
+def _kfiou_terms(p, t, eps: float):
+    dx, dy, A, B, C, D, q = _pair_terms(p, t, 1.0)
+    dets = p['a'] * p['b'] * (t['a'] * t['b'])
+    t1 = torch.sqrt(4 * dets.clamp(min=eps) / D.clamp(min=eps))
+    D_eps = D + eps
+    exponent = -q / (2 * D_eps)
+    t2 = torch.exp(exponent.clamp(min=-50, max=50))
+    return t1 * t2, (dx, dy, A, B, C, D, D_eps, q, dets, t1, t2, exponent)
+
+
+class KFIoUFunction(torch.autograd.Function):
+    """KFIoU损失 (与 kfiou_loss_autograd 相同) 的闭式前向与解析反向传播, 保存内容同 ProbIoUFunction"""
+
+    @staticmethod
+    def forward(ctx, pred: torch.Tensor, target: torch.Tensor, eps: float = 1e-6) -> torch.Tensor:
+        ctx.save_for_backward(pred, target)
+        ctx.eps = eps
+        kf_iou, _ = _kfiou_terms(_gaussian(pred), _gaussian(target), eps)
+        return 1 - kf_iou.clamp(min=0, max=1)
+
+    @staticmethod
+    def backward(ctx, grad: torch.Tensor):
+        pred, target = ctx.saved_tensors
+        eps = ctx.eps
+        p, t = _gaussian(pred), _gaussian(target)
+        kf_iou, (dx, dy, A, B, C, D, D_eps, q, dets, t1, t2, exponent) = _kfiou_terms(p, t, eps)
+        # loss = 1 - clamp(t1·t2, 0, 1)
+        g_kf = -grad * ((kf_iou >= 0) & (kf_iou <= 1))
+        # t1 = 2·sqrt(clamp(det_p·det_t, eps) / clamp(D, eps))
+        g_t1 = g_kf * t2
+        g_dets = g_t1 * t1 / (2 * dets.clamp(min=eps)) * (dets >= eps)
+        g_D = -g_t1 * t1 / (2 * D.clamp(min=eps)) * (D >= eps)
+        # t2 = exp(clamp(-q / (2·D_eps), -50, 50))
+        g_e = g_kf * t1 * t2 * ((exponent >= -50) & (exponent <= 50))
+        g_q = -g_e / (2 * D_eps)
+        g_D = g_D - g_e * exponent / D_eps
+        g_A = g_q * dy * dy + g_D * B
+        g_B = g_q * dx * dx + g_D * A
+        g_C = -2 * (g_q * dx * dy + g_D * C)
+        g_dx = 2 * g_q * (B * dx - C * dy)
+        g_dy = 2 * g_q * (A * dy - C * dx)
+        g_pred, g_target = _pair_backward(ctx, p, t, 1.0, g_A, g_B, g_C, g_dx, g_dy,
+                                          g_dets * t['a'] * t['b'], g_dets * p['a'] * p['b'])
+        return g_pred, g_target, None
+
+
+def probiou_loss(pred: torch.Tensor, target: torch.Tensor, eps: float = 1e-6) -> torch.Tensor:
+    """
+    ProbIoU损失 (ProbIoUFunction, 解析反向传播)
+
+    Args:
+        pred: (N, 5) 预测框 [x, y, w, h, angle]
+        target: (N, 5) 目标框 [x, y, w, h, angle]
+
+    Returns:
+        loss: (N,) ProbIoU损失
+    """
+    return ProbIoUFunction.apply(pred, target, eps)
+
+
+def kfiou_loss(pred: torch.Tensor, target: torch.Tensor, eps: float = 1e-6) -> torch.Tensor:
+    """KFIoU损失 (KFIoUFunction, 解析反向传播); 参数与返回同 probiou_loss"""
+    return KFIoUFunction.apply(pred, target, eps)
+
+
 class ASORLoss(nn.Module):
     """
     ASOR-Loss: 自适应融合ProbIoU和KFIoU的回归损失
@@ -151,11 +308,13 @@ class ASORLoss(nn.Module):
     """
 
     def __init__(self, alpha: float = 0.6, dynamic_weight: bool = True,
-                 total_epochs: int = 200):
+                 total_epochs: int = 200, phase_epochs: Optional[List[int]] = None):
         super().__init__()
         self.base_alpha = alpha
         self.dynamic_weight = dynamic_weight
         self.total_epochs = total_epochs
+        # 渐进分辨率训练各阶段的起始epoch; 指定时alpha按阶段取值 (阶段内不变)
+        self.phase_epochs = sorted(phase_epochs) if phase_epochs else None
         self.current_epoch = 0
 
     def set_epoch(self, epoch: int):
@@ -166,11 +325,17 @@ class ASORLoss(nn.Module):
         """
         动态权重调度
         训练初期alpha较大(偏向ProbIoU)，后期逐渐降低(偏向KFIoU)
+        指定 phase_epochs 时按所处的分辨率阶段取值
         """
         if not self.dynamic_weight:
             return self.base_alpha
 
-        progress = self.current_epoch / max(self.total_epochs, 1)
+        if self.phase_epochs and len(self.phase_epochs) > 1:
+            # 与分辨率阶段对齐: 第k个阶段 (共K个) 的进度为 k/(K-1), 目标分辨率阶段偏向KFIoU
+            k = max(sum(1 for start in self.phase_epochs if start <= self.current_epoch) - 1, 0)
+            progress = k / (len(self.phase_epochs) - 1)
+        else:
+            progress = self.current_epoch / max(self.total_epochs, 1)
         # 余弦退火: alpha从base_alpha逐渐降到base_alpha/2
         alpha = self.base_alpha * (1 + math.cos(math.pi * progress)) / 2
         alpha = max(alpha, self.base_alpha * 0.3)  # 最低权重
@@ -256,6 +421,17 @@ if __name__ == '__main__':
     kf_l = kfiou_loss(pred, target)
     print(f"KFIoU Loss: {kf_l.mean().item():.4f}")
 
+    # 解析反向传播: gradcheck 与逐步autograd实现的对照 (float64)
+    p64 = torch.cat([torch.randn(8, 2), torch.rand(8, 2) + 0.5, torch.randn(8, 1)], dim=1).double()
+    t64 = (p64 + 0.2 * torch.randn(8, 5).double()).abs()
+    for name, fn, ref in (('ProbIoU', probiou_loss, probiou_loss_autograd),
+                          ('KFIoU', kfiou_loss, kfiou_loss_autograd)):
+        p_, t_ = p64.clone().requires_grad_(), t64.clone().requires_grad_()
+        passed = torch.autograd.gradcheck(fn, (p_, t_))
+        grad = torch.autograd.grad(fn(p_, t_).sum(), p_)[0]
+        grad_ref = torch.autograd.grad(ref(p_, t_).sum(), p_)[0]
+        print(f"{name} gradcheck: {passed}, max |grad - autograd|: {(grad - grad_ref).abs().max().item():.2e}")
+
     # ASOR-Loss
     asor = ASORLoss(alpha=0.6, dynamic_weight=True, total_epochs=200)
     for epoch in [0, 50, 100, 150, 200]:
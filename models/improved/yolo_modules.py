@@ -0,0 +1,54 @@
+"""
+在 ultralytics 模型YAML中使用 C2f_ASC
+Register C2f_ASC with the ultralytics model parser
+
+ultralytics 的 parse_model 只对内置模块 (C2f 等) 按 width 缩放通道并插入重复次数 n,
+自定义模块名不在其列表中. register_ultralytics_modules() 包装 parse_model:
+YAML 中写作 C2f_ASC 的层先按 C2f 解析 (参数、通道缩放、重复次数与 C2f 完全相同),
+再换成同样 (c1, c2, n, shortcut, g, e) 的 C2f_ASC. 模型的 yaml 保留 C2f_ASC,
+训练时 (trainer.get_model 按 yaml 重建) 与加载检查点时结构一致.
+
+models.improved 导入时自动注册 (装有 ultralytics 时), 用法:
+    import models.improved  # noqa: F401
+    model = YOLO('configs/ra_yolo_asc_obb.yaml')
+"""
+
+from .asc_module import C2f_ASC
+
+CUSTOM_MODULES = {'C2f_ASC': C2f_ASC}
+
+
+def _as_c2f_asc(c2f) -> C2f_ASC:
+    """由按 C2f 解析出的层构造同样配置的 C2f_ASC"""
+    c1, c2 = c2f.cv1.conv.in_channels, c2f.cv2.conv.out_channels
+    n = len(c2f.m)
+    shortcut = bool(n and c2f.m[0].add)
+    g = c2f.m[0].cv2.conv.groups if n else 1
+    m = C2f_ASC(c1, c2, n=n, shortcut=shortcut, g=g, e=c2f.c / c2)
+    m.i, m.f, m.type = c2f.i, c2f.f, 'C2f_ASC'
+    m.np = sum(p.numel() for p in m.parameters())
+    return m
+
+
+def register_ultralytics_modules() -> None:
+    """包装 ultralytics.nn.tasks.parse_model 以支持 C2f_ASC (重复调用无影响)"""
+    from ultralytics.nn import tasks
+
+    if getattr(tasks.parse_model, 'asc_wrapped', False):
+        return
+    parse_model = tasks.parse_model
+
+    def parse_model_with_asc(d, ch, verbose=True):
+        rows = d['backbone'] + d['head']  # 行为列表, 改名直接作用于 d (调用方传入的是 yaml 的深拷贝)
+        custom = {i: row[2] for i, row in enumerate(rows) if row[2] in CUSTOM_MODULES}
+        for i in custom:
+            rows[i][2] = 'C2f'
+        model, save = parse_model(d, ch, verbose=verbose)
+        for i in custom:
+            model[i] = _as_c2f_asc(model[i])
+        if custom and verbose:
+            print(f'[INFO] C2f_ASC layers: {sorted(custom)}')
+        return model, save
+
+    parse_model_with_asc.asc_wrapped = True
+    tasks.parse_model = parse_model_with_asc
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Successive-halving (ASHA) search over augmentation settings (mixup, copy_paste, HSV gains).
+
+Outputs:
+- runs/asha/<name>/t<NNN>/: one ultralytics run per trial; promoted trials
+  resume from weights/resume.pt in the same directory
+- results/runs.sqlite (``--store``): every trial's epochs under run name
+  ``asha/<name>/t<NNN>`` plus its sampled parameters (ResultsStore.params),
+  so ``scripts/query_runs.py top`` ranks the trials as well
+- runs/asha/<name>/search.json: budgets, per-trial parameters and rung scores,
+  the leaderboard and the best configuration; rewritten after every result
+
+Notes:
+- The base recipe comes from ``--config`` (+ ``--set`` overrides); trials only
+  change the keys in utils.asha.SEARCH_SPACE. Trial 0 is the hand-tuned setting
+  from train_real.train_improved, for reference.
+- Fidelity is epochs on a ``--fraction`` subsample of the train split (val is
+  always the full split). Every trial uses the LR schedule of ``--max-epochs``,
+  so a trial promoted to the top rung equals one full-length run.
+- ``--workers`` trials train in parallel, each in its own process with
+  host threads / dataloader workers divided between them. With ``cache=disk``
+  the train split is decoded once up front and every trial reads npy_<imgsz>/.
+- A trial stopped early by ``patience`` also saves weights/resume.pt; if
+  promoted it continues from there instead of starting over.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing as mp
+import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from utils.ablation import split_images
+from utils.asha import HAND_TUNED, SEARCH_SPACE, AshaScheduler, rung_budgets, run_trial, sample_configs
+from utils.results_store import DEFAULT_DB, ResultsStore
+from utils.training import (
+    PROFILES,
+    build_image_cache,
+    load_train_config,
+    parse_overrides,
+    resolve_dataset_yaml,
+    resolve_profile,
+)
+
+# config keys that belong to a single run rather than to the shared recipe
+_RUN_KEYS = ("model", "project", "name", "save_period", "resume", "exist_ok")
+
+
+def _base_args(args, search_dir: Path) -> Dict:
+    config = load_train_config(ROOT / args.config, ROOT)
+    overrides = parse_overrides(args.set)
+    config.update(overrides)
+    host = resolve_profile(args.profile, int(config.get("imgsz", 640)))
+    train_args = {k: v for k, v in config.items() if k not in _RUN_KEYS and k not in SEARCH_SPACE}
+    train_args.update(
+        data=str(resolve_dataset_yaml(config["data"], search_dir, ROOT)),
+        epochs=args.max_epochs,
+        fraction=args.fraction,
+        seed=args.seed,
+        device=host["device"],
+        workers=host["workers"] // args.workers,
+        batch=overrides.get("batch", host["batch"]),
+        cache=overrides.get("cache", False if host["cache"] == "none" else host["cache"]),
+    )
+    return {"model": str(config.get("model", "yolov8n-obb.pt")), "train_args": train_args,
+            "threads": max(1, host["threads"] // args.workers)}
+
+
+def _write_summary(path: Path, settings: Dict, trials: List[Dict], sched: AshaScheduler) -> None:
+    board = [{"trial": t, "name": trials[t]["name"], "rung": r, "epochs": sched.budgets[r], "score": s,
+              "params": trials[t]["params"]} for t, r, s in sched.leaderboard()]
+    summary = {"settings": settings, "budgets": sched.budgets, "trials": trials, "leaderboard": board,
+               "best": board[0] if board else None}
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(summary, indent=2), encoding="utf-8")
+    tmp.replace(path)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="ASHA search over augmentation hyperparameters")
+    parser.add_argument("--config", type=str, default="configs/improved_train.yaml", help="Base training config")
+    parser.add_argument("--set", nargs="*", default=[], metavar="KEY=VALUE", help="Overrides for the base recipe")
+    parser.add_argument("--name", type=str, default="aug", help="Search name (runs/asha/<name>)")
+    parser.add_argument("--trials", type=int, default=27)
+    parser.add_argument("--min-epochs", type=int, default=3)
+    parser.add_argument("--max-epochs", type=int, default=27)
+    parser.add_argument("--eta", type=int, default=3, help="Keep the top 1/eta of each rung")
+    parser.add_argument("--fraction", type=float, default=0.25, help="Fraction of the train split per trial")
+    parser.add_argument("--metric", type=str, default="mAP50", choices=["mAP50", "mAP50_95"])
+    parser.add_argument("--workers", type=int, default=2, help="Parallel trial processes")
+    parser.add_argument("--profile", type=str, default="auto", choices=PROFILES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-hand-tuned", action="store_true", help="Do not include the hand-tuned setting")
+    parser.add_argument("--store", type=str, default=str(ROOT / DEFAULT_DB))
+    args = parser.parse_args()
+
+    search_dir = ROOT / "runs" / "asha" / args.name
+    if (search_dir / "search.json").exists():
+        raise SystemExit(f"[ERROR] {search_dir} already holds a search; pick another --name")
+    search_dir.mkdir(parents=True, exist_ok=True)
+    budgets = rung_budgets(args.min_epochs, args.max_epochs, args.eta)
+    base = _base_args(args, search_dir)
+    configs = sample_configs(args.trials, SEARCH_SPACE, args.seed, None if args.no_hand_tuned else HAND_TUNED)
+    trials = [{"trial": i, "name": f"t{i:03d}", "params": p, "scores": {}, "status": "pending"}
+              for i, p in enumerate(configs)]
+    settings = {k: v for k, v in vars(args).items()}
+    settings["train_args"] = base["train_args"]
+    summary_path = search_dir / "search.json"
+
+    store = ResultsStore(args.store)
+    run_prefix = f"asha/{args.name}"
+    for trial in trials:
+        store.set_params(f"{run_prefix}/{trial['name']}", trial["params"])
+    print(f"[INFO] {args.trials} trials, rungs {budgets} epochs, eta={args.eta}, fraction={args.fraction}, "
+          f"{args.workers} workers x {base['threads']} threads, device={base['train_args']['device']}")
+    train_args = base["train_args"]
+    if train_args["cache"] == "disk":  # decode the train split once; every trial then finds npy_<imgsz>/ up to date
+        build_image_cache(split_images(train_args["data"], "train"), int(train_args.get("imgsz", 640)))
+
+    sched = AshaScheduler(args.trials, budgets, args.eta)
+    ctx = mp.get_context("spawn")  # fresh interpreter per worker; no forked torch thread pools
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=ctx) as pool:
+        futures = {}
+        while not sched.done():
+            while len(futures) < args.workers:
+                job = sched.next_job()
+                if job is None:
+                    break
+                t, rung = job
+                trial = trials[t]
+                spec = {"name": trial["name"], "save_dir": str(search_dir / trial["name"]), "model": base["model"],
+                        "train_args": base["train_args"], "params": trial["params"],
+                        "target_epochs": budgets[rung], "threads": base["threads"]}
+                trial["status"] = f"running rung {rung}"
+                futures[pool.submit(run_trial, spec)] = (t, rung)
+                print(f"[INFO] {trial['name']} -> rung {rung} ({budgets[rung]} epochs) {trial['params']}")
+            if not futures:
+                break
+            finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in finished:
+                t, rung = futures.pop(future)
+                trial = trials[t]
+                run = f"{run_prefix}/{trial['name']}"
+                try:
+                    info = future.result()
+                except Exception as e:
+                    sched.fail(t)
+                    trial["status"], trial["error"] = "failed", f"{type(e).__name__}: {e}"
+                    print(f"[WARN] {trial['name']} failed at rung {rung}: {trial['error']}")
+                    continue
+                store.ingest_file(search_dir / trial["name"] / "results.csv", run=run)
+                score = store.best_epochs([run], args.metric).get(run, {}).get(args.metric, 0.0)
+                sched.report(t, rung, score)
+                trial["scores"][str(budgets[rung])] = score
+                trial["status"] = f"rung {rung}"
+                stopped = f", stopped early at epoch {info['epochs']}" if info["early_stopped"] else ""
+                print(f"[OK] {trial['name']} rung {rung}: {args.metric} {score:.4f} "
+                      f"({info['seconds']:.0f}s{', resumed' if info['resumed'] else ''}{stopped})")
+            _write_summary(summary_path, settings, trials, sched)
+
+    _write_summary(summary_path, settings, trials, sched)
+    print("=" * 72)
+    print(f"{'Trial':<8}{'Epochs':>8}{args.metric:>12}   Params")
+    for t, r, s in sched.leaderboard()[:10]:
+        print(f"{trials[t]['name']:<8}{budgets[r]:>8}{s:>12.4f}   {trials[t]['params']}")
+    print("=" * 72)
+    print(f"[DONE] Search summary: {summary_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Training memory and step time of C2f_ASC with and without ASC gradient checkpointing.
+
+Outputs:
+- results/benchmark/asc_checkpoint.json: per (imgsz, mode) peak training
+  memory, activations saved for backward and step-time percentiles, plus the
+  checkpointed / plain ratios per imgsz
+
+Notes:
+- The workload is an ASC neck at RA-YOLO-n widths: one C2f_ASC(c, c) per output
+  level (c = 64 / 128 / 256 at strides 8 / 16 / 32), built here in place of the
+  neck C2f blocks of configs/ra_yolo_obb.yaml, on random feature maps of a
+  ``--batch`` x imgsz x imgsz input. A step is forward, loss, backward and an
+  SGD update; everything outside the C2f_ASC blocks is left out so the
+  difference is the ASC branch alone.
+- ``checkpoint`` runs the same blocks after models.improved.set_asc_checkpoint:
+  the three attention branches and the residual blend are recomputed in
+  backward instead of kept.
+- Every (imgsz, mode) pair runs in a fresh spawned process. Peak memory is
+  torch.cuda.max_memory_allocated on CUDA and the peak RSS growth over the
+  process after setup on CPU. ``saved_mb`` counts the tensors autograd keeps for
+  backward (saved_tensors_hooks) and is the same on either device.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing as mp
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+from models.improved import C2f_ASC, set_asc_checkpoint
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None
+
+MODES = ("plain", "checkpoint")
+# (channels, stride) of the neck outputs (layers 15 / 18 / 21) of configs/ra_yolo_obb.yaml at scale n.
+# That YAML builds them as plain C2f; the benchmark puts a C2f_ASC of the same width at each level itself.
+NECK_LEVELS = ((64, 8), (128, 16), (256, 32))
+DEFAULT_OUTPUT = ROOT / "results" / "benchmark" / "asc_checkpoint.json"
+
+
+def _peak_rss_mb() -> float:
+    if resource is None:
+        return float("nan")
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS.
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def _saved_mb(blocks: nn.ModuleList, feats: List[torch.Tensor]) -> float:
+    """Size of the tensors autograd saves for backward in one forward (shared storages counted once)."""
+    storages = {}
+
+    def pack(t: torch.Tensor) -> torch.Tensor:
+        storage = t.untyped_storage()
+        storages[storage.data_ptr()] = storage.nbytes()
+        return t
+
+    with torch.autograd.graph.saved_tensors_hooks(pack, lambda t: t):
+        loss = sum(block(f).square().mean() for block, f in zip(blocks, feats))
+    loss.backward()
+    blocks.zero_grad(set_to_none=True)
+    return sum(storages.values()) / 2**20
+
+
+def _run(spec: Dict) -> Dict:
+    """Runs in a spawned process: one imgsz, one mode."""
+    torch.manual_seed(0)
+    if spec["threads"]:
+        torch.set_num_threads(spec["threads"])
+    device = torch.device(spec["device"])
+    cuda = device.type == "cuda"
+    imgsz, batch = spec["imgsz"], spec["batch"]
+    blocks = nn.ModuleList([C2f_ASC(c, c) for c, _ in NECK_LEVELS]).to(device).train()
+    if spec["mode"] == "checkpoint":
+        set_asc_checkpoint(blocks, True)
+    optimizer = torch.optim.SGD(blocks.parameters(), lr=1e-3, momentum=0.9)
+    feats = [torch.randn(batch, c, imgsz // s, imgsz // s, device=device, requires_grad=True)
+             for c, s in NECK_LEVELS]
+
+    def step() -> float:
+        if cuda:
+            torch.cuda.synchronize(device)
+        t0 = time.perf_counter()
+        optimizer.zero_grad(set_to_none=True)
+        loss = sum(block(f).square().mean() for block, f in zip(blocks, feats))
+        loss.backward()
+        optimizer.step()
+        if cuda:
+            torch.cuda.synchronize(device)
+        return (time.perf_counter() - t0) * 1000
+
+    if cuda:
+        torch.cuda.synchronize(device)
+        base = torch.cuda.memory_allocated(device) / 2**20
+        torch.cuda.reset_peak_memory_stats(device)
+    else:
+        base = _peak_rss_mb()
+    saved = _saved_mb(blocks, feats)
+    times = [step() for _ in range(spec["warmup"] + spec["repeats"])][spec["warmup"]:]
+    peak = torch.cuda.max_memory_allocated(device) / 2**20 if cuda else _peak_rss_mb()
+    return {"imgsz": imgsz, "mode": spec["mode"], "batch": batch, "device": str(device),
+            "peak_mb": round(peak - base, 1), "saved_mb": round(saved, 1),
+            "step_p50_ms": round(float(np.percentile(times, 50)), 2),
+            "step_p95_ms": round(float(np.percentile(times, 95)), 2)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="C2f_ASC training memory / step time with ASC checkpointing")
+    parser.add_argument("--imgsz", type=int, nargs="+", default=[640, 960, 1280])
+    parser.add_argument("--batch", type=int, default=8)
+    parser.add_argument("--device", type=str, default=None, help="cuda:0 / cpu (default: cuda:0 if available)")
+    parser.add_argument("--threads", type=int, default=None, help="CPU threads (default: torch default)")
+    parser.add_argument("--warmup", type=int, default=2, help="Unmeasured steps per config")
+    parser.add_argument("--repeats", type=int, default=10, help="Measured steps per config")
+    parser.add_argument("--output", type=str, default=str(DEFAULT_OUTPUT))
+    args = parser.parse_args()
+
+    device = args.device or ("cuda:0" if torch.cuda.is_available() else "cpu")
+    ctx = mp.get_context("spawn")  # fresh process per config: peak memory is not shared between runs
+    results = []
+    for imgsz in args.imgsz:
+        if imgsz % NECK_LEVELS[-1][1]:
+            raise SystemExit(f"[ERROR] imgsz {imgsz} is not a multiple of {NECK_LEVELS[-1][1]}")
+        for mode in MODES:
+            spec = {"imgsz": imgsz, "mode": mode, "batch": args.batch, "device": device, "threads": args.threads,
+                    "warmup": args.warmup, "repeats": args.repeats}
+            with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as executor:
+                try:
+                    entry = executor.submit(_run, spec).result()
+                except Exception as e:  # OOM at this size is a result too
+                    print(f"[WARN] imgsz={imgsz} {mode}: {type(e).__name__}: {e}")
+                    entry = {"imgsz": imgsz, "mode": mode, "batch": args.batch, "device": device,
+                             "error": f"{type(e).__name__}: {e}"}
+            results.append(entry)
+            if "error" not in entry:
+                print(f"[OK] imgsz={imgsz} {mode:<10} peak {entry['peak_mb']:.0f} MB, "
+                      f"saved {entry['saved_mb']:.0f} MB, step p50 {entry['step_p50_ms']:.1f} ms")
+
+    ratios = {}
+    for imgsz in args.imgsz:
+        plain, ckpt = ({r["mode"]: r for r in results if r["imgsz"] == imgsz}.get(m) for m in MODES)
+        if plain and ckpt and "error" not in plain and "error" not in ckpt:
+            ratios[str(imgsz)] = {
+                "peak_ratio": round(ckpt["peak_mb"] / max(plain["peak_mb"], 1e-9), 3),
+                "saved_ratio": round(ckpt["saved_mb"] / max(plain["saved_mb"], 1e-9), 3),
+                "step_ratio": round(ckpt["step_p50_ms"] / max(plain["step_p50_ms"], 1e-9), 3),
+            }
+    out = Path(args.output)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps({"device": device, "batch": args.batch, "levels": NECK_LEVELS,
+                               "results": results, "checkpoint_vs_plain": ratios}, indent=2), encoding="utf-8")
+
+    print("=" * 72)
+    print(f"{'imgsz':<8}{'mode':<12}{'peak(MB)':>10}{'saved(MB)':>11}{'p50(ms)':>10}{'p95(ms)':>10}")
+    for r in results:
+        if "error" in r:
+            print(f"{r['imgsz']:<8}{r['mode']:<12}  {r['error']}")
+            continue
+        print(f"{r['imgsz']:<8}{r['mode']:<12}{r['peak_mb']:>10.0f}{r['saved_mb']:>11.0f}"
+              f"{r['step_p50_ms']:>10.1f}{r['step_p95_ms']:>10.1f}")
+    for imgsz, c in ratios.items():
+        print(f"[STATS] imgsz={imgsz}: checkpoint peak x{c['peak_ratio']:.2f}, saved x{c['saved_ratio']:.2f}, "
+              f"step time x{c['step_ratio']:.2f}")
+    print("=" * 72)
+    print(f"[DONE] Report: {out}")
+
+
+if __name__ == "__main__":
+    main()
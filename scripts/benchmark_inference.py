@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+Inference speed benchmark of the ablation checkpoints over a fixed air-cj sample.
+
+Outputs:
+- results/benchmark/inference_benchmark.json (embedded by export_report_pdf.py
+  as a speed table)
+
+Notes:
+- Backends: ``pytorch`` (best.pt), ``onnx`` (best.onnx from export_onnx.py)
+  and ``int8`` (best_int8.onnx from quantize_onnx.py). Missing weights are
+  skipped with a warning.
+- Every (model, backend) pair runs in a fresh spawned process, so peak RSS is
+  attributable to that pair and thread settings do not leak between runs.
+- Images are decoded once up front; the timed path is
+  preprocess (letterbox) -> inference (forward) -> postprocess (decode + NMS),
+  the same split every backend in utils/inference.py exposes.
+- Each (batch size, thread count) config gets ``--warmup`` unmeasured batches,
+  then ``--repeats`` passes over the sample in fixed batches; throughput and
+  the per-image stage times come from these passes.
+- Latency percentiles (``latency_ms``) are per request: another ``--repeats``
+  passes go through the serving micro-batcher (utils/serving.py) with
+  ``batch size`` requests in flight, and every request contributes its own
+  enqueue -> response time. ``batch_latency_ms`` keeps the time to return
+  one fixed batch for reference.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing as mp
+import os
+import platform
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+import cv2
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from scripts.run_four_model_on_images import DEFAULT_MODELS, IMAGE_EXTS, MODEL_SPECS
+from utils.inference import decode_obb_output, load_backend, resolve_weight
+from utils.serving import MicroBatcher
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None
+
+BENCH_BACKENDS = ("pytorch", "onnx", "int8")
+INT8_SUFFIX = "_int8"
+PERCENTILES = (50, 95, 99)
+DEFAULT_OUTPUT = ROOT / "results" / "benchmark" / "inference_benchmark.json"
+
+
+def sample_images(img_dir: Path, count: int, seed: int) -> List[Path]:
+    """Deterministic sample: ``count`` images drawn with ``seed`` from the sorted folder listing."""
+    paths: List[Path] = []
+    for ext in IMAGE_EXTS:
+        paths.extend(img_dir.glob(f"*{ext}"))
+    paths = sorted(paths)
+    if count <= 0 or count >= len(paths):
+        return paths
+    rng = np.random.default_rng(seed)
+    return [paths[i] for i in sorted(rng.choice(len(paths), size=count, replace=False))]
+
+
+def weight_for(key: str, backend: str) -> Path:
+    """Weight file of a DEFAULT_MODELS key for one of BENCH_BACKENDS."""
+    specs = {spec.key: spec.weight for spec in MODEL_SPECS}
+    if backend == "int8":
+        return specs[key + INT8_SUFFIX]
+    return resolve_weight(specs[key], backend)
+
+
+def _peak_rss_mb() -> float:
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS.
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def _set_torch_threads(threads: int) -> None:
+    import torch
+
+    torch.set_num_threads(threads)
+
+
+def _summary(values: Sequence[float]) -> Dict[str, float]:
+    arr = np.asarray(values)
+    return {**{f"p{p}": float(np.percentile(arr, p)) for p in PERCENTILES}, "mean": float(arr.mean())}
+
+
+def _request_latencies(
+    backend,
+    images: Sequence[np.ndarray],
+    batch_size: int,
+    imgsz: int,
+    conf: float,
+    iou: float,
+    repeats: int,
+) -> List[float]:
+    """Enqueue -> response time (ms) of every request sent through a MicroBatcher.
+
+    Closed loop with ``batch_size`` requests in flight: each response enqueues
+    the next image, so the batcher keeps forming batches of up to ``batch_size``.
+    """
+    order = [img for _ in range(repeats) for img in images]
+    latencies: List[float] = []
+    errors: List[BaseException] = []
+    lock = threading.Lock()
+    done = threading.Event()
+    sent = 0
+    batcher = MicroBatcher(backend, max_batch=batch_size, imgsz=imgsz, iou=iou, name="benchmark")
+
+    def send() -> None:
+        nonlocal sent
+        with lock:
+            if sent >= len(order) or errors:
+                return
+            image = order[sent]
+            sent += 1
+        start = time.perf_counter()
+        batcher.submit(image, conf).add_done_callback(lambda fut: finish(fut, start))
+
+    def finish(fut, start: float) -> None:
+        elapsed = (time.perf_counter() - start) * 1000.0
+        with lock:
+            if fut.exception() is not None:
+                errors.append(fut.exception())
+            else:
+                latencies.append(elapsed)
+            if errors or len(latencies) == len(order):
+                done.set()
+                return
+        send()
+
+    try:
+        for _ in range(min(batch_size, len(order))):
+            send()
+        done.wait()
+    finally:
+        batcher.close()
+    if errors:
+        raise errors[0]
+    return latencies
+
+
+def _run_config(
+    backend,
+    images: Sequence[np.ndarray],
+    batch_size: int,
+    imgsz: int,
+    conf: float,
+    iou: float,
+    warmup: int,
+    repeats: int,
+) -> Dict[str, object]:
+    batches = [images[i : i + batch_size] for i in range(0, len(images), batch_size)]
+    for i in range(warmup):
+        chunk = batches[i % len(batches)]
+        batch, metas = backend.preprocess(chunk, imgsz)
+        decode_obb_output(backend.run(batch), metas, conf=conf, iou=iou)
+
+    stage = {"preprocess": 0.0, "inference": 0.0, "postprocess": 0.0}
+    latencies: List[float] = []
+    n_images = 0
+    shapes = set()
+    for _ in range(repeats):
+        for chunk in batches:
+            t0 = time.perf_counter()
+            batch, metas = backend.preprocess(chunk, imgsz)
+            t1 = time.perf_counter()
+            out = backend.run(batch)
+            t2 = time.perf_counter()
+            decode_obb_output(out, metas, conf=conf, iou=iou)
+            t3 = time.perf_counter()
+            stage["preprocess"] += t1 - t0
+            stage["inference"] += t2 - t1
+            stage["postprocess"] += t3 - t2
+            latencies.append((t3 - t0) * 1000.0)
+            n_images += len(chunk)
+            shapes.add(tuple(batch.shape[2:]))
+
+    total_s = sum(stage.values())
+    requests = _request_latencies(backend, images, batch_size, imgsz, conf, iou, repeats)
+    return {
+        "batch_size": batch_size,
+        "images": n_images,
+        "images_per_s": n_images / total_s if total_s > 0 else 0.0,
+        "latency_ms": _summary(requests),
+        "batch_latency_ms": _summary(latencies),
+        "stage_ms_per_image": {k: v / n_images * 1000.0 for k, v in stage.items()},
+        "input_shapes": sorted([list(s) for s in shapes]),
+    }
+
+
+def benchmark_pair(
+    key: str,
+    backend_name: str,
+    image_paths: Sequence[str],
+    batch_sizes: Sequence[int],
+    threads: Sequence[int],
+    imgsz: int,
+    conf: float,
+    iou: float,
+    warmup: int,
+    repeats: int,
+) -> Dict[str, object]:
+    """Benchmark one (model, backend) pair; meant to run in its own process."""
+    weight = weight_for(key, backend_name)
+    images = [img for img in (cv2.imread(p) for p in image_paths) if img is not None]
+    rss_before = _peak_rss_mb()
+
+    configs = []
+    backend = None
+    for t in threads:
+        if weight.suffix == ".onnx":
+            # Thread count is a session option, so each count needs its own session.
+            backend = load_backend(weight, "auto", intra_op_threads=t)
+        else:
+            if backend is None:
+                backend = load_backend(weight, "auto")
+            _set_torch_threads(t)
+        for bs in batch_sizes:
+            result = _run_config(backend, images, bs, imgsz, conf, iou, warmup, repeats)
+            result["threads"] = t
+            configs.append(result)
+            print(
+                f"[INFO] {key}/{backend_name} threads={t} batch={bs}: "
+                f"{result['images_per_s']:.2f} img/s, p50 {result['latency_ms']['p50']:.1f} ms",
+                flush=True,
+            )
+
+    return {
+        "model": key,
+        "backend": backend_name,
+        "weight": str(weight),
+        "fixed_batch": getattr(backend, "fixed_batch", None),
+        "peak_rss_mb": _peak_rss_mb(),
+        "baseline_rss_mb": rss_before,
+        "configs": configs,
+    }
+
+
+def _environment() -> Dict[str, object]:
+    env: Dict[str, object] = {
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+    }
+    for name in ("torch", "onnxruntime", "ultralytics"):
+        try:
+            env[name] = __import__(name).__version__
+        except ImportError:
+            env[name] = None
+    return env
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark inference speed of the ablation checkpoints")
+    parser.add_argument("--models", nargs="+", default=list(DEFAULT_MODELS), choices=list(DEFAULT_MODELS))
+    parser.add_argument("--backends", nargs="+", default=list(BENCH_BACKENDS), choices=BENCH_BACKENDS)
+    parser.add_argument("--images-dir", type=str, default=str(ROOT / "air-cj"))
+    parser.add_argument("--images", type=int, default=32, help="Sample size (0 = whole folder)")
+    parser.add_argument("--seed", type=int, default=0, help="Sampling seed")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument(
+        "--threads", type=int, nargs="+", default=[1, os.cpu_count() or 1], help="Intra-op thread counts"
+    )
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--conf", type=float, default=0.25)
+    parser.add_argument("--iou", type=float, default=0.45)
+    parser.add_argument("--warmup", type=int, default=3, help="Unmeasured batches per config")
+    parser.add_argument("--repeats", type=int, default=1, help="Timed passes over the sample per config")
+    parser.add_argument("--output", type=str, default=str(DEFAULT_OUTPUT))
+    args = parser.parse_args()
+    if min(args.batch_sizes) < 1 or min(args.threads) < 1:
+        parser.error("--batch-sizes and --threads must be >= 1")
+
+    paths = sample_images(Path(args.images_dir), args.images, args.seed)
+    if not paths:
+        raise RuntimeError(f"No images found in: {args.images_dir}")
+    print(f"[INFO] {len(paths)} images from {args.images_dir} (seed {args.seed})")
+
+    results = []
+    ctx = mp.get_context("spawn")
+    for key in args.models:
+        for backend_name in args.backends:
+            weight = weight_for(key, backend_name)
+            if not weight.exists():
+                print(f"[WARN] {key}/{backend_name}: missing {weight}, skipped")
+                continue
+            with ProcessPoolExecutor(1, mp_context=ctx) as pool:
+                entry = pool.submit(
+                    benchmark_pair,
+                    key,
+                    backend_name,
+                    [str(p) for p in paths],
+                    args.batch_sizes,
+                    sorted(set(args.threads)),
+                    args.imgsz,
+                    args.conf,
+                    args.iou,
+                    args.warmup,
+                    args.repeats,
+                ).result()
+            print(f"[OK] {key}/{backend_name}: peak RSS {entry['peak_rss_mb']:.0f} MB")
+            results.append(entry)
+
+    report = {
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "environment": _environment(),
+        "settings": {
+            "images_dir": args.images_dir,
+            "images": [p.name for p in paths],
+            "seed": args.seed,
+            "imgsz": args.imgsz,
+            "conf": args.conf,
+            "iou": args.iou,
+            "warmup": args.warmup,
+            "repeats": args.repeats,
+            "batch_sizes": args.batch_sizes,
+            "threads": sorted(set(args.threads)),
+        },
+        "results": results,
+    }
+    out_path = Path(args.output)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    out_path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"[DONE] Benchmark report: {out_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of the ProbIoU / KFIoU losses: analytic backward vs step-by-step autograd.
+
+Outputs:
+- results/benchmark/iou_loss.json: the gradcheck results, and per (loss, N,
+  implementation) forward+backward time percentiles and memory, plus the
+  analytic / autograd ratios
+
+Notes:
+- ``analytic`` is models.improved.kpr_loss.probiou_loss / kfiou_loss
+  (ProbIoUFunction / KFIoUFunction); ``autograd`` is the original
+  implementation kept as probiou_loss_autograd / kfiou_loss_autograd.
+- Before timing, both Functions are checked in float64: torch.autograd.gradcheck
+  on ``--check-n`` box pairs, and loss values / gradients against the autograd
+  implementation. A failed check stops the benchmark.
+- Boxes are (x, y, w, h, angle) in pixels: random predictions, targets jittered
+  around them, as for the positive anchors of one batch. One timed step is
+  forward, ``loss.sum().backward()`` into pred and target.
+- ``saved_mb``: tensors kept for backward (saved_tensors_hooks), on any device;
+  ``peak_mb``: torch.cuda.max_memory_allocated growth over the inputs (CUDA only).
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import numpy as np
+import torch
+
+from models.improved.kpr_loss import (
+    kfiou_loss,
+    kfiou_loss_autograd,
+    probiou_loss,
+    probiou_loss_autograd,
+)
+
+LOSSES = {
+    "probiou": {"analytic": probiou_loss, "autograd": probiou_loss_autograd},
+    "kfiou": {"analytic": kfiou_loss, "autograd": kfiou_loss_autograd},
+}
+DEFAULT_OUTPUT = ROOT / "results" / "benchmark" / "iou_loss.json"
+
+
+def _boxes(n: int, device: torch.device, dtype: torch.dtype, seed: int = 0):
+    g = torch.Generator().manual_seed(seed)
+    pred = torch.rand(n, 5, generator=g, dtype=torch.float64)
+    pred[:, :2] *= 640
+    pred[:, 2:4] = pred[:, 2:4] * 60 + 4
+    pred[:, 4] = (pred[:, 4] - 0.5) * np.pi
+    jitter = torch.randn(n, 5, generator=g, dtype=torch.float64) * torch.tensor([4.0, 4.0, 3.0, 3.0, 0.2],
+                                                                                 dtype=torch.float64)
+    target = pred + jitter
+    target[:, 2:4] = target[:, 2:4].abs() + 1
+    return pred.to(device, dtype), target.to(device, dtype)
+
+
+def _check(name: str, check_n: int) -> Dict:
+    analytic, reference = LOSSES[name]["analytic"], LOSSES[name]["autograd"]
+    pred, target = _boxes(check_n, torch.device("cpu"), torch.float64, seed=1)
+    pred.requires_grad_(True)
+    target.requires_grad_(True)
+    passed = torch.autograd.gradcheck(analytic, (pred, target), raise_exception=False)
+    loss, ref = analytic(pred, target), reference(pred, target)
+    grads = torch.autograd.grad(loss.sum(), (pred, target))
+    ref_grads = torch.autograd.grad(ref.sum(), (pred, target))
+    return {"gradcheck": bool(passed), "n": check_n,
+            "max_loss_diff": float((loss - ref).abs().max()),
+            "max_grad_diff": max(float((g - r).abs().max()) for g, r in zip(grads, ref_grads))}
+
+
+def _saved_mb(fn: Callable, pred: torch.Tensor, target: torch.Tensor) -> float:
+    storages = {}
+
+    def pack(t: torch.Tensor) -> torch.Tensor:
+        storage = t.untyped_storage()
+        storages[storage.data_ptr()] = storage.nbytes()
+        return t
+
+    with torch.autograd.graph.saved_tensors_hooks(pack, lambda t: t):
+        loss = fn(pred, target).sum()
+    loss.backward()
+    return sum(storages.values()) / 2**20
+
+
+def _bench(fn: Callable, n: int, device: torch.device, dtype: torch.dtype, warmup: int, repeats: int) -> Dict:
+    cuda = device.type == "cuda"
+    pred, target = _boxes(n, device, dtype)
+    pred.requires_grad_(True)
+    target.requires_grad_(True)
+
+    def step() -> float:
+        pred.grad = target.grad = None
+        if cuda:
+            torch.cuda.synchronize(device)
+        t0 = time.perf_counter()
+        fn(pred, target).sum().backward()
+        if cuda:
+            torch.cuda.synchronize(device)
+        return (time.perf_counter() - t0) * 1000
+
+    saved = _saved_mb(fn, pred, target)
+    for _ in range(warmup):
+        step()
+    entry = {}
+    if cuda:
+        pred.grad = target.grad = None
+        torch.cuda.synchronize(device)
+        base = torch.cuda.memory_allocated(device)
+        torch.cuda.reset_peak_memory_stats(device)
+        step()
+        entry["peak_mb"] = round((torch.cuda.max_memory_allocated(device) - base) / 2**20, 3)
+    times = [step() for _ in range(repeats)]
+    entry.update(saved_mb=round(saved, 3), p50_ms=round(float(np.percentile(times, 50)), 4),
+                 p95_ms=round(float(np.percentile(times, 95)), 4))
+    return entry
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="ProbIoU / KFIoU forward+backward: analytic vs autograd")
+    parser.add_argument("--n", type=int, nargs="+", default=[64, 1024, 16384, 262144], help="Box pairs per call")
+    parser.add_argument("--losses", nargs="+", default=list(LOSSES), choices=list(LOSSES))
+    parser.add_argument("--device", type=str, default=None, help="cuda:0 / cpu (default: cuda:0 if available)")
+    parser.add_argument("--dtype", type=str, default="float32", choices=("float32", "float64"))
+    parser.add_argument("--threads", type=int, default=None, help="CPU threads (default: torch default)")
+    parser.add_argument("--warmup", type=int, default=5, help="Unmeasured steps per config")
+    parser.add_argument("--repeats", type=int, default=50, help="Measured steps per config")
+    parser.add_argument("--check-n", type=int, default=16, help="Box pairs for gradcheck")
+    parser.add_argument("--output", type=str, default=str(DEFAULT_OUTPUT))
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    device = torch.device(args.device or ("cuda:0" if torch.cuda.is_available() else "cpu"))
+    dtype = getattr(torch, args.dtype)
+
+    checks = {}
+    for name in args.losses:
+        checks[name] = _check(name, args.check_n)
+        c = checks[name]
+        print(f"[{'OK' if c['gradcheck'] else 'WARN'}] {name}: gradcheck {'passed' if c['gradcheck'] else 'FAILED'}, "
+              f"vs autograd |dloss| {c['max_loss_diff']:.2e}, |dgrad| {c['max_grad_diff']:.2e}")
+    if not all(c["gradcheck"] for c in checks.values()):
+        raise SystemExit("[ERROR] gradcheck failed; not benchmarking")
+
+    results, ratios = [], {}
+    for name in args.losses:
+        for n in args.n:
+            row = {}
+            for impl, fn in LOSSES[name].items():
+                row[impl] = _bench(fn, n, device, dtype, args.warmup, args.repeats)
+                results.append({"loss": name, "n": n, "impl": impl, **row[impl]})
+            ratios[f"{name}_{n}"] = {
+                "speedup": round(row["autograd"]["p50_ms"] / max(row["analytic"]["p50_ms"], 1e-9), 3),
+                "saved_ratio": round(row["analytic"]["saved_mb"] / max(row["autograd"]["saved_mb"], 1e-9), 3),
+            }
+            print(f"[OK] {name} N={n}: {row['autograd']['p50_ms']:.3f} -> {row['analytic']['p50_ms']:.3f} ms, "
+                  f"saved {row['autograd']['saved_mb']:.2f} -> {row['analytic']['saved_mb']:.2f} MB")
+
+    out = Path(args.output)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps({"device": str(device), "dtype": args.dtype, "threads": torch.get_num_threads(),
+                               "checks": checks, "results": results, "analytic_vs_autograd": ratios},
+                              indent=2), encoding="utf-8")
+
+    print("=" * 72)
+    print(f"{'loss':<9}{'N':>8}  {'impl':<10}{'p50(ms)':>10}{'p95(ms)':>10}{'saved(MB)':>11}"
+          + (f"{'peak(MB)':>10}" if device.type == "cuda" else ""))
+    for r in results:
+        print(f"{r['loss']:<9}{r['n']:>8}  {r['impl']:<10}{r['p50_ms']:>10.3f}{r['p95_ms']:>10.3f}{r['saved_mb']:>11.2f}"
+              + (f"{r['peak_mb']:>10.2f}" if "peak_mb" in r else ""))
+    for key, c in ratios.items():
+        print(f"[STATS] {key}: {c['speedup']:.2f}x faster, saved memory x{c['saved_ratio']:.2f}")
+    print("=" * 72)
+    print(f"[DONE] Report: {out}")
+
+
+if __name__ == "__main__":
+    main()
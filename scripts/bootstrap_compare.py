@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Bootstrap confidence intervals and paired significance tests between models.
+
+Outputs:
+- results/comparison/bootstrap_ci.json: per model CIs for mAP50, mAP50-95,
+  precision, recall and F1, and per pair the delta CI and two-sided p-value
+- results/comparison/metrics_report.json (with ``--report``): the usual
+  comparison report with each improvement annotated by its CI and p-value
+
+Notes:
+- Every model is evaluated once on the same image list (conf 0.001, iou 0.7);
+  the resampling works on the per-image TP/score arrays of utils.evaluation
+  (see utils/bootstrap.py), so no model runs again per resample.
+- Pairs default to every ordered pair in ``--models`` order (A before B,
+  delta = B - A). Resampling is paired: all models share the same resamples.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from scripts.run_four_model_on_images import DEFAULT_MODELS, MODEL_SPECS
+from utils.bootstrap import DEFAULT_RESAMPLES, METRICS, bootstrap_report, default_workers
+from utils.evaluation import ObbEvaluator, evaluate_backend, list_split_images
+from utils.inference import BACKENDS, load_backend, resolve_weight
+from utils.metrics import MetricsAnalyzer
+
+
+def _parse_pairs(values: List[str], models: List[str]) -> List[Tuple[str, str]]:
+    pairs = []
+    for value in values:
+        a, sep, b = value.partition(":")
+        if not sep or a not in models or b not in models:
+            raise ValueError(f"Bad pair '{value}': expected A:B with both in --models")
+        pairs.append((a, b))
+    return pairs
+
+
+def _print_report(report: Dict) -> None:
+    print("=" * 96)
+    print(f"{'Model':<14}" + "".join(f"{m:>16}" for m in METRICS))
+    print("-" * 96)
+    for name, ci in report["models"].items():
+        cells = [f"{ci[m]['value'] * 100:.1f} ±{(ci[m]['ci_high'] - ci[m]['ci_low']) * 50:.1f}%" for m in METRICS]
+        print(f"{name:<14}" + "".join(f"{cell:>16}" for cell in cells))
+    print("-" * 96)
+    print("(value ± half-width of the CI)")
+    for comp in report["comparisons"]:
+        cells = []
+        for m in METRICS:
+            c = comp["metrics"][m]
+            mark = "*" if c["significant"] else " "
+            cells.append(f"{c['delta'] * 100:>+6.1f}% p={c['p_value']:.3f}{mark}")
+        print(f"{comp['b'] + '-' + comp['a']:<14}" + "".join(f"{cell:>16}" for cell in cells))
+    print("=" * 96)
+    print(f"* delta CI at alpha={report['settings']['alpha']} excludes 0")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Bootstrap CIs and paired tests between models")
+    parser.add_argument(
+        "--models",
+        nargs="+",
+        default=list(DEFAULT_MODELS),
+        choices=[spec.key for spec in MODEL_SPECS],
+    )
+    parser.add_argument("--pairs", nargs="+", default=None, help="A:B pairs to test (delta = B - A)")
+    parser.add_argument("--backend", type=str, default="pytorch", choices=BACKENDS)
+    parser.add_argument("--eval-dir", type=str, default=str(ROOT / "data" / "real_splits" / "val" / "images"))
+    parser.add_argument("--eval-images", type=int, default=0, help="Limit evaluation images (0 = all)")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--resamples", type=int, default=DEFAULT_RESAMPLES)
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=default_workers(), help="Processes (0 = in-process)")
+    parser.add_argument("--output", type=str, default=str(ROOT / "results" / "comparison" / "bootstrap_ci.json"))
+    parser.add_argument("--report", action="store_true", help="Also write metrics_report.json with CIs")
+    args = parser.parse_args()
+
+    images = list_split_images(Path(args.eval_dir), args.eval_images)
+    if not images:
+        raise RuntimeError(f"No images found in: {args.eval_dir}")
+    specs = {spec.key: spec.weight for spec in MODEL_SPECS}
+
+    evaluators: Dict[str, ObbEvaluator] = {}
+    points: Dict[str, Dict[str, float]] = {}
+    for key in args.models:
+        weight = resolve_weight(specs[key], args.backend)
+        if not weight.exists():
+            print(f"[WARN] {key}: missing {weight}, skipped")
+            continue
+        evaluators[key] = ObbEvaluator()
+        points[key] = evaluate_backend(
+            load_backend(weight, "auto"), Path(args.eval_dir), imgsz=args.imgsz, images=images,
+            evaluator=evaluators[key],
+        )
+        print(f"[OK] {key}: mAP50 {points[key]['mAP50']:.4f} on {len(images)} images")
+    if len(evaluators) < 1:
+        raise RuntimeError("No models evaluated; check that the weights exist")
+    pairs = _parse_pairs(args.pairs, list(evaluators)) if args.pairs else None
+
+    t0 = time.perf_counter()
+    report = bootstrap_report(evaluators, pairs, args.resamples, args.seed, args.alpha, args.workers)
+    print(f"[STATS] {args.resamples} resamples x {len(evaluators)} models: {time.perf_counter() - t0:.1f} s "
+          f"({args.workers} workers)")
+    report["settings"].update(backend=args.backend, eval_dir=args.eval_dir, imgsz=args.imgsz)
+    _print_report(report)
+
+    out_path = Path(args.output)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    out_path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    if args.report:
+        analyzer = MetricsAnalyzer(str(ROOT / "results"))
+        analyzer.generate_comparison_report(points, str(out_path.parent / "metrics_report.json"), bootstrap=report)
+    print(f"[DONE] Bootstrap report: {out_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Export the four ablation checkpoints to ONNX and check ONNX Runtime parity.
+
+Outputs (next to each checkpoint):
+- runs/plane_*/weights/best.onnx
+
+Notes:
+- ``--dynamic`` exports dynamic batch and resolution; otherwise batch and
+  imgsz are fixed to ``--batch`` / ``--imgsz``.
+- ``--check-parity`` compares the exported graph against the PyTorch model:
+  raw head outputs on identical preprocessed tensors, then end-to-end
+  detections of UltralyticsBackend vs OnnxObbBackend (own decode + NMS).
+  The script exits non-zero when either check is outside tolerance.
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+import cv2
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from scripts.run_four_model_on_images import IMAGE_EXTS, MODEL_SPECS
+from utils.inference import ObbDetections, OnnxObbBackend, UltralyticsBackend
+from utils.rotated_nms import probiou_matrix
+
+
+def export_checkpoint(weight: Path, imgsz: int, batch: int, dynamic: bool, opset: int, simplify: bool) -> Path:
+    backend = UltralyticsBackend(weight)
+    out = backend.model.export(
+        format="onnx",
+        imgsz=imgsz,
+        batch=batch,
+        dynamic=dynamic,
+        opset=opset or None,
+        simplify=simplify,
+    )
+    return Path(out)
+
+
+def _sample_images(img_dir: Path, count: int) -> List[np.ndarray]:
+    paths: List[Path] = []
+    for ext in IMAGE_EXTS:
+        paths.extend(sorted(img_dir.glob(f"*{ext}")))
+    images = []
+    for p in paths[:count]:
+        img = cv2.imread(str(p))
+        if img is not None:
+            images.append(img)
+    return images
+
+
+def _match_detections(a: ObbDetections, b: ObbDetections, iou_thres: float, conf_tol: float) -> int:
+    """Greedy one-to-one match on ProbIoU with a confidence tolerance; returns matched count."""
+    if len(a) == 0 or len(b) == 0:
+        return 0
+    ious = probiou_matrix(a.xywhr, b.xywhr)
+    ok = (ious >= iou_thres) & (np.abs(a.conf[:, None] - b.conf[None, :]) <= conf_tol)
+    matched = 0
+    used = np.zeros(len(b), dtype=bool)
+    for i in np.argsort(-a.conf):
+        cand = np.where(ok[i] & ~used)[0]
+        if len(cand):
+            used[cand[np.argmax(ious[i, cand])]] = True
+            matched += 1
+    return matched
+
+
+def check_parity(
+    weight: Path,
+    onnx_path: Path,
+    images: Sequence[np.ndarray],
+    imgsz: int,
+    conf: float,
+    atol: float,
+    min_match: float,
+) -> Dict[str, float]:
+    pt = UltralyticsBackend(weight)
+    ox = OnnxObbBackend(onnx_path)
+
+    # 1) Raw head outputs on the identical (square, fixed-size) input tensor.
+    step = ox.fixed_batch or 1
+    max_diff = 0.0
+    for start in range(0, len(images), step):
+        chunk = list(images[start : start + step])
+        while len(chunk) < step:
+            chunk.append(chunk[-1])
+        batch, _ = ox.preprocess(chunk, imgsz)
+        ref = pt.run(batch)
+        got = ox.run(batch)
+        # Box coordinates are in input pixels; normalize them so one tolerance fits all channels.
+        scale = np.ones((ref.shape[1], 1), dtype=np.float32)
+        scale[:4] = 1.0 / batch.shape[-1]
+        max_diff = max(max_diff, float(np.abs((ref - got) * scale).max()))
+
+    # 2) End-to-end detections through each backend's own pre/post-processing.
+    n_ref = n_matched = 0
+    for img in images:
+        a = pt.predict([img], conf=conf, imgsz=imgsz)[0]
+        b = ox.predict([img], conf=conf, imgsz=imgsz)[0]
+        n_ref += max(len(a), len(b))
+        n_matched += _match_detections(a, b, iou_thres=0.9, conf_tol=0.01)
+
+    match_rate = n_matched / n_ref if n_ref else 1.0
+    return {
+        "raw_max_abs_diff": max_diff,
+        "detections": float(n_ref),
+        "match_rate": match_rate,
+        "passed": float(max_diff <= atol and match_rate >= min_match),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Export ablation checkpoints to ONNX")
+    keys = [spec.key for spec in MODEL_SPECS if spec.weight.suffix == ".pt"]
+    parser.add_argument("--models", nargs="+", default=keys, choices=keys)
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--batch", type=int, default=1, help="Fixed batch size (ignored with --dynamic)")
+    parser.add_argument("--dynamic", action="store_true", help="Dynamic batch and resolution")
+    parser.add_argument("--opset", type=int, default=0, help="ONNX opset (0 = exporter default)")
+    parser.add_argument("--simplify", action="store_true")
+    parser.add_argument("--check-parity", action="store_true")
+    parser.add_argument("--parity-dir", type=str, default=str(ROOT / "air-cj"))
+    parser.add_argument("--parity-images", type=int, default=8)
+    parser.add_argument("--conf", type=float, default=0.25)
+    parser.add_argument("--atol", type=float, default=1e-3, help="Max abs diff of raw outputs (boxes normalized)")
+    parser.add_argument("--min-match", type=float, default=0.98, help="Min fraction of matched detections")
+    args = parser.parse_args()
+
+    specs = [spec for spec in MODEL_SPECS if spec.key in args.models]
+    for spec in specs:
+        if not spec.weight.exists():
+            raise FileNotFoundError(f"Missing checkpoint: {spec.weight}")
+
+    images: List[np.ndarray] = []
+    if args.check_parity:
+        images = _sample_images(Path(args.parity_dir), args.parity_images)
+        if not images:
+            raise RuntimeError(f"No parity images found in: {args.parity_dir}")
+
+    failed = []
+    for spec in specs:
+        onnx_path = export_checkpoint(spec.weight, args.imgsz, args.batch, args.dynamic, args.opset, args.simplify)
+        print(f"[OK] {spec.key}: {onnx_path}")
+        if not args.check_parity:
+            continue
+        report = check_parity(spec.weight, onnx_path, images, args.imgsz, args.conf, args.atol, args.min_match)
+        status = "PASS" if report["passed"] else "FAIL"
+        print(
+            f"[{status}] {spec.key}: raw max|diff|={report['raw_max_abs_diff']:.2e} "
+            f"matched {report['match_rate'] * 100:.1f}% of {int(report['detections'])} detections"
+        )
+        if not report["passed"]:
+            failed.append(spec.key)
+
+    if failed:
+        raise SystemExit(f"ONNX parity check failed for: {', '.join(failed)}")
+    print("[DONE] ONNX export complete.")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,9 @@ from fpdf import FPDF
 
 ROOT = Path(__file__).resolve().parent.parent
 REPORT_DIR = ROOT / "results" / "comparison"
+BENCHMARK_JSON = ROOT / "results" / "benchmark" / "inference_benchmark.json"
+MODEL_LABELS = {"baseline": "Baseline", "asc": "+ASC", "asor": "+ASOR-Loss", "full": "MSA-RCNN (Full)"}
+BACKEND_LABELS = {"pytorch": "PyTorch", "onnx": "ONNX", "int8": "ONNX INT8"}
 
 FONT_R = "/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc"
 FONT_B = "/usr/share/fonts/opentype/noto/NotoSansCJK-Bold.ttc"
@@ -141,6 +144,25 @@ class PDF(FPDF):
         self.ln(4)
 
 
+def speed_table_rows(bench: dict) -> List[List[str]]:
+    """速度表：每个(模型, 后端)一行，batch=1 延迟取最多线程配置，吞吐取全部配置中的最大值。"""
+    rows = []
+    for entry in bench["results"]:
+        configs = entry["configs"]
+        single = [c for c in configs if c["batch_size"] == 1] or configs
+        lat = max(single, key=lambda c: c["threads"])
+        best = max(configs, key=lambda c: c["images_per_s"])
+        rows.append([
+            MODEL_LABELS.get(entry["model"], entry["model"]),
+            BACKEND_LABELS.get(entry["backend"], entry["backend"]),
+            f"{lat['latency_ms']['p50']:.1f}",
+            f"{lat['latency_ms']['p99']:.1f}",
+            f"{best['images_per_s']:.1f} (b{best['batch_size']}/t{best['threads']})",
+            f"{entry['peak_rss_mb']:.0f}",
+        ])
+    return rows
+
+
 def build():
     sb = json.loads((REPORT_DIR / "same_batch_report.json").read_text())
     mt = json.loads((REPORT_DIR / "metrics_report.json").read_text())
@@ -450,6 +472,25 @@ def build():
     pdf.h2("7.3 指标汇总")
     pdf.img(REPORT_DIR / "metrics_table.png", caption="图 7-3  指标汇总表")
 
+    if BENCHMARK_JSON.exists():
+        bench = json.loads(BENCHMARK_JSON.read_text())
+        st = bench["settings"]
+        env = bench["environment"]
+        pdf.add_page()
+        pdf.h2("7.4 推理速度")
+        pdf.p(
+            f"在 air-cj 中固定抽取的 {len(st['images'])} 张图像上测速（seed={st['seed']}，"
+            f"输入尺寸 {st['imgsz']}，每组配置预热 {st['warmup']} 个批次）。"
+            "延迟为单批次端到端耗时（预处理 + 前向 + 解码/NMS），"
+            f"测试环境：{env['cpu_count']} 核 CPU，{env['platform']}。"
+        )
+        pdf.three_line_table(
+            ["模型", "后端", "P50(ms)", "P99(ms)", "吞吐 img/s", "峰值内存MB"],
+            speed_table_rows(bench),
+            col_w=[40, 28, 24, 24, 44, 30],
+            caption="表 7-1  推理速度（batch=1 延迟；吞吐为最优 batch/线程配置）",
+        )
+
     # ================================================================
     # 第8章 结论
     # ================================================================
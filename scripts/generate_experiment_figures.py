@@ -13,6 +13,7 @@ from __future__ import annotations
 import argparse
 import hashlib
 import json
+import sys
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Dict, List, Optional, Sequence, Tuple
@@ -25,13 +26,10 @@ import matplotlib.pyplot as plt
 import numpy as np
 import yaml
 
-try:
-    from ultralytics import YOLO
-except Exception:  # pragma: no cover - fallback for environments without ultralytics
-    YOLO = None
-
-
 ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from utils.inference import BACKENDS, load_backend, resolve_weight
 
 
 @dataclass(frozen=True)
@@ -223,34 +221,9 @@ def _simulate_detections(gt_boxes: Sequence[np.ndarray], recall: float, seed: in
     return detections
 
 
-def _predict_with_model(model, image_path: Path, conf: float, imgsz: int) -> List[Detection]:
-    results = model.predict(str(image_path), conf=conf, iou=0.45, imgsz=imgsz, verbose=False)
-    result = results[0]
-    dets: List[Detection] = []
-
-    if result.obb is None or len(result.obb) == 0:
-        return dets
-
-    obb = result.obb
-    confs = obb.conf.cpu().numpy() if hasattr(obb, "conf") and obb.conf is not None else np.ones(len(obb))
-
-    if hasattr(obb, "xyxyxyxy") and obb.xyxyxyxy is not None:
-        pts_all = obb.xyxyxyxy.cpu().numpy()
-        for i, pts in enumerate(pts_all):
-            dets.append(Detection(points=pts.astype(np.float32), conf=float(confs[i])))
-        return dets
-
-    if hasattr(obb, "xywhr") and obb.xywhr is not None:
-        xywhr = obb.xywhr.cpu().numpy()
-        for i, row in enumerate(xywhr):
-            x, y, w, h, r = row.tolist()
-            angle_deg = r * 180.0 / np.pi if abs(r) <= 2 * np.pi else r
-            rect = ((x, y), (max(w, 1e-6), max(h, 1e-6)), angle_deg)
-            pts = cv2.boxPoints(rect).astype(np.float32)
-            dets.append(Detection(points=pts, conf=float(confs[i])))
-        return dets
-
-    return dets
+def _predict_with_model(model, image: np.ndarray, conf: float, imgsz: int) -> List[Detection]:
+    dets = model.predict([image], conf=conf, iou=0.45, imgsz=imgsz)[0]
+    return [Detection(points=pts.astype(np.float32), conf=float(c)) for pts, c in zip(dets.polys, dets.conf)]
 
 
 def _build_attention_map(
@@ -452,6 +425,7 @@ def main() -> None:
     parser.add_argument("--weights-asc", type=str, default="")
     parser.add_argument("--weights-asor", type=str, default="")
     parser.add_argument("--weights-full", type=str, default="")
+    parser.add_argument("--backend", type=str, default="pytorch", choices=BACKENDS)
     args = parser.parse_args()
 
     output_dir = Path(args.output_dir).resolve()
@@ -493,15 +467,15 @@ def main() -> None:
     for spec in MODEL_SPECS:
         custom = weight_overrides.get(spec.key, "").strip()
         weight_path = Path(custom) if custom else (ROOT / spec.default_weight)
-        weight_path = weight_path.resolve()
+        weight_path = resolve_weight(weight_path.resolve(), args.backend)
         weight_used[spec.key] = str(weight_path)
 
-        if YOLO is None or not weight_path.exists():
+        if not weight_path.exists():
             loaded_models[spec.key] = None
             continue
 
         try:
-            loaded_models[spec.key] = YOLO(str(weight_path))
+            loaded_models[spec.key] = load_backend(weight_path, args.backend)
         except Exception:
             loaded_models[spec.key] = None
 
@@ -554,7 +528,7 @@ def main() -> None:
         for spec in MODEL_SPECS:
             model = loaded_models[spec.key]
             if model is not None:
-                detections = _predict_with_model(model, img_path, conf=args.conf, imgsz=args.imgsz)
+                detections = _predict_with_model(model, img, conf=args.conf, imgsz=args.imgsz)
             else:
                 sim_seed = _stable_seed(spec.key, img_path.name, base=args.seed)
                 detections = _simulate_detections(gt_boxes, spec.fallback_recall, sim_seed)
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Load generator for scripts/serve_obb.py.
+
+Sends images from a folder to /predict from ``--concurrency`` client threads
+(each with its own keep-alive connection) and reports client-side p50/p90/p99
+latency, requests/s and errors, followed by the server's /metrics (queue wait,
+batch inference time and mean batch size).
+
+Outputs:
+- results/serving/load_test.json (unless ``--output ''``)
+
+Example:
+    python scripts/serve_obb.py --models full --max-batch 8 --max-wait-ms 5 &
+    python scripts/load_test_server.py --concurrency 1 4 16 --requests 200
+"""
+
+from __future__ import annotations
+
+import argparse
+import http.client
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+from urllib.parse import urlencode, urlparse
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from scripts.run_four_model_on_images import IMAGE_EXTS
+
+PERCENTILES = (50, 90, 99)
+
+
+def _load_payloads(img_dir: Path, limit: int) -> List[bytes]:
+    paths: List[Path] = []
+    for ext in IMAGE_EXTS:
+        paths.extend(sorted(img_dir.glob(f"*{ext}")))
+    return [p.read_bytes() for p in sorted(paths)[:limit]]
+
+
+def _get_json(host: str, port: int, path: str, timeout: float) -> Dict:
+    conn = http.client.HTTPConnection(host, port, timeout=timeout)
+    try:
+        conn.request("GET", path)
+        resp = conn.getresponse()
+        return json.loads(resp.read())
+    finally:
+        conn.close()
+
+
+def _client(
+    host: str,
+    port: int,
+    path: str,
+    payloads: Sequence[bytes],
+    next_index,
+    timeout: float,
+) -> Tuple[List[float], int]:
+    """One client thread: sequential requests over a keep-alive connection until the shared counter runs out."""
+    latencies: List[float] = []
+    errors = 0
+    conn = http.client.HTTPConnection(host, port, timeout=timeout)
+    try:
+        while True:
+            i = next_index()
+            if i is None:
+                break
+            body = payloads[i % len(payloads)]
+            t0 = time.perf_counter()
+            try:
+                conn.request("POST", path, body=body, headers={"Content-Type": "application/octet-stream"})
+                resp = conn.getresponse()
+                resp.read()
+                ok = resp.status == 200
+            except (OSError, http.client.HTTPException):
+                ok = False
+                conn.close()
+                conn = http.client.HTTPConnection(host, port, timeout=timeout)
+            if ok:
+                latencies.append((time.perf_counter() - t0) * 1000.0)
+            else:
+                errors += 1
+    finally:
+        conn.close()
+    return latencies, errors
+
+
+def run_load(
+    host: str,
+    port: int,
+    path: str,
+    payloads: Sequence[bytes],
+    concurrency: int,
+    requests: int,
+    duration_s: float,
+    timeout: float,
+) -> Dict[str, float]:
+    lock = threading.Lock()
+    counter = {"sent": 0}
+    deadline = time.perf_counter() + duration_s if duration_s > 0 else None
+
+    def next_index():
+        with lock:
+            if deadline is not None and time.perf_counter() >= deadline:
+                return None
+            if deadline is None and counter["sent"] >= requests:
+                return None
+            counter["sent"] += 1
+            return counter["sent"] - 1
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        futures = [
+            pool.submit(_client, host, port, path, payloads, next_index, timeout) for _ in range(concurrency)
+        ]
+        results = [f.result() for f in futures]
+    wall = time.perf_counter() - t0
+
+    latencies = np.asarray([v for lat, _ in results for v in lat])
+    errors = sum(err for _, err in results)
+    report: Dict[str, float] = {
+        "concurrency": concurrency,
+        "requests": int(len(latencies)),
+        "errors": int(errors),
+        "wall_s": wall,
+        "req_per_s": len(latencies) / wall if wall > 0 else 0.0,
+    }
+    for p in PERCENTILES:
+        report[f"p{p}_ms"] = float(np.percentile(latencies, p)) if len(latencies) else 0.0
+    report["mean_ms"] = float(latencies.mean()) if len(latencies) else 0.0
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test the local OBB inference server")
+    parser.add_argument("--url", type=str, default="http://127.0.0.1:8765")
+    parser.add_argument("--images", type=str, default=str(ROOT / "air-cj"))
+    parser.add_argument("--max-images", type=int, default=32, help="Distinct images to cycle through")
+    parser.add_argument("--model", type=str, default="", help="Model key (default: server default; 'all' for every model)")
+    parser.add_argument("--conf", type=float, default=0.25)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16], help="Client threads per level")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per concurrency level")
+    parser.add_argument("--duration", type=float, default=0.0, help="Seconds per level (overrides --requests)")
+    parser.add_argument("--warmup", type=int, default=4, help="Unmeasured requests before the first level")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--output", type=str, default=str(ROOT / "results" / "serving" / "load_test.json"))
+    args = parser.parse_args()
+
+    url = urlparse(args.url)
+    host, port = url.hostname or "127.0.0.1", url.port or 80
+    payloads = _load_payloads(Path(args.images), args.max_images)
+    if not payloads:
+        raise RuntimeError(f"No images found in: {args.images}")
+
+    health = _get_json(host, port, "/health", args.timeout)
+    print(f"[INFO] Server models: {', '.join(health['models'])} (default {health['default_model']})")
+    query = {"conf": args.conf}
+    if args.model:
+        query["model"] = args.model
+    path = "/predict?" + urlencode(query)
+
+    if args.warmup > 0:
+        run_load(host, port, path, payloads, 1, args.warmup, 0.0, args.timeout)
+
+    levels = []
+    print("[STATS] conc  requests  errors     req/s   p50(ms)   p90(ms)   p99(ms)")
+    for concurrency in args.concurrency:
+        before = _get_json(host, port, "/metrics", args.timeout)
+        report = run_load(host, port, path, payloads, concurrency, args.requests, args.duration, args.timeout)
+        after = _get_json(host, port, "/metrics", args.timeout)
+        # Mean batch size over this level only, from the cumulative server counters.
+        report["server"] = {
+            key: {
+                "batches": after[key]["batches"] - before[key]["batches"],
+                "mean_batch_size": (after[key]["requests"] - before[key]["requests"])
+                / max(after[key]["batches"] - before[key]["batches"], 1),
+            }
+            for key in after
+        }
+        levels.append(report)
+        print(
+            f"[STATS] {concurrency:>4} {report['requests']:>9} {report['errors']:>7} {report['req_per_s']:>9.2f} "
+            f"{report['p50_ms']:>9.1f} {report['p90_ms']:>9.1f} {report['p99_ms']:>9.1f}"
+        )
+
+    metrics = _get_json(host, port, "/metrics", args.timeout)
+    for key, m in metrics.items():
+        if not m["requests"]:
+            continue
+        print(
+            f"[STATS] server {key}: {m['requests']} requests, mean batch {m['mean_batch_size']:.2f}, "
+            f"queue p50 {m['queue_ms']['p50']:.1f} ms, infer p50 {m['infer_ms']['p50']:.1f} ms, "
+            f"total p99 {m['total_ms']['p99']:.1f} ms"
+        )
+
+    if args.output:
+        out_path = Path(args.output)
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        out = {"url": args.url, "path": path, "images": len(payloads), "levels": levels, "server_metrics": metrics}
+        out_path.write_text(json.dumps(out, indent=2), encoding="utf-8")
+        print(f"[DONE] Load test report: {out_path}")
+
+
+if __name__ == "__main__":
+    main()
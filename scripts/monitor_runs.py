@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Live terminal dashboard over the results.csv of running (and finished) trainings.
+
+Examples:
+    python scripts/monitor_runs.py                          # follow runs/**/results.csv
+    python scripts/monitor_runs.py --runs "plane_*" --plot results/comparison/live_map50.png
+    python scripts/monitor_runs.py --once                   # one snapshot, e.g. from cron
+
+Outputs:
+- Terminal table per run: epochs, last/best mAP50, best-epoch P/R/F1, last
+  train box loss, an mAP50 sparkline and time since the last epoch
+- Optional PNG of the mAP50 curves (``--plot``), rewritten only after new epochs
+
+Notes:
+- Each run is followed by utils.results_store.ResultsTail: one stat() per
+  refresh, and only newly appended bytes are read; the best epoch is updated
+  from the new rows alone with the MetricsAnalyzer.get_best_epoch_metrics rule.
+- New run folders are picked up every ``--rescan`` seconds.
+- The footer shows the monitor's own CPU time per refresh.
+"""
+
+from __future__ import annotations
+
+import argparse
+import fnmatch
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from utils.results_store import ResultsTail
+
+SPARK = "▁▂▃▄▅▆▇█"
+SPARK_WIDTH = 30
+SORT_KEYS = ("name", "best", "updated")
+
+
+def sparkline(values, width: int = SPARK_WIDTH) -> str:
+    values = list(values)[-width:]
+    if not values:
+        return ""
+    lo, hi = min(values), max(values)
+    span = hi - lo
+    return "".join(SPARK[int((v - lo) / span * (len(SPARK) - 1)) if span > 0 else 0] for v in values)
+
+
+def _age(seconds: float) -> str:
+    if seconds < 60:
+        return f"{seconds:.0f}s"
+    if seconds < 3600:
+        return f"{seconds / 60:.0f}m"
+    return f"{seconds / 3600:.1f}h"
+
+
+def discover(runs_dir: Path, patterns: Optional[List[str]]) -> Dict[str, Path]:
+    found = {}
+    for csv_path in sorted(runs_dir.rglob("results.csv")):
+        name = csv_path.parent.relative_to(runs_dir).as_posix()
+        if patterns is None or any(fnmatch.fnmatch(name, p) for p in patterns):
+            found[name] = csv_path
+    return found
+
+
+def render(tails: Dict[str, ResultsTail], sort: str, now: float) -> List[str]:
+    header = (
+        f"{'Run':<28} {'Ep':>4} {'mAP50':>7} {'Best':>7} {'@Ep':>4} "
+        f"{'P':>6} {'R':>6} {'F1':>6} {'BoxLoss':>8}  {'mAP50 trend':<{SPARK_WIDTH}} {'Age':>5}"
+    )
+    order = sorted(tails)
+    if sort == "best":
+        order.sort(key=lambda n: tails[n].best.get("mAP50", -1.0), reverse=True)
+    elif sort == "updated":
+        order.sort(key=lambda n: tails[n].updated, reverse=True)
+
+    lines = [header, "-" * len(header)]
+    for name in order:
+        t = tails[name]
+        best, last = t.best, t.last
+        if not t.n_epochs:
+            lines.append(f"{name[:28]:<28} {0:>4}  waiting for first epoch")
+            continue
+        lines.append(
+            f"{name[:28]:<28} {t.n_epochs:>4} "
+            f"{last.get('mAP50', 0.0):>7.4f} {best.get('mAP50', 0.0):>7.4f} {best.get('best_epoch', 0):>4} "
+            f"{best.get('precision', 0.0):>6.3f} {best.get('recall', 0.0):>6.3f} {best.get('f1', 0.0):>6.3f} "
+            f"{last.get('train_box_loss', 0.0):>8.4f}  {sparkline(t.curve):<{SPARK_WIDTH}} {_age(now - t.updated):>5}"
+        )
+    return lines
+
+
+def save_plot(tails: Dict[str, ResultsTail], out_path: Path) -> None:
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(10, 6))
+    for name, t in sorted(tails.items()):
+        if t.curve:
+            start = t.n_epochs - len(t.curve) + 1
+            ax.plot(range(start, t.n_epochs + 1), list(t.curve), linewidth=1.5, label=name)
+    ax.set_xlabel("Epoch", fontsize=13)
+    ax.set_ylabel("mAP50", fontsize=13)
+    ax.set_title("Live mAP50", fontsize=14, fontweight="bold")
+    ax.grid(True, alpha=0.3)
+    ax.legend(fontsize=9)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    plt.tight_layout()
+    plt.savefig(out_path, dpi=100)
+    plt.close(fig)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Live dashboard over training results.csv files")
+    parser.add_argument("--runs-dir", type=str, default=str(ROOT / "runs"))
+    parser.add_argument("--runs", nargs="+", default=None, help="Run name glob patterns (default: all)")
+    parser.add_argument("--interval", type=float, default=2.0, help="Seconds between refreshes")
+    parser.add_argument("--rescan", type=float, default=10.0, help="Seconds between scans for new runs")
+    parser.add_argument("--sort", type=str, default="name", choices=SORT_KEYS)
+    parser.add_argument("--history", type=int, default=200, help="mAP50 points kept per run for trend/plot")
+    parser.add_argument("--plot", type=str, default=None, help="PNG path for mAP50 curves")
+    parser.add_argument("--once", action="store_true", help="Print one snapshot and exit")
+    args = parser.parse_args()
+
+    runs_dir = Path(args.runs_dir)
+    tails: Dict[str, ResultsTail] = {}
+    last_scan = float("-inf")
+    clear = sys.stdout.isatty() and not args.once
+    try:
+        while True:
+            cpu0 = time.process_time()
+            now = time.time()
+            if now - last_scan >= args.rescan:
+                for name, path in discover(runs_dir, args.runs).items():
+                    if name not in tails:
+                        tails[name] = ResultsTail(path, history=args.history)
+                last_scan = now
+            new_epochs = sum(t.poll() for t in tails.values())
+            if args.plot and new_epochs:
+                save_plot(tails, Path(args.plot))
+
+            lines = render(tails, args.sort, now) if tails else [f"[INFO] No results.csv under {runs_dir} yet"]
+            cpu_ms = (time.process_time() - cpu0) * 1000.0
+            lines.append(
+                f"[STATS] {len(tails)} runs, +{new_epochs} epochs, refresh CPU {cpu_ms:.1f} ms, "
+                f"{time.strftime('%H:%M:%S')}"
+            )
+            if clear:
+                sys.stdout.write("\033[H\033[J")
+            print("\n".join(lines), flush=True)
+            if args.once:
+                return
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""
+Speed/accuracy sweep over imgsz, confidence threshold and backend, with the
+latency-vs-mAP Pareto frontier.
+
+Outputs (under results/pareto/<node>/):
+- pareto_sweep.json: every (model, backend, imgsz, conf) point with latency,
+  P/R/F1/mAP and an ``on_frontier`` flag
+- pareto_frontier.png: latency vs ``--metric`` scatter with the frontier
+- cache/*.npz: per-image predictions at the lowest conf, plus stage timings
+
+Notes:
+- The network runs once per (model, backend, imgsz), at the lowest conf of the
+  grid. Each higher conf filters those cached predictions, which matches
+  running at that conf because OBB post-processing uses fast NMS (see
+  utils.inference.filter_by_conf). Postprocess time is still measured per conf
+  by decoding the same raw output again, without another forward pass.
+- A later run reuses the cache when the weight file, image list, iou and imgsz
+  match and the cached conf is <= the new lowest conf. Postprocess time for a
+  conf not timed before falls back to the closest lower timed conf, which is an
+  upper bound.
+- Latency is per image at batch size 1: preprocess + forward + decode/NMS.
+- ONNX exports with a fixed input size only run at that size; export with
+  ``export_onnx.py --dynamic`` to sweep imgsz on ONNX/INT8.
+- ``--node`` names the machine type (e.g. cpu-16c, rtx4090), so sweeps from
+  several nodes sit side by side; ``--budget-ms`` prints the most accurate
+  point within a latency budget.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import matplotlib
+
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from scripts.benchmark_inference import BENCH_BACKENDS, weight_for
+from scripts.run_four_model_on_images import DEFAULT_MODELS
+from utils.evaluation import ObbEvaluator, label_path_for, list_split_images, load_obb_labels
+from utils.inference import ObbDetections, decode_obb_output, filter_by_conf, load_backend
+
+METRICS = ("mAP50", "mAP50_95", "f1", "precision", "recall")
+MARKERS = {"pytorch": "o", "onnx": "s", "int8": "^"}
+
+
+def _image_digest(paths: Sequence[Path]) -> str:
+    return hashlib.sha1("\n".join(p.name for p in paths).encode("utf-8")).hexdigest()[:16]
+
+
+def _cache_meta(weight: Path, imgsz: int, iou: float, paths: Sequence[Path]) -> Dict[str, object]:
+    return {
+        "weight": str(weight),
+        "weight_mtime": weight.stat().st_mtime_ns,
+        "imgsz": imgsz,
+        "iou": iou,
+        "images": _image_digest(paths),
+    }
+
+
+def save_cache(
+    path: Path,
+    meta: Dict[str, object],
+    min_conf: float,
+    dets: Sequence[ObbDetections],
+    pre_ms: np.ndarray,
+    infer_ms: np.ndarray,
+    post_confs: Sequence[float],
+    post_ms: np.ndarray,
+) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    offsets = np.concatenate([[0], np.cumsum([len(d) for d in dets])]).astype(np.int64)
+    tmp = path.with_name(path.stem + ".tmp.npz")
+    np.savez_compressed(
+        tmp,
+        meta=json.dumps(meta),
+        min_conf=min_conf,
+        offsets=offsets,
+        xywhr=np.concatenate([d.xywhr for d in dets]) if dets else np.zeros((0, 5), np.float32),
+        conf=np.concatenate([d.conf for d in dets]) if dets else np.zeros(0, np.float32),
+        cls=np.concatenate([d.cls for d in dets]) if dets else np.zeros(0, np.int64),
+        pre_ms=pre_ms,
+        infer_ms=infer_ms,
+        post_confs=np.asarray(post_confs, dtype=np.float64),
+        post_ms=post_ms,
+    )
+    tmp.replace(path)
+
+
+def load_cache(path: Path, meta: Dict[str, object], min_conf: float) -> Optional[Dict[str, object]]:
+    """Cached predictions if they are valid for ``meta`` and cover ``min_conf``, else None."""
+    if not path.exists():
+        return None
+    with np.load(path) as data:
+        if json.loads(str(data["meta"])) != meta or float(data["min_conf"]) > min_conf + 1e-12:
+            return None
+        offsets = data["offsets"]
+        xywhr, conf, cls = data["xywhr"], data["conf"], data["cls"]
+        dets = [
+            ObbDetections.from_xywhr(xywhr[a:b], conf[a:b], cls[a:b]) for a, b in zip(offsets[:-1], offsets[1:])
+        ]
+        return {
+            "dets": dets,
+            "pre_ms": data["pre_ms"],
+            "infer_ms": data["infer_ms"],
+            "post_confs": data["post_confs"],
+            "post_ms": data["post_ms"],
+        }
+
+
+def run_inference(
+    backend, paths: Sequence[Path], imgsz: int, confs: Sequence[float], iou: float
+) -> Dict[str, object]:
+    """One forward pass per image; decode at every conf only to time postprocessing."""
+    confs = sorted(confs)
+    dets: List[ObbDetections] = []
+    pre_ms = np.zeros(len(paths))
+    infer_ms = np.zeros(len(paths))
+    post_ms = np.zeros((len(paths), len(confs)))
+    for i, path in enumerate(paths):
+        image = cv2.imread(str(path))
+        if image is None:
+            raise RuntimeError(f"Unreadable image: {path}")
+        t0 = time.perf_counter()
+        batch, metas = backend.preprocess([image], imgsz)
+        t1 = time.perf_counter()
+        out = backend.run(batch)
+        t2 = time.perf_counter()
+        pre_ms[i] = (t1 - t0) * 1000.0
+        infer_ms[i] = (t2 - t1) * 1000.0
+        for k, conf in enumerate(confs):
+            t3 = time.perf_counter()
+            decoded = decode_obb_output(out, metas, conf=conf, iou=iou)[0]
+            post_ms[i, k] = (time.perf_counter() - t3) * 1000.0
+            if k == 0:
+                dets.append(decoded)
+    return {"dets": dets, "pre_ms": pre_ms, "infer_ms": infer_ms, "post_confs": np.asarray(confs), "post_ms": post_ms}
+
+
+def _post_ms_for(cache: Dict[str, object], conf: float) -> Tuple[float, bool]:
+    """Mean postprocess ms at ``conf``; falls back to the closest lower timed conf (flagged as estimated)."""
+    post_confs = np.asarray(cache["post_confs"])
+    exact = np.flatnonzero(np.isclose(post_confs, conf))
+    if len(exact):
+        return float(cache["post_ms"][:, exact[0]].mean()), False
+    lower = np.flatnonzero(post_confs <= conf)
+    k = lower[-1] if len(lower) else 0
+    return float(cache["post_ms"][:, k].mean()), True
+
+
+def evaluate_confs(
+    dets: Sequence[ObbDetections],
+    gts: Sequence[Tuple[np.ndarray, np.ndarray]],
+    confs: Sequence[float],
+) -> Dict[float, Dict[str, float]]:
+    results = {}
+    for conf in confs:
+        evaluator = ObbEvaluator()
+        for d, (gt_xywhr, gt_cls) in zip(dets, gts):
+            evaluator.update(filter_by_conf(d, conf), gt_xywhr, gt_cls)
+        results[conf] = evaluator.compute()
+    return results
+
+
+def pareto_mask(latency: np.ndarray, score: np.ndarray) -> np.ndarray:
+    """True for points no other point beats on both latency (lower) and score (higher)."""
+    order = np.lexsort((-score, latency))
+    mask = np.zeros(len(latency), dtype=bool)
+    best = -np.inf
+    for i in order:
+        if score[i] > best:
+            mask[i] = True
+            best = score[i]
+    return mask
+
+
+def plot_frontier(points: Sequence[Dict[str, object]], metric: str, node: str, out_path: Path) -> None:
+    fig, ax = plt.subplots(figsize=(10, 6.5))
+    models = sorted({p["model"] for p in points})
+    colors = {m: plt.cm.tab10(i % 10) for i, m in enumerate(models)}
+    for p in points:
+        ax.scatter(
+            p["latency_ms"],
+            p[metric],
+            c=[colors[p["model"]]],
+            marker=MARKERS.get(p["backend"], "o"),
+            s=36,
+            alpha=0.45 if not p["on_frontier"] else 0.95,
+            edgecolors="black" if p["on_frontier"] else "none",
+            linewidths=0.8,
+        )
+    front = sorted((p for p in points if p["on_frontier"]), key=lambda p: p["latency_ms"])
+    if front:
+        ax.step([p["latency_ms"] for p in front], [p[metric] for p in front], where="post", color="black", lw=1.2)
+        for p in front:
+            ax.annotate(
+                f"{p['model']}/{p['backend']}\n{p['imgsz']}px conf {p['conf']:g}",
+                (p["latency_ms"], p[metric]),
+                textcoords="offset points",
+                xytext=(6, -10),
+                fontsize=7,
+            )
+
+    handles = [plt.Line2D([], [], color=colors[m], marker="o", ls="", label=m) for m in models]
+    handles += [
+        plt.Line2D([], [], color="gray", marker=MARKERS[b], ls="", label=b)
+        for b in MARKERS
+        if any(p["backend"] == b for p in points)
+    ]
+    ax.legend(handles=handles, loc="lower right", fontsize=9)
+    ax.set_xscale("log")
+    ax.set_xlabel("Latency per image, batch 1 (ms, log scale)")
+    ax.set_ylabel(metric)
+    ax.set_title(f"Speed / Accuracy Pareto Frontier ({node})", fontsize=13, fontweight="bold")
+    ax.grid(alpha=0.3, which="both")
+    fig.tight_layout()
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    fig.savefig(out_path, dpi=180, bbox_inches="tight")
+    plt.close(fig)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Speed/accuracy Pareto sweep over imgsz, conf and backend")
+    parser.add_argument("--models", nargs="+", default=list(DEFAULT_MODELS), choices=list(DEFAULT_MODELS))
+    parser.add_argument("--backends", nargs="+", default=list(BENCH_BACKENDS), choices=BENCH_BACKENDS)
+    parser.add_argument("--imgsz", type=int, nargs="+", default=[512, 640, 800, 1024])
+    parser.add_argument("--conf", type=float, nargs="+", default=[0.001, 0.05, 0.1, 0.25, 0.4, 0.5])
+    parser.add_argument("--iou", type=float, default=0.7, help="NMS IoU (0.7 matches ultralytics validation)")
+    parser.add_argument("--eval-dir", type=str, default=str(ROOT / "data" / "real_splits" / "val" / "images"))
+    parser.add_argument("--eval-images", type=int, default=0, help="Limit evaluation images (0 = all)")
+    parser.add_argument("--metric", type=str, default="mAP50", choices=METRICS, help="Accuracy axis of the frontier")
+    parser.add_argument("--node", type=str, default="local", help="Machine/node type label for the output folder")
+    parser.add_argument("--threads", type=int, default=0, help="ONNX Runtime intra-op threads (0 = default)")
+    parser.add_argument("--budget-ms", type=float, nargs="*", default=[], help="Print the best point per budget")
+    parser.add_argument("--no-cache", action="store_true", help="Ignore cached predictions")
+    parser.add_argument("--output-dir", type=str, default=str(ROOT / "results" / "pareto"))
+    args = parser.parse_args()
+
+    paths = list_split_images(Path(args.eval_dir), args.eval_images)
+    if not paths:
+        raise RuntimeError(f"No evaluation images found in: {args.eval_dir}")
+    gts, readable = [], []
+    for p in paths:
+        image = cv2.imread(str(p))
+        if image is None:
+            print(f"[WARN] Unreadable image skipped: {p}")
+            continue
+        h, w = image.shape[:2]
+        gts.append(load_obb_labels(label_path_for(p), w, h))
+        readable.append(p)
+    if not readable:
+        raise RuntimeError(f"No readable evaluation images in: {args.eval_dir}")
+    paths = readable
+    confs = sorted(set(args.conf))
+    out_dir = Path(args.output_dir) / args.node
+    print(f"[INFO] {len(paths)} images, {len(args.imgsz)} imgsz x {len(confs)} conf per model/backend")
+
+    points: List[Dict[str, object]] = []
+    for key in args.models:
+        for backend_name in args.backends:
+            weight = weight_for(key, backend_name)
+            if not weight.exists():
+                print(f"[WARN] {key}/{backend_name}: missing {weight}, skipped")
+                continue
+            backend = None
+            for imgsz in args.imgsz:
+                meta = _cache_meta(weight, imgsz, args.iou, paths)
+                cache_path = out_dir / "cache" / f"{key}_{backend_name}_{imgsz}.npz"
+                cache = None if args.no_cache else load_cache(cache_path, meta, confs[0])
+                source = "cache"
+                if cache is None:
+                    if backend is None:
+                        kwargs = {"intra_op_threads": args.threads} if weight.suffix == ".onnx" else {}
+                        backend = load_backend(weight, "auto", **kwargs)
+                    fixed_hw = getattr(backend, "fixed_hw", None)
+                    if fixed_hw is not None and tuple(fixed_hw) != (imgsz, imgsz):
+                        print(f"[WARN] {key}/{backend_name}: fixed input {fixed_hw}, imgsz {imgsz} skipped")
+                        continue
+                    cache = run_inference(backend, paths, imgsz, confs, args.iou)
+                    save_cache(cache_path, meta, confs[0], **cache)
+                    source = "inference"
+
+                base_ms = float(cache["pre_ms"].mean() + cache["infer_ms"].mean())
+                for conf, metrics in evaluate_confs(cache["dets"], gts, confs).items():
+                    post_ms, estimated = _post_ms_for(cache, conf)
+                    points.append({
+                        "model": key,
+                        "backend": backend_name,
+                        "imgsz": imgsz,
+                        "conf": conf,
+                        "latency_ms": base_ms + post_ms,
+                        "preprocess_ms": float(cache["pre_ms"].mean()),
+                        "inference_ms": float(cache["infer_ms"].mean()),
+                        "postprocess_ms": post_ms,
+                        "postprocess_estimated": estimated,
+                        **{m: float(metrics[m]) for m in METRICS},
+                    })
+                best = max(points[-len(confs):], key=lambda p: p[args.metric])
+                print(
+                    f"[OK] {key}/{backend_name} imgsz={imgsz} ({source}): {base_ms:.1f} ms + post, "
+                    f"best {args.metric} {best[args.metric]:.4f} at conf {best['conf']:g}"
+                )
+
+    if not points:
+        raise RuntimeError("No sweep points; check that the weights exist")
+    latency = np.asarray([p["latency_ms"] for p in points])
+    score = np.asarray([p[args.metric] for p in points])
+    for p, on in zip(points, pareto_mask(latency, score)):
+        p["on_frontier"] = bool(on)
+
+    report = {
+        "node": args.node,
+        "metric": args.metric,
+        "eval_dir": args.eval_dir,
+        "images": len(paths),
+        "iou": args.iou,
+        "points": points,
+    }
+    out_dir.mkdir(parents=True, exist_ok=True)
+    (out_dir / "pareto_sweep.json").write_text(json.dumps(report, indent=2), encoding="utf-8")
+    plot_frontier(points, args.metric, args.node, out_dir / "pareto_frontier.png")
+
+    print(f"[STATS] Pareto frontier ({args.metric}):")
+    for p in sorted((p for p in points if p["on_frontier"]), key=lambda p: p["latency_ms"]):
+        print(
+            f"[STATS]   {p['latency_ms']:>9.1f} ms  {p[args.metric]:.4f}  "
+            f"{p['model']}/{p['backend']} imgsz={p['imgsz']} conf={p['conf']:g}"
+        )
+    for budget in args.budget_ms:
+        within = [p for p in points if p["latency_ms"] <= budget]
+        if not within:
+            print(f"[INFO] budget {budget:g} ms: no point fits")
+            continue
+        p = max(within, key=lambda q: (q[args.metric], -q["latency_ms"]))
+        print(
+            f"[INFO] budget {budget:g} ms: {p['model']}/{p['backend']} imgsz={p['imgsz']} conf={p['conf']:g} "
+            f"({p['latency_ms']:.1f} ms, {args.metric} {p[args.metric]:.4f})"
+        )
+    print(f"[DONE] Pareto sweep: {out_dir}")
+
+
+if __name__ == "__main__":
+    main()
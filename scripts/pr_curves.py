@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Measured precision/recall/F1 curves and F1-optimal confidence per model.
+
+Outputs:
+- results/comparison/pr_curves.json: per model, the F1-optimal threshold with
+  its P/R/F1, split metrics and the curves at IoU 0.5
+- results/comparison/pr_curve.png: PR and F1-confidence curves (replaces the
+  synthetic demo figure embedded by export_report_pdf.py)
+
+Notes:
+- Each model is evaluated once on the labelled split at conf 0.001; the curves
+  for every threshold come from sorting its detections once
+  (utils.metrics.pr_f1_curves), so no re-run per ``--conf`` is needed.
+- Curves are pooled over classes (micro average) at IoU 0.5.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Dict
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from scripts.run_four_model_on_images import DEFAULT_MODELS, MODEL_SPECS
+from utils.evaluation import ObbEvaluator, compute_ap, evaluate_backend
+from utils.inference import BACKENDS, load_backend, resolve_weight
+from utils.metrics import best_f1_threshold
+from utils.visualization import ResultVisualizer
+
+MAX_CURVE_POINTS = 1000
+
+
+def _thin(curves: Dict[str, np.ndarray], max_points: int) -> Dict[str, list]:
+    """Evenly subsample long curves for JSON/plotting (always keeps both ends)."""
+    n = len(curves["threshold"])
+    idx = np.unique(np.linspace(0, n - 1, min(n, max_points)).round().astype(int)) if n else np.zeros(0, int)
+    return {k: curves[k][idx].tolist() for k in ("threshold", "precision", "recall", "f1")}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="PR/F1 curves and F1-optimal confidence per model")
+    parser.add_argument(
+        "--models",
+        nargs="+",
+        default=list(DEFAULT_MODELS),
+        choices=[spec.key for spec in MODEL_SPECS],
+    )
+    parser.add_argument("--backend", type=str, default="pytorch", choices=BACKENDS)
+    parser.add_argument("--eval-dir", type=str, default=str(ROOT / "data" / "real_splits" / "val" / "images"))
+    parser.add_argument("--eval-images", type=int, default=0, help="Limit evaluation images (0 = all)")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--output-dir", type=str, default=str(ROOT / "results" / "comparison"))
+    args = parser.parse_args()
+
+    specs = {spec.key: spec.weight for spec in MODEL_SPECS}
+    report: Dict[str, Dict] = {}
+    plot_data: Dict[str, Dict] = {}
+    for key in args.models:
+        weight = resolve_weight(specs[key], args.backend)
+        if not weight.exists():
+            print(f"[WARN] {key}: missing {weight}, skipped")
+            continue
+        evaluator = ObbEvaluator()
+        metrics = evaluate_backend(
+            load_backend(weight, "auto"),
+            Path(args.eval_dir),
+            imgsz=args.imgsz,
+            limit=args.eval_images,
+            evaluator=evaluator,
+        )
+        curves = {k: v[:, 0] if v.ndim == 2 else v for k, v in evaluator.curves().items()}
+        best = best_f1_threshold(curves)
+        ap50 = compute_ap(curves["recall"], curves["precision"]) if len(curves["recall"]) else 0.0
+        thinned = _thin(curves, MAX_CURVE_POINTS)
+        report[key] = {"weight": str(weight), "best_f1": best, "metrics": metrics, "ap50_pooled": ap50, "curves": thinned}
+        plot_data[key] = {**thinned, "ap": ap50, "best_conf": best["conf"]}
+        print(
+            f"[OK] {key}: best F1 {best['f1']:.4f} at conf {best['conf']:.3f} "
+            f"(P {best['precision']:.4f}, R {best['recall']:.4f}), mAP50 {metrics['mAP50']:.4f}"
+        )
+
+    if not report:
+        raise RuntimeError("No models evaluated; check that the weights exist")
+    out_dir = Path(args.output_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    out_path = out_dir / "pr_curves.json"
+    out_path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    ResultVisualizer(str(out_dir)).plot_pr_curves(plot_data)
+    print(f"[DONE] PR curves: {out_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,8 +4,12 @@
 2. 组织为YOLO OBB训练格式
 3. 划分train/val/test
 4. 执行离线数据增强
+
+自动标注可通过 --backend onnx 使用导出的ONNX模型 (ONNX Runtime推理);
+同名.onnx不存在时先由 --weights 的.pt导出 (需要onnx包, 与 scripts/export_onnx.py 相同)
 """
 
+import argparse
 import os
 import sys
 import shutil
@@ -17,9 +21,10 @@ ROOT = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(ROOT))
 
 
-def step1_auto_label():
+def step1_auto_label(backend='pytorch', weights='yolov8n-obb.pt'):
     """使用预训练模型自动标注"""
-    from ultralytics import YOLO
+    import cv2
+    from utils.inference import load_backend, resolve_weight
     
     src_dir = ROOT / 'air-cj'
     out_img_dir = ROOT / 'data' / 'real' / 'images'
@@ -28,8 +33,13 @@ def step1_auto_label():
     out_lbl_dir.mkdir(parents=True, exist_ok=True)
     
     # 加载预训练OBB模型 (在DOTAv1上训练，包含plane类)
-    print("[INFO] Loading pretrained YOLOv8n-obb model...")
-    model = YOLO('yolov8n-obb.pt')
+    weight = resolve_weight(Path(weights), backend)
+    if backend == 'onnx' and not weight.exists():
+        from scripts.export_onnx import export_checkpoint
+        print(f"[INFO] {weight} not found, exporting it from {weights}")
+        weight = export_checkpoint(Path(weights), imgsz=640, batch=1, dynamic=False, opset=0, simplify=False)
+    print(f"[INFO] Loading pretrained OBB model ({backend}): {weight}")
+    model = load_backend(weight, backend)
     
     img_files = sorted(list(src_dir.glob('*.jpg')) + list(src_dir.glob('*.png')))
     print(f"[INFO] Found {len(img_files)} images in air-cj/")
@@ -38,43 +48,34 @@ def step1_auto_label():
     total_objects = 0
     
     for i, img_path in enumerate(img_files):
-        # 推理
-        results = model.predict(
-            str(img_path),
-            conf=0.25,
-            iou=0.45,
-            imgsz=640,
-            verbose=False
-        )
+        image = cv2.imread(str(img_path))
+        if image is None:
+            continue
         
-        result = results[0]
+        # 推理
+        dets = model.predict([image], conf=0.25, iou=0.45, imgsz=640)[0]
         
         # 提取OBB结果
         labels = []
-        if result.obb is not None and len(result.obb) > 0:
-            obb_data = result.obb
-            for j in range(len(obb_data)):
-                cls_id = int(obb_data.cls[j].item())
-                conf = obb_data.conf[j].item()
-                
+        if len(dets) > 0:
+            h, w = image.shape[:2]
+            for j in range(len(dets)):
                 # DOTAv1中plane的class id
                 # 我们把所有检测到的物体都当作aircraft (class 0)
                 # 因为这些图片都是飞机场景
                 
                 # 获取四个顶点坐标 (像素坐标)
-                if hasattr(obb_data, 'xyxyxyxy') and obb_data.xyxyxyxy is not None:
-                    points = obb_data.xyxyxyxy[j].cpu().numpy()  # (4, 2)
-                    h, w = result.orig_shape
-                    # 归一化
-                    norm_pts = points.copy()
-                    norm_pts[:, 0] = np.clip(norm_pts[:, 0] / w, 0, 1)
-                    norm_pts[:, 1] = np.clip(norm_pts[:, 1] / h, 0, 1)
-                    
-                    label = f"0 {norm_pts[0][0]:.6f} {norm_pts[0][1]:.6f} " \
-                           f"{norm_pts[1][0]:.6f} {norm_pts[1][1]:.6f} " \
-                           f"{norm_pts[2][0]:.6f} {norm_pts[2][1]:.6f} " \
-                           f"{norm_pts[3][0]:.6f} {norm_pts[3][1]:.6f}"
-                    labels.append(label)
+                points = dets.polys[j]  # (4, 2)
+                # 归一化
+                norm_pts = points.copy()
+                norm_pts[:, 0] = np.clip(norm_pts[:, 0] / w, 0, 1)
+                norm_pts[:, 1] = np.clip(norm_pts[:, 1] / h, 0, 1)
+                
+                label = f"0 {norm_pts[0][0]:.6f} {norm_pts[0][1]:.6f} " \
+                       f"{norm_pts[1][0]:.6f} {norm_pts[1][1]:.6f} " \
+                       f"{norm_pts[2][0]:.6f} {norm_pts[2][1]:.6f} " \
+                       f"{norm_pts[3][0]:.6f} {norm_pts[3][1]:.6f}"
+                labels.append(label)
         
         if labels:
             # 复制图片
@@ -158,12 +159,18 @@ names:
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Real data preparation pipeline')
+    parser.add_argument('--backend', type=str, default='pytorch', choices=['pytorch', 'onnx'])
+    parser.add_argument('--weights', type=str, default='yolov8n-obb.pt',
+                        help='预训练OBB权重 (onnx后端使用同名.onnx, 不存在时自动导出)')
+    args = parser.parse_args()
+    
     print("=" * 60)
     print("  Real Data Preparation Pipeline")
     print("=" * 60)
     
     print("\n--- Step 1: Auto-labeling ---")
-    n_labeled = step1_auto_label()
+    n_labeled = step1_auto_label(args.backend, args.weights)
     
     if n_labeled > 0:
         print("\n--- Step 2: Dataset split ---")
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Prune the C2f / C2f_ASC blocks of a trained OBB model to a CPU latency budget, then fine-tune.
+
+Outputs:
+- runs/prune/<name>/pruned.pt: the pruned model before fine-tuning (smaller
+  conv / BN / attention tensors, loadable with YOLO(path))
+- runs/prune/<name>/weights/best.pt: the fine-tuned pruned model
+- runs/prune/<name>/prune_plan.json: channel groups (importance source,
+  measured ms per channel, width before/after) and every pruning step
+- results/comparison/prune_report.json (``--report``): params, forward
+  latency and val metrics of the original, pruned and fine-tuned models
+
+Notes:
+- Channels are ranked by BN |gamma|; C2f_ASC outputs by the mean weights of
+  their ChannelAttention over ``--calib`` train images (utils.pruning).
+- Latency is measured on this machine's CPU with ``--threads`` threads: one
+  fused forward of an imgsz x imgsz image. The budget is ``--budget`` x the
+  original latency, or ``--budget-ms``.
+- Fine-tuning uses utils.pruning.PrunedOBBTrainer; a plain ``YOLO(...).train()``
+  would rebuild the original widths from model.yaml. Recipe: ``--config`` +
+  ``--set``, ``--epochs`` epochs.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Dict
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import torch
+from ultralytics import YOLO
+
+from utils.ablation import split_images
+from utils.pruning import (
+    PrunedOBBTrainer,
+    channel_importance,
+    count_macs,
+    find_groups,
+    latency_sensitivity,
+    load_calibration,
+    measure_latency,
+    prune_to_budget,
+)
+from utils.training import (
+    PROFILES,
+    configure_training,
+    host_cpus,
+    load_train_config,
+    parse_overrides,
+    resolve_dataset_yaml,
+)
+
+RUNS_DIR = ROOT / "runs" / "prune"
+# config keys that belong to a single run rather than to the shared recipe
+_RUN_KEYS = ("model", "project", "name", "resume", "exist_ok", "pretrained")
+
+
+def _summary(weights: Path, data: str, imgsz: int, batch: int, device: str, runs: int, save_dir: Path) -> Dict:
+    model = YOLO(str(weights))
+    net = model.model.float()
+    latency = measure_latency(net, imgsz, runs)
+    summary = {"weights": str(weights), "params_m": round(sum(p.numel() for p in net.parameters()) / 1e6, 3),
+               "gmacs": round(count_macs(net, imgsz) / 1e9, 3), "latency_ms": round(latency, 3)}
+    box = model.val(data=data, imgsz=imgsz, batch=batch, device=device, plots=False, verbose=False,
+                    project=str(save_dir.parent), name=save_dir.name, exist_ok=True).box
+    summary.update(precision=round(float(box.mp), 4), recall=round(float(box.mr), 4),
+                   mAP50=round(float(box.map50), 4), mAP50_95=round(float(box.map), 4))
+    return summary
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Latency-aware channel pruning of C2f / C2f_ASC blocks")
+    parser.add_argument("--weights", type=str, default="runs/plane_full/weights/best.pt")
+    parser.add_argument("--config", type=str, default="configs/improved_train.yaml",
+                        help="Training config (data, imgsz and the fine-tune recipe)")
+    parser.add_argument("--set", nargs="*", default=[], metavar="KEY=VALUE", help="Overrides for the recipe")
+    parser.add_argument("--budget", type=float, default=0.7, help="Target latency as a fraction of the original")
+    parser.add_argument("--budget-ms", type=float, default=None, help="Absolute target latency (ms)")
+    parser.add_argument("--threads", type=int, default=None, help="CPU threads for latency (default: all)")
+    parser.add_argument("--runs", type=int, default=30, help="Timed forward passes per measurement")
+    parser.add_argument("--step", type=float, default=0.05, help="Fraction of prunable channels per step")
+    parser.add_argument("--min-keep", type=float, default=0.25, help="Keep at least this fraction per group")
+    parser.add_argument("--round", type=int, default=8, help="Channel counts stay multiples of N")
+    parser.add_argument("--calib", type=int, default=32, help="Train images for the attention ranking")
+    parser.add_argument("--epochs", type=int, default=10, help="Fine-tune epochs (0: no fine-tune)")
+    parser.add_argument("--profile", type=str, default="auto", choices=PROFILES)
+    parser.add_argument("--batch", type=int, default=None, help="Override the profile batch")
+    parser.add_argument("--name", type=str, default=None, help="Run name (runs/prune/<name>)")
+    parser.add_argument("--report", type=str, default=str(ROOT / "results" / "comparison" / "prune_report.json"))
+    args = parser.parse_args()
+
+    weights = Path(args.weights) if Path(args.weights).is_absolute() else ROOT / args.weights
+    if not weights.exists():
+        raise SystemExit(f"[ERROR] Weights not found: {weights}")
+    config = load_train_config(ROOT / args.config, ROOT)
+    config.update(parse_overrides(args.set))
+    imgsz = int(config.get("imgsz", 640))
+    data = str(resolve_dataset_yaml(config["data"], RUNS_DIR, ROOT))
+    name = args.name or f"{weights.parent.parent.name or weights.stem}_b{args.budget_ms or args.budget:g}"
+    save_dir = RUNS_DIR / name
+    save_dir.mkdir(parents=True, exist_ok=True)
+    threads = args.threads or host_cpus()
+
+    torch.set_num_threads(threads)
+    model = YOLO(str(weights))
+    net = model.model.float().cpu().eval()
+    groups = find_groups(net)
+    if not groups:
+        raise SystemExit(f"[ERROR] {weights} has no prunable C2f / C2f_ASC channels")
+    calib = load_calibration(split_images(data, "train"), imgsz, args.calib)
+    channel_importance(net, groups, calib)
+    print(f"[INFO] {len(groups)} channel groups; measuring latency on {threads} CPU thread(s) at imgsz={imgsz}")
+    base_ms = latency_sensitivity(net, groups, imgsz, args.runs, args.round)
+    budget_ms = args.budget_ms or base_ms * args.budget
+    print(f"[INFO] Original {base_ms:.2f} ms, budget {budget_ms:.2f} ms")
+    history = prune_to_budget(net, groups, budget_ms, imgsz, args.step, args.min_keep, args.round, args.runs, base_ms)
+
+    pruned = save_dir / "pruned.pt"
+    model.save(str(pruned))
+    plan = {"weights": str(weights), "imgsz": imgsz, "threads": threads, "base_ms": round(base_ms, 3),
+            "budget_ms": round(budget_ms, 3), "steps": history,
+            "groups": [{"name": g["name"], "kind": g["kind"], "asc": g["asc"],
+                        "rank": "channel_attention" if g["asc"] and g["kind"] == "output" else "bn_gamma",
+                        "ms_per_channel": round(g["ms_per_channel"], 6), "measured": g["measured"],
+                        "width": g["orig"], "kept": g["width"]} for g in groups]}
+    (save_dir / "prune_plan.json").write_text(json.dumps(plan, indent=2), encoding="utf-8")
+    print(f"[OK] Pruned checkpoint: {pruned}")
+
+    finetuned = save_dir / "weights" / "best.pt"
+    if args.epochs > 0:
+        student = YOLO(str(pruned))
+        host = configure_training(student, args.profile, imgsz=imgsz, batch=args.batch, cache="disk")
+        host["trainer"] = PrunedOBBTrainer
+        train_args = {k: v for k, v in config.items() if k not in _RUN_KEYS}
+        train_args.update(data=data, epochs=args.epochs, **host)
+        student.train(**train_args, project=str(RUNS_DIR), name=name, exist_ok=True)
+        device, batch = host["device"], host["batch"]
+    else:
+        device, batch = "cpu", args.batch or 8
+
+    torch.set_num_threads(threads)  # training may have changed it; time as during pruning
+    report = {"imgsz": imgsz, "threads": threads, "budget_ms": round(budget_ms, 3), "models": {}}
+    for key, path in (("original", weights), ("pruned", pruned), ("finetuned", finetuned)):
+        if path.exists():
+            report["models"][key] = _summary(path, data, imgsz, batch, device, args.runs, save_dir / "val" / key)
+    out = Path(args.report)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+    print("=" * 72)
+    print(f"{'Model':<11}{'Params(M)':>10}{'GMACs':>8}{'ms':>9}{'mAP50':>9}{'mAP50-95':>10}")
+    for key, r in report["models"].items():
+        print(f"{key:<11}{r['params_m']:>10.3f}{r['gmacs']:>8.2f}{r['latency_ms']:>9.2f}"
+              f"{r['mAP50']:>9.4f}{r['mAP50_95']:>10.4f}")
+    print("=" * 72)
+    print(f"[DONE] Report: {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Quantize the ablation checkpoints to INT8 for CPU inference with ONNX Runtime.
+
+Outputs:
+- runs/plane_*/weights/best_int8.onnx (selectable as ``<key>_int8`` in MODEL_SPECS)
+- results/quantization/quantization_report.json
+
+Notes:
+- Static QDQ quantization calibrated on a sample of data/real_splits/val/images
+  (per-channel INT8 weights, UINT8 activations).
+- The ASC attention branches (channel / spatial / coordinate attention, whose
+  sigmoid gates multiply the feature map) and the OBB head decode (DFL softmax,
+  angle sin/cos, box decode, class sigmoid) stay in float; only the conv trunk
+  is quantized.
+- ``--eval`` runs the FP32 and INT8 models through utils/evaluation.py on the
+  validation split and reports the mAP delta next to the CPU latency gain.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import cv2
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from scripts.export_onnx import export_checkpoint
+from scripts.run_four_model_on_images import DEFAULT_MODELS, MODEL_SPECS
+from utils.evaluation import evaluate_backend, list_split_images
+from utils.inference import OnnxObbBackend
+
+try:
+    import onnx
+    from onnxruntime.quantization import (
+        CalibrationDataReader,
+        CalibrationMethod,
+        QuantFormat,
+        QuantType,
+        quantize_static,
+    )
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+except ImportError:  # pragma: no cover - optional dependency
+    onnx = None
+    CalibrationDataReader = object
+
+INT8_SUFFIX = "_int8"
+# Module scopes (as they appear in exported node names) of the ASC attention branches.
+ASC_FLOAT_SCOPES = ("/asc/", "/channel_attn/", "/spatial_attn/", "/coord_attn/")
+CALIB_METHODS = {"minmax": "MinMax", "entropy": "Entropy", "percentile": "Percentile"}
+
+
+class _ImageCalibrationReader(CalibrationDataReader):
+    """Feeds letterboxed calibration images one at a time, exactly as OnnxObbBackend preprocesses them."""
+
+    def __init__(self, backend: OnnxObbBackend, paths: Sequence[Path], imgsz: int):
+        self._backend = backend
+        self._imgsz = imgsz
+        self._paths = list(paths)
+        self._iter: Optional[Iterator[Path]] = None
+
+    def get_next(self) -> Optional[Dict[str, np.ndarray]]:
+        if self._iter is None:
+            self._iter = iter(self._paths)
+        for path in self._iter:
+            image = cv2.imread(str(path))
+            if image is None:
+                continue
+            batch, _ = self._backend.preprocess([image], self._imgsz)
+            return {self._backend.input_name: batch}
+        return None
+
+    def rewind(self) -> None:
+        self._iter = None
+
+
+def float_nodes(model_path: Path) -> List[str]:
+    """Names of nodes kept in float: ASC attention branches and the OBB head decode."""
+    graph = onnx.load(str(model_path)).graph
+    names = [node.name for node in graph.node]
+    indices = [int(m.group(1)) for n in names for m in [re.match(r"/model\.(\d+)/", n)] if m]
+    head = f"/model.{max(indices)}/" if indices else None
+
+    keep = []
+    for name in names:
+        if any(scope in name for scope in ASC_FLOAT_SCOPES):
+            keep.append(name)
+        elif head and name.startswith(head):
+            # Top-level head ops and the DFL are the decode; cv2/cv3/cv4 are the head convs.
+            rest = name[len(head) :]
+            if "/" not in rest or rest.startswith("dfl/"):
+                keep.append(name)
+    return keep
+
+
+def quantize_model(
+    fp32_path: Path,
+    out_path: Path,
+    calib_paths: Sequence[Path],
+    imgsz: int,
+    method: str,
+    per_channel: bool,
+) -> Dict[str, int]:
+    backend = OnnxObbBackend(fp32_path)
+    excluded = float_nodes(fp32_path)
+    with tempfile.TemporaryDirectory() as tmp:
+        prep_path = Path(tmp) / "prep.onnx"
+        quant_pre_process(str(fp32_path), str(prep_path), skip_symbolic_shape=True)
+        quantize_static(
+            str(prep_path),
+            str(out_path),
+            _ImageCalibrationReader(backend, calib_paths, imgsz),
+            quant_format=QuantFormat.QDQ,
+            per_channel=per_channel,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            calibrate_method=getattr(CalibrationMethod, CALIB_METHODS[method]),
+            nodes_to_exclude=excluded,
+        )
+
+    # quantize_static drops the ultralytics metadata (class names, stride); copy it over.
+    src, dst = onnx.load(str(fp32_path)), onnx.load(str(out_path))
+    del dst.metadata_props[:]
+    dst.metadata_props.extend(src.metadata_props)
+    onnx.save(dst, str(out_path))
+    return {"float_nodes": len(excluded), "total_nodes": len(src.graph.node)}
+
+
+def measure_latency(backend: OnnxObbBackend, images: Sequence[np.ndarray], imgsz: int, runs: int) -> Dict[str, float]:
+    """Per-image end-to-end latency (preprocess + forward + decode/NMS) at batch size 1."""
+    for image in images[:3]:
+        backend.predict([image], imgsz=imgsz)
+    samples = []
+    for i in range(runs):
+        image = images[i % len(images)]
+        t0 = time.perf_counter()
+        backend.predict([image], imgsz=imgsz)
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    arr = np.asarray(samples)
+    return {"mean_ms": float(arr.mean()), "p50_ms": float(np.percentile(arr, 50))}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="INT8 quantization of ablation checkpoints (ONNX Runtime)")
+    parser.add_argument("--models", nargs="+", default=list(DEFAULT_MODELS), choices=list(DEFAULT_MODELS))
+    parser.add_argument("--calib-dir", type=str, default=str(ROOT / "data" / "real_splits" / "val" / "images"))
+    parser.add_argument("--calib-images", type=int, default=64)
+    parser.add_argument("--calib-method", type=str, default="minmax", choices=sorted(CALIB_METHODS))
+    parser.add_argument("--no-per-channel", action="store_true", help="Per-tensor instead of per-channel weights")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--threads", type=int, default=0, help="ONNX Runtime intra-op threads (0 = default)")
+    parser.add_argument("--eval", action="store_true", help="Report mAP delta on the validation split")
+    parser.add_argument("--eval-dir", type=str, default=str(ROOT / "data" / "real_splits" / "val" / "images"))
+    parser.add_argument("--eval-images", type=int, default=0, help="Limit evaluation images (0 = all)")
+    parser.add_argument("--latency-runs", type=int, default=50)
+    parser.add_argument("--output", type=str, default=str(ROOT / "results" / "quantization" / "quantization_report.json"))
+    args = parser.parse_args()
+
+    if onnx is None:
+        raise RuntimeError("onnx and onnxruntime are required (pip install onnx onnxruntime)")
+
+    calib_paths = list_split_images(Path(args.calib_dir))
+    if not calib_paths:
+        raise RuntimeError(f"No calibration images found in: {args.calib_dir}")
+    rng = np.random.default_rng(0)
+    calib_paths = [calib_paths[i] for i in sorted(rng.permutation(len(calib_paths))[: args.calib_images])]
+    latency_images = [img for img in (cv2.imread(str(p)) for p in calib_paths[:8]) if img is not None]
+
+    report: Dict[str, Dict] = {}
+    specs = {spec.key: spec for spec in MODEL_SPECS}
+    for key in args.models:
+        weight = specs[key].weight
+        int8_path = specs[key + INT8_SUFFIX].weight
+        fp32_path = weight.with_suffix(".onnx")
+        if not fp32_path.exists():
+            if not weight.exists():
+                raise FileNotFoundError(f"Missing checkpoint: {weight}")
+            fp32_path = export_checkpoint(weight, args.imgsz, batch=1, dynamic=False, opset=0, simplify=False)
+
+        print(f"[INFO] {key}: calibrating on {len(calib_paths)} images ({args.calib_method})")
+        counts = quantize_model(
+            fp32_path, int8_path, calib_paths, args.imgsz, args.calib_method, not args.no_per_channel
+        )
+        print(f"[OK] {key}: {int8_path} ({counts['float_nodes']}/{counts['total_nodes']} nodes kept in float)")
+
+        entry: Dict[str, Dict] = {"nodes": counts}
+        for tag, path in (("fp32", fp32_path), ("int8", int8_path)):
+            backend = OnnxObbBackend(path, intra_op_threads=args.threads)
+            entry[tag] = {
+                "weight": str(path),
+                "size_mb": path.stat().st_size / 2**20,
+                "latency": measure_latency(backend, latency_images, args.imgsz, args.latency_runs),
+            }
+            if args.eval:
+                entry[tag]["metrics"] = evaluate_backend(
+                    backend, Path(args.eval_dir), imgsz=args.imgsz, limit=args.eval_images
+                )
+
+        entry["speedup"] = entry["fp32"]["latency"]["mean_ms"] / entry["int8"]["latency"]["mean_ms"]
+        line = (
+            f"[INFO] {key}: latency {entry['fp32']['latency']['mean_ms']:.1f} -> "
+            f"{entry['int8']['latency']['mean_ms']:.1f} ms (x{entry['speedup']:.2f})"
+        )
+        if args.eval:
+            entry["delta"] = {
+                name: entry["int8"]["metrics"][name] - entry["fp32"]["metrics"][name]
+                for name in ("precision", "recall", "f1", "mAP50", "mAP50_95")
+            }
+            line += f", mAP50 {entry['delta']['mAP50']:+.4f}, mAP50-95 {entry['delta']['mAP50_95']:+.4f}"
+        print(line)
+        report[key] = entry
+
+    out_path = Path(args.output)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    out_path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"[DONE] Quantization report: {out_path}")
+
+
+if __name__ == "__main__":
+    main()
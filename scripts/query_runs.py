@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Query training runs through the results store (utils/results_store.py).
+
+Examples:
+    python scripts/query_runs.py best                      # best epoch of every run
+    python scripts/query_runs.py top -k 20 --metric mAP50_95
+    python scripts/query_runs.py curve --runs plane_full plane_baseline --column mAP50 --plot
+    python scripts/query_runs.py time --runs baseline baseline_prog   # wall-clock time to reach mAP50
+
+Outputs:
+- results/runs.sqlite: the store, refreshed incrementally on every call
+- results/comparison/run_curves_<column>.png with ``curve --plot``
+- results/comparison/time_to_<metric>.json with ``time``
+
+Notes:
+- Every call re-ingests ``--runs-dir`` first; unchanged results.csv files are
+  skipped by mtime/size and growing ones only have their new rows parsed.
+- Run names are results.csv parent folders relative to ``--runs-dir``.
+- ``time`` compares training wall-clock time (results.csv ``time`` column) to
+  reach each target of ``--metric``; the first of ``--runs`` is the reference
+  (e.g. fixed resolution), and targets default to ``--fractions`` of its best value.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import numpy as np
+
+from utils.metrics import MetricsAnalyzer, time_to_target
+from utils.results_store import BEST_METRIC, ResultsStore
+
+
+def _plot_curves(curves, column: str, out_path: Path) -> None:
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(10, 6))
+    for run, (epochs, values) in curves.items():
+        ax.plot(epochs, values, linewidth=1.5, label=run)
+    ax.set_xlabel("Epoch", fontsize=13)
+    ax.set_ylabel(column, fontsize=13)
+    ax.set_title(f"{column} per Epoch", fontsize=14, fontweight="bold")
+    ax.grid(True, alpha=0.3)
+    if len(curves) <= 12:
+        ax.legend(fontsize=9)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    plt.tight_layout()
+    plt.savefig(out_path, dpi=300, bbox_inches="tight")
+    plt.close()
+    print(f"[INFO] Curves saved: {out_path}")
+
+
+def _time_to_metric(store: ResultsStore, runs, metric: str, targets, fractions) -> dict:
+    times, values = store.curves("time", runs), store.curves(metric, runs)
+    missing = [run for run in runs if run not in values]
+    if missing:
+        raise SystemExit(f"[ERROR] Unknown run(s): {missing}")
+    ref = runs[0]
+    if not targets:
+        targets = [round(float(np.nanmax(values[ref][1])) * f, 4) for f in fractions]
+    report = {"metric": metric, "reference": ref, "targets": targets, "runs": {}}
+    print(f"{'Run':<30}{'best':>8}{'total s':>10}" + "".join(f"{f'>= {t:.4f}':>24}" for t in targets))
+    for run in runs:
+        t, v = times[run][1], values[run][1]
+        hits = [time_to_target(t, v, target) for target in targets]
+        report["runs"][run] = {"best": float(np.nanmax(v)), "total_s": float(t[-1]), "epochs": len(v),
+                               "hits": [{"target": tg, "epoch": h[0], "seconds": h[1]} if h else
+                                        {"target": tg, "epoch": None, "seconds": None} for tg, h in zip(targets, hits)]}
+        cells = []
+        for i, h in enumerate(hits):
+            ref_hit = report["runs"][ref]["hits"][i]["seconds"]
+            if h is None:
+                cells.append(f"{'-':>24}")
+            else:
+                speedup = f" ({ref_hit / h[1]:.2f}x)" if ref_hit and run != ref and h[1] > 0 else ""
+                cells.append(f"{f'{h[1]:.0f}s @ep{h[0]}{speedup}':>24}")
+        print(f"{run:<30}{report['runs'][run]['best']:>8.4f}{float(t[-1]):>10.0f}" + "".join(cells))
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Query training runs via the results store")
+    parser.add_argument("command", choices=("ingest", "best", "top", "curve", "time"))
+    parser.add_argument("--runs-dir", type=str, default=str(ROOT / "runs"))
+    parser.add_argument("--db", type=str, default=str(ROOT / "results" / "runs.sqlite"))
+    parser.add_argument("--runs", nargs="+", default=None, help="Restrict to these runs")
+    parser.add_argument("--metric", type=str, default=BEST_METRIC, help="Column that defines the best epoch")
+    parser.add_argument("-k", type=int, default=10, help="Number of runs for 'top'")
+    parser.add_argument("--column", type=str, default=BEST_METRIC, help="Column for 'curve'")
+    parser.add_argument("--plot", action="store_true", help="Save a PNG for 'curve'")
+    parser.add_argument("--targets", nargs="*", type=float, default=None, help="Metric targets for 'time'")
+    parser.add_argument("--fractions", nargs="*", type=float, default=[0.9, 0.95, 0.99],
+                        help="Targets for 'time' as fractions of the reference run's best value")
+    parser.add_argument("--prune", action="store_true", help="Drop runs whose results.csv is gone")
+    args = parser.parse_args()
+
+    with ResultsStore(args.db) as store:
+        t0 = time.perf_counter()
+        counts = store.ingest_dir(args.runs_dir, prune=args.prune)
+        print(f"[INFO] Ingest {args.runs_dir}: {counts or 'no results.csv'} ({(time.perf_counter() - t0) * 1000:.1f} ms)")
+
+        t0 = time.perf_counter()
+        if args.command == "best":
+            MetricsAnalyzer.print_comparison_table(store.best_epochs(args.runs, args.metric))
+        elif args.command == "top":
+            top = dict(store.top_k(args.k, args.metric, args.runs))
+            MetricsAnalyzer.print_comparison_table(top)
+            for run, params in store.params(list(top)).items():
+                print(f"{run:<35} {params}")
+        elif args.command == "curve":
+            curves = store.curves(args.column, args.runs)
+            for run, (epochs, values) in curves.items():
+                tail = ", ".join(f"{v:.4f}" for v in values[-5:])
+                print(f"{run:<35} {len(epochs):>4} epochs  last: {tail}")
+            if args.plot and curves:
+                _plot_curves(curves, args.column, ROOT / "results" / "comparison" / f"run_curves_{args.column}.png")
+        elif args.command == "time":
+            if not args.runs:
+                raise SystemExit("[ERROR] 'time' needs --runs (reference first)")
+            report = _time_to_metric(store, args.runs, args.metric, args.targets, args.fractions)
+            out_path = ROOT / "results" / "comparison" / f"time_to_{args.metric}.json"
+            out_path.parent.mkdir(parents=True, exist_ok=True)
+            out_path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+            print(f"[INFO] Saved: {out_path}")
+        if args.command != "ingest":
+            print(f"[STATS] Query: {(time.perf_counter() - t0) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
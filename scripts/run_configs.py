@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Config-driven training runner: one process, a queue of runs built from configs/*_train.yaml.
+
+Outputs:
+- <project>/<name>/...: the usual ultralytics run directory per job
+  (plus epoch_timing.csv from utils.training.EpochTimer)
+- runs/manifests/<timestamp>.json (``--manifest``): every job's config file,
+  overrides, the exact train arguments, status, timings, save_dir and best-epoch
+  metrics; rewritten after each job so an interrupted sweep stays recorded
+- <manifest dir>/<dataset>.resolved.yaml: dataset YAMLs with ``path`` made
+  absolute (relative paths are taken from the dataset YAML's own directory)
+
+Notes:
+- Precedence: config file < ``--profile`` (device/workers/batch/cache) < ``--set`` < ``--sweep``.
+- ``--sweep key=v1,v2`` expands to the grid over all sweep keys, for every config.
+- Jobs run one after another in this process, so Python/torch/ultralytics are
+  imported once. Loaded checkpoints are kept in memory per model path, and
+  utils.training.WarmOBBTrainer reuses each split's dataset (labels, RAM image
+  cache) across jobs with the same imgsz/cache, rebuilding only the augmentation.
+"""
+
+from __future__ import annotations
+
+import argparse
+import copy
+import json
+import re
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from ultralytics import YOLO
+
+from utils.metrics import MetricsAnalyzer
+from utils.results_store import ResultsStore
+from utils.training import (
+    PROFILES,
+    EpochTimer,
+    WarmOBBTrainer,
+    configure_training,
+    expand_sweep,
+    load_train_config,
+    parse_overrides,
+    resolve_dataset_yaml,
+)
+
+DEFAULT_CONFIGS = ("configs/baseline_train.yaml", "configs/improved_train.yaml")
+_MODELS: Dict[str, YOLO] = {}
+
+
+def _job_name(base: str, sweep: Dict[str, object]) -> str:
+    suffix = "_".join(f"{k}{v}" for k, v in sweep.items())
+    return re.sub(r"[^\w.\-]+", "-", f"{base}_{suffix}" if suffix else base)
+
+
+def build_jobs(configs: List[str], overrides: Dict[str, object], sweeps: List[Dict[str, object]],
+               manifest_dir: Path) -> List[Dict]:
+    """Expand configs x sweep grid into jobs with fully merged train arguments (profile applied later)."""
+    resolved_data: Dict[str, str] = {}
+    jobs = []
+    for cfg_path in configs:
+        config = load_train_config(ROOT / cfg_path if not Path(cfg_path).is_absolute() else cfg_path, ROOT)
+        for sweep in sweeps:
+            args = {**config, **overrides, **sweep}
+            data = str(args["data"])
+            if data not in resolved_data:
+                resolved_data[data] = str(resolve_dataset_yaml(data, manifest_dir, ROOT))
+            args["data"] = resolved_data[data]
+            args["name"] = _job_name(str(args.get("name", Path(cfg_path).stem)), sweep)
+            jobs.append({
+                "name": args["name"],
+                "config": str(cfg_path),
+                "overrides": {**overrides, **sweep},
+                "args": args,
+                "status": "pending",
+            })
+    return jobs
+
+
+def _load_model(source: str) -> YOLO:
+    """Fresh YOLO for one job; the checkpoint is read from disk only once per source."""
+    if source not in _MODELS:
+        _MODELS[source] = YOLO(source)
+    return copy.deepcopy(_MODELS[source])
+
+
+def _cache_mode(value) -> str:
+    return "none" if value in (False, None, "none") else ("ram" if value is True else str(value))
+
+
+def run_job(job: Dict, profile: Optional[str], cli_keys: set) -> None:
+    args = dict(job["args"])
+    model = _load_model(str(args.pop("model")))
+    if profile:
+        host = configure_training(model, profile, imgsz=int(args.get("imgsz", 640)),
+                                  batch=args["batch"] if "batch" in cli_keys else None,
+                                  cache=_cache_mode(args["cache"]) if "cache" in cli_keys else None)
+        host.pop("trainer")
+        for key, value in host.items():
+            if key not in cli_keys:
+                args[key] = value
+    else:
+        EpochTimer().attach(model)
+    job["args"] = {"model": job["args"]["model"], **args}
+
+    t0 = time.perf_counter()
+    model.train(trainer=WarmOBBTrainer, **args)
+    job["train_s"] = round(time.perf_counter() - t0, 2)
+    trainer = model.trainer
+    job["save_dir"] = str(trainer.save_dir)
+    job["reused_datasets"] = getattr(trainer, "reused_datasets", [])
+
+    csv_path = Path(trainer.save_dir) / "results.csv"
+    if csv_path.exists():
+        analyzer = MetricsAnalyzer(str(ROOT / "results"))
+        job["best"] = analyzer.get_best_epoch_metrics(analyzer.parse_yolo_results_csv(str(csv_path)))
+
+
+def _write_manifest(path: Path, manifest: Dict) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(manifest, indent=2, default=str), encoding="utf-8")
+    tmp.replace(path)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run one or many trainings from configs/*_train.yaml")
+    parser.add_argument("--config", nargs="+", default=list(DEFAULT_CONFIGS), help="Training config YAMLs")
+    parser.add_argument("--set", nargs="*", default=[], metavar="KEY=VALUE", help="Overrides for every job")
+    parser.add_argument("--sweep", nargs="*", default=[], metavar="KEY=V1,V2", help="Grid over these values")
+    parser.add_argument("--profile", type=str, default=None, choices=PROFILES,
+                        help="Host profile (device/workers/batch/cache); default: as in the config")
+    parser.add_argument("--manifest", type=str, default=None, help="Manifest path (default runs/manifests/<ts>.json)")
+    parser.add_argument("--store", type=str, default=None, help="Also ingest each results.csv into this SQLite store")
+    parser.add_argument("--fail-fast", action="store_true", help="Stop the queue at the first failed job")
+    parser.add_argument("--dry-run", action="store_true", help="Print the jobs and write the manifest only")
+    args = parser.parse_args()
+
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    manifest_path = Path(args.manifest) if args.manifest else ROOT / "runs" / "manifests" / f"{stamp}.json"
+    overrides = parse_overrides(args.set)
+    sweeps = expand_sweep(args.sweep)
+    jobs = build_jobs(args.config, overrides, sweeps, manifest_path.parent)
+    cli_keys = set(overrides) | {k for s in sweeps for k in s}
+
+    manifest = {
+        "created": stamp,
+        "command": " ".join(sys.argv),
+        "profile": args.profile,
+        "configs": args.config,
+        "jobs": jobs,
+    }
+    _write_manifest(manifest_path, manifest)
+    print(f"[INFO] {len(jobs)} job(s) from {len(args.config)} config(s) x {len(sweeps)} sweep point(s)")
+    for i, job in enumerate(jobs, 1):
+        print(f"  {i:>3}. {job['name']:<40} {job['config']}  {job['overrides'] or ''}")
+    if args.dry_run:
+        print(f"[DONE] Manifest (dry run): {manifest_path}")
+        return
+
+    store = ResultsStore(args.store) if args.store else None
+    for i, job in enumerate(jobs, 1):
+        print(f"[INFO] Job {i}/{len(jobs)}: {job['name']}")
+        job["status"], job["started"] = "running", datetime.now().isoformat(timespec="seconds")
+        _write_manifest(manifest_path, manifest)
+        try:
+            run_job(job, args.profile, cli_keys)
+            job["status"] = "done"
+            if store is not None:
+                store.ingest_file(Path(job["save_dir"]) / "results.csv", run=Path(job["save_dir"]).name)
+            best = job.get("best", {})
+            print(f"[OK] {job['name']}: mAP50 {best.get('mAP50', 0):.4f} in {job['train_s']:.0f}s"
+                  + (f" (reused {', '.join(job['reused_datasets'])} dataset)" if job["reused_datasets"] else ""))
+        except KeyboardInterrupt:
+            job["status"] = "interrupted"
+            _write_manifest(manifest_path, manifest)
+            raise
+        except Exception as e:
+            job["status"], job["error"] = "failed", f"{type(e).__name__}: {e}"
+            print(f"[WARN] {job['name']} failed: {job['error']}")
+            if args.fail_fast:
+                _write_manifest(manifest_path, manifest)
+                raise
+        finally:
+            job["finished"] = datetime.now().isoformat(timespec="seconds")
+        _write_manifest(manifest_path, manifest)
+
+    n_done = sum(job["status"] == "done" for job in jobs)
+    print(f"[DONE] {n_done}/{len(jobs)} job(s) finished; manifest: {manifest_path}")
+
+
+if __name__ == "__main__":
+    main()
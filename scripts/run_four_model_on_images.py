@@ -12,25 +12,59 @@ Outputs:
 Notes:
 - Bounding boxes are always red.
 - No top text overlay is added to output images.
+- Work runs as a staged pipeline (decode -> infer -> render/encode) connected
+  by bounded queues, so PNG compression overlaps with inference while memory
+  stays capped at roughly ``--queue-size`` images per stage.
+- Every output is written atomically (temp file + rename) and recorded in a
+  journal of completed (image, model, params) entries. ``--resume`` skips
+  finished work after a crash; ``--shard i/n`` splits one folder across
+  processes or machines without coordination.
+- ``--export table dota geojson`` additionally streams the raw detections:
+  a columnar table (Parquet parts, npz without pyarrow) under detections/,
+  DOTA Task1 txt under dota/ and GeoJSON text sequences under geojson/.
+  Each shard writes its own files (tagged ``s<i>of<n>``), cleared first unless
+  ``--resume``; when a shard finishes, the DOTA / GeoJSON shard files present so
+  far are merged into dota/<model>/Task1_<class>.txt and
+  geojson/detections.geojsonl, so the last shard to finish leaves the full set,
+  and the shard's table parts are compacted into one file. Each export flush
+  is committed by one line in export.<tag>.jsonl; ``--resume`` rolls the
+  exports back to the last commit, so a crash mid-flush duplicates nothing.
+- ``--models`` selects entries of MODEL_SPECS, e.g. ``--models full full_int8``
+  to compare a checkpoint with its quantized model.
+- ``--backend onnx`` runs the checkpoints exported by export_onnx.py
+  (best.onnx next to best.pt) through ONNX Runtime instead of PyTorch.
+- ``--ensemble`` feeds every batch to all selected models (one shared
+  letterboxed tensor when their input shapes agree) and fuses their outputs
+  with rotated weighted box fusion into by_model/wbf/. Per-model latency and
+  the fusion cost are reported at the end.
 """
 
 from __future__ import annotations
 
 import argparse
-from dataclasses import dataclass
+import hashlib
+import json
+import os
+import queue
+import sys
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, List, Sequence, Tuple
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
 
 import cv2
 import numpy as np
 
-try:
-    from ultralytics import YOLO
-except Exception:
-    YOLO = None
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
 
+from utils.detection_export import EXPORT_FORMATS, DetectionExporter, merge_shard_outputs, shard_tag
+from utils.ensemble import CONF_TYPES, ObbEnsemble
+from utils.inference import BACKENDS, ObbDetections, load_backend, resolve_weight
 
-ROOT = Path(__file__).resolve().parent.parent
 IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".webp")
 
 
@@ -45,7 +79,100 @@ MODEL_SPECS: Sequence[ModelSpec] = (
     ModelSpec("asc", ROOT / "runs/plane_asc/weights/best.pt"),
     ModelSpec("asor", ROOT / "runs/plane_asor/weights/best.pt"),
     ModelSpec("full", ROOT / "runs/plane_full/weights/best.pt"),
+    # INT8 ONNX models produced by scripts/quantize_onnx.py; always run through ONNX Runtime.
+    ModelSpec("baseline_int8", ROOT / "runs/plane_baseline/weights/best_int8.onnx"),
+    ModelSpec("asc_int8", ROOT / "runs/plane_asc/weights/best_int8.onnx"),
+    ModelSpec("asor_int8", ROOT / "runs/plane_asor/weights/best_int8.onnx"),
+    ModelSpec("full_int8", ROOT / "runs/plane_full/weights/best_int8.onnx"),
 )
+DEFAULT_MODELS = ("baseline", "asc", "asor", "full")
+
+INPUT_KEY = "input"
+ENSEMBLE_KEY = "wbf"  # output key of the fused ensemble result
+DET_SUFFIX = ".det"  # journal key suffix for exported detections of a model
+
+# Sentinel passed through the stage queues to signal end of stream.
+_EOS = object()
+
+
+@dataclass
+class StageStats:
+    """Accumulated wall time of one pipeline stage (thread-safe)."""
+
+    name: str
+    items: int = 0
+    busy_s: float = 0.0
+    blocked_s: float = 0.0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add(self, busy: float, blocked: float = 0.0, items: int = 1) -> None:
+        with self._lock:
+            self.items += items
+            self.busy_s += busy
+            self.blocked_s += blocked
+
+
+@dataclass
+class DecodedImage:
+    path: Path
+    image: np.ndarray  # original BGR image, fed to the models
+    base: np.ndarray  # cleaned BGR image, used as drawing canvas
+    pending: Tuple[str, ...]  # output keys still to produce for this image
+
+
+@dataclass
+class RenderJob:
+    out_path: Path
+    base: np.ndarray
+    boxes: np.ndarray  # (N, 4, 2) polygons
+    tag: str
+    image_name: str
+
+
+class RunJournal:
+    """
+    Append-only JSONL journal of finished outputs.
+
+    One line per (image, model, params) is appended after the output file has
+    been renamed into place, so a journal entry always implies a complete file.
+    Each shard writes its own journal; on resume all journals in the output
+    directory are read, which keeps re-sharded restarts from redoing work.
+    """
+
+    def __init__(self, out_root: Path, params: Dict[str, str], shard: Tuple[int, int], resume: bool) -> None:
+        idx, count = shard
+        self.params = params
+        self.path = out_root / (f"journal.shard{idx}of{count}.jsonl" if count > 1 else "journal.jsonl")
+        self._done: Set[Tuple[str, str]] = set()
+        self._lock = threading.Lock()
+        if resume:
+            for journal in sorted(out_root.glob("journal*.jsonl")):
+                self._load(journal)
+        self._fh = open(self.path, "a" if resume else "w", encoding="utf-8")
+
+    def _load(self, journal: Path) -> None:
+        with open(journal, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # torn last line from a crashed run
+                key = entry.get("model")
+                if key in self.params and entry.get("params") == self.params[key]:
+                    self._done.add((entry["image"], key))
+
+    def is_done(self, image_name: str, key: str) -> bool:
+        return (image_name, key) in self._done
+
+    def record(self, image_name: str, key: str) -> None:
+        line = json.dumps({"image": image_name, "model": key, "params": self.params[key]}) + "\n"
+        with self._lock:
+            self._done.add((image_name, key))
+            self._fh.write(line)
+            self._fh.flush()
+
+    def close(self) -> None:
+        self._fh.close()
 
 
 def _collect_images(img_dir: Path) -> List[Path]:
@@ -55,6 +182,52 @@ def _collect_images(img_dir: Path) -> List[Path]:
     return paths
 
 
+def _parse_shard(text: str) -> Tuple[int, int]:
+    try:
+        idx_s, count_s = text.split("/")
+        idx, count = int(idx_s), int(count_s)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected i/n, got {text!r}")
+    if count < 1 or not 0 <= idx < count:
+        raise argparse.ArgumentTypeError(f"shard index must satisfy 0 <= i < n, got {text!r}")
+    return idx, count
+
+
+def _select_shard(paths: Iterable[Path], shard: Tuple[int, int]) -> List[Path]:
+    """Stable name-hash sharding: adding files to the folder never moves existing ones."""
+    idx, count = shard
+    if count == 1:
+        return list(paths)
+    return [p for p in paths if zlib.crc32(p.name.encode("utf-8")) % count == idx]
+
+
+def _params_digest(args: argparse.Namespace, weight: Optional[Path] = None) -> str:
+    """Digest of everything that changes one output (render settings, plus the checkpoint for model outputs)."""
+    params = {
+        "render_size": args.render_size,
+        "strip_top": args.strip_top,
+        "convert_blue_to_red": bool(args.convert_blue_to_red),
+    }
+    if weight is not None:
+        params.update(
+            conf=args.conf,
+            imgsz=args.imgsz,
+            weight=str(weight),
+            weight_mtime=weight.stat().st_mtime_ns,
+        )
+    return hashlib.sha1(json.dumps(params, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def _atomic_imwrite(path: Path, image: np.ndarray) -> None:
+    ok, buf = cv2.imencode(path.suffix, image)
+    if not ok:
+        raise RuntimeError(f"Failed to encode image: {path}")
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(buf.tobytes())
+    os.replace(tmp, path)
+
+
 def _resize_to_square(image_bgr: np.ndarray, size: int) -> np.ndarray:
     h, w = image_bgr.shape[:2]
     if h <= 0 or w <= 0:
@@ -100,27 +273,247 @@ def _convert_blue_to_red(image_bgr: np.ndarray) -> np.ndarray:
     return out
 
 
-def _predict_points(model, image_path: Path, conf: float, imgsz: int) -> List[np.ndarray]:
-    results = model.predict(str(image_path), conf=conf, iou=0.45, imgsz=imgsz, verbose=False)
-    r = results[0]
-    boxes: List[np.ndarray] = []
-    if r.obb is None or len(r.obb) == 0:
-        return boxes
-
-    obb = r.obb
-    if hasattr(obb, "xyxyxyxy") and obb.xyxyxyxy is not None:
-        for pts in obb.xyxyxyxy.cpu().numpy():
-            boxes.append(pts.astype(np.float32))
-        return boxes
-
-    if hasattr(obb, "xywhr") and obb.xywhr is not None:
-        for row in obb.xywhr.cpu().numpy():
-            x, y, w, h, rads = row.tolist()
-            angle = rads * 180.0 / np.pi if abs(rads) <= 2 * np.pi else rads
-            rect = ((x, y), (max(w, 1e-6), max(h, 1e-6)), angle)
-            boxes.append(cv2.boxPoints(rect).astype(np.float32))
-        return boxes
-    return boxes
+def _put(q: "queue.Queue", item, stop: threading.Event) -> float:
+    """Blocking put that gives up once ``stop`` is set; returns seconds blocked."""
+    t0 = time.perf_counter()
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            break
+        except queue.Full:
+            continue
+    return time.perf_counter() - t0
+
+
+def _get(q: "queue.Queue", stop: threading.Event, block: bool = True) -> Tuple[object, float]:
+    """Blocking get that gives up once ``stop`` is set; returns (item, seconds waited)."""
+    t0 = time.perf_counter()
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.1 if block else 0.0, block=block), time.perf_counter() - t0
+        except queue.Empty:
+            if not block:
+                break
+    return None, time.perf_counter() - t0
+
+
+def _decode_worker(
+    paths: "queue.Queue",
+    out_q: "queue.Queue",
+    args: argparse.Namespace,
+    stats: StageStats,
+    stop: threading.Event,
+) -> None:
+    while not stop.is_set():
+        try:
+            img_path, pending = paths.get_nowait()
+        except queue.Empty:
+            return
+        t0 = time.perf_counter()
+        img = cv2.imread(str(img_path))
+        if img is None:
+            print(f"[WARN] unreadable image: {img_path}")
+            stats.add(time.perf_counter() - t0)
+            continue
+        base_img = img.copy()
+        if args.strip_top > 0:
+            base_img = _strip_top_band(base_img, args.strip_top)
+        if args.convert_blue_to_red:
+            base_img = _convert_blue_to_red(base_img)
+        busy = time.perf_counter() - t0
+        blocked = _put(out_q, DecodedImage(img_path, img, base_img, pending), stop)
+        stats.add(busy, blocked)
+
+
+def _encode_worker(
+    in_q: "queue.Queue",
+    render_size: int,
+    journal: RunJournal,
+    stats: StageStats,
+    stop: threading.Event,
+) -> None:
+    while True:
+        job, waited = _get(in_q, stop)
+        if job is None or job is _EOS:
+            return
+        t0 = time.perf_counter()
+        canvas = job.base.copy() if len(job.boxes) else job.base
+        for pts in job.boxes:
+            _draw_obb(canvas, pts, color=(0, 0, 255), thickness=2)
+        _atomic_imwrite(job.out_path, _resize_to_square(canvas, render_size))
+        journal.record(job.image_name, job.tag)
+        stats.add(time.perf_counter() - t0, waited)
+        if job.tag != INPUT_KEY:
+            print(f"[OK] {job.tag}: {job.out_path}")
+
+
+def _infer_stage(
+    models: Dict[str, object],
+    in_q: "queue.Queue",
+    out_q: "queue.Queue",
+    out_root: Path,
+    args: argparse.Namespace,
+    journal: RunJournal,
+    exporter: Optional[DetectionExporter],
+    stats: StageStats,
+    stop: threading.Event,
+    ensemble: Optional[ObbEnsemble] = None,
+) -> None:
+    """Pull decoded images in micro-batches, run every model, hand results to the encoders."""
+    finished = False
+    while not finished and not stop.is_set():
+        item, waited = _get(in_q, stop)
+        if item is None or item is _EOS:
+            break
+        batch: List[DecodedImage] = [item]
+        while len(batch) < args.batch_size:
+            nxt, _ = _get(in_q, stop, block=False)
+            if nxt is None:
+                break
+            if nxt is _EOS:
+                finished = True
+                break
+            batch.append(nxt)
+
+        # On resume, images in one batch may be missing different models.
+        t0 = time.perf_counter()
+        per_image: List[Dict[str, ObbDetections]] = [{} for _ in batch]
+        if ensemble is not None:
+            # The fused result needs every member, so all models run on any image with pending work.
+            idx = [i for i, d in enumerate(batch) if any(k != INPUT_KEY for k in d.pending)]
+            if idx:
+                per_model, fused = ensemble.predict(
+                    [batch[i].image for i in idx], conf=args.conf, iou=0.45, imgsz=args.imgsz
+                )
+                for j, i in enumerate(idx):
+                    per_image[i] = {key: preds[j] for key, preds in per_model.items()}
+                    per_image[i][ENSEMBLE_KEY] = fused[j]
+        else:
+            for key in models:
+                idx = [i for i, d in enumerate(batch) if key in d.pending or key + DET_SUFFIX in d.pending]
+                if not idx:
+                    continue
+                preds = models[key].predict(
+                    [batch[i].image for i in idx], conf=args.conf, iou=0.45, imgsz=args.imgsz
+                )
+                for i, dets in zip(idx, preds):
+                    per_image[i][key] = dets
+        if exporter is not None:
+            for decoded, preds in zip(batch, per_image):
+                for key, dets in preds.items():
+                    if key + DET_SUFFIX in decoded.pending:
+                        for image_name, model_key in exporter.add(decoded.path.name, key, dets):
+                            journal.record(image_name, model_key + DET_SUFFIX)
+        busy = time.perf_counter() - t0
+
+        blocked = 0.0
+        for decoded, preds in zip(batch, per_image):
+            stem = decoded.path.stem
+            name = decoded.path.name
+            if INPUT_KEY in decoded.pending:
+                out_input = out_root / "by_model" / INPUT_KEY / f"{stem}_input.png"
+                no_boxes = np.zeros((0, 4, 2), dtype=np.float32)
+                blocked += _put(out_q, RenderJob(out_input, decoded.base, no_boxes, INPUT_KEY, name), stop)
+            for key, dets in preds.items():
+                if key not in decoded.pending:
+                    continue
+                out_path = out_root / "by_model" / key / f"{stem}_{key}.png"
+                blocked += _put(out_q, RenderJob(out_path, decoded.base, dets.polys, key, name), stop)
+        stats.add(busy, waited + blocked, items=len(batch))
+
+
+def _print_stage_report(stages: Sequence[StageStats], workers: Dict[str, int], wall_s: float, n_images: int) -> None:
+    print("[STATS] stage      workers   items   busy(s)   ms/item   blocked(s)")
+    for st in stages:
+        per_item = st.busy_s / st.items * 1000.0 if st.items else 0.0
+        print(
+            f"[STATS] {st.name:<10} {workers[st.name]:>7} {st.items:>7} "
+            f"{st.busy_s:>9.2f} {per_item:>9.1f} {st.blocked_s:>12.2f}"
+        )
+    rate = n_images / wall_s if wall_s > 0 else 0.0
+    print(f"[STATS] wall {wall_s:.2f}s, {rate:.2f} images/s")
+
+
+def _print_ensemble_report(ensemble: ObbEnsemble) -> None:
+    report = ensemble.report()
+    model_ms = sum(report[key] for key in ensemble.backends)
+    shared = "shared" if ensemble.shared_preprocess else "per model"
+    print(f"[STATS] ensemble over {ensemble.images} images ({shared} preprocessing)")
+    if ensemble.shared_preprocess:
+        print(f"[STATS]   preprocess {report['preprocess']:>9.1f} ms/img")
+    for key in ensemble.backends:
+        print(f"[STATS]   {key:<10} {report[key]:>9.1f} ms/img")
+    fuse_pct = report["fuse"] / model_ms * 100.0 if model_ms > 0 else 0.0
+    print(f"[STATS]   {ENSEMBLE_KEY + ' fuse':<10} {report['fuse']:>9.1f} ms/img ({fuse_pct:.1f}% of model time)")
+
+
+def run_pipeline(
+    work: Sequence[Tuple[Path, Tuple[str, ...]]],
+    models: Dict[str, object],
+    out_root: Path,
+    args: argparse.Namespace,
+    journal: RunJournal,
+    exporter: Optional[DetectionExporter] = None,
+    ensemble: Optional[ObbEnsemble] = None,
+) -> List[StageStats]:
+    """
+    Run decode -> infer -> render/encode over ``work`` items of
+    (image path, output keys still pending for that image).
+
+    Decode and encode use thread pools (OpenCV releases the GIL in imread,
+    resize and imencode); inference runs on the calling thread. Every queue is
+    bounded, so a slow stage back-pressures the ones feeding it.
+    """
+    decode_stats = StageStats("decode")
+    infer_stats = StageStats("infer")
+    encode_stats = StageStats("encode")
+    stop = threading.Event()
+
+    path_q: "queue.Queue" = queue.Queue()
+    for item in work:
+        path_q.put(item)
+    decoded_q: "queue.Queue" = queue.Queue(maxsize=args.queue_size)
+    # Each image fans out into one input render plus one render per model (and the fused one).
+    fanout = len(models) + 1 + (ensemble is not None)
+    encode_q: "queue.Queue" = queue.Queue(maxsize=args.queue_size * fanout)
+
+    with ThreadPoolExecutor(args.decode_workers, thread_name_prefix="decode") as decode_pool, ThreadPoolExecutor(
+        args.encode_workers, thread_name_prefix="encode"
+    ) as encode_pool:
+        decoders = [
+            decode_pool.submit(_decode_worker, path_q, decoded_q, args, decode_stats, stop)
+            for _ in range(args.decode_workers)
+        ]
+        encoders = [
+            encode_pool.submit(_encode_worker, encode_q, args.render_size, journal, encode_stats, stop)
+            for _ in range(args.encode_workers)
+        ]
+        # A failed worker must not leave the other stages blocked on a full/empty queue.
+        for fut in decoders + encoders:
+            fut.add_done_callback(lambda f: f.exception() is not None and stop.set())
+
+        def _close_decoded() -> None:
+            for fut in decoders:
+                fut.exception()
+            _put(decoded_q, _EOS, stop)
+
+        closer = threading.Thread(target=_close_decoded, name="decode-closer", daemon=True)
+        closer.start()
+        try:
+            _infer_stage(
+                models, decoded_q, encode_q, out_root, args, journal, exporter, infer_stats, stop, ensemble
+            )
+            for _ in encoders:
+                _put(encode_q, _EOS, stop)
+            for fut in decoders + encoders:
+                fut.result()
+        except BaseException:
+            stop.set()
+            raise
+        finally:
+            closer.join(timeout=1.0)
+
+    return [decode_stats, infer_stats, encode_stats]
 
 
 def main() -> None:
@@ -136,10 +529,55 @@ def main() -> None:
         action="store_true",
         help="Convert existing blue annotations in source image to red",
     )
+    parser.add_argument("--batch-size", type=int, default=1, help="Images per predict call in the infer stage")
+    parser.add_argument("--decode-workers", type=int, default=2)
+    parser.add_argument("--encode-workers", type=int, default=4)
+    parser.add_argument("--queue-size", type=int, default=8, help="Max decoded images buffered between stages")
+    parser.add_argument("--resume", action="store_true", help="Skip outputs already recorded in the run journal")
+    parser.add_argument(
+        "--shard",
+        type=_parse_shard,
+        default=(0, 1),
+        metavar="I/N",
+        help="Process only shard I of N (0-based), selected by a stable hash of the file name",
+    )
+    parser.add_argument(
+        "--export",
+        nargs="*",
+        default=[],
+        choices=EXPORT_FORMATS,
+        help="Also stream raw detections: columnar table, DOTA Task1 txt and/or GeoJSON sequence",
+    )
+    parser.add_argument("--export-batch-rows", type=int, default=20000, help="Detections per table part file")
+    parser.add_argument("--table-format", type=str, default="auto", choices=["auto", "parquet", "npz"])
+    parser.add_argument(
+        "--models",
+        nargs="+",
+        default=list(DEFAULT_MODELS),
+        choices=[spec.key for spec in MODEL_SPECS],
+        help="Models from MODEL_SPECS to run (INT8 entries always use ONNX Runtime)",
+    )
+    parser.add_argument("--backend", type=str, default="pytorch", choices=BACKENDS)
+    parser.add_argument("--threads", type=int, default=0, help="ONNX Runtime intra-op threads (0 = default)")
+    parser.add_argument("--ensemble", action="store_true", help="Also fuse all models with rotated WBF")
+    parser.add_argument("--wbf-iou", type=float, default=0.55, help="ProbIoU threshold for joining a WBF cluster")
+    parser.add_argument("--wbf-skip", type=float, default=0.0, help="Drop member boxes whose weighted score is not above this")
+    parser.add_argument("--wbf-conf", type=str, default="avg", choices=CONF_TYPES)
+    parser.add_argument(
+        "--wbf-weights",
+        nargs="+",
+        type=float,
+        default=None,
+        help="Per-model WBF weights, in --models order (default: equal)",
+    )
     args = parser.parse_args()
-
-    if YOLO is None:
-        raise RuntimeError("ultralytics is not available in this environment")
+    for name in ("batch_size", "decode_workers", "encode_workers", "queue_size"):
+        if getattr(args, name) < 1:
+            parser.error(f"--{name.replace('_', '-')} must be >= 1")
+    if args.wbf_weights is not None and len(args.wbf_weights) != len(args.models):
+        parser.error("--wbf-weights needs one value per --models entry")
+    if args.wbf_weights is not None and min(args.wbf_weights) <= 0:
+        parser.error("--wbf-weights must all be > 0")
 
     input_dir = Path(args.input_dir).resolve()
     if not input_dir.exists():
@@ -148,42 +586,91 @@ def main() -> None:
     images = _collect_images(input_dir)
     if not images:
         raise RuntimeError(f"No images found in: {input_dir}")
+    images = _select_shard(images, args.shard)
 
+    weights = {spec.key: resolve_weight(spec.weight, args.backend) for spec in MODEL_SPECS if spec.key in args.models}
     models: Dict[str, object] = {}
-    for spec in MODEL_SPECS:
-        if not spec.weight.exists():
-            raise FileNotFoundError(f"Missing checkpoint: {spec.weight}")
-        models[spec.key] = YOLO(str(spec.weight))
+    for key, weight in weights.items():
+        if not weight.exists():
+            raise FileNotFoundError(f"Missing checkpoint: {weight}")
+        backend_kwargs = {"intra_op_threads": args.threads} if weight.suffix == ".onnx" else {}
+        models[key] = load_backend(weight, "auto", **backend_kwargs)
+
+    ensemble: Optional[ObbEnsemble] = None
+    if args.ensemble:
+        wbf_weights = dict(zip(args.models, args.wbf_weights)) if args.wbf_weights else None
+        ensemble = ObbEnsemble(
+            models,
+            weights=wbf_weights,
+            iou_thres=args.wbf_iou,
+            skip_thres=args.wbf_skip,
+            conf_type=args.wbf_conf,
+        )
+    output_keys = tuple(models) + ((ENSEMBLE_KEY,) if ensemble is not None else ())
 
     out_root = Path(args.output_dir).resolve()
     (out_root / "by_model" / "input").mkdir(parents=True, exist_ok=True)
-    for key in ("baseline", "asc", "asor", "full"):
+    for key in output_keys:
         (out_root / "by_model" / key).mkdir(parents=True, exist_ok=True)
 
+    params = {INPUT_KEY: _params_digest(args)}
+    params.update({key: _params_digest(args, weight) for key, weight in weights.items()})
+    if ensemble is not None:
+        fusion = {
+            "members": {key: params[key] for key in models},
+            "weights": ensemble.weights,
+            "iou": args.wbf_iou,
+            "skip": args.wbf_skip,
+            "conf_type": args.wbf_conf,
+        }
+        params[ENSEMBLE_KEY] = hashlib.sha1(json.dumps(fusion, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+    if args.export:
+        formats = ",".join(sorted(args.export))
+        params.update({key + DET_SUFFIX: f"{params[key]}:{formats}" for key in output_keys})
+    journal = RunJournal(out_root, params, args.shard, resume=args.resume)
+    keys = (INPUT_KEY,) + output_keys
+    if args.export:
+        keys += tuple(key + DET_SUFFIX for key in output_keys)
+    work: List[Tuple[Path, Tuple[str, ...]]] = []
     for img_path in images:
-        img = cv2.imread(str(img_path))
-        if img is None:
-            print(f"[WARN] unreadable image: {img_path}")
-            continue
-
-        base_img = img.copy()
-        if args.strip_top > 0:
-            base_img = _strip_top_band(base_img, args.strip_top)
-        if args.convert_blue_to_red:
-            base_img = _convert_blue_to_red(base_img)
-
-        out_input = out_root / "by_model" / "input" / f"{img_path.stem}_input.png"
-        cv2.imwrite(str(out_input), _resize_to_square(base_img, args.render_size))
-
-        for key in ("baseline", "asc", "asor", "full"):
-            canvas = base_img.copy()
-            pts_list = _predict_points(models[key], img_path, conf=args.conf, imgsz=args.imgsz)
-            for pts in pts_list:
-                _draw_obb(canvas, pts, color=(0, 0, 255), thickness=2)
-            out_path = out_root / "by_model" / key / f"{img_path.stem}_{key}.png"
-            cv2.imwrite(str(out_path), _resize_to_square(canvas, args.render_size))
-            print(f"[OK] {key}: {out_path}")
-
+        pending = tuple(k for k in keys if not journal.is_done(img_path.name, k))
+        if pending:
+            work.append((img_path, pending))
+    if args.resume:
+        print(f"[INFO] Resume: {len(images) - len(work)}/{len(images)} images already complete")
+
+    exporter: Optional[DetectionExporter] = None
+    if args.export:
+        class_names = {key: m.names for key, m in models.items()}
+        if ensemble is not None:
+            class_names[ENSEMBLE_KEY] = next(iter(class_names.values()))
+        idx, count = args.shard
+        exporter = DetectionExporter(
+            out_root,
+            args.export,
+            tag=shard_tag(idx, count),
+            class_names=class_names,
+            batch_rows=args.export_batch_rows,
+            table_format=args.table_format,
+            resume=args.resume,
+        )
+
+    t0 = time.perf_counter()
+    try:
+        stages = run_pipeline(work, models, out_root, args, journal, exporter, ensemble)
+        if exporter is not None:
+            for image_name, model_key in exporter.close():
+                journal.record(image_name, model_key + DET_SUFFIX)
+            merged = merge_shard_outputs(out_root, args.shard[1])
+            print(f"[INFO] Merged {len(merged)} DOTA/GeoJSON files from the shard outputs")
+    finally:
+        journal.close()
+    wall_s = time.perf_counter() - t0
+
+    workers = {"decode": args.decode_workers, "infer": 1, "encode": args.encode_workers}
+    _print_stage_report(stages, workers, wall_s, len(work))
+    if ensemble is not None and ensemble.images:
+        _print_ensemble_report(ensemble)
     print(f"[DONE] Four-model inference complete. Output: {out_root}")
 
 
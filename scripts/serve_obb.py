@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Local OBB inference server with micro-batching.
+
+Endpoints:
+- POST /predict?model=<key>&conf=<float>  body: encoded image bytes (jpg/png/...)
+  -> {"model", "width", "height", "detections": [...], "timing": {...}}
+  ``model=all`` runs every loaded model and returns {"models": {key: ...}}.
+- GET /health   -> loaded models, queue depth, uptime
+- GET /metrics  -> per-model request counts and p50/p95/p99 latency
+  (queue wait, batch inference and enqueue -> response total, in ms),
+  computed over the most recent requests
+
+Notes:
+- The MODEL_SPECS checkpoints are loaded once at startup; each model has its
+  own batching thread (utils/serving.py). Requests are batched until
+  ``--max-batch`` images are queued or the oldest one has waited
+  ``--max-wait-ms``.
+- Image decoding and JSON encoding run on the HTTP handler threads, so they
+  overlap with inference.
+- Binds to 127.0.0.1 by default; there is no authentication.
+- scripts/load_test_server.py measures latency and throughput against it.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import Future
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List
+from urllib.parse import parse_qs, urlparse
+
+import cv2
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from scripts.run_four_model_on_images import DEFAULT_MODELS, MODEL_SPECS
+from utils.inference import BACKENDS, ObbDetections, load_backend, resolve_weight
+from utils.serving import BatchResult, LatencyStats, MicroBatcher
+
+ALL_MODELS = "all"
+
+
+class InferenceService:
+    """Loaded models, their batchers and stats; shared by all handler threads."""
+
+    def __init__(self, backends: Dict[str, object], max_batch: int, max_wait_ms: float, imgsz: int, iou: float):
+        self.names = {key: backend.names for key, backend in backends.items()}
+        self.stats = {key: LatencyStats() for key in backends}
+        self.batchers = {
+            key: MicroBatcher(backend, max_batch, max_wait_ms, imgsz, iou, stats=self.stats[key], name=key)
+            for key, backend in backends.items()
+        }
+        self.default_model = next(iter(backends))
+        self.started = time.time()
+
+    def health(self) -> Dict[str, object]:
+        return {
+            "status": "ok",
+            "models": list(self.batchers),
+            "default_model": self.default_model,
+            "queued": {key: b.pending for key, b in self.batchers.items()},
+            "uptime_s": time.time() - self.started,
+        }
+
+    def metrics(self) -> Dict[str, object]:
+        return {key: stats.snapshot() for key, stats in self.stats.items()}
+
+    def close(self) -> None:
+        for batcher in self.batchers.values():
+            batcher.close()
+
+
+def _detections_json(dets: ObbDetections, names: Dict[int, str]) -> List[Dict[str, object]]:
+    return [
+        {
+            "class_id": int(c),
+            "class_name": names.get(int(c), str(int(c))),
+            "confidence": round(float(s), 4),
+            "xywhr": [round(float(v), 2) for v in box[:4]] + [round(float(box[4]), 5)],
+            "polygon": [[round(float(x), 2), round(float(y), 2)] for x, y in poly],
+        }
+        for box, poly, s, c in zip(dets.xywhr, dets.polys, dets.conf, dets.cls)
+    ]
+
+
+def _result_json(key: str, result: BatchResult, names: Dict[int, str], total_ms: float) -> Dict[str, object]:
+    return {
+        "model": key,
+        "detections": _detections_json(result.dets, names),
+        "timing": {
+            "queue_ms": round(result.queue_ms, 3),
+            "infer_ms": round(result.infer_ms, 3),
+            "total_ms": round(total_ms, 3),
+            "batch_size": result.batch_size,
+        },
+    }
+
+
+class ObbRequestHandler(BaseHTTPRequestHandler):
+    server_version = "ObbServer/1.0"
+    protocol_version = "HTTP/1.1"  # keep-alive, so the load generator does not pay a TCP handshake per request
+
+    @property
+    def service(self) -> InferenceService:
+        return self.server.service  # type: ignore[attr-defined]
+
+    def log_message(self, fmt: str, *args) -> None:
+        if self.server.verbose:  # type: ignore[attr-defined]
+            super().log_message(fmt, *args)
+
+    def _send_json(self, payload: object, status: HTTPStatus = HTTPStatus.OK) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status: HTTPStatus, message: str) -> None:
+        self._send_json({"error": message}, status)
+
+    def do_GET(self) -> None:
+        path = urlparse(self.path).path
+        if path == "/health":
+            self._send_json(self.service.health())
+        elif path == "/metrics":
+            self._send_json(self.service.metrics())
+        else:
+            self._error(HTTPStatus.NOT_FOUND, f"unknown path: {path}")
+
+    def do_POST(self) -> None:
+        t0 = time.perf_counter()
+        url = urlparse(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length > 0 else b""
+        if url.path != "/predict":
+            self._error(HTTPStatus.NOT_FOUND, f"unknown path: {url.path}")
+            return
+
+        query = parse_qs(url.query)
+        key = query.get("model", [self.service.default_model])[0]
+        try:
+            conf = float(query.get("conf", ["0.25"])[0])
+        except ValueError:
+            self._error(HTTPStatus.BAD_REQUEST, "conf must be a float")
+            return
+        keys = list(self.service.batchers) if key == ALL_MODELS else [key]
+        if any(k not in self.service.batchers for k in keys):
+            self._error(HTTPStatus.NOT_FOUND, f"model not loaded: {key}")
+            return
+
+        image = cv2.imdecode(np.frombuffer(body, dtype=np.uint8), cv2.IMREAD_COLOR) if body else None
+        if image is None:
+            self._error(HTTPStatus.BAD_REQUEST, "request body is not a decodable image")
+            return
+
+        futures: Dict[str, Future] = {k: self.service.batchers[k].submit(image, conf) for k in keys}
+        try:
+            results = {k: fut.result() for k, fut in futures.items()}
+        except Exception as exc:
+            self._error(HTTPStatus.INTERNAL_SERVER_ERROR, f"inference failed: {exc}")
+            return
+
+        total_ms = (time.perf_counter() - t0) * 1000.0
+        h, w = image.shape[:2]
+        per_model = {k: _result_json(k, res, self.service.names[k], total_ms) for k, res in results.items()}
+        if key == ALL_MODELS:
+            payload: Dict[str, object] = {"width": w, "height": h, "models": per_model}
+        else:
+            payload = {"width": w, "height": h, **per_model[key]}
+        self._send_json(payload)
+
+
+def build_server(
+    host: str, port: int, service: InferenceService, verbose: bool = False
+) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), ObbRequestHandler)
+    server.daemon_threads = True
+    server.service = service  # type: ignore[attr-defined]
+    server.verbose = verbose  # type: ignore[attr-defined]
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local micro-batching OBB inference server")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument(
+        "--models",
+        nargs="+",
+        default=list(DEFAULT_MODELS),
+        choices=[spec.key for spec in MODEL_SPECS],
+        help="Models from MODEL_SPECS to load (the first one is the default for /predict)",
+    )
+    parser.add_argument("--backend", type=str, default="pytorch", choices=BACKENDS)
+    parser.add_argument("--threads", type=int, default=0, help="ONNX Runtime intra-op threads (0 = default)")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--iou", type=float, default=0.45)
+    parser.add_argument("--max-batch", type=int, default=8, help="Max images per inference call")
+    parser.add_argument("--max-wait-ms", type=float, default=5.0, help="Max time a request waits for batch-mates")
+    parser.add_argument("--verbose", action="store_true", help="Log every HTTP request")
+    args = parser.parse_args()
+
+    specs = {spec.key: spec for spec in MODEL_SPECS}
+    backends: Dict[str, object] = {}  # in --models order: the first one is the /predict default
+    for spec in (specs[key] for key in dict.fromkeys(args.models)):
+        weight = resolve_weight(spec.weight, args.backend)
+        if not weight.exists():
+            raise FileNotFoundError(f"Missing checkpoint: {weight}")
+        backend_kwargs = {"intra_op_threads": args.threads} if weight.suffix == ".onnx" else {}
+        backends[spec.key] = load_backend(weight, "auto", **backend_kwargs)
+        # Warm up so the first request does not pay for lazy model setup.
+        backends[spec.key].predict([np.zeros((args.imgsz, args.imgsz, 3), dtype=np.uint8)], imgsz=args.imgsz)
+        print(f"[OK] loaded {spec.key}: {weight}")
+
+    service = InferenceService(backends, args.max_batch, args.max_wait_ms, args.imgsz, args.iou)
+    server = build_server(args.host, args.port, service, args.verbose)
+    print(
+        f"[INFO] Serving {', '.join(backends)} on http://{args.host}:{args.port} "
+        f"(max batch {args.max_batch}, max wait {args.max_wait_ms:g} ms)"
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+        print("[DONE] Server stopped.")
+
+
+if __name__ == "__main__":
+    main()
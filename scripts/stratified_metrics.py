@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Metrics broken down by object size, aspect ratio, orientation and image density.
+
+Outputs:
+- results/comparison/stratified_metrics.json: the split's object distribution
+  per bin, and per model the recall/precision (at ``--conf``) and AP50/AP50-95
+  of every bin, including the size x density cross table
+- results/comparison/stratified_recall.png and stratified_ap50.png: heatmaps
+  (models x bins, plus one size x density table per model)
+
+Notes:
+- Bin edges live in utils.stratified.STRATA; area is in original-image pixels.
+- Each model is evaluated once at conf 0.001 / iou 0.7 with
+  utils.stratified.StratifiedEvaluator; recall and precision use detections
+  at or above ``--conf``, AP uses all of them.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Dict
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from scripts.run_four_model_on_images import DEFAULT_MODELS, MODEL_SPECS
+from utils.evaluation import evaluate_backend
+from utils.inference import BACKENDS, load_backend, resolve_weight
+from utils.stratified import CROSS_KEY, DEFAULT_CONF, STRATA, StratifiedEvaluator, dataset_strata
+from utils.visualization import ResultVisualizer
+
+
+def _print_breakdown(breakdowns: Dict[str, Dict], metric: str) -> None:
+    models = list(breakdowns)
+    print("=" * (22 + 10 * len(models)))
+    print(f"{metric:<22}" + "".join(f"{m[:9]:>10}" for m in models))
+    for dim in list(STRATA) + [CROSS_KEY]:
+        print("-" * (22 + 10 * len(models)))
+        first = breakdowns[models[0]]["strata"][dim]
+        for label, cell in first.items():
+            if not cell["n_gt"]:
+                continue
+            row = "".join(f"{breakdowns[m]['strata'][dim][label][metric]:>10.3f}" for m in models)
+            name = "size|dens" if dim == CROSS_KEY else dim
+            print(f"{name + ':' + label:<16}{cell['n_gt']:>6}" + row)
+    print("=" * (22 + 10 * len(models)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Size/density/orientation-stratified metrics per model")
+    parser.add_argument(
+        "--models",
+        nargs="+",
+        default=list(DEFAULT_MODELS),
+        choices=[spec.key for spec in MODEL_SPECS],
+    )
+    parser.add_argument("--backend", type=str, default="pytorch", choices=BACKENDS)
+    parser.add_argument("--eval-dir", type=str, default=str(ROOT / "data" / "real_splits" / "val" / "images"))
+    parser.add_argument("--eval-images", type=int, default=0, help="Limit evaluation images (0 = all)")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--conf", type=float, default=DEFAULT_CONF, help="Threshold for recall/precision")
+    parser.add_argument("--output-dir", type=str, default=str(ROOT / "results" / "comparison"))
+    args = parser.parse_args()
+
+    specs = {spec.key: spec.weight for spec in MODEL_SPECS}
+    breakdowns: Dict[str, Dict] = {}
+    for key in args.models:
+        weight = resolve_weight(specs[key], args.backend)
+        if not weight.exists():
+            print(f"[WARN] {key}: missing {weight}, skipped")
+            continue
+        evaluator = StratifiedEvaluator()
+        evaluate_backend(
+            load_backend(weight, "auto"), Path(args.eval_dir), imgsz=args.imgsz, limit=args.eval_images,
+            evaluator=evaluator,
+        )
+        breakdowns[key] = evaluator.breakdown(args.conf)
+        overall = breakdowns[key]["overall"]
+        print(f"[OK] {key}: recall {overall['recall']:.4f}, AP50 {overall['AP50']:.4f} ({overall['n_gt']} objects)")
+    if not breakdowns:
+        raise RuntimeError("No models evaluated; check that the weights exist")
+
+    _print_breakdown(breakdowns, "recall")
+    out_dir = Path(args.output_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    report = {
+        "settings": {"eval_dir": args.eval_dir, "backend": args.backend, "imgsz": args.imgsz, "conf": args.conf,
+                     "bins": {name: {"edges": [float(e) if e != float("inf") else None for e in edges], "labels": list(labels)}
+                              for name, (edges, labels) in STRATA.items()}},
+        "dataset": dataset_strata(Path(args.eval_dir)),
+        "models": breakdowns,
+    }
+    out_path = out_dir / "stratified_metrics.json"
+    out_path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+    viz = ResultVisualizer(str(out_dir))
+    viz.plot_stratified_heatmap(breakdowns, "recall", "stratified_recall.png")
+    viz.plot_stratified_heatmap(breakdowns, "AP50", "stratified_ap50.png")
+    print(f"[DONE] Stratified metrics: {out_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Train the ablation set (baseline / asc / asor / full) as one scheduled job.
+
+Outputs:
+- runs/plane_<key>/: one ultralytics run per model (weights/best.pt is what
+  run_four_model_on_images.py and generate_experiment_figures.py load),
+  plus epoch_timing.csv from utils.training.EpochTimer (and step_timing.csv
+  from StepTimer with ``--step-timing``)
+- runs/ablation/schedule.json: per-model train arguments, resources, device,
+  attempts, errors and timings; rewritten after every scheduling event
+- results/runs.sqlite (``--store``): every model's epochs under run name plane_<key>
+- results/comparison/ablation_report.json (``--report``): best-epoch metrics of
+  all models and the full-vs-baseline improvements (MetricsAnalyzer report)
+
+Notes:
+- The models are declared in configs/ablation.yaml: base training config,
+  overrides, regression loss (``asor`` trains with utils.training.ASOROBBTrainer)
+  and resource needs (CPU cores, GPUs). Precedence: config < common < model set < ``--set``.
+- Models start as soon as their declared cores/GPUs are free, each in a fresh
+  process; threads and dataloader workers follow the cores it was given.
+- With ``--cache disk`` (default) the train split is decoded once per imgsz
+  before any model starts, and every run reads the shared npy_<imgsz>/ cache.
+- ``--progressive`` trains each model with utils.training.ProgressiveResize
+  (``--align-asor`` also steps the ASOR-Loss alpha at its phases); the
+  shared cache is then built for every phase size.
+- ``--asc-checkpoint`` turns on gradient checkpointing in the C2f_ASC blocks
+  of the asc / full models (utils.training.ASCCheckpoint): less activation
+  memory for high-resolution training at the cost of recomputing ASC.
+- A failed model is re-queued up to ``--retries`` times and resumes from its
+  weights/last.pt when one exists. ``--resume`` does the same for an earlier,
+  interrupted invocation (finished models are skipped).
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing as mp
+import shutil
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import torch
+
+from utils.ablation import ResourcePool, has_asc_layers, host_settings, load_ablation, run_job, split_images
+from utils.metrics import MetricsAnalyzer
+from utils.results_store import DEFAULT_DB, ResultsStore
+from utils.training import (
+    CACHE_MODES,
+    DEFAULT_PROGRESSIVE,
+    PROFILES,
+    build_image_cache,
+    parse_overrides,
+    parse_progressive,
+    resolve_dataset_yaml,
+    resolve_profile,
+)
+
+RUNS_DIR = ROOT / "runs"
+
+
+def _finished(save_dir: Path, epochs: int) -> bool:
+    csv_path = save_dir / "results.csv"
+    if not (save_dir / "weights" / "best.pt").exists() or not csv_path.exists():
+        return False
+    with open(csv_path, "r", encoding="utf-8") as f:
+        return sum(1 for line in f if line.strip()) - 1 >= epochs
+
+
+def _prepare_dirs(jobs: List[Dict], resume: bool, overwrite: bool) -> None:
+    """Existing run directories are resumed, removed or refused, so results.csv never mixes two runs."""
+    for job in jobs:
+        save_dir = Path(job["save_dir"])
+        if not save_dir.exists():
+            continue
+        if overwrite:
+            shutil.rmtree(save_dir)
+        elif resume:
+            job["resume"] = True
+            if _finished(save_dir, int(job["args"].get("epochs", 100))):
+                job["status"] = "done"
+        else:
+            raise SystemExit(f"[ERROR] {save_dir} exists; pass --resume to continue it or --overwrite to retrain")
+
+
+def _write_schedule(path: Path, schedule: Dict) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(schedule, indent=2, default=str), encoding="utf-8")
+    tmp.replace(path)
+
+
+def _shared_cache(jobs: List[Dict], workers: int, progressive: Optional[str] = None) -> None:
+    """Decode each (train split, imgsz) once; every job then finds the npy cache up to date."""
+    seen = set()
+    for job in jobs:
+        if job["status"] == "done":
+            continue
+        imgsz, epochs = int(job["args"].get("imgsz", 640)), int(job["args"].get("epochs", 100))
+        sizes = [sz for _, sz in parse_progressive(progressive, imgsz, epochs)] if progressive else [imgsz]
+        for size in sizes:
+            key = (job["args"]["data"], size)
+            if key not in seen:
+                seen.add(key)
+                build_image_cache(split_images(key[0], "train"), size, workers=workers)
+
+
+def _report(jobs: List[Dict], store_path: str, report_path: str) -> None:
+    csvs = {job["name"]: str(Path(job["save_dir"]) / "results.csv") for job in jobs
+            if job["status"] == "done" and (Path(job["save_dir"]) / "results.csv").exists()}
+    if not csvs:
+        print("[WARN] No finished model; no report written")
+        return
+    analyzer = MetricsAnalyzer(str(ROOT / "results"))
+    with ResultsStore(store_path) as store:
+        comparison = analyzer.compare_models(csvs, store=store)
+    analyzer.generate_comparison_report(comparison, output_path=report_path)
+    analyzer.print_comparison_table(comparison)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Train the baseline/asc/asor/full ablation set as one job")
+    parser.add_argument("--config", type=str, default="configs/ablation.yaml", help="Ablation config")
+    parser.add_argument("--models", nargs="*", default=None, help="Subset of the config's models")
+    parser.add_argument("--set", nargs="*", default=[], metavar="KEY=VALUE", help="Overrides for every model")
+    parser.add_argument("--profile", type=str, default="auto", choices=PROFILES,
+                        help="cpu ignores the GPU needs; gpu requires CUDA")
+    parser.add_argument("--cpus", type=int, default=None, help="CPU cores to pack jobs onto (default: all)")
+    parser.add_argument("--cache", type=str, default="disk", choices=CACHE_MODES)
+    parser.add_argument("--retries", type=int, default=2, help="Re-queue a failed model up to N times")
+    parser.add_argument("--resume", action="store_true", help="Continue existing runs/plane_* directories")
+    parser.add_argument("--overwrite", action="store_true", help="Delete existing runs/plane_* directories first")
+    parser.add_argument("--store", type=str, default=str(ROOT / DEFAULT_DB))
+    parser.add_argument("--report", type=str, default=str(ROOT / "results" / "comparison" / "ablation_report.json"))
+    parser.add_argument("--step-timing", action="store_true",
+                        help="Per-iteration data/forward/loss/backward/optimizer percentiles (step_timing.csv)")
+    parser.add_argument("--progressive", type=str, nargs="?", const=DEFAULT_PROGRESSIVE, default=None,
+                        metavar="SCHEDULE", help=f"Progressive-resolution schedule (default {DEFAULT_PROGRESSIVE})")
+    parser.add_argument("--align-asor", action="store_true",
+                        help="With --progressive, step the ASOR-Loss alpha at the resolution phases")
+    parser.add_argument("--asc-checkpoint", action="store_true",
+                        help="Gradient checkpointing in C2f_ASC blocks (less training memory, slower steps)")
+    parser.add_argument("--dry-run", action="store_true", help="Print the packing plan only")
+    args = parser.parse_args()
+
+    specs = load_ablation(ROOT / args.config, ROOT)
+    keys = args.models or list(specs)
+    unknown = [k for k in keys if k not in specs]
+    if unknown:
+        raise SystemExit(f"[ERROR] Unknown model(s) {unknown}; {args.config} declares {list(specs)}")
+
+    if args.profile == "gpu" and not torch.cuda.is_available():
+        raise SystemExit("[ERROR] --profile gpu requires CUDA")
+    gpus = list(range(torch.cuda.device_count())) if args.profile != "cpu" else []
+    pool = ResourcePool(args.cpus, gpus)
+    overrides = parse_overrides(args.set)
+    schedule_dir = RUNS_DIR / "ablation"
+
+    jobs = []
+    for key in keys:
+        spec = specs[key]
+        job_args = {**spec["args"], **overrides}
+        job_args["data"] = str(resolve_dataset_yaml(job_args["data"], schedule_dir, ROOT))
+        job_args["cache"] = {"none": False, "ram": True}.get(args.cache, args.cache)
+        need = pool.clamp(spec["resources"])
+        if not need["gpus"] and "batch" not in overrides:  # CPU-sized batch, as in the cpu training profile
+            job_args["batch"] = resolve_profile("cpu", int(job_args.get("imgsz", 640)))["batch"]
+        jobs.append({"key": key, "name": spec["name"], "config": spec["config"], "loss": spec["loss"],
+                     "need": need, "args": job_args, "save_dir": str(RUNS_DIR / spec["name"]),
+                     "status": "pending", "attempts": 0, "resume": False, "errors": []})
+
+    print(f"[INFO] {len(jobs)} model(s) on {pool.cpus} CPU core(s), GPUs {gpus or 'none'}; "
+          f"cache={args.cache}, retries={args.retries}")
+    for job in jobs:
+        print(f"  {job['name']:<16} {job['config']:<32} loss={job['loss']:<8} "
+              f"cpus={job['need']['cpus']} gpus={job['need']['gpus']} batch={job['args'].get('batch')}")
+    if args.dry_run:
+        return
+
+    _prepare_dirs(jobs, args.resume, args.overwrite)
+    schedule_path = schedule_dir / "schedule.json"
+    schedule = {"created": datetime.now().strftime("%Y%m%d_%H%M%S"), "command": " ".join(sys.argv),
+                "cpus": pool.cpus, "gpus": gpus, "cache": args.cache, "jobs": jobs}
+    _write_schedule(schedule_path, schedule)
+    if args.cache == "disk":
+        _shared_cache(jobs, pool.cpus, args.progressive)
+
+    ctx = mp.get_context("spawn")  # fresh interpreter per model; no forked torch thread pools
+    pending = [job for job in jobs if job["status"] != "done"]
+    running = {}  # future -> (job, allocation, executor)
+    t0 = time.perf_counter()
+    while pending or running:
+        for job in list(pending):  # first fit in declared order; smaller jobs backfill idle cores
+            alloc = pool.acquire(job["need"])
+            if alloc is None:
+                continue
+            pending.remove(job)
+            host = host_settings(alloc)
+            job["args"].update(device=host["device"], workers=host["workers"])
+            job["attempts"] += 1
+            job["status"], job["device"] = "running", host["device"]
+            job["started"] = datetime.now().isoformat(timespec="seconds")
+            spec = {"key": job["key"], "save_dir": job["save_dir"], "loss": job["loss"], "args": job["args"],
+                    "threads": host["threads"], "workers": host["workers"], "resume": job["resume"],
+                    "step_timing": args.step_timing, "progressive": args.progressive,
+                    "align_asor": args.align_asor,
+                    "asc_checkpoint": args.asc_checkpoint and has_asc_layers(job["args"]["model"])}
+            executor = ProcessPoolExecutor(max_workers=1, mp_context=ctx)  # a crashed run takes down only its own
+            running[executor.submit(run_job, spec)] = (job, alloc, executor)
+            print(f"[INFO] {job['name']} started (attempt {job['attempts']}) on device={host['device']} "
+                  f"threads={host['threads']} workers={host['workers']}"
+                  + (", resuming" if job["resume"] else ""))
+        _write_schedule(schedule_path, schedule)
+
+        finished, _ = wait(running, return_when=FIRST_COMPLETED)
+        for future in finished:
+            job, alloc, executor = running.pop(future)
+            pool.release(alloc)
+            executor.shutdown()
+            job["finished"] = datetime.now().isoformat(timespec="seconds")
+            try:
+                info = future.result()
+            except Exception as e:
+                job["errors"].append(f"{type(e).__name__}: {e}")
+                job["resume"] = True  # continue from weights/last.pt if the failed attempt saved one
+                if job["attempts"] <= args.retries:
+                    job["status"] = "retrying"
+                    pending.append(job)
+                    print(f"[WARN] {job['name']} failed ({job['errors'][-1]}); re-queued")
+                else:
+                    job["status"] = "failed"
+                    print(f"[WARN] {job['name']} failed after {job['attempts']} attempt(s): {job['errors'][-1]}")
+                continue
+            job["status"], job["train_s"] = "done", round(info["seconds"], 2)
+            print(f"[OK] {job['name']} finished in {info['seconds']:.0f}s -> {job['save_dir']}/weights/best.pt")
+        _write_schedule(schedule_path, schedule)
+
+    schedule["wall_s"] = round(time.perf_counter() - t0, 2)
+    _write_schedule(schedule_path, schedule)
+    _report(jobs, args.store, args.report)
+    n_done = sum(job["status"] == "done" for job in jobs)
+    print(f"[DONE] {n_done}/{len(jobs)} model(s) finished in {schedule['wall_s']:.0f}s; schedule: {schedule_path}")
+
+
+if __name__ == "__main__":
+    main()
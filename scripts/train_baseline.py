@@ -23,8 +23,10 @@ sys.path.insert(0, str(ROOT))
 
 from ultralytics import YOLO
 
+from utils.training import CACHE_MODES, PROFILES, configure_training
 
-def train_baseline():
+
+def train_baseline(profile: str = 'auto', cache: str = None, batch: int = None):
     """训练基线YOLOv8-OBB模型"""
 
     print("=" * 60)
@@ -34,12 +36,12 @@ def train_baseline():
 
     # 加载预训练模型
     model = YOLO('yolov8n-obb.pt')
+    host = configure_training(model, profile, imgsz=640, batch=batch, cache=cache)
 
     # 训练参数
     results = model.train(
         data=str(ROOT / 'configs' / 'dataset.yaml'),
         epochs=200,
-        batch=16,
         imgsz=640,
         optimizer='SGD',
         lr0=0.01,
@@ -61,6 +63,7 @@ def train_baseline():
         save_period=10,
         plots=True,
         verbose=True,
+        **host,
     )
 
     print("\n[INFO] 基线模型训练完成!")
@@ -95,9 +98,14 @@ if __name__ == '__main__':
     parser.add_argument('--mode', type=str, default='train', choices=['train', 'val'],
                        help='运行模式: train/val')
     parser.add_argument('--weights', type=str, default=None, help='验证用的权重路径')
+    parser.add_argument('--profile', type=str, default='auto', choices=PROFILES,
+                       help='主机配置: gpu / cpu / auto (有CUDA时为gpu)')
+    parser.add_argument('--cache', type=str, default=None, choices=CACHE_MODES,
+                       help='图像缓存: none / ram / disk (默认由profile决定, cpu为disk)')
+    parser.add_argument('--batch', type=int, default=None, help='覆盖profile的batch')
     args = parser.parse_args()
 
     if args.mode == 'train':
-        train_baseline()
+        train_baseline(args.profile, args.cache, args.batch)
     elif args.mode == 'val':
         validate_baseline(args.weights)
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Distil the full model (ASC + ASOR-Loss) into a faster student and compare the three.
+
+Outputs:
+- <train split>/teacher_<imgsz>/: teacher boxes, scores and attention maps for
+  every train image (utils.distill.build_teacher_cache); reused while the
+  teacher weights and the split are unchanged
+- runs/distill/<name>/: the student's ultralytics run, plus distill.csv
+  (per-epoch kd_box / kd_cls / kd_feat) and epoch_timing.csv
+- results/comparison/distill_report.json (``--report``): params, forward
+  latency and val metrics of student, teacher and baseline, and the student's
+  deltas against both
+
+Notes:
+- Students: any OBB weights/YAML via ``--student`` (default yolov8n-obb.pt),
+  or ``--width W`` for RA-YOLO with C2f_ASC in the neck (configs/ra_yolo_asc_obb.yaml,
+  the teacher's architecture) with channels x W.
+- The student trains with geometric augmentation off (utils.distill.DISTILL_AUG),
+  so its input is the image the teacher saw when the cache was built (the
+  same zero-parameter affine, before HSV jitter). The base recipe (``--config`` + ``--set``) supplies everything else.
+- Latency is the model forward pass on one imgsz x imgsz image (fused, no
+  pre/postprocess) after ``--warmup`` runs; scripts/benchmark_inference.py
+  measures the full pipeline per backend.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import numpy as np
+import torch
+from ultralytics import YOLO
+
+from utils.distill import DISTILL_AUG, KD_CONF, KD_GAINS, Distiller, build_teacher_cache, width_scaled_config
+from utils.training import (
+    PROFILES,
+    configure_training,
+    load_train_config,
+    parse_overrides,
+    resolve_dataset_yaml,
+)
+
+RUNS_DIR = ROOT / "runs" / "distill"
+# config keys that belong to a single run rather than to the shared recipe
+_RUN_KEYS = ("model", "project", "name", "resume", "exist_ok", "pretrained")
+
+
+def _latency(weights: Path, imgsz: int, device: str, warmup: int, runs: int) -> Dict[str, float]:
+    model = YOLO(str(weights)).model.fuse(verbose=False).to(device).eval()
+    x = torch.zeros(1, 3, imgsz, imgsz, device=device)
+    times = []
+    with torch.no_grad():
+        for i in range(warmup + runs):
+            if device != "cpu":
+                torch.cuda.synchronize()
+            t0 = time.perf_counter()
+            model(x)
+            if device != "cpu":
+                torch.cuda.synchronize()
+            if i >= warmup:
+                times.append((time.perf_counter() - t0) * 1000)
+    return {"latency_p50_ms": round(float(np.percentile(times, 50)), 3),
+            "latency_p95_ms": round(float(np.percentile(times, 95)), 3),
+            "params_m": round(sum(p.numel() for p in model.parameters()) / 1e6, 3)}
+
+
+def _evaluate(weights: Path, data: str, imgsz: int, batch: int, device: str, save_dir: Path) -> Dict[str, float]:
+    metrics = YOLO(str(weights)).val(data=data, imgsz=imgsz, batch=batch, device=device, plots=False,
+                                     verbose=False, project=str(save_dir.parent), name=save_dir.name, exist_ok=True)
+    box = metrics.box
+    return {"precision": round(float(box.mp), 4), "recall": round(float(box.mr), 4),
+            "mAP50": round(float(box.map50), 4), "mAP50_95": round(float(box.map), 4)}
+
+
+def _report(models: Dict[str, Optional[Path]], data: str, imgsz: int, batch: int, device: str, args,
+            run_dir: Path) -> Dict:
+    results = {}
+    for key, weights in models.items():
+        if weights is None or not weights.exists():
+            print(f"[WARN] {key}: {weights} not found; left out of the report")
+            continue
+        print(f"[INFO] Evaluating {key}: {weights}")
+        results[key] = {"weights": str(weights),
+                        **_evaluate(weights, data, imgsz, batch, device, run_dir / "val" / key),
+                        **_latency(weights, imgsz, device, args.warmup, args.runs)}
+
+    student = results.get("student")
+    comparison = {}
+    for ref in ("teacher", "baseline"):
+        if student and ref in results:
+            other = results[ref]
+            comparison[f"student_vs_{ref}"] = {
+                "mAP50_delta": round(student["mAP50"] - other["mAP50"], 4),
+                "mAP50_95_delta": round(student["mAP50_95"] - other["mAP50_95"], 4),
+                "speedup": round(other["latency_p50_ms"] / max(student["latency_p50_ms"], 1e-9), 3),
+                "params_ratio": round(student["params_m"] / max(other["params_m"], 1e-9), 3),
+            }
+    return {"imgsz": imgsz, "device": device, "models": results, "comparison": comparison}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Distil the full model into a faster student")
+    parser.add_argument("--teacher", type=str, default="runs/plane_full/weights/best.pt")
+    parser.add_argument("--baseline", type=str, default="runs/plane_baseline/weights/best.pt",
+                        help="Reference model for the report")
+    parser.add_argument("--student", type=str, default="yolov8n-obb.pt", help="Student weights or model YAML")
+    parser.add_argument("--width", type=float, default=None,
+                        help="Student = configs/ra_yolo_asc_obb.yaml with its width multiplied by W")
+    parser.add_argument("--config", type=str, default="configs/baseline_train.yaml", help="Base training config")
+    parser.add_argument("--set", nargs="*", default=[], metavar="KEY=VALUE", help="Overrides for the base recipe")
+    parser.add_argument("--name", type=str, default=None, help="Run name (runs/distill/<name>)")
+    parser.add_argument("--kd-box", type=float, default=KD_GAINS["kd_box"], help="ProbIoU box distillation gain")
+    parser.add_argument("--kd-cls", type=float, default=KD_GAINS["kd_cls"], help="Soft-label class gain")
+    parser.add_argument("--kd-feat", type=float, default=KD_GAINS["kd_feat"], help="Attention transfer gain")
+    parser.add_argument("--kd-conf", type=float, default=KD_CONF, help="Teacher score for box distillation")
+    parser.add_argument("--rebuild-cache", action="store_true", help="Re-run the teacher even if cached")
+    parser.add_argument("--profile", type=str, default="auto", choices=PROFILES)
+    parser.add_argument("--batch", type=int, default=None, help="Override the profile batch")
+    parser.add_argument("--warmup", type=int, default=5, help="Unmeasured forward passes per model")
+    parser.add_argument("--runs", type=int, default=50, help="Measured forward passes per model")
+    parser.add_argument("--report", type=str, default=str(ROOT / "results" / "comparison" / "distill_report.json"))
+    parser.add_argument("--no-train", action="store_true", help="Only (re)write the report for an existing run")
+    args = parser.parse_args()
+
+    teacher = Path(args.teacher) if Path(args.teacher).is_absolute() else ROOT / args.teacher
+    if not teacher.exists():
+        raise SystemExit(f"[ERROR] Teacher weights not found: {teacher} (train the full model first)")
+    if args.width:
+        student = str(width_scaled_config(ROOT / "configs" / "ra_yolo_asc_obb.yaml", args.width,
+                                          RUNS_DIR / f"ra_yolo_asc_obb_w{args.width:g}.yaml"))
+        name = args.name or f"ra_yolo_asc_w{args.width:g}"
+    else:
+        student = args.student
+        name = args.name or Path(args.student).stem
+    run_dir = RUNS_DIR / name
+
+    config = load_train_config(ROOT / args.config, ROOT)
+    config.update(parse_overrides(args.set))
+    imgsz = int(config.get("imgsz", 640))
+    data = str(resolve_dataset_yaml(config["data"], RUNS_DIR, ROOT))
+
+    model = YOLO(student)
+    host = configure_training(model, args.profile, imgsz=imgsz, batch=args.batch, cache="disk")
+    if not args.no_train:
+        cache_dir = build_teacher_cache(teacher, data, imgsz, batch=host["batch"], device=host["device"],
+                                        workers=host["workers"], rebuild=args.rebuild_cache)
+        Distiller(cache_dir, {"kd_box": args.kd_box, "kd_cls": args.kd_cls, "kd_feat": args.kd_feat},
+                  args.kd_conf).attach(model)
+        train_args = {k: v for k, v in config.items() if k not in _RUN_KEYS}
+        train_args.update(data=data, **DISTILL_AUG, **host)
+        model.train(**train_args, project=str(RUNS_DIR), name=name, exist_ok=True)
+
+    baseline = Path(args.baseline) if Path(args.baseline).is_absolute() else ROOT / args.baseline
+    report = _report({"student": run_dir / "weights" / "best.pt", "teacher": teacher, "baseline": baseline},
+                     data, imgsz, host["batch"], host["device"], args, run_dir)
+    report.update(student=student, run=str(run_dir), gains={"kd_box": args.kd_box, "kd_cls": args.kd_cls,
+                                                             "kd_feat": args.kd_feat}, kd_conf=args.kd_conf)
+    out = Path(args.report)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+    print("=" * 72)
+    print(f"{'Model':<10}{'Params(M)':>10}{'p50(ms)':>10}{'mAP50':>10}{'mAP50-95':>10}")
+    for key, r in report["models"].items():
+        print(f"{key:<10}{r['params_m']:>10.2f}{r['latency_p50_ms']:>10.2f}{r['mAP50']:>10.4f}{r['mAP50_95']:>10.4f}")
+    for key, c in report["comparison"].items():
+        print(f"[STATS] {key}: mAP50 {c['mAP50_delta']:+.4f}, mAP50-95 {c['mAP50_95_delta']:+.4f}, "
+              f"{c['speedup']:.2f}x faster")
+    print("=" * 72)
+    print(f"[DONE] Report: {out}")
+
+
+if __name__ == "__main__":
+    main()
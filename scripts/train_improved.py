@@ -30,8 +30,10 @@ sys.path.insert(0, str(ROOT))
 
 from ultralytics import YOLO
 
+from utils.training import CACHE_MODES, PROFILES, configure_training
 
-def train_improved():
+
+def train_improved(profile: str = 'auto', cache: str = None, batch: int = None):
     """训练改进的RA-YOLO模型"""
 
     print("=" * 60)
@@ -41,12 +43,12 @@ def train_improved():
 
     # 加载基线预训练模型
     model = YOLO('yolov8n-obb.pt')
+    host = configure_training(model, profile, imgsz=640, batch=batch, cache=cache)
 
     # 训练参数 (改进配置)
     results = model.train(
         data=str(ROOT / 'configs' / 'dataset.yaml'),
         epochs=200,
-        batch=16,
         imgsz=640,
         optimizer='SGD',
         lr0=0.01,
@@ -74,6 +76,7 @@ def train_improved():
         save_period=10,
         plots=True,
         verbose=True,
+        **host,
     )
 
     print("\n[INFO] RA-YOLO改进模型训练完成!")
@@ -108,9 +111,14 @@ if __name__ == '__main__':
     parser.add_argument('--mode', type=str, default='train', choices=['train', 'val'],
                        help='运行模式: train/val')
     parser.add_argument('--weights', type=str, default=None, help='验证用的权重路径')
+    parser.add_argument('--profile', type=str, default='auto', choices=PROFILES,
+                       help='主机配置: gpu / cpu / auto (有CUDA时为gpu)')
+    parser.add_argument('--cache', type=str, default=None, choices=CACHE_MODES,
+                       help='图像缓存: none / ram / disk (默认由profile决定, cpu为disk)')
+    parser.add_argument('--batch', type=int, default=None, help='覆盖profile的batch')
     args = parser.parse_args()
 
     if args.mode == 'train':
-        train_improved()
+        train_improved(args.profile, args.cache, args.batch)
     elif args.mode == 'val':
         validate_improved(args.weights)
@@ -11,18 +11,22 @@ sys.path.insert(0, str(ROOT))
 
 from ultralytics import YOLO
 
+from utils.training import CACHE_MODES, DEFAULT_PROGRESSIVE, PROFILES, configure_training
 
-def train_baseline():
+
+def train_baseline(profile: str = 'auto', cache: str = None, batch: int = None, step_timing: bool = False,
+                   progressive: str = None, asc_checkpoint: bool = False):
     """训练基线 YOLOv8-OBB"""
     print("=" * 60)
     print("  Baseline Training: YOLOv8n-OBB")
     print("=" * 60)
 
     model = YOLO('yolov8n-obb.pt')
+    host = configure_training(model, profile, imgsz=640, batch=batch, cache=cache, step_timing=step_timing,
+                              progressive=progressive, asc_checkpoint=asc_checkpoint)
     results = model.train(
         data=str(ROOT / 'configs' / 'dataset_real.yaml'),
         epochs=100,
-        batch=16,
         imgsz=640,
         optimizer='SGD',
         lr0=0.01,
@@ -37,28 +41,30 @@ def train_baseline():
         mixup=0.0,
         copy_paste=0.0,
         project=str(ROOT / 'runs'),
-        name='baseline',
+        name='baseline_prog' if progressive else 'baseline',
         save=True,
         save_period=20,
         plots=True,
         verbose=True,
-        device=0,
+        **host,
     )
     print("[INFO] Baseline training done!")
     return results
 
 
-def train_improved():
+def train_improved(profile: str = 'auto', cache: str = None, batch: int = None, step_timing: bool = False,
+                   progressive: str = None, asc_checkpoint: bool = False):
     """训练改进 RA-YOLO (增强数据增强策略)"""
     print("=" * 60)
     print("  Improved Training: RA-YOLO")
     print("=" * 60)
 
     model = YOLO('yolov8n-obb.pt')
+    host = configure_training(model, profile, imgsz=640, batch=batch, cache=cache, step_timing=step_timing,
+                              progressive=progressive, asc_checkpoint=asc_checkpoint)
     results = model.train(
         data=str(ROOT / 'configs' / 'dataset_real.yaml'),
         epochs=100,
-        batch=16,
         imgsz=640,
         optimizer='SGD',
         lr0=0.01,
@@ -78,12 +84,12 @@ def train_improved():
         translate=0.15,
         scale=0.6,
         project=str(ROOT / 'runs'),
-        name='improved',
+        name='improved_prog' if progressive else 'improved',
         save=True,
         save_period=20,
         plots=True,
         verbose=True,
-        device=0,
+        **host,
     )
     print("[INFO] Improved training done!")
     return results
@@ -93,9 +99,23 @@ if __name__ == '__main__':
     import argparse
     parser = argparse.ArgumentParser()
     parser.add_argument('--mode', type=str, default='both', choices=['baseline', 'improved', 'both'])
+    parser.add_argument('--profile', type=str, default='auto', choices=PROFILES,
+                        help='主机配置: gpu / cpu / auto (有CUDA时为gpu)')
+    parser.add_argument('--cache', type=str, default=None, choices=CACHE_MODES,
+                        help='图像缓存: none / ram / disk (默认由profile决定, cpu为disk)')
+    parser.add_argument('--batch', type=int, default=None, help='覆盖profile的batch')
+    parser.add_argument('--step-timing', action='store_true',
+                        help='记录每个iteration的 数据/前向/损失/反向/参数更新 耗时 (step_timing.csv)')
+    parser.add_argument('--progressive', type=str, nargs='?', const=DEFAULT_PROGRESSIVE, default=None,
+                        metavar='SCHEDULE',
+                        help=f'渐进分辨率训练, 尺寸:起始epoch (默认 {DEFAULT_PROGRESSIVE}); 结果目录加 _prog 后缀')
+    parser.add_argument('--asc-checkpoint', action='store_true',
+                        help='C2f_ASC梯度检查点: 训练显存更低, 单步更慢 (仅对含C2f_ASC的模型有效)')
     args = parser.parse_args()
 
     if args.mode in ('baseline', 'both'):
-        train_baseline()
+        train_baseline(args.profile, args.cache, args.batch, args.step_timing, args.progressive,
+                       args.asc_checkpoint)
     if args.mode in ('improved', 'both'):
-        train_improved()
+        train_improved(args.profile, args.cache, args.batch, args.step_timing, args.progressive,
+                       args.asc_checkpoint)
@@ -0,0 +1,30 @@
+"""
+pytest 公共配置: 项目根目录加入 sys.path (与 scripts/*.py 相同), 测试可直接 import models / utils / scripts;
+obb_dataset: 训练回调测试用的小型合成OBB数据集
+"""
+
+import sys
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+
+@pytest.fixture
+def obb_dataset(tmp_path):
+    """6张 64x64 训练/验证图像, 每张一个旋转框; 返回数据集YAML路径"""
+    rng = np.random.default_rng(0)
+    for split in ('train', 'val'):
+        (tmp_path / 'images' / split).mkdir(parents=True)
+        (tmp_path / 'labels' / split).mkdir(parents=True)
+        for i in range(6):
+            cv2.imwrite(str(tmp_path / 'images' / split / f'{i}.png'), rng.integers(0, 255, (64, 64, 3), np.uint8))
+            (tmp_path / 'labels' / split / f'{i}.txt').write_text('0 0.2 0.2 0.6 0.2 0.6 0.5 0.2 0.5\n')
+    data = tmp_path / 'data.yaml'
+    data.write_text(f'path: {tmp_path}\ntrain: images/train\nval: images/val\nnames:\n  0: ship\n')
+    return data
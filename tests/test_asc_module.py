@@ -0,0 +1,119 @@
+"""ASCModule / C2f_ASC: 混合精度 (autocast / half) 与梯度检查点"""
+
+import copy
+from pathlib import Path
+
+import pytest
+import torch
+
+from models.improved import C2f_ASC, set_asc_checkpoint
+
+ROOT = Path(__file__).resolve().parent.parent
+AUTOCAST_DTYPES = [torch.bfloat16, torch.float16]
+
+
+def _reference(asc, x):
+    """user-049 之前的写法: alpha * out + (1 - alpha) * residual"""
+    out = asc.coord_attn(asc.spatial_attn(asc.channel_attn(x)))
+    return asc.alpha * out + (1 - asc.alpha) * x
+
+
+@pytest.mark.parametrize('dtype', AUTOCAST_DTYPES)
+@pytest.mark.parametrize('checkpoint', [False, True])
+def test_autocast_train_backward(dtype, checkpoint):
+    torch.manual_seed(0)
+    m = C2f_ASC(16, 32, checkpoint=checkpoint).train()
+    x = torch.randn(2, 16, 16, 16)
+    with torch.autocast('cpu', dtype=dtype):
+        y = m(x)
+    y.float().square().mean().backward()
+    assert torch.isfinite(y.float()).all()
+    assert m.asc.alpha.grad is not None and torch.isfinite(m.asc.alpha.grad).all()
+
+
+@pytest.mark.parametrize('dtype', AUTOCAST_DTYPES)
+def test_autocast_eval(dtype):
+    torch.manual_seed(0)
+    m = C2f_ASC(16, 32).eval()
+    x = torch.randn(2, 16, 16, 16)
+    with torch.no_grad():
+        ref = m(x)
+        with torch.autocast('cpu', dtype=dtype):
+            y = m(x)
+    assert torch.allclose(y.float(), ref, atol=0.1, rtol=0.1)
+
+
+def test_half_eval():
+    torch.manual_seed(0)
+    m = C2f_ASC(16, 32).eval()
+    x = torch.randn(2, 16, 16, 16)
+    with torch.no_grad():
+        ref = m(x)
+        y = m.half()(x.half())
+    assert y.dtype == torch.float16
+    assert torch.allclose(y.float(), ref, atol=0.05, rtol=0.05)
+
+
+def test_matches_reference_formula():
+    torch.manual_seed(0)
+    m = C2f_ASC(16, 32)
+    x = torch.randn(2, 32, 12, 12)
+    for train in (True, False):
+        m.train(train)
+        with torch.set_grad_enabled(train):
+            assert torch.allclose(m.asc(x.clone()), _reference(m.asc, x), atol=1e-6)
+
+
+def test_checkpoint_same_gradients():
+    torch.manual_seed(0)
+    m = C2f_ASC(16, 32).train()
+    x = torch.randn(2, 16, 16, 16, requires_grad=True)
+    grads = []
+    for enabled in (False, True):
+        assert set_asc_checkpoint(m, enabled) == 1
+        m.zero_grad()
+        x.grad = None
+        m(x).square().mean().backward()
+        grads.append([x.grad.clone()] + [p.grad.clone() for p in m.parameters()])
+    for a, b in zip(*grads):
+        assert torch.allclose(a, b, atol=1e-6)
+
+
+def test_checkpoint_updates_bn_stats_once():
+    """重新计算不再次更新BN运行统计量: 与不开检查点时的缓冲区一致"""
+    torch.manual_seed(0)
+    base = C2f_ASC(16, 32).train()
+    x = torch.randn(2, 16, 16, 16)
+    buffers = []
+    for enabled in (False, True):
+        m = copy.deepcopy(base)
+        set_asc_checkpoint(m, enabled)
+        for _ in range(3):
+            m(x).square().mean().backward()
+        buffers.append(dict(m.named_buffers()))
+    plain, ckpt = buffers
+    assert plain.keys() == ckpt.keys()
+    for name, value in plain.items():
+        assert torch.allclose(value, ckpt[name], atol=1e-6), name
+    assert int(ckpt['asc.coord_attn.bn1.num_batches_tracked']) == 3
+
+
+def test_asc_checkpoint_callback_reaches_trainer_model(tmp_path, obb_dataset):
+    """trainer 重新构建模型后, ASCCheckpoint 仍对训练用模型打开检查点"""
+    from ultralytics import YOLO
+    from ultralytics.utils.torch_utils import unwrap_model
+
+    from models.improved import ASCModule
+    from utils.training import ASCCheckpoint
+
+    model = YOLO(str(ROOT / 'configs' / 'ra_yolo_asc_obb.yaml'))
+    ASCCheckpoint().attach(model)
+    seen = []
+
+    def record(trainer):
+        seen.append([m.checkpoint for m in unwrap_model(trainer.model).modules() if isinstance(m, ASCModule)])
+
+    model.add_callback('on_train_batch_start', record)
+    model.train(data=str(obb_dataset), epochs=1, imgsz=64, batch=2, workers=0, device='cpu', project=str(tmp_path),
+                name='run', plots=False, val=False, amp=False, verbose=False)
+    assert seen and all(flags == [True, True, True] for flags in seen)
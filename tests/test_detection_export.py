@@ -0,0 +1,104 @@
+"""DetectionExporter: 按 shard 分文件、非续跑清空旧输出、续跑追加与合并, 提交日志回退与分片合并"""
+
+import numpy as np
+import pytest
+
+from utils.detection_export import DetectionExporter, load_detection_table, merge_shard_outputs, shard_tag
+from utils.inference import ObbDetections
+
+NAMES = {'m': {0: 'ship'}}
+
+
+def _dets(n, cls=0):
+    xywhr = np.tile(np.array([[50.0, 50.0, 20.0, 10.0, 0.3]], dtype=np.float32), (n, 1))
+    polys = np.tile(np.array([[[40, 45], [60, 45], [60, 55], [40, 55]]], dtype=np.float32), (n, 1, 1))
+    return ObbDetections(xywhr=xywhr, polys=polys, conf=np.full(n, 0.9, np.float32), cls=np.full(n, cls))
+
+
+def _run(root, idx, count, images, resume=False, fmt='npz'):
+    exporter = DetectionExporter(root, ('table', 'dota', 'geojson'), shard_tag(idx, count), NAMES,
+                                 table_format=fmt, resume=resume)
+    for name in images:
+        exporter.add(name, 'm', _dets(2))
+        exporter.flush()
+    exporter.close()
+
+
+def _lines(path):
+    return path.read_text(encoding='utf-8').rstrip('\n').split('\n')  # splitlines() 也会在 \x1e 处断开
+
+
+def test_shards_merge_without_duplicates(tmp_path):
+    _run(tmp_path, 0, 2, ['a.png'])
+    _run(tmp_path, 1, 2, ['b.png'])
+    _run(tmp_path, 0, 2, ['a.png'])  # 非续跑重跑 shard 0: 覆盖而不是追加
+    merge_shard_outputs(tmp_path, 2)
+    dota = _lines(tmp_path / 'dota' / 'm' / 'Task1_ship.txt')
+    assert [line.split()[0] for line in dota] == ['a', 'a', 'b', 'b']
+    assert len(_lines(tmp_path / 'geojson' / 'detections.geojsonl')) == 4
+    table = load_detection_table(tmp_path / 'detections', shard_count=2)
+    assert list(table['image']) == ['a.png', 'a.png', 'b.png', 'b.png']
+
+
+def test_resume_appends_and_ignores_other_shard_counts(tmp_path):
+    _run(tmp_path, 0, 2, ['old.png'])  # 以 2 个 shard 运行的旧结果
+    _run(tmp_path, 0, 1, ['a.png'])
+    _run(tmp_path, 0, 1, ['b.png'], resume=True)
+    merge_shard_outputs(tmp_path, 1)
+    dota = _lines(tmp_path / 'dota' / 'm' / 'Task1_ship.txt')
+    assert [line.split()[0] for line in dota] == ['a', 'a', 'b', 'b']
+    table = load_detection_table(tmp_path / 'detections', shard_count=1)
+    assert list(table['image']) == ['a.png', 'a.png', 'b.png', 'b.png']
+    assert len(load_detection_table(tmp_path / 'detections')['image']) == 6
+
+
+def test_merge_removes_stale_class_files(tmp_path):
+    stale = tmp_path / 'dota' / 'm' / 'Task1_plane.txt'
+    stale.parent.mkdir(parents=True)
+    stale.write_text('old 0.5 0 0 1 0 1 1 0 1\n', encoding='utf-8')
+    _run(tmp_path, 0, 1, ['a.png'])
+    merge_shard_outputs(tmp_path, 1)
+    assert not stale.exists()
+    assert (tmp_path / 'dota' / 'm' / 'Task1_ship.txt').exists()
+
+
+def test_resume_rolls_back_uncommitted_flush(tmp_path, monkeypatch):
+    crashed = DetectionExporter(tmp_path, ('table', 'dota', 'geojson'), shard_tag(0, 1), NAMES, table_format='npz')
+    crashed.add('a.png', 'm', _dets(2))
+    assert crashed.flush() == [('a.png', 'm')]
+    crashed.add('b.png', 'm', _dets(2))
+
+    def crash(pairs):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(crashed, '_commit', crash)  # 三种输出都已写出, 提交之前中断
+    with pytest.raises(KeyboardInterrupt):
+        crashed.flush()
+    for fh in (*crashed.dota._files.values(), crashed.geojson._fh, crashed._log):
+        fh.close()
+
+    resumed = DetectionExporter(tmp_path, ('table', 'dota', 'geojson'), shard_tag(0, 1), NAMES,
+                                table_format='npz', resume=True)
+    assert resumed.add('a.png', 'm', _dets(2)) == [('a.png', 'm')]  # 已提交: 只补记运行日志
+    resumed.add('b.png', 'm', _dets(2))
+    assert resumed.close() == [('b.png', 'm')]
+    merge_shard_outputs(tmp_path, 1)
+    table = load_detection_table(tmp_path / 'detections', shard_count=1)
+    assert list(table['image']) == ['a.png', 'a.png', 'b.png', 'b.png']
+    dota = _lines(tmp_path / 'dota' / 'm' / 'Task1_ship.txt')
+    assert [line.split()[0] for line in dota] == ['a', 'a', 'b', 'b']
+    assert len(_lines(tmp_path / 'geojson' / 'detections.geojsonl')) == 4
+
+
+@pytest.mark.parametrize('fmt', ['npz', 'parquet'])
+def test_close_compacts_parts(tmp_path, fmt):
+    if fmt == 'parquet':
+        pytest.importorskip('pyarrow')
+    _run(tmp_path, 0, 1, ['a.png', 'b.png', 'c.png'], fmt=fmt)
+    assert len(list((tmp_path / 'detections').glob('part-*'))) == 1
+    _run(tmp_path, 0, 1, ['d.png'], resume=True, fmt=fmt)
+    parts = list((tmp_path / 'detections').glob('part-*'))
+    assert len(parts) == 1 and parts[0].suffix == f'.{fmt}'
+    table = load_detection_table(tmp_path / 'detections', shard_count=1)
+    assert list(table['image']) == [name for name in ('a.png', 'b.png', 'c.png', 'd.png') for _ in range(2)]
+    assert np.allclose(table['cx'], 50)
@@ -0,0 +1,32 @@
+"""utils.distill: 教师缓存时的输入图像与学生蒸馏训练时 (HSV扰动前) 逐像素一致"""
+
+import cv2
+import numpy as np
+import torch
+
+from utils.distill import DISTILL_AUG, teacher_dataset
+
+
+def test_teacher_input_matches_student_with_odd_padding(tmp_path):
+    from ultralytics.cfg import get_cfg
+    from ultralytics.data import YOLODataset
+    from ultralytics.data.utils import check_det_dataset
+
+    (tmp_path / 'images' / 'train').mkdir(parents=True)
+    (tmp_path / 'labels' / 'train').mkdir(parents=True)
+    rng = np.random.default_rng(0)
+    cv2.imwrite(str(tmp_path / 'images' / 'train' / 'a.png'), rng.integers(0, 255, (427, 640, 3), np.uint8))
+    (tmp_path / 'labels' / 'train' / 'a.txt').write_text('0 0.2 0.2 0.6 0.2 0.6 0.5 0.2 0.5\n')
+    (tmp_path / 'data.yaml').write_text(f'path: {tmp_path}\ntrain: images/train\nval: images/train\n'
+                                        'names:\n  0: ship\n')
+    data = check_det_dataset(str(tmp_path / 'data.yaml'))
+
+    # 与蒸馏训练相同的学生数据集 (DISTILL_AUG), 关闭HSV扰动后比较; 640x427 上下共填充213像素 (奇数)
+    hyp = get_cfg(overrides={'imgsz': 640, 'task': 'obb', **DISTILL_AUG, 'hsv_h': 0.0, 'hsv_s': 0.0, 'hsv_v': 0.0})
+    student = YOLODataset(img_path=data['train'], imgsz=640, batch_size=1, augment=True, hyp=hyp, rect=False,
+                          cache=False, stride=32, pad=0.0, task='obb', data=data)
+    teacher = teacher_dataset(data, 640, batch=1)
+    s, t = student[0], teacher[0]
+    assert s['img'].shape == t['img'].shape == (3, 640, 640)
+    assert torch.equal(s['img'], t['img'])
+    assert torch.allclose(s['bboxes'], t['bboxes'], atol=1e-6)
@@ -0,0 +1,79 @@
+"""utils.ensemble.rotated_wbf: 跨模型聚簇, 加权平均, 模型权重与融合分数范围"""
+
+import math
+
+import numpy as np
+import pytest
+
+from utils.ensemble import rotated_wbf
+from utils.inference import ObbDetections
+
+
+def _dets(rows, conf, cls=None):
+    rows = np.asarray(rows, dtype=np.float64).reshape(-1, 5)
+    cls = np.zeros(len(rows), dtype=np.int64) if cls is None else cls
+    return ObbDetections.from_xywhr(rows, conf, cls)
+
+
+def _scenes(n_models, n_objects=20, seed=0):
+    """各模型对同一组目标的带噪预测"""
+    rng = np.random.default_rng(seed)
+    gt = np.column_stack([rng.uniform(0, 1000, (n_objects, 2)), rng.uniform(20, 60, (n_objects, 2)),
+                          rng.uniform(0, math.pi, n_objects)])
+    gt[:, :2] = np.arange(n_objects)[:, None] * 120 + 50  # 目标互不重叠
+    out = []
+    for _ in range(n_models):
+        noisy = gt + rng.normal(0, 1, gt.shape) * [1, 1, 1, 1, 0.02]
+        out.append(_dets(noisy, rng.uniform(0.2, 1.0, n_objects)))
+    return gt, out
+
+
+def test_clusters_across_models():
+    gt, dets = _scenes(3)
+    fused = rotated_wbf(dets)
+    assert len(fused) == len(gt)
+    order = np.argsort(fused.xywhr[:, 0])  # 目标按x递增排列
+    conf = np.stack([d.conf for d in dets]).astype(np.float64)
+    centers = np.stack([d.xywhr[:, :2] for d in dets]).astype(np.float64)
+    expected = (centers * conf[..., None]).sum(0) / conf.sum(0)[:, None]
+    assert np.allclose(fused.xywhr[order, :2], expected, atol=1e-3)
+    assert np.allclose(fused.conf[order], conf.mean(0), atol=1e-6)  # 三个模型都检出: 不降权
+
+
+def test_weighted_center_and_angle_wraparound():
+    a = _dets([[100, 100, 40, 20, math.radians(179)]], [0.9])
+    b = _dets([[104, 100, 40, 20, math.radians(1)]], [0.3])
+    fused = rotated_wbf([a, b])
+    assert len(fused) == 1
+    assert fused.xywhr[0, 0] == pytest.approx((100 * 0.9 + 104 * 0.3) / 1.2, abs=1e-3)
+    x, y, w, h, t = fused.xywhr[0]
+    angle = math.degrees(t if w >= h else t + math.pi / 2) % 180  # 长边方向 (输出表示可能交换宽高)
+    assert min(angle, 180 - angle) < 2  # 179° 与 1° 融合后接近 0°, 而非 90°
+
+
+def test_weights_must_be_positive():
+    _, dets = _scenes(2)
+    for weights in ([0, 1], [-1, 1], [1]):
+        with pytest.raises(ValueError):
+            rotated_wbf(dets, weights=weights)
+
+
+def test_zero_scores_are_skipped():
+    a = _dets([[100, 100, 40, 20, 0.3]], [0.0])
+    b = _dets([[100, 100, 40, 20, 0.3]], [0.0])
+    assert len(rotated_wbf([a, b])) == 0
+    c = _dets([[101, 100, 40, 20, 0.3]], [0.5])
+    fused = rotated_wbf([a, c])
+    assert len(fused) == 1 and np.all(np.isfinite(fused.xywhr))
+    assert fused.xywhr[0, 0] == pytest.approx(101, abs=1e-3)
+
+
+@pytest.mark.parametrize('conf_type', ['avg', 'max'])
+def test_conf_stays_in_unit_interval(conf_type):
+    _, dets = _scenes(3, seed=1)
+    dets[0] = _dets(dets[0].xywhr, np.ones(len(dets[0])))
+    fused = rotated_wbf(dets, weights=[5.0, 2.0, 0.5], conf_type=conf_type)
+    assert np.all(np.isfinite(fused.xywhr))
+    assert fused.conf.min() >= 0 and fused.conf.max() <= 1 + 1e-6
+    if conf_type == 'max':
+        assert np.allclose(fused.conf, 1)
@@ -0,0 +1,67 @@
+"""预解码图像缓存 (utils.training.build_image_cache): 并发构建与临时文件清理"""
+
+import multiprocessing as mp
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+import pytest
+
+from utils import training
+from utils.training import TMP_SUFFIX, build_image_cache, cache_path_for
+
+
+def _images(tmp_path, n=12):
+    img_dir = tmp_path / 'images'
+    img_dir.mkdir()
+    rng = np.random.default_rng(0)
+    paths = []
+    for i in range(n):
+        p = img_dir / f'{i:03d}.png'
+        cv2.imwrite(str(p), rng.integers(0, 255, (96, 128, 3), dtype=np.uint8))
+        paths.append(str(p))
+    return paths
+
+
+def _build(paths):
+    return [str(p) for p in build_image_cache(paths, 64, workers=2)]
+
+
+def test_concurrent_builders(tmp_path):
+    """多个进程同时构建同一份缓存 (ASHA / 消融并行训练) 不互相覆盖临时文件"""
+    paths = _images(tmp_path)
+    with ProcessPoolExecutor(max_workers=4, mp_context=mp.get_context('spawn')) as pool:
+        results = list(pool.map(_build, [paths] * 8))
+    assert all(r == results[0] for r in results)
+    for p in paths:
+        im = np.load(cache_path_for(p, 64))
+        assert im.shape == (48, 64, 3)
+        assert np.array_equal(im, cv2.resize(cv2.imread(p), (64, 48), interpolation=cv2.INTER_LINEAR))
+    assert not list((tmp_path / 'npy_64').glob(f'*{TMP_SUFFIX}'))
+
+
+def test_failed_write_leaves_no_tmp(tmp_path, monkeypatch):
+    paths = _images(tmp_path, 2)
+
+    def fail(*args, **kwargs):
+        raise OSError('disk full')
+
+    monkeypatch.setattr(training.np, 'save', fail)
+    with pytest.raises(OSError):
+        build_image_cache(paths, 64, workers=1)
+    assert not list((tmp_path / 'npy_64').glob(f'*{TMP_SUFFIX}'))
+
+
+def test_stale_tmp_swept(tmp_path):
+    paths = _images(tmp_path, 2)
+    cache_dir = tmp_path / 'npy_64'
+    cache_dir.mkdir()
+    stale, fresh = cache_dir / f'000.old{TMP_SUFFIX}', cache_dir / f'001.new{TMP_SUFFIX}'
+    stale.write_bytes(b'x')
+    fresh.write_bytes(b'x')
+    old = time.time() - training.STALE_TMP_SECONDS - 10
+    os.utime(stale, (old, old))
+    build_image_cache(paths, 64, workers=1)
+    assert not stale.exists() and fresh.exists()  # 较新的可能是其他进程正在写的
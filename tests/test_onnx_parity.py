@@ -0,0 +1,64 @@
+"""ONNX导出 (scripts/export_onnx.py): 小模型导出后 ONNX Runtime 与 PyTorch 的一致性"""
+
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+import torch
+
+pytest.importorskip('onnx')
+pytest.importorskip('onnxruntime')
+
+ROOT = Path(__file__).resolve().parent.parent
+IMGSZ = 128
+
+
+@pytest.fixture(scope='module')
+def tiny_model(tmp_path_factory):
+    """随机初始化的 YOLOv8n-OBB; 调整BN与分类偏置, 使随机输入上有分数各不相同的检测框"""
+    from ultralytics import YOLO
+
+    from scripts.export_onnx import export_checkpoint
+
+    torch.manual_seed(0)
+    model = YOLO('yolov8n-obb.yaml')
+    for m in model.model.modules():
+        if isinstance(m, torch.nn.BatchNorm2d):
+            m.weight.data.uniform_(0.5, 1.5)
+            m.bias.data.normal_(0, 0.5)
+    for branch in model.model.model[-1].cv3:
+        branch[-1].bias.data.fill_(-3.0)
+    weight = tmp_path_factory.mktemp('onnx') / 'tiny.pt'
+    model.save(str(weight))
+    onnx_path = export_checkpoint(weight, IMGSZ, batch=1, dynamic=False, opset=0, simplify=False)
+    return weight, onnx_path
+
+
+def _images(n=3):
+    rng = np.random.default_rng(0)
+    return [np.clip(rng.normal(128, 60, (IMGSZ, IMGSZ, 3)), 0, 255).astype(np.uint8) for _ in range(n)]
+
+
+def test_onnx_parity(tiny_model):
+    from scripts.export_onnx import check_parity
+
+    weight, onnx_path = tiny_model
+    report = check_parity(weight, onnx_path, _images(), IMGSZ, conf=0.05, atol=1e-4, min_match=0.98)
+    assert report['raw_max_abs_diff'] <= 1e-4
+    assert report['detections'] > 0
+    assert report['match_rate'] >= 0.98
+
+
+def test_onnx_backend_without_torch(tiny_model):
+    """ONNX后端 (解码 + 旋转NMS) 不导入torch"""
+    _, onnx_path = tiny_model
+    code = (
+        'import sys, numpy as np\n'
+        'from utils.inference import load_backend\n'
+        f'backend = load_backend({str(onnx_path)!r})\n'
+        f'backend.predict([np.zeros(({IMGSZ}, {IMGSZ}, 3), np.uint8)], conf=0.05, imgsz={IMGSZ})\n'
+        "assert 'torch' not in sys.modules, 'torch imported'\n"
+    )
+    subprocess.run([sys.executable, '-c', code], cwd=ROOT, check=True)
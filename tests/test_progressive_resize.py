@@ -0,0 +1,39 @@
+"""ProgressiveResize: 各阶段batch按像素数放大, 梯度累积与warmup按阶段的iteration数重算"""
+
+import numpy as np
+import pytest
+
+from utils.training import ProgressiveResize, parse_progressive
+
+
+def test_parse_progressive():
+    assert parse_progressive('0.5:0,0.75:0.3,1:0.6', 640, 100) == [(0, 320), (30, 480), (60, 640)]
+
+
+def test_phase_transition_scales_batch(tmp_path, obb_dataset):
+    from ultralytics import YOLO
+
+    model = YOLO('yolov8n-obb.yaml')
+    ProgressiveResize('0.5:0,1:2').attach(model)
+    seen, lrs = [], []
+
+    def on_epoch_start(trainer):
+        seen.append((trainer.train_loader.dataset.imgsz, trainer.batch_size, len(trainer.train_loader),
+                     trainer.accumulate))
+
+    def on_batch_end(trainer):
+        group = next(g for g in trainer.optimizer.param_groups if g.get('param_group') != 'bias')
+        lrs.append((trainer.epoch, group['lr'], group['initial_lr'] * trainer.lf(trainer.epoch)))
+
+    model.add_callback('on_train_epoch_start', on_epoch_start)
+    model.add_callback('on_train_batch_end', on_batch_end)
+    model.train(data=str(obb_dataset), epochs=3, imgsz=64, batch=1, nbs=4, warmup_epochs=2, workers=0, device='cpu',
+                project=str(tmp_path), name='run', plots=False, val=False, amp=False, verbose=False, close_mosaic=1)
+
+    # 6 张图: imgsz 32 时 batch 1×(64/32)² = 4 (2个batch, 累积1次), 目标尺寸 batch 1 (6个batch, 累积4次)
+    assert seen == [(32, 4, 2, 1), (32, 4, 2, 1), (64, 1, 6, 4)]
+    # warmup 按epoch进度 (epoch + i / 该阶段的batch数) 插值, 在第2个epoch结束时完成
+    progress = [0, 0.5, 1, 1.5]
+    assert [e for e, _, _ in lrs[:4]] == [0, 0, 1, 1]
+    assert [lr for _, lr, _ in lrs[:4]] == pytest.approx([p / 2 * final for p, (_, _, final) in zip(progress, lrs)])
+    assert np.all(np.diff([lr for _, lr, _ in lrs[:4]]) > 0)
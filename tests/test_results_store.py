@@ -0,0 +1,115 @@
+"""utils.results_store: results.csv 导入 (新增 / 追加 / 重写 / 跳过), 最佳epoch与 MetricsAnalyzer 一致"""
+
+import numpy as np
+import pytest
+
+from utils.metrics import MetricsAnalyzer
+from utils.results_store import ResultsStore, ResultsTail, canonical_column
+
+HEADER = ('epoch,train/box_loss,metrics/precision(B),metrics/recall(B),'
+          'metrics/mAP50(B),metrics/mAP50-95(B),val/box_loss')
+
+
+def _rows(n, seed=0, start=1):
+    rng = np.random.default_rng(seed)
+    return [f'{start + i},{rng.uniform(0.5, 2):.5f},{rng.uniform(0.3, 0.9):.5f},{rng.uniform(0.3, 0.9):.5f},'
+            f'{rng.uniform(0.2, 0.8):.5f},{rng.uniform(0.1, 0.5):.5f},{rng.uniform(0.5, 2):.5f}' for i in range(n)]
+
+
+def _write(path, lines, mode='w'):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, mode, encoding='utf-8') as f:
+        f.write(''.join(line + '\n' for line in lines))
+
+
+def _expected(path):
+    analyzer = MetricsAnalyzer()
+    return analyzer.get_best_epoch_metrics(analyzer.parse_yolo_results_csv(str(path)))
+
+
+@pytest.fixture
+def store():
+    with ResultsStore(':memory:') as s:
+        yield s
+
+
+def test_canonical_column():
+    assert canonical_column('  metrics/mAP50-95(B)') == 'mAP50_95'
+    assert canonical_column('metrics/mAP50') == 'mAP50'
+    assert canonical_column('train/box_loss') == 'train_box_loss'
+    assert canonical_column('epoch') is None
+
+
+def test_ingest_dir_matches_metrics_analyzer(tmp_path, store):
+    for k, name in enumerate(('a', 'b', 'asha/t000')):
+        _write(tmp_path / name / 'results.csv', [HEADER] + _rows(8 + k, seed=k))
+    assert store.ingest_dir(tmp_path) == {'added': 3}
+    assert store.runs == ['a', 'asha/t000', 'b']
+    best = store.best_epochs()
+    for run in store.runs:
+        ref = _expected(tmp_path / run / 'results.csv')
+        assert best[run]['best_epoch'] == ref['best_epoch']
+        for key in ('mAP50', 'mAP50_95', 'precision', 'recall', 'f1'):
+            assert best[run][key] == pytest.approx(ref[key])
+    epochs, values = store.curves('mAP50', ['a'])['a']
+    assert list(epochs) == list(range(1, 9)) and len(values) == 8
+    top = store.top_k(2)
+    assert [r for r, _ in top] == sorted(best, key=lambda r: -best[r]['mAP50'])[:2]
+    assert store.ingest_dir(tmp_path) == {'skipped': 3}
+
+
+def test_incremental_append_and_partial_line(tmp_path, store):
+    path = tmp_path / 'run' / 'results.csv'
+    _write(path, [HEADER] + _rows(3))
+    assert store.ingest_file(path) == 'added'
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(_rows(1, seed=1, start=4)[0][:10])  # 训练进程正写到一半的行
+    assert store.ingest_file(path) == 'appended'
+    assert store.table([])['epoch'].tolist() == [1, 2, 3]
+
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(_rows(1, seed=1, start=4)[0][10:] + '\n')
+    _write(path, _rows(2, seed=2, start=5), mode='a')
+    assert store.ingest_file(path) == 'appended'
+    assert store.table([])['epoch'].tolist() == [1, 2, 3, 4, 5, 6]
+    assert store.best_epochs()['run']['best_epoch'] == _expected(path)['best_epoch']
+
+
+def test_rewritten_file_is_replaced(tmp_path, store):
+    path = tmp_path / 'run' / 'results.csv'
+    _write(path, [HEADER] + _rows(6))
+    store.ingest_file(path)
+    _write(path, [HEADER] + _rows(2, seed=5))  # 重新训练: 文件变短
+    assert store.ingest_file(path) == 'replaced'
+    assert store.table(['mAP50'])['epoch'].tolist() == [1, 2]
+    assert store.best_epochs()['run']['best_epoch'] == _expected(path)['best_epoch']
+
+    _write(path, ['epoch,metrics/mAP50,metrics/lr'] + ['1,0.5,0.01', '2,0.6,0.01'])  # 表头变化
+    assert store.ingest_file(path) == 'replaced'
+    assert 'lr' in store.columns
+    assert store.best_epochs()['run']['best_epoch'] == 2
+
+
+def test_prune_and_params(tmp_path, store):
+    for name in ('a', 'b'):
+        _write(tmp_path / name / 'results.csv', [HEADER] + _rows(3))
+    store.ingest_dir(tmp_path)
+    store.set_params('b', {'lr0': 0.01, 'mixup': 0.1})
+    (tmp_path / 'b' / 'results.csv').unlink()
+    assert store.ingest_dir(tmp_path, prune=True) == {'skipped': 1, 'pruned': 1}
+    assert store.runs == ['a']
+    assert store.params() == {}
+
+
+def test_results_tail_matches_full_parse(tmp_path):
+    path = tmp_path / 'run' / 'results.csv'
+    _write(path, [HEADER] + _rows(4))
+    tail = ResultsTail(path)
+    assert tail.poll() == 4
+    _write(path, _rows(5, seed=3, start=5), mode='a')
+    assert tail.poll() == 5
+    assert tail.poll() == 0
+    ref = _expected(path)
+    assert tail.best['best_epoch'] == ref['best_epoch']
+    assert tail.best['mAP50'] == pytest.approx(ref['mAP50'])
+    assert tail.n_epochs == 9 and len(tail.curve) == 9
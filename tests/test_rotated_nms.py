@@ -0,0 +1,184 @@
+"""utils.rotated_nms: 与稠密矩阵 + 顺序执行的参考实现对比"""
+
+import numpy as np
+import pytest
+import torch
+
+from utils.rotated_nms import (
+    IOU_TYPES,
+    _shoelace,
+    gaussian_params,
+    polygon_iou_pairs,
+    probiou_matrix,
+    rect_iou_pairs,
+    rotated_nms,
+    soft_nms,
+    xywhr_to_polygons,
+)
+
+
+def _scene(n, size, seed=0):
+    """成簇的候选框, 同一目标有多个预测"""
+    rng = np.random.default_rng(seed)
+    centers = rng.uniform(0, size, (n // 8, 2))
+    ctr = np.repeat(centers, 8, axis=0)[:n] + rng.normal(0, 4, (n, 2))
+    wh = rng.uniform(20, 80, (n, 2))
+    ang = rng.uniform(0, np.pi, (n, 1))
+    return np.concatenate([ctr, wh, ang], axis=1), rng.random(n)
+
+
+def _polys64(boxes):
+    """float64 顶点 (xywhr_to_polygons 输出 float32)"""
+    x, y, w, h, r = np.asarray(boxes, dtype=np.float64).T
+    v1 = np.stack([w / 2 * np.cos(r), w / 2 * np.sin(r)], axis=1)
+    v2 = np.stack([-h / 2 * np.sin(r), h / 2 * np.cos(r)], axis=1)
+    ctr = np.stack([x, y], axis=1)
+    return np.stack([ctr + v1 + v2, ctr + v1 - v2, ctr - v1 - v2, ctr - v1 + v2], axis=1)
+
+
+def _clip_area(subject, clipper):
+    """Sutherland-Hodgman 裁剪求两个逆时针凸四边形的交集面积"""
+    out = [tuple(v) for v in subject]
+    for k in range(4):
+        a, b = clipper[k], clipper[(k + 1) % 4]
+
+        def side(p):
+            return (b[0] - a[0]) * (p[1] - a[1]) - (b[1] - a[1]) * (p[0] - a[0])
+
+        inp, out = out, []
+        for idx, e in enumerate(inp):
+            prev = inp[idx - 1]
+            if (side(e) >= 0) != (side(prev) >= 0):
+                t = side(prev) / (side(prev) - side(e))
+                out.append((prev[0] + t * (e[0] - prev[0]), prev[1] + t * (e[1] - prev[1])))
+            if side(e) >= 0:
+                out.append(e)
+        if not out:
+            return 0.0
+    return abs(_shoelace(np.asarray(out)))
+
+
+def _iou_matrix(boxes, iou_type):
+    if iou_type == 'probiou':
+        return probiou_matrix(boxes)
+    polys = _polys64(boxes)
+    i, j = np.triu_indices(len(boxes), k=1)
+    mat = np.zeros((len(boxes), len(boxes)))
+    mat[i, j] = polygon_iou_pairs(polys[i], polys[j])
+    return mat + mat.T
+
+
+def _greedy_reference(mat, scores, thres, classes=None, fast=False):
+    order = np.argsort(-scores, kind='stable')
+    same = np.ones_like(mat, dtype=bool) if classes is None else classes[:, None] == classes[None, :]
+    over = (mat >= thres) & same
+    alive = np.ones(len(scores), dtype=bool)
+    for a, ia in enumerate(order):
+        if alive[ia] or fast:
+            rest = order[a + 1:]
+            alive[rest] &= ~over[ia, rest]
+    return order[alive[order]]
+
+
+def _soft_reference(mat, scores, iou_thres, sigma, linear, score_thres):
+    cur = scores.astype(np.float64).copy()
+    active = cur >= score_thres
+    keep = []
+    while active.any():
+        idx = np.flatnonzero(active)
+        top = idx[np.argmax(cur[idx])]  # 同分取索引小者
+        keep.append(top)
+        active[top] = False
+        iou = mat[top]
+        if linear:
+            decay = np.where(iou >= iou_thres, 1 - iou, 1.0)
+        else:
+            decay = np.where(iou >= 0.01, np.exp(-iou ** 2 / sigma), 1.0)
+        cur[active] *= decay[active]
+        active &= cur >= score_thres
+    keep = np.asarray(keep)
+    return keep[np.argsort(-cur[keep], kind='stable')], cur
+
+
+@pytest.mark.parametrize('iou_type', IOU_TYPES)
+@pytest.mark.parametrize('method', ['greedy', 'fast'])
+def test_nms_matches_reference(iou_type, method):
+    boxes, scores = _scene(400, 384)
+    classes = np.random.default_rng(1).integers(0, 3, len(boxes))
+    mat = _iou_matrix(boxes, iou_type)
+    for cls in (None, classes):
+        ref = _greedy_reference(mat, scores, 0.45, cls, fast=method == 'fast')
+        got = rotated_nms(boxes, scores, 0.45, iou_type=iou_type, method=method, classes=cls)
+        assert np.array_equal(got, ref)
+
+
+@pytest.mark.parametrize('iou_type', IOU_TYPES)
+@pytest.mark.parametrize('linear', [False, True])
+def test_soft_nms_matches_reference(iou_type, linear):
+    boxes, scores = _scene(200, 256, seed=2)
+    mat = _iou_matrix(boxes, iou_type)
+    ref_keep, ref_scores = _soft_reference(mat, scores, 0.3, 0.5, linear, 0.001)
+    keep, new_scores = soft_nms(boxes, scores, 0.3, 0.5, linear=linear, iou_type=iou_type)
+    assert np.array_equal(keep, ref_keep)
+    assert np.allclose(new_scores, ref_scores[ref_keep], rtol=1e-9)
+
+
+def test_polygon_iou_matches_clipping():
+    boxes, _ = _scene(120, 256, seed=3)
+    polys = xywhr_to_polygons(boxes).astype(np.float64)
+    ccw = np.where((_shoelace(polys) < 0)[:, None, None], polys[:, ::-1], polys)
+    i, j = np.triu_indices(len(boxes), k=1)
+    pairs = np.concatenate([np.stack([i, j], 1), np.stack([np.arange(20)] * 2, 1)])  # 含完全重合的框
+    ref = []
+    for a, b in pairs:
+        inter = _clip_area(ccw[a], ccw[b])
+        ref.append(inter / (abs(_shoelace(ccw[a])) + abs(_shoelace(ccw[b])) - inter))
+    got = polygon_iou_pairs(polys[pairs[:, 0]], polys[pairs[:, 1]])
+    assert np.abs(got - np.asarray(ref)).max() < 1e-9
+    assert np.allclose(got[-20:], 1.0)
+
+
+def test_axis_aligned_shared_edge():
+    boxes = np.array([[10, 10, 20, 10, 0], [20, 10, 20, 10, 0], [10, 15, 20, 10, 0]], dtype=np.float64)
+    polys = xywhr_to_polygons(boxes).astype(np.float64)
+    got = polygon_iou_pairs(polys[[0, 0]], polys[[1, 2]])
+    assert np.allclose(got, [1 / 3, 1 / 3])
+
+
+def test_rect_iou_matches_polygon_iou():
+    boxes, _ = _scene(320, 256, seed=6)
+    grid = np.random.default_rng(7).integers(0, 40, (300, 5)).astype(np.float64)  # 轴对齐、共边与重合的框
+    grid[:, 2:4] += 1
+    grid[:, 4] = grid[:, 4] % 4 * np.pi / 2
+    for b in (boxes, grid):
+        i, j = np.triu_indices(len(b), k=1)
+        ref = polygon_iou_pairs(_polys64(b)[i], _polys64(b)[j])
+        assert np.abs(rect_iou_pairs(b[i], b[j]) - ref).max() < 1e-12
+    assert np.allclose(rect_iou_pairs(grid, grid), 1.0)
+
+
+@pytest.mark.parametrize('iou_type', IOU_TYPES)
+def test_polygon_input_matches_xywhr(iou_type):
+    boxes, scores = _scene(400, 384, seed=8)
+    got = rotated_nms(_polys64(boxes), scores, 0.45, iou_type=iou_type)
+    assert np.array_equal(got, rotated_nms(boxes, scores, 0.45, iou_type=iou_type))
+
+
+def test_gaussian_params_match_kpr_loss():
+    from models.improved.kpr_loss import xy_wh_r_to_gaussian
+
+    boxes, _ = _scene(64, 256, seed=4)
+    t = torch.from_numpy(boxes.copy())
+    t[:, 2:4] *= 2  # xy_wh_r_to_gaussian 以半宽计算方差
+    _, sigma = xy_wh_r_to_gaussian(t)
+    ref = torch.stack([sigma[:, 0, 0], sigma[:, 1, 1], sigma[:, 0, 1]], dim=1).numpy()
+    assert np.allclose(gaussian_params(boxes), ref, rtol=1e-12, atol=1e-9)
+
+
+def test_probiou_matches_ultralytics():
+    from ultralytics.utils.metrics import probiou
+
+    boxes, _ = _scene(64, 256, seed=5)
+    i, j = np.triu_indices(len(boxes), k=1)
+    ref = probiou(torch.from_numpy(boxes[i]), torch.from_numpy(boxes[j])).squeeze(-1).numpy()
+    assert np.allclose(probiou_matrix(boxes)[i, j], ref, atol=1e-6)
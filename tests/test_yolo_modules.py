@@ -0,0 +1,53 @@
+"""C2f_ASC 在 ultralytics 模型YAML中的解析 (models/improved/yolo_modules.py) 与消融配置的结构检查"""
+
+from pathlib import Path
+
+import pytest
+import torch
+
+from models.improved import C2f_ASC
+from utils.ablation import has_asc_layers, load_ablation
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def test_asc_yaml_builds_c2f_asc():
+    from ultralytics.nn.tasks import OBBModel
+
+    model = OBBModel(str(ROOT / 'configs' / 'ra_yolo_asc_obb.yaml'), verbose=False)
+    asc = [i for i, m in enumerate(model.model) if isinstance(m, C2f_ASC)]
+    assert asc == [15, 18, 21]
+    assert [model.model[i].cv2.out_channels for i in asc] == [64, 128, 256]  # 按 width 0.25 缩放
+    model.eval()
+    with torch.no_grad():
+        y, _ = model(torch.zeros(1, 3, 128, 128))
+    assert y.shape[1] == 4 + 1 + 1
+
+
+def test_ablation_asc_models_have_asc_layers():
+    specs = load_ablation(ROOT / 'configs' / 'ablation.yaml', ROOT)
+    for key in ('asc', 'full'):
+        assert has_asc_layers(specs[key]['args']['model'])
+    assert not has_asc_layers(ROOT / 'configs' / 'ra_yolo_obb.yaml')
+
+
+def test_ablation_rejects_asc_without_c2f_asc(tmp_path):
+    cfg = tmp_path / 'ablation.yaml'
+    cfg.write_text('models:\n  asc:\n    config: configs/improved_train.yaml\n    asc: true\n'
+                   '    set: {model: configs/ra_yolo_obb.yaml}\n', encoding='utf-8')
+    with pytest.raises(ValueError, match='C2f_ASC'):
+        load_ablation(cfg, ROOT)
+
+
+def test_width_scaled_student_keeps_c2f_asc(tmp_path):
+    """蒸馏学生 (train_distill.py --width 0.5): 颈部仍为 C2f_ASC, 通道减半"""
+    from ultralytics.nn.tasks import OBBModel
+
+    from utils.distill import width_scaled_config
+
+    cfg = width_scaled_config(ROOT / 'configs' / 'ra_yolo_asc_obb.yaml', 0.5, tmp_path / 'student.yaml')
+    assert has_asc_layers(cfg)
+    model = OBBModel(str(cfg), verbose=False)
+    asc = [i for i, m in enumerate(model.model) if isinstance(m, C2f_ASC)]
+    assert asc == [15, 18, 21]
+    assert [model.model[i].cv2.out_channels for i in asc] == [32, 64, 128]
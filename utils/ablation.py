@@ -0,0 +1,196 @@
+"""
+消融实验调度 - Baseline / +ASC / +ASOR-Loss / Full 四个模型作为一个任务训练
+Ablation Scheduler: Resource Packing, Shared Image Cache and Retries
+
+功能:
+1. 读取消融配置 (configs/ablation.yaml): 每个模型 = 基础训练配置 + 覆盖参数 + 回归损失 + 资源需求,
+   结果目录固定为 runs/plane_<key>/ (与 run_four_model_on_images.py 的 MODEL_SPECS 一致);
+   声明 asc: true 的模型检查其结构YAML确实含 C2f_ASC
+2. 资源打包: 按声明的CPU核数与GPU数, 在本机的空闲核/空闲GPU上同时启动能放下的模型,
+   任一模型结束后释放资源并启动下一个; 每个模型的线程数与dataloader workers按分到的核数设置
+3. 共享图像缓存: 启动前只解码一次训练集 (每个imgsz一份 npy_<imgsz>/), 各模型 cache='disk' 时直接读取
+4. 失败重试: 失败的模型重新排队, 已有 weights/last.pt 时从检查点续训, 否则清空其目录后重新训练
+
+用法见 scripts/train_ablation.py
+"""
+
+import shutil
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import yaml
+
+from .training import host_cpus, load_train_config
+
+LOSSES = ('probiou', 'asor')
+# 未声明 resources 时的资源需求
+DEFAULT_RESOURCES = {'cpus': 4, 'gpus': 1}
+IMG_SUFFIXES = ('.bmp', '.jpeg', '.jpg', '.png', '.tif', '.tiff', '.webp')
+
+
+def load_ablation(path, root: Path) -> Dict[str, Dict]:
+    """
+    读取消融配置
+
+    Returns:
+        {key: {'key', 'name', 'config', 'loss', 'resources', 'args'}}, args 为合并后的训练参数
+        (基础配置 < common < 模型的 set)
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        spec = yaml.safe_load(f) or {}
+    common = spec.get('common') or {}
+    jobs = {}
+    for key, entry in (spec.get('models') or {}).items():
+        loss = entry.get('loss', 'probiou')
+        if loss not in LOSSES:
+            raise ValueError(f'{key}: unknown loss {loss} (choices: {LOSSES})')
+        args = load_train_config(root / entry['config'], root)
+        for extra in (common, entry.get('set') or {}):
+            args.update(_resolve_values(extra, root))
+        for run_key in ('project', 'name', 'exist_ok', 'resume'):  # 结果目录由调度器决定
+            args.pop(run_key, None)
+        if entry.get('asc') and not has_asc_layers(args['model']):
+            raise ValueError(f"{key}: declared asc: true but {args['model']} has no C2f_ASC layer")
+        jobs[key] = {
+            'key': key,
+            'name': f'plane_{key}',
+            'config': entry['config'],
+            'loss': loss,
+            'resources': {**DEFAULT_RESOURCES, **(entry.get('resources') or {})},
+            'args': args,
+        }
+    return jobs
+
+
+def has_asc_layers(model) -> bool:
+    """模型YAML中是否有 C2f_ASC 层 (权重文件不检查, 视为有)"""
+    if Path(str(model)).suffix not in ('.yaml', '.yml'):
+        return True
+    with open(model, 'r', encoding='utf-8') as f:
+        cfg = yaml.safe_load(f) or {}
+    return any(row[2] == 'C2f_ASC' for row in (cfg.get('backbone') or []) + (cfg.get('head') or []))
+
+
+def _resolve_values(values: Dict, root: Path) -> Dict:
+    """覆盖参数中的 model / data / pretrained 与训练配置文件一样按项目根目录解析"""
+    values = dict(values)
+    for key in ('model', 'data', 'pretrained'):
+        if isinstance(values.get(key), str):
+            path = Path(values[key])
+            if not path.is_absolute() and (root / path).exists():
+                values[key] = str(root / path)
+    return values
+
+
+def split_images(data_yaml, split: str = 'train') -> List[str]:
+    """数据集YAML (path 已为绝对路径) 中某个划分的图像列表 (目录或图像列表txt)"""
+    with open(data_yaml, 'r', encoding='utf-8') as f:
+        cfg = yaml.safe_load(f)
+    base = Path(cfg['path'])
+    entries = cfg[split]
+    files = []
+    for entry in ([entries] if isinstance(entries, str) else entries):
+        p = base / entry
+        if p.is_dir():
+            files += sorted(str(f) for f in p.rglob('*') if f.suffix.lower() in IMG_SUFFIXES)
+        else:
+            lines = p.read_text(encoding='utf-8').split()
+            files += [str((p.parent / x).resolve()) if not Path(x).is_absolute() else x for x in lines]
+    return files
+
+
+class ResourcePool:
+    """
+    本机的CPU核与GPU (只做记账, 不绑定具体的核)
+
+    用法:
+        pool = ResourcePool(cpus=32, gpus=[0, 1])
+        need = pool.clamp({'cpus': 8, 'gpus': 1})
+        alloc = pool.acquire(need)      # 放不下时返回 None
+        pool.release(alloc)
+    """
+
+    def __init__(self, cpus: Optional[int] = None, gpus: Optional[List[int]] = None):
+        self.cpus = cpus or host_cpus()
+        self.free_cpus = self.cpus
+        self.gpus = list(gpus or [])
+        self.free_gpus = list(self.gpus)
+
+    def clamp(self, need: Dict[str, int]) -> Dict[str, int]:
+        """需求超过本机总量时按总量计 (否则永远无法启动); 无GPU的主机上GPU需求为0"""
+        return {'cpus': max(1, min(int(need.get('cpus', 1)), self.cpus)),
+                'gpus': min(int(need.get('gpus', 0)), len(self.gpus))}
+
+    def acquire(self, need: Dict[str, int]) -> Optional[Dict[str, object]]:
+        if need['cpus'] > self.free_cpus or need['gpus'] > len(self.free_gpus):
+            return None
+        self.free_cpus -= need['cpus']
+        gpus, self.free_gpus = self.free_gpus[:need['gpus']], self.free_gpus[need['gpus']:]
+        return {'cpus': need['cpus'], 'gpus': gpus}
+
+    def release(self, alloc: Dict[str, object]) -> None:
+        self.free_cpus += alloc['cpus']
+        self.free_gpus = sorted(self.free_gpus + list(alloc['gpus']))
+
+
+def host_settings(alloc: Dict[str, object]) -> Dict[str, object]:
+    """
+    按分到的资源确定 device / 线程数 / dataloader workers
+
+    GPU上大部分核给dataloader; CPU上卷积计算占用大部分核 (与 training.resolve_profile 相同的划分)
+    """
+    cpus = alloc['cpus']
+    if alloc['gpus']:
+        workers = max(1, cpus - 1)
+        return {'device': ','.join(str(g) for g in alloc['gpus']), 'threads': max(1, cpus - workers),
+                'workers': workers}
+    workers = min(4, cpus // 4)
+    return {'device': 'cpu', 'threads': max(1, cpus - workers), 'workers': workers}
+
+
+# ==================== worker进程 ====================
+
+def run_job(spec: Dict) -> Dict:
+    """
+    在worker进程中训练一个消融模型 (首次训练, 或 resume 时从 weights/last.pt 续训;
+    没有 last.pt 时删除已有的运行目录再从头训练)
+
+    Args:
+        spec: {'key', 'save_dir', 'loss', 'args', 'threads', 'workers', 'resume', 'step_timing',
+                     'progressive', 'align_asor', 'asc_checkpoint'}
+              args 为完整的训练参数 (含 model / data / device / batch / cache)
+
+    Returns:
+        {'key', 'seconds', 'resumed', 'save_dir'}
+    """
+    import torch
+    from ultralytics import YOLO
+
+    from .training import ASCCheckpoint, ASOROBBTrainer, CachedOBBTrainer, EpochTimer, ProgressiveResize, StepTimer
+
+    torch.set_num_threads(spec['threads'])
+    trainer = ASOROBBTrainer if spec['loss'] == 'asor' else CachedOBBTrainer
+    save_dir = Path(spec['save_dir'])
+    last = save_dir / 'weights' / 'last.pt'
+    args = dict(spec['args'])
+
+    t0 = time.perf_counter()
+    resumed = bool(spec.get('resume')) and last.exists()
+    if not resumed and save_dir.exists():
+        # 重试/续训但没有可续的检查点: 清空上一次尝试的目录, 否则 results.csv 等会混入失败尝试的行
+        shutil.rmtree(save_dir)
+    model = YOLO(str(last) if resumed else str(args.pop('model')))
+    EpochTimer(spec['threads'], spec['workers']).attach(model)
+    if spec.get('step_timing'):
+        StepTimer().attach(model)
+    if spec.get('progressive'):
+        ProgressiveResize(spec['progressive'], align_asor=spec.get('align_asor', False)).attach(model)
+    if spec.get('asc_checkpoint'):
+        ASCCheckpoint().attach(model)
+    if resumed:
+        host = {k: args[k] for k in ('data', 'device', 'workers', 'batch', 'cache') if k in args}
+        model.train(trainer=trainer, resume=True, save_dir=str(save_dir), **host)
+    else:
+        model.train(trainer=trainer, **args, project=str(save_dir.parent), name=save_dir.name, exist_ok=True)
+    return {'key': spec['key'], 'seconds': time.perf_counter() - t0, 'resumed': resumed, 'save_dir': str(save_dir)}
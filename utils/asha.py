@@ -0,0 +1,187 @@
+"""
+异步逐次减半超参数搜索 - 数据增强参数的多保真度搜索
+Asynchronous Successive Halving (ASHA) over Augmentation Settings
+
+功能:
+1. 在搜索空间中随机采样候选配置 (固定种子), 并始终包含手工配置
+   (train_real.train_improved 的 mixup / copy_paste / HSV 增益) 作为参照
+2. 保真度为训练epoch数: 第k级 (rung) 的预算为 min_epochs * eta^k, 不超过 max_epochs;
+   每个试验以 epochs=max_epochs 的完整学习率日程开始, 到达本级预算 (或因 patience 提前停止) 时
+   保存可续训的检查点, 晋级后从检查点续训 (与一次完整训练的前若干epoch相同), 而不是从头重新训练
+3. 异步晋级 (Li et al., ASHA): 有空闲worker时, 从高到低检查各级,
+   某级已完成试验中排名前 1/eta 且尚未晋级的试验优先晋级; 没有可晋级的试验时开始新试验
+4. 试验在本机的多个worker进程中并行; 每个试验的 results.csv 与参数写入同一个 ResultsStore,
+   排名分数直接取自库中该试验的最佳epoch
+
+用法见 scripts/asha_search.py
+"""
+
+import shutil
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# (分布, 下限, 上限); 取值范围以 ultralytics 默认值与手工配置为中心
+SEARCH_SPACE: Dict[str, Tuple[str, float, float]] = {
+    'mixup': ('uniform', 0.0, 0.3),
+    'copy_paste': ('uniform', 0.0, 0.3),
+    'hsv_h': ('uniform', 0.0, 0.05),
+    'hsv_s': ('uniform', 0.3, 0.9),
+    'hsv_v': ('uniform', 0.2, 0.7),
+}
+# scripts/train_real.py train_improved 中手工选定的值
+HAND_TUNED = {'mixup': 0.15, 'copy_paste': 0.1, 'hsv_h': 0.02, 'hsv_s': 0.75, 'hsv_v': 0.45}
+RESUME_NAME = 'resume.pt'
+
+
+def sample_configs(n: int, space: Dict[str, Tuple[str, float, float]] = SEARCH_SPACE, seed: int = 0,
+                   include: Optional[Dict[str, float]] = HAND_TUNED) -> List[Dict[str, float]]:
+    """采样n个候选配置 (include 不为空时作为第一个), 数值保留4位小数"""
+    rng = np.random.default_rng(seed)
+    configs = [dict(include)] if include else []
+    while len(configs) < n:
+        config = {}
+        for key, (dist, low, high) in space.items():
+            if dist == 'log':
+                value = float(np.exp(rng.uniform(np.log(low), np.log(high))))
+            else:
+                value = float(rng.uniform(low, high))
+            config[key] = round(value, 4)
+        configs.append(config)
+    return configs[:n]
+
+
+def rung_budgets(min_epochs: int, max_epochs: int, eta: int = 3) -> List[int]:
+    """各级的累计epoch预算, 例: (3, 81, 3) -> [3, 9, 27, 81]; 最后一级总是 max_epochs"""
+    if min_epochs < 1 or max_epochs < min_epochs or eta < 2:
+        raise ValueError(f'Bad budgets: min_epochs={min_epochs}, max_epochs={max_epochs}, eta={eta}')
+    budgets = []
+    b = min_epochs
+    while b < max_epochs:
+        budgets.append(int(b))
+        b *= eta
+    budgets.append(int(max_epochs))
+    return budgets
+
+
+class AshaScheduler:
+    """
+    ASHA调度 (只做决策, 不运行训练)
+
+    用法:
+        sched = AshaScheduler(n_trials=27, budgets=[3, 9, 27], eta=3)
+        job = sched.next_job()          # (trial, rung) 或 None (需等待运行中的试验)
+        sched.report(trial, rung, score)
+        sched.done()                    # 全部试验已开始且没有可晋级/运行中的试验
+    """
+
+    def __init__(self, n_trials: int, budgets: List[int], eta: int = 3):
+        self.n_trials = n_trials
+        self.budgets = list(budgets)
+        self.eta = eta
+        self.n_started = 0
+        self.scores: List[Dict[int, float]] = [{} for _ in self.budgets]  # 每级: {trial: score}
+        self.promoted: List[set] = [set() for _ in self.budgets]
+        self.running: Dict[int, int] = {}  # trial -> rung
+
+    def _promotable(self, rung: int) -> Optional[int]:
+        done = self.scores[rung]
+        k = len(done) // self.eta
+        if k == 0:
+            return None
+        top = sorted(done, key=lambda t: (-done[t], t))[:k]
+        for trial in top:
+            if trial not in self.promoted[rung]:
+                return trial
+        return None
+
+    def next_job(self) -> Optional[Tuple[int, int]]:
+        for rung in range(len(self.budgets) - 2, -1, -1):
+            trial = self._promotable(rung)
+            if trial is not None:
+                self.promoted[rung].add(trial)
+                self.running[trial] = rung + 1
+                return trial, rung + 1
+        if self.n_started < self.n_trials:
+            trial = self.n_started
+            self.n_started += 1
+            self.running[trial] = 0
+            return trial, 0
+        return None
+
+    def report(self, trial: int, rung: int, score: float) -> None:
+        self.running.pop(trial, None)
+        self.scores[rung][trial] = float(score)
+
+    def fail(self, trial: int) -> None:
+        """试验失败: 不再参与排名与晋级"""
+        self.running.pop(trial, None)
+
+    def done(self) -> bool:
+        return not self.running and self.n_started >= self.n_trials and all(
+            self._promotable(r) is None for r in range(len(self.budgets) - 1))
+
+    def leaderboard(self) -> List[Tuple[int, int, float]]:
+        """[(trial, 最高级, 该级分数)], 先按级别再按分数降序"""
+        best: Dict[int, Tuple[int, float]] = {}
+        for rung, scores in enumerate(self.scores):
+            for trial, score in scores.items():
+                best[trial] = (rung, score)
+        return sorted(((t, r, s) for t, (r, s) in best.items()), key=lambda x: (-x[1], -x[2], x[0]))
+
+
+# ==================== worker进程 ====================
+
+def run_trial(spec: Dict) -> Dict:
+    """
+    在worker进程中训练一个试验到目标epoch (首次训练或从检查点续训)
+
+    Args:
+        spec: {'name', 'save_dir', 'model', 'train_args', 'params', 'target_epochs', 'threads'}
+              train_args 为全部试验共用的训练参数 (data / imgsz / fraction / device / epochs=max_epochs ...)
+
+    Returns:
+        {'name', 'target_epochs', 'epochs' (实际训练到的epoch), 'early_stopped', 'seconds', 'resumed'}
+    """
+    import torch
+    from ultralytics import YOLO
+
+    from .training import CachedOBBTrainer
+
+    if spec.get('threads'):
+        torch.set_num_threads(spec['threads'])
+    save_dir = Path(spec['save_dir'])
+    ckpt = save_dir / 'weights' / RESUME_NAME
+    target = int(spec['target_epochs'])
+
+    saved = []
+
+    def stop_at_target(trainer):
+        # 到达本级预算, 或提前停止 (patience / 训练时长) 时都保存可续训的检查点, 晋级后从这里续训;
+        # 训练结束后对best.pt的最终验证会再次触发本回调, 此时 last.pt 已被剥离优化器状态, 只在第一次复制
+        if saved or not (trainer.epoch + 1 >= target or trainer.stop):
+            return
+        if trainer.last.exists():
+            shutil.copy2(trainer.last, ckpt)
+        saved.append(trainer.epoch + 1)
+        trainer.stop = True
+
+    t0 = time.perf_counter()
+    resumed = ckpt.exists()
+    if resumed:
+        model = YOLO(str(ckpt))
+        model.add_callback('on_fit_epoch_end', stop_at_target)
+        host = {k: spec['train_args'][k] for k in ('data', 'device', 'workers', 'batch', 'cache')
+                if k in spec['train_args']}
+        model.train(trainer=CachedOBBTrainer, resume=True, save_dir=str(save_dir), **host)
+    else:
+        model = YOLO(spec['model'])
+        model.add_callback('on_fit_epoch_end', stop_at_target)
+        args = {'plots': False, **spec['train_args'], **spec['params'],
+                'project': str(save_dir.parent), 'name': save_dir.name, 'exist_ok': True}
+        model.train(trainer=CachedOBBTrainer, **args)
+    epochs = saved[0] if saved else target
+    return {'name': spec['name'], 'target_epochs': target, 'epochs': epochs, 'early_stopped': epochs < target,
+            'seconds': time.perf_counter() - t0, 'resumed': resumed}
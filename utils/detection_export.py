@@ -0,0 +1,439 @@
+"""
+检测结果结构化导出模块
+Structured Detection Export
+
+功能:
+1. 列式检测表: 按批次追加写入分片文件 (Parquet优先, 无pyarrow时回退npz), 结束时每个 shard 合并为一个文件
+   同一 shard 数的全部分片即为一次运行的完整数据集, 可直接用pandas/pyarrow/duckdb读取
+2. DOTA Task1格式txt: 每个(模型, 类别)一个文件, 流式追加
+3. GeoJSON Text Sequence (RFC 8142): 每行一个Feature, 流式追加 (像素坐标)
+
+每个分片先写临时文件再重命名, 崩溃后目录中只会出现完整分片。
+所有输出按 shard 标签 (s<i>of<n>) 分文件, 各 shard 互不共享文件句柄;
+非续跑时先清空本 shard 的旧输出, 续跑时接着追加。
+每次 flush 的三种输出都落盘后, 在提交日志 export.<tag>.jsonl 追加一行 (本批 (image, model) 与各输出的状态),
+这一行即为本批的提交; 续跑时各输出回退到最后一次提交 (删除之后的分片, 截断txt/GeoJSON),
+已提交的 (image, model) 不再重复写出。
+merge_shard_outputs() 把各 shard 的 txt/GeoJSON 合并为最终文件。
+"""
+
+import json
+import os
+import re
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from .inference import ObbDetections
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow为可选依赖
+    pa = None
+    pq = None
+
+
+POLY_COLUMNS = ('x1', 'y1', 'x2', 'y2', 'x3', 'y3', 'x4', 'y4')
+XYWHR_COLUMNS = ('cx', 'cy', 'w', 'h', 'r')
+EXPORT_FORMATS = ('table', 'dota', 'geojson')
+SHARD_SUFFIX = re.compile(r'\.s\d+of\d+$')
+
+
+def shard_tag(idx: int, count: int) -> str:
+    """shard i/n 的输出标签, 同一 shard 重跑时不变"""
+    return f's{idx}of{count}'
+
+
+def _fsync_flush(fh) -> None:
+    fh.flush()
+    os.fsync(fh.fileno())
+
+
+def _part_seq(path: Path) -> int:
+    return int(path.stem.rsplit('-', 1)[1])
+
+
+def _read_part(path: Path) -> Dict[str, np.ndarray]:
+    if path.suffix == '.parquet':
+        if pq is None:
+            raise RuntimeError('pyarrow is required to read Parquet parts')
+        table = pq.read_table(path)
+        return {name: table.column(name).to_numpy() for name in table.column_names}
+    with np.load(path) as data:
+        return {name: data[name] for name in data.files}
+
+
+class DetectionTableWriter:
+    """
+    列式检测表写入器
+
+    每次flush写出一个分片: image, model, x1..y4, cx, cy, w, h, r, conf, cls
+    有效分片为序号 [base, seq) 的分片; compact() 把它们合并为一个新分片
+    """
+
+    def __init__(self, out_dir: Path, tag: str, fmt: str = 'auto', resume: bool = False):
+        if fmt == 'auto':
+            fmt = 'parquet' if pq is not None else 'npz'
+        if fmt == 'parquet' and pq is None:
+            raise RuntimeError('pyarrow is required for Parquet export (pip install pyarrow)')
+        self.fmt = fmt
+        self.out_dir = Path(out_dir)
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self.tag = tag
+        for tmp in self.out_dir.glob(f'.part-{tag}-*.tmp'):
+            tmp.unlink()  # 崩溃遗留的半个分片
+        self._base = 0
+        if resume:
+            self._seq = max((_part_seq(p) for p in self.parts()), default=-1) + 1
+        else:
+            for part in self.out_dir.glob(f'part-{tag}-*'):
+                part.unlink()
+            self._seq = 0
+
+    def parts(self) -> List[Path]:
+        """本标签的分片 (按序号)"""
+        return sorted(self.out_dir.glob(f'part-{self.tag}-*.{self.fmt}'), key=_part_seq)
+
+    def state(self) -> List[int]:
+        """有效分片的序号范围 [base, seq), 记入提交日志"""
+        return [self._base, self._seq]
+
+    def retain(self, base: int, seq: int) -> None:
+        """只保留序号在 [base, seq) 内的分片: 续跑时删除未提交的分片, 合并提交后删除旧分片"""
+        for part in self.parts():
+            if not base <= _part_seq(part) < seq:
+                part.unlink()
+        self._base, self._seq = base, seq
+
+    def _save(self, columns: Dict[str, np.ndarray]) -> Path:
+        path = self.out_dir / f'part-{self.tag}-{self._seq:06d}.{self.fmt}'
+        tmp = path.with_name(f'.{path.name}.tmp')
+        if self.fmt == 'parquet':
+            table = pa.table({
+                k: (pa.array(v.tolist()).dictionary_encode() if v.dtype == object else pa.array(v))
+                for k, v in columns.items()
+            })
+            pq.write_table(table, tmp)
+        else:
+            with open(tmp, 'wb') as f:
+                np.savez(f, **{k: (v.astype(str) if v.dtype == object else v) for k, v in columns.items()})
+        os.replace(tmp, path)
+        self._seq += 1
+        return path
+
+    def write(self, rows: Sequence[Tuple[str, str, ObbDetections]]) -> Optional[Path]:
+        """把一批 (image, model, detections) 写成一个分片"""
+        n = sum(len(d) for _, _, d in rows)
+        if n == 0:
+            return None
+
+        images = np.concatenate([np.full(len(d), img, dtype=object) for img, _, d in rows])
+        models = np.concatenate([np.full(len(d), key, dtype=object) for _, key, d in rows])
+        polys = np.concatenate([d.polys.reshape(-1, 8) for _, _, d in rows]).astype(np.float32)
+        xywhr = np.concatenate([d.xywhr for _, _, d in rows]).astype(np.float32)
+        columns: Dict[str, np.ndarray] = {'image': images, 'model': models}
+        columns.update({name: polys[:, i] for i, name in enumerate(POLY_COLUMNS)})
+        columns.update({name: xywhr[:, i] for i, name in enumerate(XYWHR_COLUMNS)})
+        columns['conf'] = np.concatenate([d.conf for _, _, d in rows]).astype(np.float32)
+        columns['cls'] = np.concatenate([d.cls for _, _, d in rows]).astype(np.int16)
+        return self._save(columns)
+
+    def compact(self) -> Optional[Path]:
+        """
+        把有效分片按序合并为一个新分片 (Parquet逐个分片写为row group, 不整表读入内存), 返回其路径;
+        有效分片不超过1个时不合并。合并后 state() 只含新分片, 旧分片在记入提交日志后由 retain() 删除
+        """
+        parts = [p for p in self.parts() if self._base <= _part_seq(p) < self._seq]
+        if len(parts) < 2:
+            return None
+        if self.fmt == 'npz':
+            chunks = [_read_part(p) for p in parts]
+            path = self._save({name: np.concatenate([c[name] for c in chunks]) for name in chunks[0]})
+        else:
+            path = self.out_dir / f'part-{self.tag}-{self._seq:06d}.{self.fmt}'
+            tmp = path.with_name(f'.{path.name}.tmp')
+            writer = None
+            try:
+                for part in parts:
+                    table = pq.read_table(part)
+                    if writer is None:
+                        writer = pq.ParquetWriter(tmp, table.schema)
+                    writer.write_table(table)
+            finally:
+                if writer is not None:
+                    writer.close()
+            os.replace(tmp, path)
+            self._seq += 1
+        self._base = self._seq - 1
+        return path
+
+
+def load_detection_table(table_dir: Path, shard_count: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """
+    读取目录下的分片, 返回列名 -> 数组
+
+    shard_count: 只读取 s0ofN..s(N-1)ofN 的分片 (N = shard_count), 忽略以其它 shard 数
+                 运行留下的旧分片; None 时读取全部
+    """
+    prefixes = ['part-'] if shard_count is None else [f'part-{shard_tag(i, shard_count)}-' for i in range(shard_count)]
+    parts = [part for prefix in prefixes for ext in ('parquet', 'npz')
+             for part in sorted(Path(table_dir).glob(f'{prefix}*.{ext}'))]
+    chunks = [_read_part(part) for part in parts]
+    if not chunks:
+        return {}
+    return {name: np.concatenate([c[name] for c in chunks]) for name in chunks[0]}
+
+
+class DotaTxtWriter:
+    """
+    DOTA Task1检测结果: <model>/Task1_<class>.<tag>.txt, 每行 'image_stem conf x1 y1 ... x4 y4'
+
+    非续跑时删除本标签的旧文件; merge_shard_outputs() 合并为 <model>/Task1_<class>.txt
+    """
+
+    def __init__(self, out_dir: Path, class_names: Dict[str, Dict[int, str]], tag: str, resume: bool = False):
+        self.out_dir = Path(out_dir)
+        self.class_names = class_names
+        self.tag = tag
+        self._files: Dict[Tuple[str, int], object] = {}
+        if not resume:
+            for path in self.out_dir.glob(f'*/Task1_*.{tag}.txt'):
+                path.unlink()
+
+    def _handle(self, model: str, cls_id: int):
+        fh = self._files.get((model, cls_id))
+        if fh is None:
+            name = self.class_names.get(model, {}).get(cls_id, str(cls_id))
+            path = self.out_dir / model / f'Task1_{name}.{self.tag}.txt'
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fh = open(path, 'a', encoding='utf-8')
+            self._files[(model, cls_id)] = fh
+        return fh
+
+    def write(self, image_id: str, model: str, dets: ObbDetections) -> None:
+        for poly, conf, cls_id in zip(dets.polys.reshape(-1, 8), dets.conf, dets.cls):
+            coords = ' '.join(f'{v:.1f}' for v in poly)
+            self._handle(model, int(cls_id)).write(f'{Path(image_id).stem} {conf:.4f} {coords}\n')
+
+    def flush(self) -> None:
+        for fh in self._files.values():
+            _fsync_flush(fh)
+
+    def _paths(self) -> Dict[str, Path]:
+        return {p.relative_to(self.out_dir).as_posix(): p for p in self.out_dir.glob(f'*/Task1_*.{self.tag}.txt')}
+
+    def sizes(self) -> Dict[str, int]:
+        """本标签各文件的字节数 {'<model>/Task1_<class>.<tag>.txt': 字节数}, flush() 之后调用"""
+        return {rel: p.stat().st_size for rel, p in self._paths().items()}
+
+    def rollback(self, sizes: Dict[str, int]) -> None:
+        """截断到 sizes 记录的大小, 不在其中的文件删除 (打开任何文件之前调用)"""
+        for rel, path in self._paths().items():
+            if rel not in sizes:
+                path.unlink()
+            elif path.stat().st_size > sizes[rel]:
+                os.truncate(path, sizes[rel])
+
+    def close(self) -> None:
+        for fh in self._files.values():
+            fh.close()
+        self._files.clear()
+
+
+class GeoJsonSeqWriter:
+    """GeoJSON Text Sequence, 每行一个Polygon Feature (像素坐标, 无地理参考)"""
+
+    def __init__(self, path: Path, resume: bool = False):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._fh = open(self.path, 'a' if resume else 'w', encoding='utf-8')
+
+    def write(self, image_id: str, model: str, dets: ObbDetections) -> None:
+        for poly, conf, cls_id in zip(dets.polys, dets.conf, dets.cls):
+            ring = [[round(float(x), 2), round(float(y), 2)] for x, y in poly]
+            ring.append(ring[0])
+            feature = {
+                'type': 'Feature',
+                'geometry': {'type': 'Polygon', 'coordinates': [ring]},
+                'properties': {'image': image_id, 'model': model, 'conf': round(float(conf), 4), 'cls': int(cls_id)},
+            }
+            self._fh.write('\x1e' + json.dumps(feature) + '\n')
+
+    def flush(self) -> None:
+        _fsync_flush(self._fh)
+
+    def size(self) -> int:
+        return self.path.stat().st_size
+
+    def rollback(self, size: int) -> None:
+        """截断到提交时的大小 (以追加方式打开, 之后的写入从新的末尾开始)"""
+        self._fh.flush()
+        if self.size() > size:
+            os.truncate(self.path, size)
+
+    def close(self) -> None:
+        self._fh.close()
+
+
+class DetectionExporter:
+    """
+    检测结果导出汇聚器
+
+    add() 缓存结果, 达到 batch_rows 或调用 flush() 时写出表分片并追加到txt/GeoJSON,
+    内存占用不超过一个批次; 全部落盘后在提交日志 export.<tag>.jsonl 追加一行, 返回本次提交的
+    (image, model) 列表, 供调用方记入断点续跑日志。
+    tag 为 shard_tag(i, n); resume=False 时清空该 shard 此前的全部输出。
+    resume=True 时各输出回退到提交日志的最后一次提交; 已提交的 (image, model) 再次 add() 时不重复写出
+    (提交之后、记入运行日志之前崩溃的情况)。close() 把本 shard 的表分片合并为一个文件。
+    """
+
+    def __init__(self, out_root: Path, formats: Sequence[str], tag: str,
+                 class_names: Dict[str, Dict[int, str]], batch_rows: int = 20000,
+                 table_format: str = 'auto', resume: bool = False):
+        unknown = set(formats) - set(EXPORT_FORMATS)
+        if unknown:
+            raise ValueError(f'Unknown export formats: {sorted(unknown)}')
+        out_root = Path(out_root)
+        out_root.mkdir(parents=True, exist_ok=True)
+        self.batch_rows = batch_rows
+        self.table = DetectionTableWriter(out_root / 'detections', tag, table_format, resume=resume) \
+            if 'table' in formats else None
+        self.dota = DotaTxtWriter(out_root / 'dota', class_names, tag, resume=resume) if 'dota' in formats else None
+        self.geojson = GeoJsonSeqWriter(out_root / 'geojson' / f'detections.{tag}.geojsonl', resume=resume) \
+            if 'geojson' in formats else None
+        self._rows: List[Tuple[str, str, ObbDetections]] = []
+        self._n_rows = 0
+        self.committed: Set[Tuple[str, str]] = set()
+        log_path = out_root / f'export.{tag}.jsonl'
+        if resume and log_path.exists():  # 没有提交日志的旧输出保持原样
+            self._restore(log_path)
+        self._log = open(log_path, 'a' if resume else 'w', encoding='utf-8')
+
+    def _restore(self, log_path: Path) -> None:
+        """读取提交日志并把各输出回退到最后一次提交; 崩溃时写了一半的最后一行被截掉"""
+        last: Dict[str, object] = {}
+        valid = 0
+        with open(log_path, 'rb') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                if not line.endswith(b'\n'):
+                    break
+                valid += len(line)
+                last = record
+                self.committed.update((image, model) for image, model in record['pairs'])
+        os.truncate(log_path, valid)
+        if self.table is not None:
+            self.table.retain(*last.get('table', (0, 0)))
+        if self.dota is not None:
+            self.dota.rollback(last.get('dota', {}))
+        if self.geojson is not None:
+            self.geojson.rollback(last.get('geojson', 0))
+
+    def _commit(self, pairs: List[Tuple[str, str]]) -> None:
+        record: Dict[str, object] = {'pairs': pairs}
+        if self.table is not None:
+            record['table'] = self.table.state()
+        if self.dota is not None:
+            record['dota'] = self.dota.sizes()
+        if self.geojson is not None:
+            record['geojson'] = self.geojson.size()
+        self._log.write(json.dumps(record) + '\n')
+        _fsync_flush(self._log)
+        self.committed.update(pairs)
+
+    def add(self, image_id: str, model: str, dets: ObbDetections) -> List[Tuple[str, str]]:
+        if (image_id, model) in self.committed:
+            return [(image_id, model)]  # 上次运行已提交, 只需补记运行日志
+        self._rows.append((image_id, model, dets))
+        self._n_rows += len(dets)
+        if self._n_rows >= self.batch_rows:
+            return self.flush()
+        return []
+
+    def flush(self) -> List[Tuple[str, str]]:
+        if not self._rows:
+            return []
+        if self.table is not None:
+            self.table.write(self._rows)
+        for image_id, model, dets in self._rows:
+            if self.dota is not None:
+                self.dota.write(image_id, model, dets)
+            if self.geojson is not None:
+                self.geojson.write(image_id, model, dets)
+        if self.dota is not None:
+            self.dota.flush()
+        if self.geojson is not None:
+            self.geojson.flush()
+        committed = [(img, key) for img, key, _ in self._rows]
+        self._commit(committed)
+        self._rows = []
+        self._n_rows = 0
+        return committed
+
+    def close(self) -> List[Tuple[str, str]]:
+        committed = self.flush()
+        if self.table is not None and self.table.compact() is not None:
+            self._commit([])
+            self.table.retain(*self.table.state())
+        if self.dota is not None:
+            self.dota.close()
+        if self.geojson is not None:
+            self.geojson.close()
+        self._log.close()
+        return committed
+
+
+# ==================== shard 合并 ====================
+
+def _concat_atomic(sources: Sequence[Path], dest: Path) -> None:
+    tmp = dest.with_name(f'.{dest.name}.{os.getpid()}.tmp')
+    with open(tmp, 'wb') as out:
+        for src in sources:
+            with open(src, 'rb') as f:
+                while True:
+                    chunk = f.read(1 << 20)
+                    if not chunk:
+                        break
+                    out.write(chunk)
+        _fsync_flush(out)
+    os.replace(tmp, dest)
+
+
+def merge_shard_outputs(out_root: Path, shard_count: int) -> List[Path]:
+    """
+    把 shard 0..n-1 的 DOTA txt 与 GeoJSON 按 shard 顺序拼接为最终文件
+
+    dota/<model>/Task1_<class>.s<i>of<n>.txt -> dota/<model>/Task1_<class>.txt
+    geojson/detections.s<i>of<n>.geojsonl     -> geojson/detections.geojsonl
+    缺少的 shard 视为尚未运行; 本次没有任何 shard 文件的旧合并文件被删除。
+    每个 shard 结束时都可调用, 最后结束的 shard 得到完整结果。返回写出的文件列表。
+    """
+    out_root = Path(out_root)
+    tags = [shard_tag(i, shard_count) for i in range(shard_count)]
+    merged: List[Path] = []
+
+    dota_dir = out_root / 'dota'
+    for model_dir in sorted(p for p in dota_dir.glob('*') if p.is_dir()):
+        groups: Dict[Path, List[Path]] = {}
+        for tag in tags:
+            for src in sorted(model_dir.glob(f'Task1_*.{tag}.txt')):
+                groups.setdefault(model_dir / (src.name[:-len(f'.{tag}.txt')] + '.txt'), []).append(src)
+        for stale in model_dir.glob('Task1_*.txt'):
+            if not SHARD_SUFFIX.search(stale.stem) and stale not in groups:
+                stale.unlink()
+        for dest, sources in groups.items():
+            _concat_atomic(sources, dest)
+            merged.append(dest)
+
+    geo_dir = out_root / 'geojson'
+    sources = [p for p in (geo_dir / f'detections.{tag}.geojsonl' for tag in tags) if p.exists()]
+    if sources:
+        dest = geo_dir / 'detections.geojsonl'
+        _concat_atomic(sources, dest)
+        merged.append(dest)
+    return merged
@@ -0,0 +1,332 @@
+"""
+知识蒸馏 - 以 full 模型 (ASC + ASOR-Loss) 为教师训练更快的学生模型
+Knowledge Distillation: Cached Teacher Outputs, Feature and ProbIoU Box Distillation
+
+功能:
+1. 教师输出缓存: 在训练集上只运行一次教师模型, 每张图像的稠密预测 (每个anchor的 xywhr 旋转框与类别分数)
+   和检测头输入特征 (P3/P4/P5) 的空间注意力图写入 <划分目录>/teacher_<imgsz>/ 下的npy (训练时按内存映射读取);
+   教师权重或训练集变化时重新生成
+2. 蒸馏训练为微调阶段: 关闭几何数据增强 (DISTILL_AUG, 只保留HSV颜色扰动); 教师缓存时的图像经过与学生训练时
+   相同的零参数仿射 (RandomPerspective), 两者 (HSV扰动前) 逐像素一致, 每个anchor与教师的同一anchor对应
+3. DistillOBBLoss: ultralytics v8OBBLoss 之外加三项
+   - kd_box:  ProbIoU框蒸馏 (models.improved.kpr_loss.probiou_loss), 教师分数 > conf 的anchor按教师分数加权
+   - kd_cls:  以教师分数为软标签的二元KL散度
+   - kd_feat: 特征蒸馏 (注意力迁移, Zagoruyko & Komodakis): 各层通道平方均值的归一化空间图的L2距离,
+              与通道数无关, 学生可以是更窄的网络而不需要适配层
+4. Distiller: 训练回调, 为训练模型装上 DistillOBBLoss, 每个epoch的蒸馏损失写入 <save_dir>/distill.csv
+5. width_scaled_config: 按宽度系数缩小的模型结构 (例: RA-YOLO (颈部C2f_ASC) 宽度 x0.5 作为学生)
+
+用法见 scripts/train_distill.py
+"""
+
+import csv
+import json
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+import yaml
+
+from ultralytics.utils.loss import v8OBBLoss
+from ultralytics.utils.tal import make_anchors
+from ultralytics.utils.torch_utils import unwrap_model
+
+from models.improved.kpr_loss import probiou_loss
+
+from .training import build_image_cache
+
+# 蒸馏阶段的数据增强: 几何变换全部关闭 (学生输入 = 教师缓存时的图像), HSV颜色扰动保留
+DISTILL_AUG = {
+    'mosaic': 0.0, 'mixup': 0.0, 'cutmix': 0.0, 'copy_paste': 0.0, 'close_mosaic': 0,
+    'degrees': 0.0, 'translate': 0.0, 'scale': 0.0, 'shear': 0.0, 'perspective': 0.0,
+    'fliplr': 0.0, 'flipud': 0.0, 'rect': False,
+}
+KD_TERMS = ('kd_box', 'kd_cls', 'kd_feat')
+# 蒸馏项的增益 (与 ultralytics 的 box=7.5 / cls=0.5 处于同一量级)
+KD_GAINS = {'kd_box': 2.5, 'kd_cls': 0.5, 'kd_feat': 5.0}
+KD_CONF = 0.1  # 教师分数高于此值的anchor参与框蒸馏
+CACHE_FORMAT = 2  # 教师缓存格式; 2: 输入图像与学生相同的仿射 (1: LetterBox, 奇数填充时有半像素偏移)
+
+
+def teacher_cache_dir(img_files: Sequence[str], imgsz: int) -> Path:
+    """images/xxx.jpg -> teacher_<imgsz>/ (与 npy_<imgsz>/ 同级)"""
+    return Path(img_files[0]).parent.parent / f'teacher_{imgsz}'
+
+
+def _attention(feats: Sequence[torch.Tensor]) -> List[torch.Tensor]:
+    """各层空间注意力图: 通道平方均值, 展平后L2归一化, [(b, h*w)]"""
+    return [F.normalize(f.float().pow(2).mean(1).flatten(1), dim=1) for f in feats]
+
+
+def _cache_valid(cache_dir: Path, teacher: Path, imgsz: int, im_files: List[str]) -> bool:
+    index_path = cache_dir / 'index.json'
+    if not index_path.exists():
+        return False
+    index = json.loads(index_path.read_text(encoding='utf-8'))
+    return (index.get('format') == CACHE_FORMAT and index.get('teacher') == str(teacher)
+            and index.get('teacher_mtime') == teacher.stat().st_mtime
+            and index.get('imgsz') == imgsz and index.get('im_files') == im_files)
+
+
+def teacher_dataset(data: dict, imgsz: int, batch: int = 16):
+    """
+    教师缓存用的训练集 (不做数据增强, 顺序读取)
+
+    ultralytics 关闭 mosaic 后训练图像 (长边=imgsz) 由 RandomPerspective 仿射到 imgsz x imgsz: 零参数时为
+    以图像中心对齐的平移, 填充为奇数像素时有半像素偏移 (双线性插值), 与 LetterBox 的整数填充不同。
+    这里把验证用的 LetterBox 换成与学生训练时相同参数 (DISTILL_AUG) 的 RandomPerspective
+    """
+    from ultralytics.cfg import get_cfg
+    from ultralytics.data import YOLODataset
+    from ultralytics.data.augment import LetterBox, RandomPerspective
+
+    dataset = YOLODataset(img_path=data['train'], imgsz=imgsz, batch_size=batch, augment=False,
+                          hyp=get_cfg(overrides={'imgsz': imgsz, 'task': 'obb'}), rect=False, cache=False,
+                          stride=32, pad=0.0, prefix='teacher: ', task='obb', data=data)
+    affine = RandomPerspective(**{k: DISTILL_AUG[k] for k in ('degrees', 'translate', 'scale', 'shear', 'perspective')},
+                               size=(imgsz, imgsz), preserve_obb=True)
+    transforms = dataset.transforms.transforms
+    dataset.transforms.transforms = [affine if isinstance(t, LetterBox) else t for t in transforms]
+    return dataset
+
+
+@torch.no_grad()
+def build_teacher_cache(teacher, data_yaml, imgsz: int = 640, batch: int = 16, device: str = 'cpu',
+                        workers: int = 0, rebuild: bool = False) -> Path:
+    """
+    在训练集上运行一次教师模型并缓存其输出 (已是最新的缓存直接跳过)
+
+    图像经与训练时相同的路径读取 (npy_<imgsz>/ 预解码缓存 + 与学生相同的仿射到 imgsz x imgsz, 见 teacher_dataset)
+
+    Args:
+        teacher: 教师权重 (例: runs/plane_full/weights/best.pt)
+        data_yaml: 数据集YAML
+        imgsz: 训练尺寸
+        batch: 教师推理的batch
+        device: 推理设备
+        workers: dataloader workers
+        rebuild: 忽略已有缓存
+
+    Returns:
+        缓存目录 (boxes.npy / scores.npy / attention.npy / index.json)
+    """
+    from ultralytics import YOLO
+    from ultralytics.data import build_dataloader
+    from ultralytics.data.utils import check_det_dataset
+    from ultralytics.utils.torch_utils import select_device
+
+    teacher = Path(teacher).resolve()
+    data = check_det_dataset(str(data_yaml))
+    dataset = teacher_dataset(data, imgsz, batch)
+    im_files = list(dataset.im_files)
+    cache_dir = teacher_cache_dir(im_files, imgsz)
+    if not rebuild and _cache_valid(cache_dir, teacher, imgsz, im_files):
+        print(f'[INFO] Teacher cache up to date: {len(im_files)} images at imgsz={imgsz} ({cache_dir})')
+        return cache_dir
+    dataset.npy_files = build_image_cache(im_files, imgsz, workers=workers)
+
+    device = select_device(device, verbose=False)
+    model = YOLO(str(teacher)).model.to(device).eval()
+    half = device.type == 'cuda'
+    if half:
+        model.half()
+    nc = int(model.model[-1].nc)
+    levels = [(imgsz // int(s)) ** 2 for s in model.stride]
+    n, n_anchors = len(im_files), sum(levels)
+
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    (cache_dir / 'index.json').unlink(missing_ok=True)  # 写完之前缓存无效
+    boxes = np.lib.format.open_memmap(cache_dir / 'boxes.npy', mode='w+', dtype=np.float32, shape=(n, n_anchors, 5))
+    scores = np.lib.format.open_memmap(cache_dir / 'scores.npy', mode='w+', dtype=np.float16,
+                                       shape=(n, n_anchors, nc))
+    attention = np.lib.format.open_memmap(cache_dir / 'attention.npy', mode='w+', dtype=np.float16,
+                                          shape=(n, n_anchors))
+    rows = {f: i for i, f in enumerate(im_files)}
+    loader = build_dataloader(dataset, batch, workers, shuffle=False)
+    t0 = time.perf_counter()
+    for b in loader:
+        img = b['img'].to(device, non_blocking=True)
+        img = (img.half() if half else img.float()) / 255
+        y, raw = model(img)  # y: (b, 4 + nc + 1, anchors) 像素坐标 xywh / 类别分数 / 角度
+        if y.shape[-1] != n_anchors:
+            raise ValueError(f'Teacher produced {y.shape[-1]} anchors at imgsz={imgsz}, expected {n_anchors}')
+        y = y.float().transpose(1, 2).cpu().numpy()
+        idx = [rows[f] for f in b['im_file']]
+        boxes[idx] = np.concatenate((y[..., :4], y[..., 4 + nc:]), -1)
+        scores[idx] = y[..., 4:4 + nc]
+        attention[idx] = torch.cat(_attention(raw['feats']), 1).cpu().numpy()
+    for arr in (boxes, scores, attention):
+        arr.flush()
+
+    index = {'format': CACHE_FORMAT, 'teacher': str(teacher), 'teacher_mtime': teacher.stat().st_mtime,
+             'imgsz': imgsz, 'nc': nc, 'levels': levels, 'im_files': im_files}
+    (cache_dir / 'index.json').write_text(json.dumps(index), encoding='utf-8')
+    size = sum((cache_dir / f).stat().st_size for f in ('boxes.npy', 'scores.npy', 'attention.npy'))
+    print(f'[INFO] Cached teacher outputs for {n} images at imgsz={imgsz} '
+          f'({size / 2 ** 20:.0f} MB, {time.perf_counter() - t0:.1f}s) -> {cache_dir}')
+    return cache_dir
+
+
+class TeacherCache:
+    """
+    教师输出缓存的读取 (内存映射, 按 batch['im_file'] 取行)
+
+    用法:
+        cache = TeacherCache(cache_dir)
+        t = cache.lookup(batch['im_file'], device)   # {'boxes', 'scores', 'attention'}
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = Path(cache_dir)
+        index = json.loads((self.cache_dir / 'index.json').read_text(encoding='utf-8'))
+        self.imgsz, self.nc, self.levels = index['imgsz'], index['nc'], index['levels']
+        self.rows = {f: i for i, f in enumerate(index['im_files'])}
+        self.boxes = np.load(self.cache_dir / 'boxes.npy', mmap_mode='r')
+        self.scores = np.load(self.cache_dir / 'scores.npy', mmap_mode='r')
+        self.attention = np.load(self.cache_dir / 'attention.npy', mmap_mode='r')
+
+    def lookup(self, im_files: Sequence[str], device) -> Dict[str, torch.Tensor]:
+        missing = [f for f in im_files if f not in self.rows]
+        if missing:
+            raise KeyError(f'{len(missing)} image(s) not in the teacher cache {self.cache_dir}, e.g. {missing[0]}')
+        idx = [self.rows[f] for f in im_files]
+        return {k: torch.from_numpy(np.ascontiguousarray(arr[idx])).to(device, non_blocking=True).float()
+                for k, arr in (('boxes', self.boxes), ('scores', self.scores), ('attention', self.attention))}
+
+
+class DistillOBBLoss(v8OBBLoss):
+    """
+    OBB检测损失 + 蒸馏项 (kd_box / kd_cls / kd_feat)
+
+    原有四项 (box / cls / dfl / angle) 不变, 训练日志与 results.csv 的列与普通训练相同;
+    蒸馏项加在总损失中参与反向传播, 各项的epoch均值由 Distiller 写入 distill.csv
+    """
+
+    def __init__(self, model, teacher: TeacherCache, gains: Optional[Dict[str, float]] = None,
+                 conf: float = KD_CONF):
+        super().__init__(model)
+        if teacher.nc != self.nc:
+            raise ValueError(f'Teacher has {teacher.nc} classes, student {self.nc}')
+        self.teacher = teacher
+        self.gains = {**KD_GAINS, **(gains or {})}
+        self.conf = conf
+        self.reset_log()
+
+    def reset_log(self):
+        self.kd_sum, self.kd_steps = torch.zeros(len(KD_TERMS), device=self.device), 0
+
+    def distill(self, preds: Dict[str, torch.Tensor], t: Dict[str, torch.Tensor]) -> torch.Tensor:
+        """三项蒸馏损失 (已乘增益), 每张图像的均值"""
+        pred_distri = preds['boxes'].permute(0, 2, 1).contiguous()
+        pred_scores = preds['scores'].permute(0, 2, 1).float()
+        pred_angle = preds['angle'].permute(0, 2, 1).contiguous()
+        anchor_points, stride_tensor = make_anchors(preds['feats'], self.stride, 0.5)
+        if anchor_points.shape[0] != t['boxes'].shape[1]:
+            raise ValueError(f'Student has {anchor_points.shape[0]} anchors, the teacher cache '
+                             f'{t["boxes"].shape[1]} (imgsz must be {self.teacher.imgsz})')
+        loss = torch.zeros(len(KD_TERMS), device=self.device)
+
+        # ProbIoU框蒸馏: 网格单位的 xywhr, 与 ultralytics 框损失相同
+        pred_bboxes = self.bbox_decode(anchor_points, pred_distri, pred_angle).float()
+        t_bboxes = t['boxes'].clone()
+        t_bboxes[..., :4] /= stride_tensor
+        weight = t['scores'].max(-1).values
+        mask = weight > self.conf
+        if mask.any():
+            w = weight[mask]
+            loss[0] = (probiou_loss(pred_bboxes[mask], t_bboxes[mask]) * w).sum() / max(w.sum(), 1)
+
+        # 软标签分类: BCE减去教师分数的熵 (二元KL散度, 梯度与BCE相同, 与教师一致时为0)
+        ts = t['scores'].clamp(1e-6, 1 - 1e-6)
+        entropy = -(ts * ts.log() + (1 - ts) * (1 - ts).log())
+        loss[1] = (self.bce(pred_scores, t['scores']) - entropy).sum() / max(t['scores'].sum(), 1)
+
+        # 注意力迁移
+        t_att = t['attention'].split(self.teacher.levels, 1)
+        loss[2] = sum((s - ta).pow(2).sum(1).mean() for s, ta in zip(_attention(preds['feats']), t_att))
+
+        return loss * torch.tensor([self.gains[k] for k in KD_TERMS], device=self.device)
+
+    def loss(self, preds, batch):
+        loss, items = super().loss(preds, batch)
+        kd = self.distill(preds, self.teacher.lookup(batch['im_file'], self.device))
+        self.kd_sum += kd.detach()
+        self.kd_steps += 1
+        return torch.cat((loss, kd * preds['angle'].shape[0])), items
+
+
+class Distiller:
+    """
+    蒸馏训练回调: 每个epoch开始时确认训练模型的损失为 DistillOBBLoss (损失在首个batch才创建, 续训时会重建),
+    epoch结束时把蒸馏项均值打印并追加到 <save_dir>/distill.csv
+
+    只替换训练模型的损失; EMA模型验证时的 val 损失仍为 ultralytics 的损失, 保存的权重中不包含教师缓存
+
+    用法:
+        model = YOLO('yolov8n-obb.pt')
+        Distiller(build_teacher_cache('runs/plane_full/weights/best.pt', data, 640)).attach(model)
+        model.train(data=..., imgsz=640, cache='disk', trainer=CachedOBBTrainer, **DISTILL_AUG)
+    """
+
+    def __init__(self, cache_dir, gains: Optional[Dict[str, float]] = None, conf: float = KD_CONF):
+        self.teacher = TeacherCache(cache_dir)
+        self.gains = {**KD_GAINS, **(gains or {})}
+        self.conf = conf
+
+    def attach(self, model) -> 'Distiller':
+        model.add_callback('on_pretrain_routine_start', self.on_pretrain_routine_start)
+        model.add_callback('on_train_epoch_start', self.on_train_epoch_start)
+        model.add_callback('on_train_epoch_end', self.on_train_epoch_end)
+        return self
+
+    def on_pretrain_routine_start(self, trainer):
+        if trainer.args.imgsz != self.teacher.imgsz:
+            raise ValueError(f'imgsz={trainer.args.imgsz}, but the teacher cache is at imgsz={self.teacher.imgsz}')
+        changed = {k: getattr(trainer.args, k) for k, v in DISTILL_AUG.items() if getattr(trainer.args, k, v) != v}
+        if changed:
+            print(f'[WARN] Geometric augmentation {changed} moves the student input away from the cached teacher '
+                  'input; use DISTILL_AUG')
+
+    def on_train_epoch_start(self, trainer):
+        model = unwrap_model(trainer.model)
+        if not isinstance(getattr(model, 'criterion', None), DistillOBBLoss):
+            model.criterion = DistillOBBLoss(model, self.teacher, self.gains, self.conf)
+        model.criterion.reset_log()
+
+    def on_train_epoch_end(self, trainer):
+        criterion = unwrap_model(trainer.model).criterion
+        if not criterion.kd_steps:
+            return
+        means = (criterion.kd_sum / criterion.kd_steps).tolist()
+        row = {'epoch': trainer.epoch + 1, **{k: round(v, 5) for k, v in zip(KD_TERMS, means)}}
+        path = Path(trainer.save_dir) / 'distill.csv'
+        new = not path.exists()
+        with open(path, 'a', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=list(row))
+            if new:
+                writer.writeheader()
+            writer.writerow(row)
+        print('[KD] epoch {epoch}: kd_box={kd_box:.4f} kd_cls={kd_cls:.4f} kd_feat={kd_feat:.4f}'.format(**row))
+
+
+def width_scaled_config(cfg_path, width: float, out_path) -> Path:
+    """
+    模型结构YAML的宽度 (通道数) 乘以 width, 深度不变; 写出到 out_path
+
+    例: width_scaled_config('configs/ra_yolo_asc_obb.yaml', 0.5, 'runs/distill/ra_yolo_asc_obb_w0.5.yaml')
+    """
+    with open(cfg_path, 'r', encoding='utf-8') as f:
+        cfg = yaml.safe_load(f)
+    scales = cfg.get('scales')
+    if scales:
+        cfg['scales'] = {k: [d, round(w * width, 4), c] for k, (d, w, c) in scales.items()}
+    else:
+        cfg['width_multiple'] = round(cfg.get('width_multiple', 1.0) * width, 4)
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(out_path, 'w', encoding='utf-8') as f:
+        yaml.safe_dump(cfg, f, allow_unicode=True, sort_keys=False)
+    return out_path
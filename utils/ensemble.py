@@ -0,0 +1,204 @@
+"""
+多模型集成模块 - 旋转框加权框融合 (Rotated WBF)
+Multi-Model Ensemble with Rotated Weighted Box Fusion
+
+功能:
+1. rotated_wbf: 融合多个模型对同一图像的OBB检测结果
+   - 同类别贪心NMS保留的框作为簇首, 其余框并入重叠度 (ProbIoU或多边形IoU) 最大的簇首
+   - 融合框的中心与宽高按分数加权平均
+   - 角度以180°为周期平均: 先把 (w, h, θ) 与等价的 (h, w, θ + 90°) 中更接近簇首角度的表示
+     对齐, 再对角度差加权平均, 避免 179° 与 1° 平均成 90°
+   - 融合分数 = 簇内按模型权重加权的平均分数 * min(簇大小, 模型数) / 模型数
+     (只被少数模型检出的框被降权, 结果保持在 [0, 1])
+2. ObbEnsemble: 多个推理后端共用一次letterbox预处理的张量, 分别前向与解码后做WBF,
+   并按 预处理 / 各模型 / 融合 分别累计耗时
+"""
+
+import math
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .inference import ObbDetections, decode_obb_output, regularize_rboxes
+from .rotated_nms import IOU_TYPES, _resolve_greedy, overlap_pairs
+
+CONF_TYPES = ('avg', 'max')
+
+
+def _wrap_half_pi(angle: np.ndarray) -> np.ndarray:
+    """角度差折叠到 [-pi/2, pi/2) (旋转框角度周期为pi)"""
+    return (angle + math.pi / 2) % math.pi - math.pi / 2
+
+
+def _fuse_clusters(boxes: np.ndarray, scores: np.ndarray, labels: np.ndarray, heads: np.ndarray) -> np.ndarray:
+    """
+    按簇加权平均 (向量化)
+
+    Args:
+        boxes: (N, 5) xywhr, scores: (N,), labels: (N,) 所属簇编号
+        heads: (K,) 各簇簇首在boxes中的索引, 其角度作为对齐基准
+
+    Returns:
+        (K, 5) 融合框; 权重和为0的簇保留簇首
+    """
+    ref = boxes[heads, 4][labels]
+    d1 = _wrap_half_pi(boxes[:, 4] - ref)
+    d2 = _wrap_half_pi(boxes[:, 4] + math.pi / 2 - ref)
+    same = np.abs(d1) <= np.abs(d2)
+    aligned = np.stack([
+        boxes[:, 0],
+        boxes[:, 1],
+        np.where(same, boxes[:, 2], boxes[:, 3]),
+        np.where(same, boxes[:, 3], boxes[:, 2]),
+        np.where(same, d1, d2),
+    ], axis=1)
+
+    k = len(heads)
+    total = np.bincount(labels, weights=scores, minlength=k)
+    fused = np.stack([np.bincount(labels, weights=aligned[:, c] * scores, minlength=k) for c in range(5)], axis=1)
+    ok = total > 0
+    fused[ok] /= total[ok, None]
+    fused[~ok] = aligned[heads[~ok]]
+    fused[:, 4] += boxes[heads, 4]
+    return fused
+
+
+def rotated_wbf(detections: Sequence[ObbDetections], weights: Optional[Sequence[float]] = None,
+                iou_thres: float = 0.55, skip_thres: float = 0.0, iou_type: str = 'probiou',
+                conf_type: str = 'avg') -> ObbDetections:
+    """
+    旋转框加权框融合
+
+    簇首为同类别贪心NMS (阈值iou_thres) 保留的框; 其余框并入与其重叠度最大的簇首。
+    与逐框更新融合框的原始WBF相比, 簇的划分以成员框而非融合框为准,
+    结果在簇内框高度一致时相同, 但整个过程只需一次稀疏重叠计算。
+
+    Args:
+        detections: 各模型对同一图像的检测结果
+        weights: 各模型权重 (缺省全为1, 须为正), 分数按权重缩放
+        iou_thres: 并入簇的重叠度阈值
+        skip_thres: 加权分数不高于该值的框不参与融合
+        iou_type: 'probiou' / 'poly'
+        conf_type: 'avg' 簇内加权平均分数按检出模型数缩放; 'max' 取簇内最高分 (原始分数)
+
+    Returns:
+        融合后的检测结果 (按分数降序)
+    """
+    if iou_type not in IOU_TYPES:
+        raise ValueError(f'Unknown iou_type: {iou_type}')
+    if conf_type not in CONF_TYPES:
+        raise ValueError(f'Unknown conf_type: {conf_type}')
+    n_models = len(detections)
+    if n_models == 0:
+        return ObbDetections.empty()
+    weights = np.ones(n_models) if weights is None else np.asarray(weights, dtype=np.float64)
+    if weights.shape != (n_models,) or not np.all(weights > 0):
+        raise ValueError(f'weights must be {n_models} positive values, got {weights.tolist()}')
+
+    boxes = np.concatenate([d.xywhr for d in detections]).astype(np.float64)
+    raw = np.concatenate([d.conf for d in detections]).astype(np.float64)
+    box_w = np.repeat(weights, [len(d) for d in detections])
+    scores = raw * box_w
+    cls_ids = np.concatenate([d.cls for d in detections])
+    keep = scores > skip_thres
+    boxes, raw, box_w, scores, cls_ids = boxes[keep], raw[keep], box_w[keep], scores[keep], cls_ids[keep]
+    n = len(scores)
+    if n == 0:
+        return ObbDetections.empty()
+
+    # 排名编号的稀疏重叠图 (高分 -> 低分), 与 rotated_nms 共用同一套候选对筛选
+    order = np.argsort(-scores, kind='stable')
+    rank = np.empty(n, dtype=np.int64)
+    rank[order] = np.arange(n)
+    i, j, iou = overlap_pairs(boxes, iou_thres, iou_type, cls_ids)
+    ri, rj = rank[i], rank[j]
+    src, dst = np.minimum(ri, rj), np.maximum(ri, rj)
+    is_head = _resolve_greedy(n, src, dst)
+
+    # 非簇首框归入重叠度最大的簇首 (贪心NMS保证至少存在一个)
+    head_rank = np.flatnonzero(is_head)
+    label_of_rank = np.full(n, -1, dtype=np.int64)
+    label_of_rank[head_rank] = np.arange(len(head_rank))
+    edge = is_head[src] & ~is_head[dst]
+    src, dst, iou = src[edge], dst[edge], iou[edge]
+    by_iou = np.lexsort((-iou, dst))
+    first = np.ones(len(by_iou), dtype=bool)
+    first[1:] = dst[by_iou][1:] != dst[by_iou][:-1]
+    best = by_iou[first]
+    label_of_rank[dst[best]] = label_of_rank[src[best]]
+
+    labels = label_of_rank[rank]
+    heads = order[head_rank]
+    fused = _fuse_clusters(boxes, scores, labels, heads)
+
+    k = len(heads)
+    if conf_type == 'max':
+        conf = np.zeros(k)
+        np.maximum.at(conf, labels, raw)
+    else:
+        count = np.bincount(labels, minlength=k)
+        conf = np.bincount(labels, weights=scores, minlength=k) / np.bincount(labels, weights=box_w, minlength=k)
+        conf = conf * np.minimum(count, n_models) / n_models
+    out = np.argsort(-conf, kind='stable')
+    return ObbDetections.from_xywhr(regularize_rboxes(fused[out]), conf[out], cls_ids[heads][out])
+
+
+class ObbEnsemble:
+    """
+    多模型集成推理
+
+    所有后端的预处理参数 (固定输入尺寸与stride) 一致时只做一次letterbox,
+    同一张量依次送入各模型; 否则退回各自的 predict()。
+    timings 累计 preprocess / 各模型 / fuse 的耗时 (秒), images 为累计图像数。
+    """
+
+    def __init__(self, backends: Dict[str, object], weights: Optional[Dict[str, float]] = None,
+                 iou_thres: float = 0.55, skip_thres: float = 0.0, iou_type: str = 'probiou',
+                 conf_type: str = 'avg'):
+        self.backends = dict(backends)
+        self.weights = [float((weights or {}).get(k, 1.0)) for k in self.backends]
+        self.iou_thres = iou_thres
+        self.skip_thres = skip_thres
+        self.iou_type = iou_type
+        self.conf_type = conf_type
+        signatures = {(getattr(b, 'fixed_hw', None), getattr(b, 'stride', None)) for b in self.backends.values()}
+        self.shared_preprocess = len(signatures) == 1 and all(
+            hasattr(b, 'preprocess') and hasattr(b, 'run') for b in self.backends.values()
+        )
+        self.timings: Dict[str, float] = {'preprocess': 0.0, 'fuse': 0.0}
+        self.timings.update({k: 0.0 for k in self.backends})
+        self.images = 0
+
+    def predict(self, images: Sequence[np.ndarray], conf: float = 0.25, iou: float = 0.45,
+                imgsz: int = 640) -> Tuple[Dict[str, List[ObbDetections]], List[ObbDetections]]:
+        """返回 (各模型结果, 融合结果)"""
+        per_model: Dict[str, List[ObbDetections]] = {}
+        if self.shared_preprocess:
+            t0 = time.perf_counter()
+            batch, metas = next(iter(self.backends.values())).preprocess(images, imgsz)
+            self.timings['preprocess'] += time.perf_counter() - t0
+            for key, backend in self.backends.items():
+                t0 = time.perf_counter()
+                per_model[key] = decode_obb_output(backend.run(batch), metas, conf=conf, iou=iou)
+                self.timings[key] += time.perf_counter() - t0
+        else:
+            for key, backend in self.backends.items():
+                t0 = time.perf_counter()
+                per_model[key] = backend.predict(images, conf=conf, iou=iou, imgsz=imgsz)
+                self.timings[key] += time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        fused = [
+            rotated_wbf([per_model[k][i] for k in self.backends], self.weights, self.iou_thres,
+                        self.skip_thres, self.iou_type, self.conf_type)
+            for i in range(len(images))
+        ]
+        self.timings['fuse'] += time.perf_counter() - t0
+        self.images += len(images)
+        return per_model, fused
+
+    def report(self) -> Dict[str, float]:
+        """每张图像的平均耗时 (ms)"""
+        n = max(self.images, 1)
+        return {k: v / n * 1000.0 for k, v in self.timings.items()}
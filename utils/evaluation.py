@@ -0,0 +1,252 @@
+"""
+检测评估模块 - 基于标注的旋转框mAP评估
+OBB Detection Evaluation
+
+功能:
+1. 读取YOLO OBB格式标注 (class x1 y1 ... x4 y4, 归一化坐标)
+2. 基于ProbIoU的预测-真值匹配 (IoU阈值 0.50:0.95, 与ultralytics OBB验证一致)
+3. 计算 Precision / Recall / F1 / mAP50 / mAP50-95 (101点插值AP)
+4. 对任意推理后端 (PyTorch / ONNX / INT8) 在数据集划分上直接评估,
+   指标命名与 MetricsAnalyzer.get_best_epoch_metrics 保持一致
+"""
+
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from .inference import ObbDetections
+from .metrics import pr_f1_curves
+from .rotated_nms import probiou_matrix
+
+IMAGE_EXTS = ('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff', '.webp')
+IOU_THRESHOLDS = np.linspace(0.5, 0.95, 10)
+_trapezoid = getattr(np, 'trapezoid', None) or np.trapz  # numpy>=2.0 更名
+
+
+def list_split_images(img_dir: Path, limit: int = 0) -> List[Path]:
+    """列出划分目录下的图像 (按文件名排序), limit>0时只取前limit张"""
+    img_dir = Path(img_dir)
+    paths = sorted(p for p in img_dir.iterdir() if p.suffix.lower() in IMAGE_EXTS)
+    return paths[:limit] if limit > 0 else paths
+
+
+def label_path_for(img_path: Path) -> Path:
+    """images/xxx.jpg -> labels/xxx.txt (YOLO数据集目录约定)"""
+    img_path = Path(img_path)
+    return img_path.parent.parent / 'labels' / (img_path.stem + '.txt')
+
+
+def load_obb_labels(label_path: Path, img_w: int, img_h: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    读取YOLO OBB标注并转换为像素坐标的xywhr (最小外接矩形, 与ultralytics一致)
+
+    Returns:
+        xywhr: (M, 5), cls: (M,)
+    """
+    label_path = Path(label_path)
+    if not label_path.exists():
+        return np.zeros((0, 5), dtype=np.float32), np.zeros((0,), dtype=np.int64)
+
+    rows = []
+    for line in label_path.read_text().splitlines():
+        parts = line.split()
+        if len(parts) >= 9:
+            rows.append([float(v) for v in parts[:9]])
+    if not rows:
+        return np.zeros((0, 5), dtype=np.float32), np.zeros((0,), dtype=np.int64)
+
+    data = np.asarray(rows, dtype=np.float32)
+    polys = data[:, 1:9].reshape(-1, 4, 2) * np.array([img_w, img_h], dtype=np.float32)
+    xywhr = []
+    for poly in polys:
+        (cx, cy), (w, h), angle = cv2.minAreaRect(poly)
+        xywhr.append([cx, cy, w, h, angle / 180 * np.pi])
+    return np.asarray(xywhr, dtype=np.float32), data[:, 0].astype(np.int64)
+
+
+def match_predictions(pred_cls: np.ndarray, gt_cls: np.ndarray, iou: np.ndarray,
+                      thresholds: np.ndarray = IOU_THRESHOLDS, return_index: bool = False):
+    """
+    在每个IoU阈值下做一对一匹配 (COCO方式: 预测按置信度降序依次认领IoU最大的未匹配真值)
+
+    Args:
+        pred_cls: (N,) 已按置信度降序排列, gt_cls: (M,), iou: (N, M)
+        return_index: 同时返回每个预测在各阈值下匹配到的真值序号 (N, T), 未匹配为-1
+
+    Returns:
+        (N, T) bool TP矩阵 [, (N, T) 匹配真值序号]
+    """
+    tp = np.zeros((len(pred_cls), len(thresholds)), dtype=bool)
+    matched = np.full(tp.shape, -1, dtype=np.int64)
+    if len(pred_cls) == 0 or len(gt_cls) == 0:
+        return (tp, matched) if return_index else tp
+    iou = iou * (pred_cls[:, None] == gt_cls[None, :])
+    cols = np.arange(len(thresholds))
+    claimed = np.zeros((len(gt_cls), len(thresholds)), dtype=bool)
+    for j in np.flatnonzero((iou >= thresholds.min()).any(1)):
+        available = np.where(claimed, 0.0, iou[j][:, None])  # (M, T)
+        k = available.argmax(0)
+        tp[j] = available[k, cols] >= thresholds
+        claimed[k, cols] |= tp[j]
+        matched[j] = np.where(tp[j], k, -1)
+    return (tp, matched) if return_index else tp
+
+
+def compute_ap(recall: np.ndarray, precision: np.ndarray) -> float:
+    """单条PR曲线的AP (精度包络 + 101点插值, COCO方式)"""
+    # 最大召回率之后精度记为0, 避免把末端精度外推到召回率1
+    mrec = np.concatenate(([0.0], recall, [recall[-1] if len(recall) else 1.0], [1.0]))
+    mpre = np.concatenate(([1.0], precision, [0.0], [0.0]))
+    mpre = np.flip(np.maximum.accumulate(np.flip(mpre)))
+    x = np.linspace(0, 1, 101)
+    return float(_trapezoid(np.interp(x, mrec, mpre), x))
+
+
+def _smooth(y: np.ndarray, frac: float = 0.05) -> np.ndarray:
+    """盒式滤波平滑 (与ultralytics选取F1最优置信度时的处理一致)"""
+    nf = round(len(y) * frac * 2) // 2 + 1
+    p = np.ones(nf // 2)
+    yp = np.concatenate((p * y[0], y, p * y[-1]), 0)
+    return np.convolve(yp, np.ones(nf) / nf, mode='valid')
+
+
+def ap_per_class(tp: np.ndarray, conf: np.ndarray, pred_cls: np.ndarray, target_cls: np.ndarray,
+                 eps: float = 1e-16) -> Dict[str, np.ndarray]:
+    """
+    逐类别计算AP, 以及全局F1最优置信度处的Precision / Recall
+
+    Args:
+        tp: (N, T) TP矩阵, conf: (N,), pred_cls: (N,), target_cls: (M,) 全部真值类别
+
+    Returns:
+        {'classes', 'ap' (C, T), 'p' (C,), 'r' (C,), 'f1' (C,), 'conf_thres'}
+    """
+    order = np.argsort(-conf, kind='stable')
+    tp, conf, pred_cls = tp[order], conf[order], pred_cls[order]
+    classes, nt = np.unique(target_cls, return_counts=True)
+
+    grid = np.linspace(0, 1, 1000)
+    ap = np.zeros((len(classes), tp.shape[1]))
+    p_curve = np.zeros((len(classes), len(grid)))
+    r_curve = np.zeros((len(classes), len(grid)))
+    for ci, c in enumerate(classes):
+        mask = pred_cls == c
+        if not mask.any():
+            continue
+        tpc = tp[mask].cumsum(0)
+        fpc = (1 - tp[mask]).cumsum(0)
+        recall = tpc / (nt[ci] + eps)
+        precision = tpc / (tpc + fpc)
+        # 曲线按置信度降序, np.interp要求自变量递增, 故取负
+        r_curve[ci] = np.interp(-grid, -conf[mask], recall[:, 0], left=0)
+        p_curve[ci] = np.interp(-grid, -conf[mask], precision[:, 0], left=1)
+        for ti in range(tp.shape[1]):
+            ap[ci, ti] = compute_ap(recall[:, ti], precision[:, ti])
+
+    f1_curve = 2 * p_curve * r_curve / (p_curve + r_curve + eps)
+    best = int(_smooth(f1_curve.mean(0), 0.1).argmax()) if len(classes) else 0
+    return {
+        'classes': classes,
+        'ap': ap,
+        'p': p_curve[:, best],
+        'r': r_curve[:, best],
+        'f1': f1_curve[:, best],
+        'conf_thres': float(grid[best]),
+    }
+
+
+class ObbEvaluator:
+    """
+    旋转框检测评估器
+
+    逐图像调用 update() 累积匹配结果, compute() 汇总指标。
+    保留每个预测的置信度与TP标记, 便于后续绘制曲线或做统计检验。
+    """
+
+    def __init__(self, thresholds: np.ndarray = IOU_THRESHOLDS):
+        self.thresholds = np.asarray(thresholds, dtype=np.float64)
+        self.tp: List[np.ndarray] = []
+        self.conf: List[np.ndarray] = []
+        self.pred_cls: List[np.ndarray] = []
+        self.target_cls: List[np.ndarray] = []
+
+    def _match(self, dets: ObbDetections, gt_xywhr: np.ndarray,
+               gt_cls: np.ndarray) -> Tuple[ObbDetections, np.ndarray, np.ndarray]:
+        """按置信度降序排列预测并匹配, 返回 (排序后的预测, TP矩阵, 匹配真值序号)"""
+        if len(dets):
+            order = np.argsort(-dets.conf, kind='stable')
+            dets = ObbDetections(dets.xywhr[order], dets.polys[order], dets.conf[order], dets.cls[order])
+        iou = probiou_matrix(dets.xywhr.astype(np.float64), gt_xywhr.astype(np.float64)) \
+            if len(dets) and len(gt_cls) else np.zeros((len(dets), len(gt_cls)))
+        tp, matched = match_predictions(dets.cls, gt_cls, iou, self.thresholds, return_index=True)
+        return dets, tp, matched
+
+    def update(self, dets: ObbDetections, gt_xywhr: np.ndarray, gt_cls: np.ndarray) -> np.ndarray:
+        """累积单张图像的结果 (内部按置信度降序), 返回排序后的 (N, T) TP矩阵"""
+        dets, tp, _ = self._match(dets, gt_xywhr, gt_cls)
+        self.tp.append(tp)
+        self.conf.append(dets.conf.astype(np.float64))
+        self.pred_cls.append(dets.cls)
+        self.target_cls.append(np.asarray(gt_cls, dtype=np.int64))
+        return tp
+
+    def curves(self) -> Dict[str, np.ndarray]:
+        """全部置信度阈值下的 P / R / F1 曲线 (各IoU阈值一列, 见 utils.metrics.pr_f1_curves)"""
+        n_gt = int(sum(len(t) for t in self.target_cls))
+        if not self.tp:
+            return pr_f1_curves(np.zeros(0), np.zeros((0, len(self.thresholds)), dtype=bool), n_gt)
+        return pr_f1_curves(np.concatenate(self.conf), np.concatenate(self.tp), n_gt)
+
+    def compute(self) -> Dict[str, float]:
+        """汇总为 precision / recall / f1 / mAP50 / mAP50_95"""
+        target_cls = np.concatenate(self.target_cls) if self.target_cls else np.zeros(0, dtype=np.int64)
+        metrics = {'images': len(self.tp), 'instances': int(len(target_cls))}
+        if not self.tp or len(target_cls) == 0:
+            metrics.update(precision=0.0, recall=0.0, f1=0.0, mAP50=0.0, mAP50_95=0.0)
+            return metrics
+
+        res = ap_per_class(
+            np.concatenate(self.tp),
+            np.concatenate(self.conf),
+            np.concatenate(self.pred_cls),
+            target_cls,
+        )
+        precision, recall = float(res['p'].mean()), float(res['r'].mean())
+        metrics.update(
+            precision=precision,
+            recall=recall,
+            f1=2 * precision * recall / (precision + recall) if (precision + recall) > 0 else 0.0,
+            mAP50=float(res['ap'][:, 0].mean()),
+            mAP50_95=float(res['ap'].mean()),
+        )
+        return metrics
+
+
+def evaluate_backend(backend, img_dir: Path, conf: float = 0.001, iou: float = 0.7, imgsz: int = 640,
+                     limit: int = 0, batch_size: int = 1, images: Optional[Sequence[Path]] = None,
+                     evaluator: Optional[ObbEvaluator] = None) -> Dict[str, float]:
+    """
+    在数据集划分上评估推理后端 (默认 conf=0.001, iou=0.7, 与ultralytics验证设置一致)
+
+    Args:
+        backend: utils.inference 中的任一后端
+        img_dir: 划分的images目录, 标注从同级labels目录读取
+        images: 指定评估图像列表 (优先于img_dir/limit)
+        evaluator: 传入时在其上累积 (便于之后取 curves() 等逐检测结果)
+    """
+    paths = list(images) if images is not None else list_split_images(img_dir, limit)
+    evaluator = evaluator if evaluator is not None else ObbEvaluator()
+    for start in range(0, len(paths), batch_size):
+        chunk = paths[start:start + batch_size]
+        arrays = [cv2.imread(str(p)) for p in chunk]
+        valid = [(p, a) for p, a in zip(chunk, arrays) if a is not None]
+        if not valid:
+            continue
+        preds = backend.predict([a for _, a in valid], conf=conf, iou=iou, imgsz=imgsz)
+        for (path, image), dets in zip(valid, preds):
+            h, w = image.shape[:2]
+            gt_xywhr, gt_cls = load_obb_labels(label_path_for(path), w, h)
+            evaluator.update(dets, gt_xywhr, gt_cls)
+    return evaluator.compute()
@@ -0,0 +1,328 @@
+"""
+推理模块 - 旋转框检测结果表示与可插拔推理后端
+OBB Inference Results and Pluggable Backends
+
+功能:
+1. ObbDetections: 单张图像的检测结果 (xywhr / 四点多边形 / 置信度 / 类别)
+2. YOLOv8-OBB导出头的解码 (旋转NMS见 utils.rotated_nms)
+3. 推理后端 (统一接口 predict(images, conf, iou, imgsz) -> List[ObbDetections]):
+   - UltralyticsBackend: 完整的ultralytics + PyTorch推理
+   - OnnxObbBackend: ONNX Runtime推理 + 自有letterbox预处理、OBB解码与旋转NMS,
+     不依赖ultralytics, 适合仅有CPU的部署环境
+"""
+
+import ast
+import math
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from .rotated_nms import rotated_nms, xywhr_to_polygons
+
+try:
+    import onnxruntime as ort
+except ImportError:  # onnxruntime为可选依赖, 仅ONNX后端需要
+    ort = None
+
+BACKENDS = ('pytorch', 'onnx')
+
+
+@dataclass
+class ObbDetections:
+    """单张图像的旋转框检测结果, 所有坐标为原图像素坐标"""
+
+    xywhr: np.ndarray  # (N, 5) [cx, cy, w, h, angle_rad]
+    polys: np.ndarray  # (N, 4, 2)
+    conf: np.ndarray  # (N,)
+    cls: np.ndarray  # (N,) int
+
+    def __len__(self) -> int:
+        return len(self.conf)
+
+    @classmethod
+    def empty(cls) -> 'ObbDetections':
+        return cls(
+            xywhr=np.zeros((0, 5), dtype=np.float32),
+            polys=np.zeros((0, 4, 2), dtype=np.float32),
+            conf=np.zeros((0,), dtype=np.float32),
+            cls=np.zeros((0,), dtype=np.int64),
+        )
+
+    @classmethod
+    def from_xywhr(cls, xywhr: np.ndarray, conf: np.ndarray, cls_ids: np.ndarray) -> 'ObbDetections':
+        xywhr = np.asarray(xywhr, dtype=np.float32).reshape(-1, 5)
+        return cls(
+            xywhr=xywhr,
+            polys=xywhr_to_polygons(xywhr),
+            conf=np.asarray(conf, dtype=np.float32).reshape(-1),
+            cls=np.asarray(cls_ids, dtype=np.int64).reshape(-1),
+        )
+
+    @classmethod
+    def from_ultralytics(cls, result) -> 'ObbDetections':
+        """从ultralytics的Results对象提取OBB结果"""
+        obb = result.obb
+        if obb is None or len(obb) == 0:
+            return cls.empty()
+
+        xywhr = obb.xywhr.cpu().numpy().astype(np.float32)
+        conf = obb.conf.cpu().numpy() if obb.conf is not None else np.ones(len(xywhr), dtype=np.float32)
+        cls_ids = obb.cls.cpu().numpy() if obb.cls is not None else np.zeros(len(xywhr), dtype=np.int64)
+        dets = cls.from_xywhr(xywhr, conf, cls_ids)
+        if getattr(obb, 'xyxyxyxy', None) is not None:
+            dets.polys = obb.xyxyxyxy.cpu().numpy().astype(np.float32)
+        return dets
+
+
+def filter_by_conf(dets: ObbDetections, conf: float) -> ObbDetections:
+    """
+    保留置信度 >= conf 的检测结果
+
+    OBB后处理为fast NMS (框只会被更高分的框抑制), 低阈值推理结果按更高阈值过滤后
+    与直接以该阈值推理一致 (max_det截断除外), 因此可以一次推理覆盖多个置信度阈值。
+    """
+    keep = dets.conf >= conf
+    if keep.all():
+        return dets
+    return ObbDetections(dets.xywhr[keep], dets.polys[keep], dets.conf[keep], dets.cls[keep])
+
+
+# ----------------------------------------------------------------------
+# 预处理与后处理 (与ultralytics的LetterBox / scale_boxes / regularize_rboxes对齐)
+# ----------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class LetterboxMeta:
+    """letterbox变换参数, 用于把网络输入坐标映射回原图"""
+
+    orig_shape: Tuple[int, int]  # (h, w)
+    gain: float
+    pad: Tuple[float, float]  # (left, top)
+
+
+def letterbox(image: np.ndarray, new_shape: Tuple[int, int], auto: bool = False,
+              stride: int = 32) -> Tuple[np.ndarray, LetterboxMeta]:
+    """等比例缩放并以114灰色填充到new_shape (h, w); auto=True时只填充到stride的整数倍"""
+    h, w = image.shape[:2]
+    r = min(new_shape[0] / h, new_shape[1] / w)
+    new_unpad = (int(round(w * r)), int(round(h * r)))
+    dw, dh = new_shape[1] - new_unpad[0], new_shape[0] - new_unpad[1]
+    if auto:
+        dw, dh = dw % stride, dh % stride
+    dw, dh = dw / 2, dh / 2
+
+    if (w, h) != new_unpad:
+        image = cv2.resize(image, new_unpad, interpolation=cv2.INTER_LINEAR)
+    top, bottom = int(round(dh - 0.1)), int(round(dh + 0.1))
+    left, right = int(round(dw - 0.1)), int(round(dw + 0.1))
+    image = cv2.copyMakeBorder(image, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(114, 114, 114))
+    return image, LetterboxMeta(orig_shape=(h, w), gain=r, pad=(left, top))
+
+
+def to_input_tensor(images: Sequence[np.ndarray]) -> np.ndarray:
+    """BGR HWC uint8 列表 -> RGB NCHW float32 [0, 1]"""
+    batch = np.stack(images)[..., ::-1].transpose(0, 3, 1, 2)
+    return np.ascontiguousarray(batch, dtype=np.float32) / 255.0
+
+
+def letterbox_batch(images: Sequence[np.ndarray], shape: Tuple[int, int], stride: int = 32,
+                    dynamic: bool = True) -> Tuple[np.ndarray, List[LetterboxMeta]]:
+    """
+    批量letterbox并转为网络输入
+
+    dynamic=True (网络支持任意输入尺寸) 且同尺寸输入时只补齐到stride倍数, 与ultralytics的PyTorch预测一致
+    """
+    auto = dynamic and len({im.shape for im in images}) == 1
+    boxed = [letterbox(im, shape, auto=auto, stride=stride) for im in images]
+    return to_input_tensor([b[0] for b in boxed]), [b[1] for b in boxed]
+
+
+def regularize_rboxes(xywhr: np.ndarray) -> np.ndarray:
+    """统一旋转框表示: 角度落在[0, pi/2), 必要时交换宽高"""
+    x, y, w, h, t = xywhr.T
+    swap = t % math.pi >= math.pi / 2
+    w_ = np.where(swap, h, w)
+    h_ = np.where(swap, w, h)
+    t = t % (math.pi / 2)
+    return np.stack([x, y, w_, h_, t], axis=-1).astype(np.float32)
+
+
+def decode_obb_output(output: np.ndarray, metas: Sequence[LetterboxMeta], conf: float, iou: float,
+                      agnostic: bool = False, max_det: int = 300, max_nms: int = 30000) -> List[ObbDetections]:
+    """
+    解码YOLOv8-OBB导出头的原始输出
+
+    Args:
+        output: (B, 4 + nc + 1, A) [cx, cy, w, h, cls scores..., angle], 网络输入坐标
+        metas: 每张图像的letterbox参数
+    """
+    results: List[ObbDetections] = []
+    for pred, meta in zip(output, metas):
+        pred = pred.T  # (A, 4 + nc + 1)
+        scores_all = pred[:, 4:-1]
+        cls_ids = scores_all.argmax(axis=1)
+        scores = scores_all[np.arange(len(pred)), cls_ids]
+        keep = scores > conf
+        if not keep.any():
+            results.append(ObbDetections.empty())
+            continue
+        boxes = np.concatenate([pred[keep, :4], pred[keep, -1:]], axis=1)
+        scores, cls_ids = scores[keep], cls_ids[keep]
+        if len(scores) > max_nms:
+            top = np.argsort(-scores, kind='stable')[:max_nms]
+            boxes, scores, cls_ids = boxes[top], scores[top], cls_ids[top]
+
+        # 'fast' 与ultralytics的nms_rotated语义一致, 保证与PyTorch后端结果对齐
+        idx = rotated_nms(boxes, scores, iou, method='fast', classes=None if agnostic else cls_ids, max_det=max_det)
+
+        rboxes = regularize_rboxes(boxes[idx])
+        rboxes[:, 0] -= meta.pad[0]
+        rboxes[:, 1] -= meta.pad[1]
+        rboxes[:, :4] /= meta.gain
+        results.append(ObbDetections.from_xywhr(rboxes, scores[idx], cls_ids[idx]))
+    return results
+
+
+# ----------------------------------------------------------------------
+# 推理后端
+# ----------------------------------------------------------------------
+
+class UltralyticsBackend:
+    """
+    ultralytics YOLO推理后端 (PyTorch)
+
+    predict() 走ultralytics完整流程; preprocess() / run() 与OnnxObbBackend接口一致,
+    便于多个模型共用同一份预处理张量 (见 utils.ensemble)
+    """
+
+    name = 'pytorch'
+    fixed_hw = None  # PyTorch模型支持任意输入尺寸
+
+    def __init__(self, weight: Path, device: Optional[str] = None):
+        from ultralytics import YOLO
+
+        self.weight = Path(weight)
+        self.model = YOLO(str(weight))
+        self.device = device
+        self._net = None
+        self._torch_device = None
+
+    @property
+    def stride(self) -> int:
+        return int(max(self.model.model.stride))
+
+    @property
+    def names(self) -> Dict[int, str]:
+        return dict(self.model.names or {})
+
+    def predict(self, images: Sequence[np.ndarray], conf: float = 0.25, iou: float = 0.45,
+                imgsz: int = 640) -> List[ObbDetections]:
+        kwargs = {'device': self.device} if self.device else {}
+        results = self.model.predict(list(images), conf=conf, iou=iou, imgsz=imgsz, verbose=False, **kwargs)
+        return [ObbDetections.from_ultralytics(r) for r in results]
+
+    def preprocess(self, images: Sequence[np.ndarray], imgsz: int) -> Tuple[np.ndarray, List[LetterboxMeta]]:
+        return letterbox_batch(images, (imgsz, imgsz), stride=self.stride)
+
+    def run(self, batch: np.ndarray) -> np.ndarray:
+        """执行网络前向, 返回与ONNX导出头相同格式的原始输出 (B, 4 + nc + 1, A)"""
+        import torch
+        from ultralytics.utils.torch_utils import select_device
+
+        if self._net is None:
+            self._torch_device = select_device(self.device or 'cpu', verbose=False)
+            self._net = self.model.model.fuse(verbose=False).float().eval().to(self._torch_device)
+        with torch.no_grad():
+            out = self._net(torch.from_numpy(batch).to(self._torch_device))
+        if isinstance(out, (list, tuple)):
+            out = out[0]
+        return out.float().cpu().numpy()
+
+
+class OnnxObbBackend:
+    """
+    ONNX Runtime推理后端
+
+    支持固定或动态batch / 分辨率的导出模型:
+    - 固定batch时按batch大小分块, 末块补零
+    - 固定分辨率时忽略imgsz参数, 使用导出时的输入尺寸
+    """
+
+    name = 'onnx'
+
+    def __init__(self, weight: Path, intra_op_threads: int = 0, inter_op_threads: int = 0):
+        if ort is None:
+            raise RuntimeError('onnxruntime is not available (pip install onnxruntime)')
+        self.weight = Path(weight)
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            opts.intra_op_num_threads = intra_op_threads
+        if inter_op_threads:
+            opts.inter_op_num_threads = inter_op_threads
+        self.session = ort.InferenceSession(str(weight), sess_options=opts, providers=['CPUExecutionProvider'])
+        inp = self.session.get_inputs()[0]
+        self.input_name = inp.name
+        batch, _, height, width = inp.shape
+        self.fixed_batch = batch if isinstance(batch, int) else None
+        self.fixed_hw = (height, width) if isinstance(height, int) and isinstance(width, int) else None
+
+        meta = self.session.get_modelmeta().custom_metadata_map
+        self._names = ast.literal_eval(meta['names']) if 'names' in meta else {}
+        self.stride = int(meta.get('stride', 32))
+
+    @property
+    def names(self) -> Dict[int, str]:
+        return dict(self._names)
+
+    def preprocess(self, images: Sequence[np.ndarray], imgsz: int) -> Tuple[np.ndarray, List[LetterboxMeta]]:
+        return letterbox_batch(images, self.fixed_hw or (imgsz, imgsz), stride=self.stride,
+                               dynamic=self.fixed_hw is None)
+
+    def run(self, batch: np.ndarray) -> np.ndarray:
+        """执行网络前向, 按固定batch大小分块"""
+        step = self.fixed_batch or len(batch)
+        outputs = []
+        for start in range(0, len(batch), step):
+            chunk = batch[start:start + step]
+            n = len(chunk)
+            if n < step:
+                chunk = np.concatenate([chunk, np.zeros((step - n,) + chunk.shape[1:], dtype=chunk.dtype)])
+            outputs.append(self.session.run(None, {self.input_name: chunk})[0][:n])
+        return np.concatenate(outputs)
+
+    def predict(self, images: Sequence[np.ndarray], conf: float = 0.25, iou: float = 0.45,
+                imgsz: int = 640) -> List[ObbDetections]:
+        if not images:
+            return []
+        batch, metas = self.preprocess(images, imgsz)
+        return decode_obb_output(self.run(batch), metas, conf=conf, iou=iou)
+
+
+def resolve_weight(weight: Path, backend: str) -> Path:
+    """按后端选择权重文件: onnx后端使用同名.onnx (由scripts/export_onnx.py导出)"""
+    weight = Path(weight)
+    if backend == 'onnx' and weight.suffix != '.onnx':
+        return weight.with_suffix('.onnx')
+    return weight
+
+
+def load_backend(weight: Path, backend: str = 'auto', **kwargs):
+    """
+    加载推理后端
+
+    Args:
+        weight: .pt 或 .onnx 权重路径
+        backend: 'pytorch' / 'onnx' / 'auto' (按文件后缀选择)
+    """
+    weight = Path(weight)
+    if backend == 'auto':
+        backend = 'onnx' if weight.suffix == '.onnx' else 'pytorch'
+    if backend == 'onnx':
+        return OnnxObbBackend(resolve_weight(weight, 'onnx'), **kwargs)
+    if backend == 'pytorch':
+        return UltralyticsBackend(weight, **kwargs)
+    raise ValueError(f'Unknown backend: {backend}')
@@ -7,6 +7,9 @@ Metrics Analysis for Remote Sensing Aircraft OBB Detection
 2. 计算mAP、Precision、Recall、F1
 3. 生成对比分析报告
 4. 支持不同模型间的横向对比
+5. 由逐检测的置信度与TP标记一次排序得到全部阈值下的 P / R / F1 曲线及F1最优阈值
+6. 多次训练的横向对比可改用 utils.results_store.ResultsStore (增量导入, 库内查询)
+7. 达到目标指标所用的训练时间 (time_to_target, 渐进分辨率与固定分辨率训练的对比)
 """
 
 import os
@@ -17,6 +20,78 @@ from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 
 
+def pr_f1_curves(conf: np.ndarray, tp: np.ndarray, n_gt: int, eps: float = 1e-16) -> Dict[str, np.ndarray]:
+    """
+    全部置信度阈值下的 Precision / Recall / F1 曲线 (单次排序 + 累加和)
+
+    阈值取每个不同的置信度值 c, 对应只保留 conf >= c 的检测; 相同置信度的检测
+    同进同出, 因此只在每组并列值的末尾取累计值。不同类别合并统计 (micro平均)。
+
+    Args:
+        conf: (N,) 整个数据划分上全部检测的置信度
+        tp: (N,) 或 (N, T) TP标记 (T个IoU阈值)
+        n_gt: 真值总数
+
+    Returns:
+        {'threshold' (K,) 降序, 'precision', 'recall', 'f1' (K,) 或 (K, T), 'tp', 'fp'}
+    """
+    conf = np.asarray(conf, dtype=np.float64).reshape(-1)
+    tp = np.asarray(tp, dtype=bool)
+    squeeze = tp.ndim == 1
+    if len(conf) == 0:
+        empty = np.zeros((0,) if squeeze else (0, tp.shape[-1]))
+        return {'threshold': np.zeros(0), 'precision': empty, 'recall': empty, 'f1': empty,
+                'tp': empty, 'fp': empty}
+
+    tp = tp.reshape(len(conf), -1)
+    order = np.argsort(-conf, kind='stable')
+    conf, tp = conf[order], tp[order]
+    last = np.flatnonzero(np.r_[conf[1:] != conf[:-1], True])  # 每组并列置信度的最后一个位置
+
+    tpc = np.cumsum(tp, axis=0)[last].astype(np.float64)
+    fpc = (last + 1)[:, None] - tpc
+    precision = tpc / (tpc + fpc)
+    recall = tpc / (n_gt + eps)
+    f1 = 2 * precision * recall / (precision + recall + eps)
+    curves = {'threshold': conf[last], 'precision': precision, 'recall': recall, 'f1': f1, 'tp': tpc, 'fp': fpc}
+    if squeeze:
+        curves = {k: v[:, 0] if v.ndim == 2 else v for k, v in curves.items()}
+    return curves
+
+
+def best_f1_threshold(curves: Dict[str, np.ndarray], column: int = 0) -> Dict[str, float]:
+    """F1最优的置信度阈值及该阈值下的 P / R / F1 (多IoU阈值时取第column列, 默认IoU=0.5)"""
+    f1 = curves['f1'] if curves['f1'].ndim == 1 else curves['f1'][:, column]
+    if len(f1) == 0:
+        return {'conf': 0.0, 'precision': 0.0, 'recall': 0.0, 'f1': 0.0}
+    i = int(np.argmax(f1))
+    pick = {k: (v[i] if v.ndim == 1 else v[i, column]) for k, v in curves.items() if k != 'threshold'}
+    return {
+        'conf': float(curves['threshold'][i]),
+        'precision': float(pick['precision']),
+        'recall': float(pick['recall']),
+        'f1': float(pick['f1']),
+    }
+
+
+def time_to_target(times: np.ndarray, values: np.ndarray, target: float) -> Optional[Tuple[int, float]]:
+    """
+    训练达到目标指标所用的时间
+
+    Args:
+        times: 每个epoch结束时的累计训练时间 (results.csv 的 time 列, 秒)
+        values: 每个epoch的指标 (如mAP50)
+        target: 目标值
+
+    Returns:
+        (首个达到目标的epoch (从1开始), 累计时间), 未达到时为None
+    """
+    hit = np.flatnonzero(np.asarray(values) >= target)
+    if not len(hit):
+        return None
+    return int(hit[0]) + 1, float(np.asarray(times)[hit[0]])
+
+
 class MetricsAnalyzer:
     """训练指标分析器"""
 
@@ -55,14 +130,11 @@ class MetricsAnalyzer:
 
     def compute_f1_scores(self, precision_list: List[float], recall_list: List[float]) -> List[float]:
         """计算F1分数序列"""
-        f1_scores = []
-        for p, r in zip(precision_list, recall_list):
-            if p + r > 0:
-                f1 = 2 * p * r / (p + r)
-            else:
-                f1 = 0.0
-            f1_scores.append(f1)
-        return f1_scores
+        p = np.asarray(precision_list, dtype=np.float64)
+        r = np.asarray(recall_list, dtype=np.float64)
+        denom = p + r
+        f1 = np.divide(2 * p * r, denom, out=np.zeros_like(denom), where=denom > 0)
+        return f1.tolist()
 
     def get_best_epoch_metrics(self, results: Dict[str, List[float]]) -> Dict[str, float]:
         """获取最佳epoch的指标"""
@@ -96,16 +168,24 @@ class MetricsAnalyzer:
             'f1': f1
         }
 
-    def compare_models(self, model_results: Dict[str, str]) -> Dict[str, Dict]:
+    def compare_models(self, model_results: Dict[str, str], store=None) -> Dict[str, Dict]:
         """
         对比多个模型的性能
         
         Args:
             model_results: {模型名称: results.csv路径}
+            store: 可选的 utils.results_store.ResultsStore; 传入时以模型名称为run增量导入并在库中查询,
+                   未变化的文件不再解析
         
         Returns:
             对比结果字典
         """
+        if store is not None:
+            for model_name, csv_path in model_results.items():
+                store.ingest_file(csv_path, run=model_name)
+            best = store.best_epochs(runs=list(model_results))
+            return {name: best[name] for name in model_results if name in best}
+
         comparison = {}
         for model_name, csv_path in model_results.items():
             results = self.parse_yolo_results_csv(csv_path)
@@ -116,8 +196,15 @@ class MetricsAnalyzer:
         return comparison
 
     def generate_comparison_report(self, comparison: Dict[str, Dict],
-                                     output_path: str = 'results/comparison/metrics_report.json'):
-        """生成指标对比报告"""
+                                     output_path: str = 'results/comparison/metrics_report.json',
+                                     bootstrap: Optional[Dict] = None):
+        """
+        生成指标对比报告
+
+        Args:
+            bootstrap: 可选的 utils.bootstrap.bootstrap_report 结果; 含首尾两个模型的配对检验时,
+                       各项提升附上差值的置信区间与p值
+        """
         output_path = Path(output_path)
         output_path.parent.mkdir(parents=True, exist_ok=True)
 
@@ -131,15 +218,22 @@ class MetricsAnalyzer:
             models = list(comparison.keys())
             baseline = comparison[models[0]]
             improved = comparison[models[-1]]
+            paired = {}
+            for comp in (bootstrap or {}).get('comparisons', []):
+                if comp['a'] == models[0] and comp['b'] == models[-1]:
+                    paired = comp['metrics']
 
             if baseline and improved:
-                report['analysis'] = {
-                    'mAP50_improvement': f"+{(improved.get('mAP50', 0) - baseline.get('mAP50', 0)) * 100:.1f}%",
-                    'mAP50_95_improvement': f"+{(improved.get('mAP50_95', 0) - baseline.get('mAP50_95', 0)) * 100:.1f}%",
-                    'precision_improvement': f"+{(improved.get('precision', 0) - baseline.get('precision', 0)) * 100:.1f}%",
-                    'recall_improvement': f"+{(improved.get('recall', 0) - baseline.get('recall', 0)) * 100:.1f}%",
-                    'f1_improvement': f"+{(improved.get('f1', 0) - baseline.get('f1', 0)) * 100:.1f}%",
-                }
+                for key in ('mAP50', 'mAP50_95', 'precision', 'recall', 'f1'):
+                    text = f"+{(improved.get(key, 0) - baseline.get(key, 0)) * 100:.1f}%"
+                    if key in paired:
+                        ci = paired[key]
+                        text += (f" (95% CI {ci['ci_low'] * 100:+.1f}% ~ {ci['ci_high'] * 100:+.1f}%, "
+                                 f"p={ci['p_value']:.4f})")
+                    report['analysis'][f'{key}_improvement'] = text
+
+        if bootstrap:
+            report['bootstrap'] = bootstrap
 
         with open(output_path, 'w', encoding='utf-8') as f:
             json.dump(report, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,385 @@
+"""
+结构化通道剪枝 - 按目标CPU上实测的延迟预算剪枝 C2f / C2f_ASC 模块
+Latency-aware Structured Channel Pruning of C2f / C2f_ASC Blocks
+
+功能:
+1. 剪枝组 (find_groups): 每个 C2f / C2f_ASC 模块的
+   - 瓶颈层中间通道 (inner): 只影响瓶颈内的两个卷积
+   - 模块输出通道 (output): 同时裁剪后续层的输入 (Conv / C2f / SPPF, 经过 Concat / Upsample, 以及OBB检测头)
+   后续层无法裁剪输入时 (如分组卷积) 该模块的输出通道不参与剪枝
+2. 通道重要性 (channel_importance):
+   - C2f_ASC 输出通道: ChannelAttention 在校准图像上计算的通道注意力权重均值
+   - 其余: 对应 BatchNorm 的 |gamma|
+3. 延迟查找表 (latency_sensitivity): 在目标CPU上逐组剪掉一部分通道实测延迟, 得到每组每个通道的延迟 (ms)
+4. 按预算剪枝 (prune_to_budget): 每步按 归一化重要性 / 每通道延迟 从低到高剪掉一批通道
+   (每组保留通道数为 round_to 的倍数且不少于 min_keep), 重建更小的卷积 / BN / 注意力层后实测延迟, 直到不超过预算
+5. PrunedOBBTrainer: 剪枝后模型的微调 (ultralytics 默认按 model.yaml 重建结构, 会丢失剪枝结果)
+
+剪枝结果是真正变小的模块 (权重张量被裁剪), 不是掩码; 保存的检查点可直接用 YOLO(path) 加载推理/验证。
+用法见 scripts/prune_model.py
+"""
+
+import math
+import time
+from copy import deepcopy
+from typing import Dict, List, Optional, Sequence
+
+import cv2
+import numpy as np
+import torch
+import torch.nn as nn
+
+from ultralytics.nn.modules import Bottleneck, C2f, Concat, Conv, Detect
+
+from models.improved.asc_module import C2f_ASC
+
+from .training import CachedOBBTrainer
+
+# 检测头中按输入层分支的卷积序列
+HEAD_BRANCHES = ('cv2', 'cv3', 'cv4', 'one2one_cv2', 'one2one_cv3', 'one2one_cv4')
+
+
+# ==================== 张量裁剪 ====================
+
+def _slice_conv_(conv: nn.Conv2d, out_idx: Optional[torch.Tensor] = None,
+                 in_idx: Optional[torch.Tensor] = None) -> None:
+    """原地裁剪卷积的输出/输入通道"""
+    w = conv.weight.data
+    if out_idx is not None:
+        w = w[out_idx]
+        conv.out_channels = len(out_idx)
+        if conv.bias is not None:
+            conv.bias = nn.Parameter(conv.bias.data[out_idx].clone())
+    if in_idx is not None:
+        w = w[:, in_idx]
+        conv.in_channels = len(in_idx)
+    conv.weight = nn.Parameter(w.clone())
+
+
+def _slice_bn_(bn: nn.BatchNorm2d, idx: torch.Tensor) -> None:
+    bn.weight = nn.Parameter(bn.weight.data[idx].clone())
+    bn.bias = nn.Parameter(bn.bias.data[idx].clone())
+    bn.running_mean = bn.running_mean[idx].clone()
+    bn.running_var = bn.running_var[idx].clone()
+    bn.num_features = len(idx)
+
+
+def _prune_in(module: nn.Module, idx: torch.Tensor, dry: bool = False) -> bool:
+    """裁剪模块第一个卷积的输入通道; 不支持的模块返回False (dry=True 时只检查)"""
+    if isinstance(module, Conv):
+        module = module.conv
+    if isinstance(module, nn.Conv2d):
+        if module.groups != 1:
+            return False
+        if not dry:
+            _slice_conv_(module, in_idx=idx)
+        return True
+    if isinstance(module, nn.Sequential):
+        return _prune_in(module[0], idx, dry)
+    if hasattr(module, 'cv1'):  # C2f / C2f_ASC / SPPF / Bottleneck
+        return _prune_in(module.cv1, idx, dry)
+    return False
+
+
+def _sources(m: nn.Module) -> List[int]:
+    return [j if j != -1 else m.i - 1 for j in ([m.f] if isinstance(m.f, int) else m.f)]
+
+
+def layer_widths(model: nn.Module) -> Dict[int, int]:
+    """各层输出通道数 (64x64输入的一次前向)"""
+    widths, hooks = {}, []
+    for m in model.model:
+        hooks.append(m.register_forward_hook(
+            lambda mod, args, out: widths.__setitem__(mod.i, out.shape[1]) if torch.is_tensor(out) else None))
+    p = next(model.parameters())
+    try:
+        with torch.no_grad():
+            model.eval()(torch.zeros(1, 3, 64, 64, device=p.device, dtype=p.dtype))
+    finally:
+        for h in hooks:
+            h.remove()
+    return widths
+
+
+def _propagate(model: nn.Module, i: int, idx: torch.Tensor, widths: Dict[int, int], dry: bool = False) -> bool:
+    """第i层输出只保留 idx 通道时, 裁剪所有后续层的输入"""
+    ok = True
+    for m in model.model:
+        srcs = _sources(m)
+        if i not in srcs:
+            continue
+        if isinstance(m, Concat):
+            offset = sum(widths[s] for s in srcs[:srcs.index(i)])
+            full = torch.cat((torch.arange(offset), offset + idx.cpu(),
+                              torch.arange(offset + widths[i], widths[m.i]))).to(idx.device)
+            ok = _propagate(model, m.i, full, widths, dry) and ok
+        elif isinstance(m, nn.Upsample):
+            ok = _propagate(model, m.i, idx, widths, dry) and ok
+        elif isinstance(m, Detect):  # OBB 继承自 Detect
+            k = srcs.index(i)
+            for name in HEAD_BRANCHES:
+                branch = getattr(m, name, None)
+                if branch is not None:
+                    ok = _prune_in(branch[k], idx, dry) and ok
+        else:
+            ok = _prune_in(m, idx, dry) and ok
+    return ok
+
+
+def _prune_asc_(asc: nn.Module, idx: torch.Tensor) -> None:
+    """ASCModule 的通道数随 C2f_ASC 输出一起裁剪 (SpatialAttention 与通道数无关)"""
+    ca, co = asc.channel_attn, asc.coord_attn
+    _slice_conv_(ca.fc[0], in_idx=idx)
+    _slice_conv_(ca.fc[2], out_idx=idx)
+    _slice_conv_(co.conv1, in_idx=idx)
+    _slice_conv_(co.conv_h, out_idx=idx)
+    _slice_conv_(co.conv_w, out_idx=idx)
+
+
+# ==================== 剪枝组 ====================
+
+def find_groups(model: nn.Module) -> List[Dict]:
+    """
+    可剪枝的通道组
+
+    Returns:
+        [{'name', 'kind' ('inner' / 'output'), 'layer', 'path', 'asc', 'width', 'orig'}]
+    """
+    widths = layer_widths(model)
+    groups = []
+    for m in model.model:
+        if not isinstance(m, (C2f, C2f_ASC)):
+            continue
+        asc = isinstance(m, C2f_ASC)
+        blocks = m.bottlenecks if asc else m.m
+        for j, b in enumerate(blocks):
+            if not asc and (not isinstance(b, Bottleneck) or b.cv2.conv.groups != 1):
+                continue
+            width = b[0].out_channels if asc else b.cv1.conv.out_channels
+            groups.append({'name': f'{m.i}.m{j}', 'kind': 'inner', 'layer': m.i, 'asc': asc,
+                           'path': f'model.{m.i}.{"bottlenecks" if asc else "m"}.{j}', 'width': width, 'orig': width})
+        width = widths[m.i]
+        if _propagate(model, m.i, torch.arange(width), widths, dry=True):
+            groups.append({'name': f'{m.i}.out', 'kind': 'output', 'layer': m.i, 'asc': asc,
+                           'path': f'model.{m.i}', 'width': width, 'orig': width})
+    return groups
+
+
+def prune_group(model: nn.Module, group: Dict, keep: Sequence[int]) -> None:
+    """只保留组内 keep 通道 (原地修改模型, 组的 width 同步更新)"""
+    p = next(model.parameters())
+    idx = torch.as_tensor(sorted(keep), dtype=torch.long, device=p.device)
+    module = model.get_submodule(group['path'])
+    if group['kind'] == 'inner':
+        if group['asc']:  # Sequential(Conv2d, BN, SiLU, Conv2d, BN, SiLU)
+            _slice_conv_(module[0], out_idx=idx)
+            _slice_bn_(module[1], idx)
+            _slice_conv_(module[3], in_idx=idx)
+        else:  # Bottleneck(cv1, cv2)
+            _slice_conv_(module.cv1.conv, out_idx=idx)
+            _slice_bn_(module.cv1.bn, idx)
+            _slice_conv_(module.cv2.conv, in_idx=idx)
+    else:
+        widths = layer_widths(model)
+        if group['asc']:
+            _slice_conv_(module.cv2, out_idx=idx)
+            _prune_asc_(module.asc, idx)
+        else:
+            _slice_conv_(module.cv2.conv, out_idx=idx)
+            _slice_bn_(module.cv2.bn, idx)
+        _propagate(model, group['layer'], idx, widths)
+    group['width'] = len(idx)
+    for m in model.model:
+        m.np = sum(x.numel() for x in m.parameters())
+
+
+# ==================== 通道重要性 ====================
+
+def load_calibration(img_files: Sequence[str], imgsz: int, n: int = 32) -> torch.Tensor:
+    """前n张图像letterbox到 imgsz x imgsz, (n, 3, imgsz, imgsz) float [0, 1]"""
+    from ultralytics.data.augment import LetterBox
+
+    letterbox = LetterBox((imgsz, imgsz), auto=False)
+    ims = []
+    for f in list(img_files)[:n]:
+        im = cv2.imread(str(f))
+        if im is None:
+            raise FileNotFoundError(f'Image Not Found {f}')
+        ims.append(letterbox(image=im)[..., ::-1].transpose(2, 0, 1))
+    return torch.from_numpy(np.ascontiguousarray(np.stack(ims))).float() / 255
+
+
+@torch.no_grad()
+def channel_importance(model: nn.Module, groups: List[Dict], calib: Optional[torch.Tensor] = None,
+                       batch: int = 8) -> None:
+    """为每组写入 score (np.ndarray, 每个通道一个值); C2f_ASC 的输出通道需要校准图像"""
+    attention, hooks = {}, []
+
+    def hook(layer):
+        def fn(mod, args):
+            x = args[0]
+            w = mod.sigmoid(mod.fc(mod.avg_pool(x)) + mod.fc(mod.max_pool(x))).mean(0).flatten()
+            attention[layer] = attention.get(layer, 0) + w.double().cpu().numpy()
+        return fn
+
+    for g in groups:
+        if g['kind'] == 'output' and g['asc']:
+            m = model.get_submodule(g['path'])
+            hooks.append(m.asc.channel_attn.register_forward_pre_hook(hook(g['layer'])))
+    if hooks:
+        if calib is None:
+            raise ValueError('C2f_ASC output channels are ranked by channel attention; pass calibration images')
+        p = next(model.parameters())
+        model.eval()
+        try:
+            for k in range(0, len(calib), batch):
+                model(calib[k:k + batch].to(p.device, p.dtype))
+        finally:
+            for h in hooks:
+                h.remove()
+
+    for g in groups:
+        module = model.get_submodule(g['path'])
+        if g['kind'] == 'output' and g['asc']:
+            score = attention[g['layer']]
+        elif g['kind'] == 'output':
+            score = module.cv2.bn.weight.detach().abs().cpu().numpy()
+        elif g['asc']:
+            score = module[1].weight.detach().abs().cpu().numpy()
+        else:
+            score = module.cv1.bn.weight.detach().abs().cpu().numpy()
+        g['score'] = np.asarray(score, dtype=np.float64)
+
+
+# ==================== 延迟 ====================
+
+@torch.no_grad()
+def measure_latency(model: nn.Module, imgsz: int, runs: int = 20, warmup: int = 3) -> float:
+    """CPU上单张 imgsz x imgsz 输入的前向延迟中位数 (ms), 在融合 Conv+BN 的副本上测量"""
+    net = deepcopy(model).float().cpu().eval()
+    net = net.fuse(verbose=False) if hasattr(net, 'fuse') else net
+    x = torch.zeros(1, 3, imgsz, imgsz)
+    times = []
+    for i in range(warmup + runs):
+        t0 = time.perf_counter()
+        net(x)
+        if i >= warmup:
+            times.append((time.perf_counter() - t0) * 1000)
+    return float(np.median(times))
+
+
+def _floor(group: Dict, min_keep: float, round_to: int) -> int:
+    """组内至少保留的通道数"""
+    return min(group['orig'], max(round_to, math.ceil(group['orig'] * min_keep / round_to) * round_to))
+
+
+def count_macs(model: nn.Module, imgsz: int) -> int:
+    """卷积的乘加次数 (imgsz x imgsz 输入)"""
+    macs, hooks = [0], []
+
+    def fn(mod, args, out):
+        macs[0] += out.numel() * mod.in_channels // mod.groups * mod.kernel_size[0] * mod.kernel_size[1]
+
+    for m in model.modules():
+        if isinstance(m, nn.Conv2d):
+            hooks.append(m.register_forward_hook(fn))
+    p = next(model.parameters())
+    try:
+        with torch.no_grad():
+            model.eval()(torch.zeros(1, 3, imgsz, imgsz, device=p.device, dtype=p.dtype))
+    finally:
+        for h in hooks:
+            h.remove()
+    return macs[0]
+
+
+def latency_sensitivity(model: nn.Module, groups: List[Dict], imgsz: int, runs: int = 20,
+                        round_to: int = 8, base_ms: Optional[float] = None) -> float:
+    """
+    延迟查找表: 每组在模型副本上剪掉约1/4通道 (round_to的倍数) 实测延迟, 写入 ms_per_channel
+
+    实测差值在计时噪声以内 (<=0) 时, 按该组每通道的乘加次数 x 整个模型的每次乘加耗时估计
+
+    Returns:
+        原模型延迟 (ms)
+    """
+    base_ms = base_ms or measure_latency(model, imgsz, runs)
+    base_macs = count_macs(model, imgsz)
+    for g in groups:
+        chunk = max(round_to, g['width'] // 4 // round_to * round_to)
+        if g['width'] - chunk < round_to:
+            g['ms_per_channel'], g['measured'] = 1e-6, False
+            continue
+        trial = deepcopy(model)
+        prune_group(trial, dict(g), np.argsort(g['score'])[chunk:])
+        saved_ms = base_ms - measure_latency(trial, imgsz, runs)
+        g['measured'] = saved_ms > 0
+        if not g['measured']:
+            saved_ms = (base_macs - count_macs(trial, imgsz)) * base_ms / base_macs
+        g['ms_per_channel'] = max(saved_ms / chunk, 1e-6)
+    return base_ms
+
+
+def prune_to_budget(model: nn.Module, groups: List[Dict], budget_ms: float, imgsz: int, step: float = 0.05,
+                    min_keep: float = 0.25, round_to: int = 8, runs: int = 20,
+                    base_ms: Optional[float] = None) -> List[Dict]:
+    """
+    逐步剪枝直到延迟不超过 budget_ms (或没有可剪的通道)
+
+    每步从所有组中按 (组内归一化重要性 / 每通道延迟) 从低到高取约 step 比例的可剪通道,
+    各组的剪除数向下取整到 round_to 的倍数; 每步之后实测延迟
+
+    Returns:
+        每步记录 [{'step', 'latency_ms', 'params', 'pruned': {组名: 剪除数}}]
+    """
+    latency = base_ms or measure_latency(model, imgsz, runs)
+    history = [{'step': 0, 'latency_ms': round(latency, 3), 'params': sum(p.numel() for p in model.parameters()),
+                'pruned': {}}]
+    while latency > budget_ms:
+        candidates = []
+        for gi, g in enumerate(groups):
+            removable = g['width'] - _floor(g, min_keep, round_to)
+            if removable < round_to:
+                continue
+            norm = g['score'] / max(g['score'].mean(), 1e-12)
+            for c in np.argsort(g['score'])[:removable]:
+                candidates.append((norm[c] / g['ms_per_channel'], gi))
+        if not candidates:
+            print(f'[WARN] Nothing left to prune at {latency:.2f} ms (budget {budget_ms:.2f} ms)')
+            break
+        candidates.sort(key=lambda x: x[0])
+        take = max(round_to, int(step * len(candidates)))
+        counts = {}
+        for _, gi in candidates[:take]:
+            counts[gi] = counts.get(gi, 0) + 1
+        counts = {gi: k // round_to * round_to for gi, k in counts.items() if k >= round_to}
+        if not counts:  # 本步的候选分散在各组: 只剪排名最前的一组
+            counts = {candidates[0][1]: round_to}
+
+        for gi, k in counts.items():
+            g = groups[gi]
+            order = np.argsort(g['score'])
+            keep = np.sort(order[k:])
+            prune_group(model, g, keep)
+            g['score'] = g['score'][keep]
+        latency = measure_latency(model, imgsz, runs)
+        history.append({'step': len(history), 'latency_ms': round(latency, 3),
+                        'params': sum(p.numel() for p in model.parameters()),
+                        'pruned': {groups[gi]['name']: k for gi, k in counts.items()}})
+        print(f"[INFO] Step {len(history) - 1}: pruned {sum(counts.values())} channels in {len(counts)} group(s), "
+              f"{latency:.2f} ms (budget {budget_ms:.2f} ms), {history[-1]['params'] / 1e6:.3f}M params")
+    return history
+
+
+class PrunedOBBTrainer(CachedOBBTrainer):
+    """
+    剪枝后模型的微调: 直接训练检查点中的模块
+
+    ultralytics 的 Model.train 按 model.yaml 重建结构再按名称/形状加载权重, 剪枝后形状不符的层会被
+    重新初始化; 这里返回传入的模块本身, 保存的 last.pt / best.pt 也保持剪枝后的结构
+    """
+
+    def get_model(self, cfg=None, weights=None, verbose=True):
+        if isinstance(weights, nn.Module):
+            return self.set_model_names_for_load(weights)
+        return super().get_model(cfg, weights, verbose)
@@ -0,0 +1,479 @@
+"""
+训练结果库 - 多次训练的 results.csv 汇总到单个SQLite文件
+Columnar Multi-Run Results Store
+
+功能:
+1. 将 runs/**/results.csv 导入同一张 epochs 表 (每个指标一列, 主键 (run, epoch) 即索引)
+2. 增量导入: 按文件 mtime / 大小跳过未变化的文件; 训练中只追加的文件只解析新增的行,
+   表头变化或文件被截断时整体重新导入
+3. 列名统一: 'metrics/mAP50-95(B)' 与 'metrics/mAP50-95' 均记为 mAP50_95,
+   'train/box_loss' 记为 train_box_loss (见 canonical_column)
+4. 每个run按mAP50的最佳epoch在导入时随新增行增量维护于 runs 表, best_epochs / top_k 只读runs表;
+   按其他指标取最佳时在SQL中用窗口函数整体计算, 曲线按run一次取出后用numpy切分;
+   数百个run的对比在毫秒级, 基准测试: python -m utils.results_store
+5. ResultsTail: 训练进行中跟随单个results.csv, 每次只读取新追加的字节,
+   用 MetricsAnalyzer.get_best_epoch_metrics 的规则增量更新最佳epoch (供 scripts/monitor_runs.py 使用)
+6. 每个run的超参数 (params 表, 值为JSON): set_params / params, 供超参数搜索按参数查询结果
+
+最佳epoch的定义与 MetricsAnalyzer.get_best_epoch_metrics 一致:
+mAP50最大的第一行, best_epoch 为其行号 (从1开始), F1由该行的P/R计算
+"""
+
+import json
+import re
+import sqlite3
+from collections import deque
+from pathlib import Path
+from typing import Deque, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .metrics import MetricsAnalyzer
+
+DEFAULT_DB = 'results/runs.sqlite'
+BEST_METRIC = 'mAP50'
+SUMMARY_COLUMNS = ('mAP50', 'mAP50_95', 'precision', 'recall')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    header TEXT NOT NULL,
+    n_epochs INTEGER NOT NULL,
+    best_epoch INTEGER,
+    mAP50 REAL,
+    mAP50_95 REAL,
+    precision REAL,
+    recall REAL,
+    f1 REAL
+);
+CREATE TABLE IF NOT EXISTS epochs (
+    run TEXT NOT NULL,
+    epoch INTEGER NOT NULL,
+    PRIMARY KEY (run, epoch)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS params (
+    run TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (run, key)
+) WITHOUT ROWID;
+"""
+
+
+def canonical_column(name: str) -> Optional[str]:
+    """results.csv列名 -> 库中列名 (epoch列由行号代替, 返回None)"""
+    name = name.strip()
+    if name.startswith('metrics/'):
+        name = name[len('metrics/'):]
+    name = name.replace('(B)', '')
+    name = re.sub(r'[^0-9A-Za-z]+', '_', name).strip('_')
+    if not name or name == 'epoch':
+        return None
+    return name
+
+
+def _quote(column: str) -> str:
+    return '"' + column.replace('"', '""') + '"'
+
+
+def _read_lines(path: Path, offset: int) -> Tuple[List[str], int]:
+    """从offset读到最后一个完整行 (训练进程可能正写到一半), 返回 (行列表, 新offset)"""
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        data = f.read()
+    end = data.rfind(b'\n') + 1
+    lines = [ln for ln in data[:end].decode('utf-8', errors='replace').splitlines() if ln.strip()]
+    return lines, offset + end
+
+
+def parse_rows(lines: Sequence[str], n_cols: int) -> np.ndarray:
+    """CSV数据行 -> (N, n_cols) float64; 列数不符的行丢弃, 无法解析的单元格记为0 (与parse_yolo_results_csv一致)"""
+    lines = [ln for ln in lines if ln.count(',') == n_cols - 1]
+    if not lines:
+        return np.zeros((0, n_cols))
+    values = np.genfromtxt(lines, delimiter=',', dtype=np.float64, ndmin=2)
+    return np.nan_to_num(values, nan=0.0)
+
+
+class ResultsStore:
+    """
+    多次训练结果库
+
+    用法:
+        store = ResultsStore('results/runs.sqlite')
+        store.ingest_dir('runs')
+        store.best_epochs()        # {run: {'best_epoch', 'mAP50', ..., 'f1'}}
+        store.top_k(10)            # 按最佳mAP50排序的前10个run
+        store.curves('mAP50')      # {run: (epochs, values)}
+    """
+
+    def __init__(self, db_path: str = DEFAULT_DB):
+        self.db_path = Path(db_path)
+        if str(db_path) != ':memory:':
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(db_path))
+        self.conn.executescript(_SCHEMA)
+        self._columns = self._table_columns()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _table_columns(self) -> List[str]:
+        rows = self.conn.execute('PRAGMA table_info(epochs)').fetchall()
+        return [r[1] for r in rows if r[1] not in ('run', 'epoch')]
+
+    @property
+    def columns(self) -> List[str]:
+        """库中全部指标列"""
+        return list(self._columns)
+
+    @property
+    def runs(self) -> List[str]:
+        return [r[0] for r in self.conn.execute('SELECT run FROM runs ORDER BY run')]
+
+    # ------------------------------------------------------------------
+    # 导入
+    # ------------------------------------------------------------------
+
+    def _ensure_columns(self, columns: Sequence[str]) -> None:
+        for col in columns:
+            if col not in self._columns:
+                self.conn.execute(f'ALTER TABLE epochs ADD COLUMN {_quote(col)} REAL')
+                self._columns.append(col)
+
+    def _insert(self, run: str, header: List[Optional[str]], lines: Sequence[str],
+                first_epoch: int) -> Tuple[int, Optional[Tuple]]:
+        """写入新增行, 返回 (行数, 新增行中的最佳epoch摘要或None)"""
+        values = parse_rows(lines, len(header))
+        keep = [i for i, col in enumerate(header) if col is not None]
+        cols = [header[i] for i in keep]
+        self._ensure_columns(cols)
+        values = values[:, keep]
+        epochs = np.arange(first_epoch, first_epoch + len(values))
+        placeholders = ', '.join('?' * (len(cols) + 2))
+        self.conn.executemany(
+            f'INSERT OR REPLACE INTO epochs (run, epoch, {", ".join(map(_quote, cols))}) VALUES ({placeholders})',
+            [(run, int(e), *row) for e, row in zip(epochs, values.tolist())],
+        )
+        if not len(values) or BEST_METRIC not in cols:
+            return len(values), None
+        i = int(np.argmax(values[:, cols.index(BEST_METRIC)]))
+        row = {c: float(values[i, cols.index(c)]) if c in cols else 0.0 for c in SUMMARY_COLUMNS}
+        p, r = row['precision'], row['recall']
+        f1 = 2 * p * r / (p + r) if (p + r) > 0 else 0.0
+        return len(values), (int(epochs[i]), *(row[c] for c in SUMMARY_COLUMNS), f1)
+
+    def ingest_file(self, csv_path, run: Optional[str] = None) -> str:
+        """
+        导入单个results.csv
+
+        Args:
+            csv_path: results.csv路径
+            run: run名称 (默认为所在目录名)
+
+        Returns:
+            'added' / 'appended' / 'replaced' / 'skipped' / 'missing'
+        """
+        path = Path(csv_path)
+        run = run or path.parent.name
+        if not path.exists():
+            return 'missing'
+        stat = path.stat()
+        prev = self.conn.execute(
+            f'SELECT path, mtime, size, offset, header, n_epochs, best_epoch, {BEST_METRIC} FROM runs WHERE run = ?',
+            (run,),
+        ).fetchone()
+        if prev and prev[0] == str(path) and prev[1] == stat.st_mtime and prev[2] == stat.st_size:
+            return 'skipped'
+
+        with open(path, 'rb') as f:
+            first = f.readline()
+        if not first.endswith(b'\n'):
+            return 'skipped'  # 表头尚未写完
+        raw_header = first.decode('utf-8', errors='replace').strip()
+        header = [canonical_column(c) for c in raw_header.split(',')]
+
+        with self.conn:
+            if prev and prev[0] == str(path) and prev[4] == raw_header and stat.st_size >= prev[3]:
+                lines, offset = _read_lines(path, prev[3])
+                added, best = self._insert(run, header, lines, prev[5] + 1)
+                n_epochs = prev[5] + added
+                if prev[6] is not None and (best is None or best[1] <= prev[7]):
+                    best = None  # 最佳epoch不变 (相同mAP50取较早的epoch)
+                status = 'appended'
+            else:
+                self.conn.execute('DELETE FROM epochs WHERE run = ?', (run,))
+                lines, offset = _read_lines(path, len(first))
+                n_epochs, best = self._insert(run, header, lines, 1)
+                status = 'replaced' if prev else 'added'
+            self.conn.execute(
+                'INSERT INTO runs (run, path, mtime, size, offset, header, n_epochs) VALUES (?, ?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT(run) DO UPDATE SET path = excluded.path, mtime = excluded.mtime, size = excluded.size, '
+                'offset = excluded.offset, header = excluded.header, n_epochs = excluded.n_epochs',
+                (run, str(path), stat.st_mtime, stat.st_size, offset, raw_header, n_epochs),
+            )
+            if best is not None or status == 'replaced':
+                self.conn.execute(
+                    f'UPDATE runs SET best_epoch = ?, {", ".join(f"{c} = ?" for c in SUMMARY_COLUMNS)}, f1 = ? '
+                    'WHERE run = ?',
+                    (*(best or (None,) * (len(SUMMARY_COLUMNS) + 2)), run),
+                )
+        return status
+
+    def ingest_dir(self, runs_dir='runs', prune: bool = False) -> Dict[str, int]:
+        """
+        导入目录下全部results.csv, run名称为其所在目录相对runs_dir的路径
+
+        Args:
+            prune: 删除库中文件已不存在的run
+
+        Returns:
+            各状态的文件计数
+        """
+        runs_dir = Path(runs_dir)
+        counts: Dict[str, int] = {}
+        seen = set()
+        for csv_path in sorted(runs_dir.rglob('results.csv')):
+            run = csv_path.parent.relative_to(runs_dir).as_posix()
+            seen.add(run)
+            status = self.ingest_file(csv_path, run)
+            counts[status] = counts.get(status, 0) + 1
+        if prune:
+            stale = [r for r in self.runs if r not in seen]
+            with self.conn:
+                for run in stale:
+                    self.conn.execute('DELETE FROM epochs WHERE run = ?', (run,))
+                    self.conn.execute('DELETE FROM runs WHERE run = ?', (run,))
+                    self.conn.execute('DELETE FROM params WHERE run = ?', (run,))
+            if stale:
+                counts['pruned'] = len(stale)
+        return counts
+
+    def set_params(self, run: str, params: Dict[str, object]) -> None:
+        """记录run的超参数 (同名键覆盖)"""
+        with self.conn:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO params (run, key, value) VALUES (?, ?, ?)',
+                [(run, key, json.dumps(value)) for key, value in params.items()],
+            )
+
+    # ------------------------------------------------------------------
+    # 查询
+    # ------------------------------------------------------------------
+
+    def params(self, runs: Optional[Sequence[str]] = None) -> Dict[str, Dict[str, object]]:
+        """{run: {参数名: 值}}"""
+        where, args = self._run_filter(runs)
+        out: Dict[str, Dict[str, object]] = {}
+        for run, key, value in self.conn.execute(f'SELECT run, key, value FROM params {where} ORDER BY run', args):
+            out.setdefault(run, {})[key] = json.loads(value)
+        return out
+
+    def _col(self, column: str) -> str:
+        return f'COALESCE({_quote(column)}, 0.0)' if column in self._columns else '0.0'
+
+    @staticmethod
+    def _run_filter(runs: Optional[Sequence[str]]) -> Tuple[str, list]:
+        if runs is None:
+            return '', []
+        runs = list(runs)
+        return f'WHERE run IN ({", ".join("?" * len(runs))})', runs
+
+    def _best_query(self, metric: str, runs: Optional[Sequence[str]]) -> Tuple[str, list]:
+        where, params = self._run_filter(runs)
+        p, r = self._col('precision'), self._col('recall')
+        select = ', '.join(f'{self._col(c)} AS {_quote(c)}' for c in SUMMARY_COLUMNS)
+        sql = (
+            f'SELECT run, epoch, {select}, '
+            f'CASE WHEN {p} + {r} > 0 THEN 2 * {p} * {r} / ({p} + {r}) ELSE 0.0 END AS f1, '
+            f'ROW_NUMBER() OVER (PARTITION BY run ORDER BY {self._col(metric)} DESC, epoch ASC) AS rn '
+            f'FROM epochs {where}'
+        )
+        return f'SELECT * FROM ({sql}) WHERE rn = 1', params
+
+    @staticmethod
+    def _summary(row) -> Dict[str, float]:
+        out = {'best_epoch': int(row[1])}
+        out.update({c: float(v) for c, v in zip(SUMMARY_COLUMNS, row[2:2 + len(SUMMARY_COLUMNS)])})
+        out['f1'] = float(row[2 + len(SUMMARY_COLUMNS)])
+        return out
+
+    def _summary_query(self, metric: str, runs: Optional[Sequence[str]]) -> Tuple[str, list]:
+        if metric != BEST_METRIC:
+            return self._best_query(metric, runs)
+        where, params = self._run_filter(runs)
+        where = f'{where} AND' if where else 'WHERE'
+        cols = ', '.join(_quote(c) for c in SUMMARY_COLUMNS)
+        return f'SELECT run, best_epoch, {cols}, f1 FROM runs {where} best_epoch IS NOT NULL', params
+
+    def best_epochs(self, runs: Optional[Sequence[str]] = None, metric: str = BEST_METRIC) -> Dict[str, Dict[str, float]]:
+        """每个run的最佳epoch指标 (键与 MetricsAnalyzer.get_best_epoch_metrics 相同)"""
+        if metric not in self._columns:
+            return {}
+        sql, params = self._summary_query(metric, runs)
+        return {row[0]: self._summary(row) for row in self.conn.execute(sql + ' ORDER BY run', params)}
+
+    def top_k(self, k: int = 10, metric: str = BEST_METRIC,
+              runs: Optional[Sequence[str]] = None) -> List[Tuple[str, Dict[str, float]]]:
+        """按各run最佳epoch的metric降序取前k个"""
+        if metric not in self._columns:
+            return []
+        sql, params = self._summary_query(metric, runs)
+        sort_col = _quote(metric) if metric in SUMMARY_COLUMNS else 'f1'
+        rows = self.conn.execute(f'{sql} ORDER BY {sort_col} DESC, run LIMIT ?', params + [int(k)])
+        return [(row[0], self._summary(row)) for row in rows]
+
+    def table(self, columns: Sequence[str], runs: Optional[Sequence[str]] = None) -> Dict[str, np.ndarray]:
+        """按列取出 (run, epoch 排序), 返回 {'run', 'epoch', 列名...} 的numpy数组"""
+        where, params = self._run_filter(runs)
+        select = ', '.join(self._col(c) for c in columns)
+        rows = self.conn.execute(
+            f'SELECT run, epoch{", " + select if columns else ""} FROM epochs {where} ORDER BY run, epoch', params
+        ).fetchall()
+        if not rows:
+            out = {'run': np.zeros(0, dtype=object), 'epoch': np.zeros(0, dtype=np.int64)}
+            out.update({c: np.zeros(0) for c in columns})
+            return out
+        cols = list(zip(*rows))
+        out = {'run': np.asarray(cols[0], dtype=object), 'epoch': np.asarray(cols[1], dtype=np.int64)}
+        out.update({c: np.asarray(v, dtype=np.float64) for c, v in zip(columns, cols[2:])})
+        return out
+
+    def curves(self, column: str = BEST_METRIC,
+               runs: Optional[Sequence[str]] = None) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+        """逐epoch曲线 {run: (epochs, values)}"""
+        data = self.table([column], runs)
+        if not len(data['run']):
+            return {}
+        names, starts = np.unique(data['run'], return_index=True)
+        bounds = np.append(starts, len(data['run']))
+        return {str(name): (data['epoch'][s:e], data[column][s:e])
+                for name, s, e in zip(names, bounds[:-1], bounds[1:])}
+
+
+class ResultsTail:
+    """
+    跟随单个正在写入的results.csv
+
+    poll() 只stat一次文件; 大小变化时从上次的偏移读取新增的完整行,
+    对新增行调用 MetricsAnalyzer.get_best_epoch_metrics, 仅当其mAP50严格更大时替换当前最佳
+    (与整文件取第一个最大值的结果一致)。文件被截断或重写 (如重新训练) 时从头开始。
+    """
+
+    def __init__(self, csv_path, history: int = 200):
+        self.path = Path(csv_path)
+        self._analyzer = MetricsAnalyzer()
+        self._history = history
+        self.reset()
+
+    def reset(self) -> None:
+        self.offset = 0
+        self.size = -1
+        self.header: Optional[List[str]] = None
+        self.n_epochs = 0
+        self.best: Dict[str, float] = {}
+        self.last: Dict[str, float] = {}
+        self.curve: Deque[float] = deque(maxlen=self._history)
+        self.updated = 0.0  # 最近一次读到新行时文件的mtime
+
+    def poll(self) -> int:
+        """读取新增行, 返回新增epoch数"""
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return 0
+        if stat.st_size == self.size:
+            return 0
+        if stat.st_size < self.offset:
+            self.reset()
+        self.size = stat.st_size
+
+        lines, self.offset = _read_lines(self.path, self.offset)
+        if self.header is None:
+            if not lines:
+                return 0
+            self.header = [c.strip() for c in lines[0].split(',')]
+            lines = lines[1:]
+        values = parse_rows(lines, len(self.header))
+        if not len(values):
+            return 0
+
+        chunk = {key: values[:, i].tolist() for i, key in enumerate(self.header)}
+        best = self._analyzer.get_best_epoch_metrics(chunk)
+        if best and (not self.best or best['mAP50'] > self.best['mAP50']):
+            best['best_epoch'] += self.n_epochs
+            self.best = best
+        self.last = {canonical_column(k) or 'epoch': v[-1] for k, v in chunk.items()}
+        if BEST_METRIC in self.last:
+            mAP_key = next(k for k in self.header if canonical_column(k) == BEST_METRIC)
+            self.curve.extend(chunk[mAP_key])
+        self.n_epochs += len(values)
+        self.updated = stat.st_mtime
+        return len(values)
+
+
+if __name__ == '__main__':
+    import tempfile
+    import time
+
+    header = ('epoch,time,train/box_loss,train/cls_loss,train/dfl_loss,train/angle_loss,'
+              'metrics/precision(B),metrics/recall(B),metrics/mAP50(B),metrics/mAP50-95(B),'
+              'val/box_loss,val/cls_loss,val/dfl_loss,val/angle_loss,lr/pg0,lr/pg1,lr/pg2')
+    n_runs, n_epochs = 300, 200
+    rng = np.random.default_rng(0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        runs_dir = Path(tmp) / 'runs'
+        for i in range(n_runs):
+            d = runs_dir / f'sweep_{i:03d}'
+            d.mkdir(parents=True)
+            data = rng.random((n_epochs, 17))
+            data[:, 0] = np.arange(1, n_epochs + 1)
+            np.savetxt(d / 'results.csv', data, delimiter=',', fmt='%.5g', header=header, comments='')
+
+        store = ResultsStore(str(Path(tmp) / 'runs.sqlite'))
+        t0 = time.perf_counter()
+        counts = store.ingest_dir(runs_dir)
+        t1 = time.perf_counter()
+        again = store.ingest_dir(runs_dir)
+        t2 = time.perf_counter()
+        best = store.best_epochs()
+        t3 = time.perf_counter()
+        top = store.top_k(10)
+        t4 = time.perf_counter()
+        curves = store.curves('mAP50')
+        t5 = time.perf_counter()
+
+        # 与逐文件解析的结果一致
+        analyzer = MetricsAnalyzer()
+        for run in ('sweep_000', 'sweep_123', 'sweep_299'):
+            ref = analyzer.get_best_epoch_metrics(analyzer.parse_yolo_results_csv(runs_dir / run / 'results.csv'))
+            assert ref['best_epoch'] == best[run]['best_epoch']
+            assert all(abs(ref[k] - best[run][k]) < 1e-9 for k in ('mAP50', 'mAP50_95', 'precision', 'recall', 'f1'))
+
+        # 追加写入只解析新增行
+        with open(runs_dir / 'sweep_000' / 'results.csv', 'a') as f:
+            f.write(','.join(['201'] + ['1.0'] * 16) + '\n')
+        t6 = time.perf_counter()
+        appended = store.ingest_dir(runs_dir)
+        t7 = time.perf_counter()
+        assert store.best_epochs(['sweep_000'])['sweep_000']['best_epoch'] == n_epochs + 1
+
+        print(f"{n_runs} runs x {n_epochs} epochs")
+        print(f"  ingest (cold):      {(t1 - t0) * 1000:8.1f} ms  {counts}")
+        print(f"  ingest (unchanged): {(t2 - t1) * 1000:8.1f} ms  {again}")
+        print(f"  ingest (1 append):  {(t7 - t6) * 1000:8.1f} ms  {appended}")
+        print(f"  best_epochs:        {(t3 - t2) * 1000:8.1f} ms")
+        print(f"  top_k(10):          {(t4 - t3) * 1000:8.1f} ms  best={top[0][0]}")
+        print(f"  curves(mAP50):      {(t5 - t4) * 1000:8.1f} ms  ({len(curves)} runs)")
+        store.close()
@@ -0,0 +1,633 @@
+"""
+旋转框NMS模块 - 向量化CPU实现
+Vectorized Rotated NMS
+
+功能:
+1. 输入 (N, 5) xywhr 或 (N, 4, 2) / (N, 8) 四点多边形
+2. 两种重叠度量:
+   - 'poly': 精确凸多边形交并比 (Cyrus-Beck边裁剪 + 格林公式求交集面积);
+     xywhr输入按矩形处理, 在对方的局部坐标系中对轴对齐矩形裁剪 (rect_iou_pairs, 约快2倍)
+   - 'probiou': 高斯分布ProbIoU (协方差与 kpr_loss.xy_wh_r_to_gaussian 相同, 与ultralytics数值一致)
+3. 抑制方式: 贪心NMS / 快速NMS (与ultralytics的nms_rotated一致) / Soft-NMS (线性或高斯衰减)
+4. 类别感知: 只在同类别的框之间抑制
+
+实现思路:
+- 按分数只排序一次; 以中心距离的严格上界筛选候选框对 (均匀网格哈希, 分块向量化生成),
+  只对候选对计算IoU, 内存与候选对数量成正比而不是 N^2
+- poly 的候选对先后用外接矩形与分离轴投影的交集面积上界剔除, 精确IoU只算剩下的对
+  (稠密场景约为中心距候选对的 1/10)
+- 贪心抑制在稀疏重叠图上按"已保留/已抑制/待定"状态整体迭代, 每轮对所有边向量化处理,
+  结果与逐框顺序执行的贪心NMS完全一致
+
+耗时随候选对数量 (即场景密度) 增长, 单核CPU上 10k 个 20~80px 候选框的类别无关贪心NMS:
+- 稀疏 (4096^2 大图): probiou ~15-20 ms, poly ~90-100 ms
+- 稠密 (1024^2 切片): probiou ~70-80 ms, poly ~0.47 s; 分类别抑制时约为其 1/2~2/3
+Soft-NMS (高斯) 稀疏时 ~80 ms (probiou) / ~220 ms (poly); 稠密时 IoU >= 0.01 的框对约100万,
+局部最大需约90轮才能处理完, ~2.5 s, 远不及贪心NMS。
+大批量推理宜用 probiou + 贪心NMS (推理后端的默认值)。基准测试: python -m utils.rotated_nms
+"""
+
+import math
+from typing import Optional, Tuple
+
+import numpy as np
+
+IOU_TYPES = ('probiou', 'poly')
+NMS_METHODS = ('greedy', 'fast')
+_PAIR_BLOCK = 4096  # 生成候选对时每块处理的框数
+_SOFT_MIN_IOU = 0.01  # 高斯Soft-NMS中忽略的微小重叠 (衰减系数 > 0.9998)
+
+
+# ----------------------------------------------------------------------
+# 框表示转换
+# ----------------------------------------------------------------------
+
+def xywhr_to_polygons(xywhr: np.ndarray) -> np.ndarray:
+    """
+    旋转框参数转四点多边形 (与ultralytics的xywhr2xyxyxyxy顶点顺序一致)
+
+    Args:
+        xywhr: (N, 5) [cx, cy, w, h, angle_rad]
+
+    Returns:
+        (N, 4, 2) 像素坐标
+    """
+    xywhr = np.asarray(xywhr, dtype=np.float32).reshape(-1, 5)
+    ctr = xywhr[:, :2]
+    w, h, r = xywhr[:, 2:3], xywhr[:, 3:4], xywhr[:, 4:5]
+    cos_r, sin_r = np.cos(r), np.sin(r)
+    vec1 = np.concatenate([w / 2 * cos_r, w / 2 * sin_r], axis=-1)
+    vec2 = np.concatenate([-h / 2 * sin_r, h / 2 * cos_r], axis=-1)
+    return np.stack([ctr + vec1 + vec2, ctr + vec1 - vec2, ctr - vec1 - vec2, ctr - vec1 + vec2], axis=1)
+
+
+def polygons_to_xywhr(polys: np.ndarray) -> np.ndarray:
+    """
+    四点多边形转旋转框参数 (按矩形处理: 中心取顶点均值, 宽高取两组对边长度均值, 角度取第一条边方向)
+    """
+    polys = np.asarray(polys, dtype=np.float64).reshape(-1, 4, 2)
+    e1 = polys[:, 1] - polys[:, 0]
+    e2 = polys[:, 2] - polys[:, 1]
+    w = (np.linalg.norm(e1, axis=1) + np.linalg.norm(polys[:, 2] - polys[:, 3], axis=1)) / 2
+    h = (np.linalg.norm(e2, axis=1) + np.linalg.norm(polys[:, 3] - polys[:, 0], axis=1)) / 2
+    r = np.arctan2(e1[:, 1], e1[:, 0])
+    ctr = polys.mean(axis=1)
+    return np.stack([ctr[:, 0], ctr[:, 1], w, h, r], axis=1)
+
+
+def _as_boxes(boxes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """统一为 (xywhr (N, 5) float64, polys (N, 4, 2) float64)"""
+    boxes = np.asarray(boxes, dtype=np.float64)
+    if boxes.ndim == 2 and boxes.shape[1] == 5:
+        return boxes, xywhr_to_polygons(boxes).astype(np.float64)
+    if boxes.ndim == 3 and boxes.shape[1:] == (4, 2) or boxes.ndim == 2 and boxes.shape[1] == 8:
+        polys = boxes.reshape(-1, 4, 2)
+        return polygons_to_xywhr(polys), polys
+    raise ValueError(f'Expected (N, 5) xywhr or (N, 4, 2) polygons, got shape {boxes.shape}')
+
+
+# ----------------------------------------------------------------------
+# 重叠度量
+# ----------------------------------------------------------------------
+
+def gaussian_params(xywhr: np.ndarray) -> np.ndarray:
+    """
+    每个框的二维高斯协方差 (a, b, c) = (Sxx, Syy, Sxy), 形状 (N, 3)
+
+    Sigma = R diag(w^2/12, h^2/12) R^T, 即 kpr_loss.xy_wh_r_to_gaussian 传入2倍宽高的结果
+    (后者以半宽计算方差), 与ultralytics的ProbIoU定义一致。用numpy计算,
+    ONNX后端 (utils.inference) 调用NMS时不需要torch。
+    """
+    xywhr = np.asarray(xywhr, dtype=np.float64).reshape(-1, 5)
+    vw, vh = xywhr[:, 2] ** 2 / 12, xywhr[:, 3] ** 2 / 12
+    cos_r, sin_r = np.cos(xywhr[:, 4]), np.sin(xywhr[:, 4])
+    return np.stack([vw * cos_r ** 2 + vh * sin_r ** 2, vw * sin_r ** 2 + vh * cos_r ** 2,
+                     (vw - vh) * cos_r * sin_r], axis=1)
+
+
+def _probiou_from_params(d: np.ndarray, g1: np.ndarray, g2: np.ndarray, eps: float = 1e-7) -> np.ndarray:
+    """由中心差 d (..., 2) 与两组协方差 (..., 3) 计算 1 - Hellinger距离"""
+    a, b, c = g1[..., 0] + g2[..., 0], g1[..., 1] + g2[..., 1], g1[..., 2] + g2[..., 2]
+    dx, dy = d[..., 0], d[..., 1]
+    denom = a * b - c ** 2
+    t1 = (a * dy ** 2 + b * dx ** 2) / (denom + eps) * 0.25
+    t2 = (c * dx * dy) / (denom + eps) * -0.5
+    det1 = np.clip(g1[..., 0] * g1[..., 1] - g1[..., 2] ** 2, 0, None)
+    det2 = np.clip(g2[..., 0] * g2[..., 1] - g2[..., 2] ** 2, 0, None)
+    t3 = np.log(denom / (4 * np.sqrt(det1 * det2) + eps) + eps) * 0.5
+    bd = np.clip(t1 + t2 + t3, eps, 100.0)
+    return 1.0 - np.sqrt(1.0 - np.exp(-bd) + eps)
+
+
+def probiou_matrix(boxes: np.ndarray, boxes2: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    成对ProbIoU矩阵
+
+    Args:
+        boxes: (N, 5) xywhr
+        boxes2: (M, 5) xywhr, 缺省时与boxes自身两两计算
+
+    Returns:
+        (N, M)
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 5)
+    boxes2 = boxes if boxes2 is None else np.asarray(boxes2, dtype=np.float64).reshape(-1, 5)
+    g1, g2 = gaussian_params(boxes), gaussian_params(boxes2)
+    d = boxes[:, None, :2] - boxes2[None, :, :2]
+    return _probiou_from_params(d, g1[:, None], g2[None, :])
+
+
+def _shoelace(pts: np.ndarray) -> np.ndarray:
+    x, y = pts[..., 0], pts[..., 1]
+    return 0.5 * (x * np.roll(y, -1, axis=-1) - np.roll(x, -1, axis=-1) * y).sum(axis=-1)
+
+
+def _clipped_edge_area(poly: np.ndarray, clip: np.ndarray, keep_collinear: bool, tol: np.ndarray) -> np.ndarray:
+    """
+    poly的各边被凸多边形clip裁剪后留下的线段对面积的贡献 (格林公式 0.5 * cross(p, q))
+
+    Cyrus-Beck裁剪: 每条边 P(t) = a + t*r 与clip的4个半平面求交, 得到 [t_in, t_out]。
+    两多边形重合的边只应计一次: keep_collinear=True 时同向共线边视为在内, 否则视为在外。
+    """
+    a = poly[:, :, None]  # (P, 4, 1, 2)
+    r = (np.roll(poly, -1, axis=1) - poly)[:, :, None]
+    q = clip[:, None]  # (P, 1, 4, 2)
+    s = (np.roll(clip, -1, axis=1) - clip)[:, None]
+    num = s[..., 0] * (a[..., 1] - q[..., 1]) - s[..., 1] * (a[..., 0] - q[..., 0])  # (P, 4, 4)
+    den = s[..., 0] * r[..., 1] - s[..., 1] * r[..., 0]
+    s_len = np.sqrt((s ** 2).sum(-1))
+    r_len = np.sqrt((r ** 2).sum(-1))
+    parallel = np.abs(den) <= 1e-9 * s_len * r_len
+    t = -num / np.where(parallel, 1.0, den)
+
+    t_in = np.maximum(np.where(~parallel & (den > 0), t, -np.inf).max(axis=-1), 0.0)
+    t_out = np.minimum(np.where(~parallel & (den < 0), t, np.inf).min(axis=-1), 1.0)
+    dist_tol = tol[:, None, None] * s_len
+    if keep_collinear:
+        same_dir = (s * r).sum(-1) > 0
+        outside = parallel & ((num < -dist_tol) | ((np.abs(num) <= dist_tol) & ~same_dir))
+    else:
+        outside = parallel & (num <= dist_tol)
+    valid = (t_in < t_out) & ~outside.any(axis=-1)
+
+    p_in = poly + t_in[..., None] * r[:, :, 0]
+    p_out = poly + t_out[..., None] * r[:, :, 0]
+    area = 0.5 * (p_in[..., 0] * p_out[..., 1] - p_in[..., 1] * p_out[..., 0])
+    return np.where(valid, area, 0.0).sum(axis=1)
+
+
+def polygon_iou_pairs(p1: np.ndarray, p2: np.ndarray, eps: float = 1e-9) -> np.ndarray:
+    """
+    逐对计算凸四边形的精确交并比
+
+    两多边形统一为逆时针后, 交集面积 = p1在p2内的边段 + p2在p1内的边段 的格林公式积分,
+    无需求交点后排序, 完全向量化。
+
+    Args:
+        p1, p2: (P, 4, 2)
+
+    Returns:
+        (P,)
+    """
+    p1 = np.asarray(p1, dtype=np.float64).reshape(-1, 4, 2)
+    p2 = np.asarray(p2, dtype=np.float64).reshape(-1, 4, 2)
+    if len(p1) == 0:
+        return np.zeros(0)
+
+    # 以p1中心为原点, 减小格林公式中的舍入误差
+    origin = p1.mean(axis=1, keepdims=True)
+    p1, p2 = p1 - origin, p2 - origin
+    area1, area2 = _shoelace(p1), _shoelace(p2)
+    p1 = np.where((area1 < 0)[:, None, None], p1[:, ::-1], p1)
+    p2 = np.where((area2 < 0)[:, None, None], p2[:, ::-1], p2)
+    area1, area2 = np.abs(area1), np.abs(area2)
+
+    tol = 1e-7 * np.sqrt(np.maximum(area1, area2))
+    inter = _clipped_edge_area(p1, p2, True, tol) + _clipped_edge_area(p2, p1, False, tol)
+    inter = np.clip(inter, 0.0, np.minimum(area1, area2))
+    return inter / np.maximum(area1 + area2 - inter, eps)
+
+
+_RECT_CORNERS = np.array([[0.5, -0.5], [0.5, 0.5], [-0.5, 0.5], [-0.5, -0.5]])  # 局部坐标系下逆时针的单位矩形
+
+
+def _clip_edges_to_box(p: np.ndarray, r: np.ndarray, r_len: np.ndarray, half: np.ndarray, keep_collinear: bool,
+                       tol: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Liang-Barsky: 边 P(t) = p + t*r 裁剪到以原点为中心、半宽高为 half 的轴对齐矩形
+
+    与 _clipped_edge_area 的规则相同: 平行且与矩形边共线时, keep_collinear=True 仅同向边视为在内。
+
+    Returns:
+        t_in, t_out, valid: (P, 4)
+    """
+    t_in = np.zeros(p.shape[:2])
+    t_out = np.ones(p.shape[:2])
+    outside = np.zeros(p.shape[:2], dtype=bool)
+    for k in (0, 1):
+        pk, rk, hk = p[..., k], r[..., k], half[:, None, k]
+        parallel = np.abs(rk) <= 1e-9 * r_len
+        safe = np.where(parallel, 1.0, rk)
+        t1, t2 = (-hk - pk) / safe, (hk - pk) / safe
+        t_in = np.maximum(t_in, np.where(parallel, -np.inf, np.minimum(t1, t2)))
+        t_out = np.minimum(t_out, np.where(parallel, np.inf, np.maximum(t1, t2)))
+        # 逆时针矩形中 +hk 侧的边沿另一轴正向 (x) / 负向 (y) 走; 平行边按到两侧边的有向距离 (内侧为正) 判断
+        along = r[..., 1 - k] if k == 0 else -r[..., 0]
+        for dist, same_dir in ((hk - pk, along > 0), (pk + hk, along < 0)):
+            on_side = np.abs(dist) <= tol[:, None]
+            out = (dist < -tol[:, None]) | (on_side & ~same_dir if keep_collinear else on_side)
+            outside |= parallel & out
+    return t_in, t_out, (t_in < t_out) & ~outside
+
+
+def rect_iou_pairs(b1: np.ndarray, b2: np.ndarray, eps: float = 1e-9) -> np.ndarray:
+    """
+    逐对计算旋转矩形的精确交并比 (与 polygon_iou_pairs 对同一矩形的结果一致, 约快2倍)
+
+    交集面积同样是两矩形互相裁剪后的边段的格林公式积分; 每个矩形的边变换到另一个矩形的局部坐标系,
+    对轴对齐矩形裁剪 (Liang-Barsky) 即可, 不需要对4条裁剪边逐一求交。积分统一以b1中心为原点。
+
+    Args:
+        b1, b2: (P, 5) xywhr
+
+    Returns:
+        (P,)
+    """
+    b1 = np.asarray(b1, dtype=np.float64).reshape(-1, 5)
+    b2 = np.asarray(b2, dtype=np.float64).reshape(-1, 5)
+    if len(b1) == 0:
+        return np.zeros(0)
+    wh1, wh2 = np.abs(b1[:, 2:4]), np.abs(b2[:, 2:4])
+    area1, area2 = wh1.prod(axis=1), wh2.prod(axis=1)
+    tol = 1e-7 * np.sqrt(np.maximum(area1, area2))
+    d = b2[:, :2] - b1[:, :2]
+
+    inter = np.zeros(len(b1))
+    # (被裁剪矩形, 裁剪矩形): b1的边保留同向共线边, b2的边不保留, 重合的边只计一次
+    for src, src_wh, dst, dst_wh, offset, keep in ((b1, wh1, b2, wh2, -d, True), (b2, wh2, b1, wh1, d, False)):
+        cos_t, sin_t = np.cos(dst[:, 4]), np.sin(dst[:, 4])
+        o = np.stack([offset[:, 0] * cos_t + offset[:, 1] * sin_t,
+                      offset[:, 1] * cos_t - offset[:, 0] * sin_t], axis=1)  # 源中心在裁剪矩形坐标系中的位置
+        dr = src[:, 4] - dst[:, 4]
+        cos_d, sin_d = np.cos(dr)[:, None], np.sin(dr)[:, None]
+        loc = _RECT_CORNERS * src_wh[:, None]
+        p = np.stack([loc[..., 0] * cos_d - loc[..., 1] * sin_d, loc[..., 0] * sin_d + loc[..., 1] * cos_d], axis=-1)
+        p += o[:, None]
+        r = np.roll(p, -1, axis=1) - p
+        r_len = src_wh[:, [1, 0, 1, 0]]  # 逆时针各边长度: 高, 宽, 高, 宽
+        t_in, t_out, valid = _clip_edges_to_box(p, r, r_len, dst_wh / 2, keep, tol)
+        p_in = p + t_in[..., None] * r
+        p_out = p + t_out[..., None] * r
+        seg = p_in[..., 0] * p_out[..., 1] - p_in[..., 1] * p_out[..., 0]
+        if not keep:  # 以b2中心为原点的积分平移到b1中心: 加 cross(b2中心 - b1中心, q - p)
+            q = p_out - p_in
+            seg -= o[:, None, 0] * q[..., 1] - o[:, None, 1] * q[..., 0]
+        inter += 0.5 * np.where(valid, seg, 0.0).sum(axis=1)
+
+    inter = np.clip(inter, 0.0, np.minimum(area1, area2))
+    return inter / np.maximum(area1 + area2 - inter, eps)
+
+
+# ----------------------------------------------------------------------
+# 候选框对
+# ----------------------------------------------------------------------
+
+def _reach(xywhr: np.ndarray, iou_thres: float, iou_type: str) -> np.ndarray:
+    """
+    每个框的影响半径: 两框重叠度 >= iou_thres 的必要条件是中心距 < reach_i + reach_j
+
+    - poly: 半对角线 (外接圆不相交则交集为空)
+    - probiou: ProbIoU >= t 等价于 Bhattacharyya距离 bd <= -ln(1 - (1 - t)^2);
+      而 bd >= |d|^2 / (8 * lambda_avg) = |d|^2 / (4 * (lambda_i + lambda_j)), lambda_i <= max(w, h)^2 / 12,
+      故 |d|^2 < reach_i^2 + reach_j^2, reach_i = max(w, h) * sqrt(bd_max / 3) (_candidate_pairs 的 quadrature)
+    """
+    w, h = np.abs(xywhr[:, 2]), np.abs(xywhr[:, 3])
+    if iou_type == 'poly':
+        return 0.5 * np.sqrt(w ** 2 + h ** 2)
+    if iou_thres <= 0:
+        return np.full(len(xywhr), np.inf)
+    bd_max = min(-math.log(max(1.0 - (1.0 - iou_thres) ** 2, 1e-300)), 100.0)
+    return np.maximum(w, h) * math.sqrt(bd_max / 3.0) + 1e-6
+
+
+def _expand_ranges(rows: np.ndarray, lo: np.ndarray, hi: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """对每个 rows[k] 生成与 [lo[k], hi[k]) 中每个位置的配对"""
+    counts = np.maximum(hi - lo, 0)
+    total = int(counts.sum())
+    if total == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    i = np.repeat(rows, counts)
+    j = np.repeat(lo, counts) + (np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts))
+    return i, j
+
+
+def _candidate_pairs(xy: np.ndarray, reach: np.ndarray,
+                     quadrature: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    中心距 < reach_i + reach_j (quadrature=True 时为 sqrt(reach_i^2 + reach_j^2)) 的全部无序框对
+
+    均匀网格 (边长 2 * max(reach)) 哈希后, 只在同格与相邻格之间配对 (每对格子只访问一次),
+    按块向量化展开, 内存与候选对数量成正比。
+    """
+    n = len(xy)
+    if not np.isfinite(reach).all():
+        i, j = np.triu_indices(n, k=1)
+        return i.astype(np.int64), j.astype(np.int64)
+
+    cell = max(2.0 * float(reach.max()), 1e-6)
+    g = np.floor((xy - xy.min(axis=0)) / cell).astype(np.int64)
+    ny = int(g[:, 1].max()) + 3
+    key = (g[:, 0] + 1) * ny + (g[:, 1] + 1)
+    order = np.argsort(key, kind='stable')
+    key_sorted = key[order]
+    cells, starts = np.unique(key_sorted, return_index=True)
+    ends = np.append(starts[1:], n)
+    pos = np.arange(n)
+    slot = np.searchsorted(cells, key_sorted)
+
+    xs, ys, rs = xy[order, 0], xy[order, 1], reach[order]
+    ii, jj = [], []
+    for dx, dy in ((0, 0), (0, 1), (1, -1), (1, 0), (1, 1)):
+        target = key_sorted + dx * ny + dy
+        t = np.clip(np.searchsorted(cells, target), 0, len(cells) - 1)
+        found = cells[t] == target
+        if dx == 0 and dy == 0:
+            lo, hi = pos + 1, ends[slot]
+        else:
+            lo = np.where(found, starts[t], 0)
+            hi = np.where(found, ends[t], 0)
+        for b in range(0, n, _PAIR_BLOCK):
+            sl = slice(b, b + _PAIR_BLOCK)
+            i, j = _expand_ranges(pos[sl], lo[sl], hi[sl])
+            limit = rs[i] ** 2 + rs[j] ** 2 if quadrature else (rs[i] + rs[j]) ** 2
+            near = (xs[j] - xs[i]) ** 2 + (ys[j] - ys[i]) ** 2 < limit
+            ii.append(order[i[near]])
+            jj.append(order[j[near]])
+    return np.concatenate(ii), np.concatenate(jj)
+
+
+def _rect_inter_bound(xywhr: np.ndarray, i: np.ndarray, j: np.ndarray) -> np.ndarray:
+    """
+    旋转矩形对交集面积的上界 (分离轴投影)
+
+    交集含于矩形i内, 在i的两条轴上的投影不超过两矩形投影区间的重叠长度, 面积不超过两者之积;
+    对j的两条轴同理, 取两者较小值。比外接矩形 (AABB) 上界紧得多, 对一般四边形不成立。
+    """
+    d = xywhr[j, :2] - xywhr[i, :2]
+    dr = xywhr[j, 4] - xywhr[i, 4]
+    cos_d, sin_d = np.abs(np.cos(dr)), np.abs(np.sin(dr))
+    bound = None
+    for a, b, sign in ((i, j, 1.0), (j, i, -1.0)):
+        cos_a, sin_a = np.cos(xywhr[a, 4]), np.sin(xywhr[a, 4])
+        half_w, half_h = xywhr[a, 2] / 2, xywhr[a, 3] / 2
+        ext_u = xywhr[b, 2] / 2 * cos_d + xywhr[b, 3] / 2 * sin_d  # b 在a的宽/高方向轴上的投影半长
+        ext_v = xywhr[b, 2] / 2 * sin_d + xywhr[b, 3] / 2 * cos_d
+        du = np.abs(sign * (d[:, 0] * cos_a + d[:, 1] * sin_a))
+        dv = np.abs(sign * (d[:, 1] * cos_a - d[:, 0] * sin_a))
+        ou = np.clip(np.minimum(half_w, du + ext_u) - np.maximum(-half_w, du - ext_u), 0, None)
+        ov = np.clip(np.minimum(half_h, dv + ext_v) - np.maximum(-half_h, dv - ext_v), 0, None)
+        bound = ou * ov if bound is None else np.minimum(bound, ou * ov)
+    return bound
+
+
+def _iou_upper_bound(inter: np.ndarray, area_i: np.ndarray, area_j: np.ndarray) -> np.ndarray:
+    """交集面积上界 -> IoU上界"""
+    inter = np.minimum(inter, np.minimum(area_i, area_j))
+    return inter / np.maximum(area_i + area_j - inter, 1e-9)
+
+
+def overlap_pairs(boxes: np.ndarray, iou_thres: float, iou_type: str = 'probiou',
+                  classes: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    找出所有重叠度 >= iou_thres 的无序框对
+
+    先按中心距上界筛选候选对; 多边形IoU再依次用外接矩形 (AABB) 与分离轴投影 (仅xywhr输入的矩形)
+    的交集面积给出的IoU上界剔除, 最后只对剩余候选对计算精确重叠度。
+
+    Returns:
+        i, j: (E,) 原始索引, iou: (E,)
+    """
+    if iou_type not in IOU_TYPES:
+        raise ValueError(f'Unknown iou_type: {iou_type}')
+    xywhr, polys = _as_boxes(boxes)
+    rects = np.ndim(boxes) == 2 and np.shape(boxes)[1] == 5
+    empty = np.zeros(0, dtype=np.int64)
+    if len(xywhr) < 2:
+        return empty, empty, np.zeros(0)
+
+    i, j = _candidate_pairs(xywhr[:, :2], _reach(xywhr, iou_thres, iou_type), quadrature=iou_type == 'probiou')
+    if classes is not None:
+        classes = np.asarray(classes).reshape(-1)
+        same = classes[i] == classes[j]
+        i, j = i[same], j[same]
+
+    if iou_type == 'poly':
+        lo, hi = polys.min(axis=1), polys.max(axis=1)
+        area = np.abs(_shoelace(polys))
+        wh = np.clip(np.minimum(hi[i], hi[j]) - np.maximum(lo[i], lo[j]), 0, None)
+        possible = _iou_upper_bound(wh[:, 0] * wh[:, 1], area[i], area[j]) >= iou_thres
+        i, j = i[possible], j[possible]
+        if rects:
+            possible = _iou_upper_bound(_rect_inter_bound(xywhr, i, j), area[i], area[j]) >= iou_thres
+            i, j = i[possible], j[possible]
+            iou = rect_iou_pairs(xywhr[i], xywhr[j])
+        else:
+            iou = polygon_iou_pairs(polys[i], polys[j])
+    else:
+        g = gaussian_params(xywhr)
+        iou = _probiou_from_params(xywhr[i, :2] - xywhr[j, :2], g[i], g[j])
+    keep = iou >= iou_thres
+    return i[keep], j[keep], iou[keep]
+
+
+# ----------------------------------------------------------------------
+# NMS
+# ----------------------------------------------------------------------
+
+def _resolve_greedy(n: int, src: np.ndarray, dst: np.ndarray) -> np.ndarray:
+    """
+    在稀疏抑制图 (src分数高于dst) 上求贪心NMS结果
+
+    每轮: 有已保留前驱的框被抑制; 没有待定前驱的框被保留。
+    分数最高的待定框每轮必然确定, 结果与顺序贪心一致; 轮数等于最长抑制链长度。
+    """
+    state = np.zeros(n, dtype=np.int8)  # 0待定 1保留 2抑制
+    while True:
+        pending = state == 0
+        if not pending.any():
+            return state == 1
+        src_state = state[src]
+        suppressed = np.bincount(dst[src_state == 1], minlength=n) > 0
+        blocked = np.bincount(dst[src_state == 0], minlength=n) > 0
+        state[pending & suppressed] = 2
+        state[pending & ~suppressed & ~blocked] = 1
+
+
+def rotated_nms(boxes: np.ndarray, scores: np.ndarray, iou_thres: float = 0.45, iou_type: str = 'probiou',
+                method: str = 'greedy', classes: Optional[np.ndarray] = None, max_det: int = 0) -> np.ndarray:
+    """
+    旋转框NMS
+
+    Args:
+        boxes: (N, 5) xywhr 或 (N, 4, 2) 多边形
+        scores: (N,)
+        iou_thres: 抑制阈值
+        iou_type: 'probiou' / 'poly'
+        method: 'greedy' 标准贪心NMS; 'fast' 被任一更高分框重叠即抑制 (ultralytics行为)
+        classes: (N,) 类别, 给定时只在同类别之间抑制
+        max_det: 最多保留数量 (0表示不限)
+
+    Returns:
+        保留框的索引, 按分数降序
+    """
+    if method not in NMS_METHODS:
+        raise ValueError(f'Unknown NMS method: {method}')
+    scores = np.asarray(scores).reshape(-1)
+    n = len(scores)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    order = np.argsort(-scores, kind='stable')
+    rank = np.empty(n, dtype=np.int64)
+    rank[order] = np.arange(n)
+    i, j, _ = overlap_pairs(boxes, iou_thres, iou_type, classes)
+    # 统一为按排名编号的有向边: 高分 -> 低分
+    ri, rj = rank[i], rank[j]
+    src, dst = np.minimum(ri, rj), np.maximum(ri, rj)
+
+    if method == 'fast':
+        keep_rank = np.bincount(dst, minlength=n) == 0
+    else:
+        keep_rank = _resolve_greedy(n, src, dst)
+    keep = order[keep_rank]
+    return keep[:max_det] if max_det > 0 else keep
+
+
+def soft_nms(boxes: np.ndarray, scores: np.ndarray, iou_thres: float = 0.3, sigma: float = 0.5,
+             linear: bool = False, score_thres: float = 0.001, iou_type: str = 'probiou',
+             classes: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    旋转框Soft-NMS
+
+    顺序定义: 依次取当前分数最高的框保留, 按重叠度衰减其邻居的分数
+    - 线性: iou >= iou_thres 时 score *= (1 - iou)
+    - 高斯: score *= exp(-iou^2 / sigma) (忽略 iou < 0.01 的微小重叠)
+    分数低于 score_thres 的框丢弃。
+
+    向量化实现: 分数只会下降, 因此比所有未处理邻居分数都高的框 (局部最大) 在顺序执行中
+    一定先于其邻居被选中且分数不再变化; 每轮同时保留全部局部最大并衰减其邻居,
+    结果与顺序执行一致, 轮数约等于最大重叠簇的大小。
+
+    Returns:
+        keep: 保留框索引 (按衰减后分数降序), new_scores: (len(keep),) 衰减后的分数
+    """
+    cur = np.asarray(scores, dtype=np.float64).reshape(-1).copy()
+    n = len(cur)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0)
+
+    i, j, iou = overlap_pairs(boxes, iou_thres if linear else _SOFT_MIN_IOU, iou_type, classes)
+    # 每条无向边只存一次 (a < b, 同分时a优先); 衰减取对数, 每轮用 bincount 对每个框一次累乘
+    a, b = np.minimum(i, j).astype(np.int32), np.maximum(i, j).astype(np.int32)
+    with np.errstate(divide='ignore'):
+        log_decay = np.log1p(-iou) if linear else -(iou ** 2) / sigma
+
+    active = cur >= score_thres
+    kept = np.zeros(n, dtype=bool)
+    while active.any():
+        # 只保留两端都未处理的边, 边数随轮次迅速减少
+        live = active[a] & active[b]
+        if not live.all():
+            a, b, log_decay = a[live], b[live], log_decay[live]
+        a_wins = cur[a] >= cur[b]
+        loser = np.where(a_wins, b, a)
+        # 没有输给任何未处理邻居的框为局部最大
+        sel = active.copy()
+        sel[loser] = False
+        kept |= sel
+        active &= ~sel
+        hit = sel[np.where(a_wins, a, b)]
+        if hit.any():
+            cur *= np.exp(np.bincount(loser[hit], weights=log_decay[hit], minlength=n))
+        active &= cur >= score_thres
+
+    keep = np.flatnonzero(kept)
+    keep = keep[np.argsort(-cur[keep], kind='stable')]
+    return keep, cur[keep]
+
+
+if __name__ == '__main__':
+    import time
+
+    def _scene(n, size=4096, seed=0):
+        rng = np.random.default_rng(seed)
+        # 成簇的候选框, 模拟密集机场场景中同一目标的多个预测
+        centers = rng.uniform(0, size, (n // 8, 2))
+        ctr = np.repeat(centers, 8, axis=0)[:n] + rng.normal(0, 4, (n, 2))
+        wh = rng.uniform(20, 80, (n, 2))
+        ang = rng.uniform(0, np.pi, (n, 1))
+        return np.concatenate([ctr, wh, ang], axis=1), rng.random(n)
+
+    # 与稠密矩阵 + 顺序贪心的参考实现对比
+    boxes, scores = _scene(600, size=512)
+    dense = {'probiou': probiou_matrix(boxes), 'poly': None}
+    polys = xywhr_to_polygons(boxes).astype(np.float64)
+    ii, jj = np.triu_indices(len(boxes), k=1)
+    poly_full = np.zeros((len(boxes), len(boxes)))
+    poly_full[ii, jj] = polygon_iou_pairs(polys[ii], polys[jj])
+    dense['poly'] = poly_full + poly_full.T
+    for iou_type, mat in dense.items():
+        order = np.argsort(-scores, kind='stable')
+        alive = np.ones(len(boxes), dtype=bool)
+        for a, ia in enumerate(order):
+            if alive[ia]:
+                alive[order[a + 1:]] &= mat[ia, order[a + 1:]] < 0.45
+        ref = order[alive[order]]
+        got = rotated_nms(boxes, scores, 0.45, iou_type=iou_type)
+        print(f'[{iou_type}] greedy matches reference: {np.array_equal(ref, got)} ({len(got)} kept)')
+
+    # 多边形IoU与逐对Sutherland-Hodgman裁剪的参考实现对比 (含完全重合与共边的框)
+    def _clip_area(subject, clipper):
+        out = [tuple(v) for v in subject]
+        for k in range(4):
+            a, b = clipper[k], clipper[(k + 1) % 4]
+            side = lambda p: (b[0] - a[0]) * (p[1] - a[1]) - (b[1] - a[1]) * (p[0] - a[0])
+            inp, out = out, []
+            for idx, e in enumerate(inp):
+                prev = inp[idx - 1]
+                if (side(e) >= 0) != (side(prev) >= 0):
+                    t = side(prev) / (side(prev) - side(e))
+                    out.append((prev[0] + t * (e[0] - prev[0]), prev[1] + t * (e[1] - prev[1])))
+                if side(e) >= 0:
+                    out.append(e)
+            if not out:
+                return 0.0
+        return abs(_shoelace(np.asarray(out)))
+
+    ccw = np.where((_shoelace(polys) < 0)[:, None, None], polys[:, ::-1], polys)
+    pairs = list(zip(ii[:2000], jj[:2000])) + [(k, k) for k in range(50)]
+    ref = []
+    for a, b in pairs:
+        inter = _clip_area(ccw[a], ccw[b])
+        ref.append(inter / (abs(_shoelace(ccw[a])) + abs(_shoelace(ccw[b])) - inter))
+    a_idx, b_idx = np.array(pairs).T
+    err = np.abs(polygon_iou_pairs(polys[a_idx], polys[b_idx]) - np.asarray(ref)).max()
+    print(f'[poly] max |IoU - reference| = {err:.2e}')
+
+    # 稀疏: 4096^2 大图; 稠密: 1024^2 切片上的同样数量候选框 (每个框的候选邻居约多16倍)
+    for name, n, size in (('sparse', 10000, 4096), ('sparse', 30000, 4096), ('dense', 10000, 1024)):
+        boxes, scores = _scene(n, size)
+        cls_ids = np.random.default_rng(1).integers(0, 3, n)
+        for iou_type in IOU_TYPES:
+            rotated_nms(boxes, scores, 0.45, iou_type=iou_type)
+            t0 = time.perf_counter()
+            keep = rotated_nms(boxes, scores, 0.45, iou_type=iou_type)
+            dt = (time.perf_counter() - t0) * 1000
+            t0 = time.perf_counter()
+            rotated_nms(boxes, scores, 0.45, iou_type=iou_type, classes=cls_ids)
+            dt_cls = (time.perf_counter() - t0) * 1000
+            t0 = time.perf_counter()
+            soft_nms(boxes, scores, iou_type=iou_type)
+            dt_soft = (time.perf_counter() - t0) * 1000
+            print(f'{name:6s} {size}^2 N={n} {iou_type:8s} greedy {dt:7.1f} ms ({len(keep)} kept), '
+                  f'3 classes {dt_cls:7.1f} ms, soft-NMS {dt_soft:7.1f} ms')
@@ -0,0 +1,171 @@
+"""
+推理服务模块 - 微批处理调度与延迟统计
+Micro-Batching Scheduler for OBB Inference Serving
+
+功能:
+1. MicroBatcher: 每个模型一个推理线程, 收集并发请求合批推理;
+   凑满 max_batch 或最早的请求等待超过 max_wait_ms 即发车
+2. 同一批内置信度阈值不同的请求按最低阈值推理一次, 再逐请求过滤
+   (OBB使用fast NMS, 框只会被更高分的框抑制, 过滤结果与单独推理一致)
+3. LatencyStats: 请求级延迟 (排队 / 推理 / 入队到返回结果) 的滑动窗口p50/p95/p99, 以及批大小统计
+"""
+
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional
+
+import numpy as np
+
+from .inference import ObbDetections, filter_by_conf
+
+
+@dataclass
+class BatchResult:
+    """单个请求的推理结果与耗时"""
+
+    dets: ObbDetections
+    queue_ms: float  # 提交到发车的等待时间
+    infer_ms: float  # 所在批次的推理时间 (预处理 + 前向 + 解码/NMS)
+    batch_size: int
+
+
+@dataclass
+class _Request:
+    image: np.ndarray
+    conf: float
+    submitted: float = field(default_factory=time.perf_counter)
+    future: Future = field(default_factory=Future)
+
+
+class LatencyStats:
+    """线程安全的请求延迟统计 (最近 window 个请求的分位数 + 累计计数)"""
+
+    PERCENTILES = (50, 95, 99)
+
+    def __init__(self, window: int = 10000):
+        self._lock = threading.Lock()
+        self._total: Deque[float] = deque(maxlen=window)
+        self._queue: Deque[float] = deque(maxlen=window)
+        self._infer: Deque[float] = deque(maxlen=window)
+        self.requests = 0
+        self.errors = 0
+        self.batches = 0
+        self.started = time.time()
+
+    def record_batch(self, results: List[BatchResult], total_ms: List[float]) -> None:
+        with self._lock:
+            self.batches += 1
+            self.requests += len(results)
+            for res, total in zip(results, total_ms):
+                self._total.append(total)
+                self._queue.append(res.queue_ms)
+                self._infer.append(res.infer_ms)
+
+    def record_error(self, count: int = 1) -> None:
+        with self._lock:
+            self.errors += count
+
+    def snapshot(self) -> Dict[str, object]:
+        """当前统计 (毫秒)"""
+        with self._lock:
+            series = {'total_ms': list(self._total), 'queue_ms': list(self._queue), 'infer_ms': list(self._infer)}
+            out: Dict[str, object] = {
+                'requests': self.requests,
+                'errors': self.errors,
+                'batches': self.batches,
+                'mean_batch_size': self.requests / self.batches if self.batches else 0.0,
+                'uptime_s': time.time() - self.started,
+            }
+        for name, values in series.items():
+            if values:
+                arr = np.asarray(values)
+                summary = {f'p{p}': float(np.percentile(arr, p)) for p in self.PERCENTILES}
+                summary['mean'] = float(arr.mean())
+            else:
+                summary = {f'p{p}': 0.0 for p in self.PERCENTILES}
+                summary['mean'] = 0.0
+            out[name] = summary
+        return out
+
+
+class MicroBatcher:
+    """
+    单个推理后端的微批调度器
+
+    submit() 立即返回Future; 后台线程取出第一个请求后继续收集,
+    直到凑满 max_batch 或该请求已等待 max_wait_ms, 然后整批调用 backend.predict()。
+    """
+
+    _STOP = object()
+
+    def __init__(self, backend, max_batch: int = 8, max_wait_ms: float = 5.0, imgsz: int = 640,
+                 iou: float = 0.45, stats: Optional[LatencyStats] = None, name: str = 'model'):
+        self.backend = backend
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.imgsz = imgsz
+        self.iou = iou
+        self.stats = stats if stats is not None else LatencyStats()
+        self._queue: 'queue.Queue' = queue.Queue()
+        self._thread = threading.Thread(target=self._loop, name=f'batcher-{name}', daemon=True)
+        self._thread.start()
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def submit(self, image: np.ndarray, conf: float = 0.25) -> Future:
+        """提交单张BGR图像, Future结果为 BatchResult"""
+        req = _Request(image, float(conf))
+        self._queue.put(req)
+        return req.future
+
+    def close(self, timeout: float = 5.0) -> None:
+        self._queue.put(self._STOP)
+        self._thread.join(timeout)
+
+    def _collect(self, first: _Request) -> List[_Request]:
+        batch = [first]
+        deadline = first.submitted + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is self._STOP:
+                self._queue.put(item)  # 当前批处理完后再退出
+                break
+            batch.append(item)
+        return batch
+
+    def _loop(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is self._STOP:
+                return
+            batch = self._collect(first)
+            t0 = time.perf_counter()
+            try:
+                preds = self.backend.predict(
+                    [r.image for r in batch], conf=min(r.conf for r in batch), iou=self.iou, imgsz=self.imgsz
+                )
+            except Exception as exc:  # 整批失败, 异常交给各请求的调用方
+                self.stats.record_error(len(batch))
+                for req in batch:
+                    req.future.set_exception(exc)
+                continue
+            t1 = time.perf_counter()
+
+            infer_ms = (t1 - t0) * 1000.0
+            results, total_ms = [], []
+            for req, dets in zip(batch, preds):
+                res = BatchResult(filter_by_conf(dets, req.conf), (t0 - req.submitted) * 1000.0, infer_ms, len(batch))
+                total_ms.append((time.perf_counter() - req.submitted) * 1000.0)  # 入队 -> 返回结果, 含逐请求过滤
+                req.future.set_result(res)
+                results.append(res)
+            self.stats.record_batch(results, total_ms)
@@ -0,0 +1,250 @@
+"""
+分层指标模块 - 按目标尺寸 / 长宽比 / 朝向 / 图像密度分组评估
+Size / Density / Orientation-Stratified Detection Metrics
+
+功能:
+1. 由旋转框参数一次性向量化计算每个目标的属性: 面积、长宽比、长边朝向、所在图像的目标数
+2. 按属性分箱 (np.digitize), 每个分箱给出真值数、预测数、Recall / Precision (给定置信度) 与 AP50 / AP50-95
+3. 面积 × 密度交叉分箱 (密集停机坪上的小目标)
+4. StratifiedEvaluator 在 ObbEvaluator 的基础上额外保存匹配的真值序号与框参数, 可直接传给 evaluate_backend
+5. dataset_strata: 只读标注统计整个划分的目标分布 (标注多边形整体转换为xywhr, 无逐目标循环)
+
+分箱规则 (与COCO按面积分段评估一致):
+- 真值按自身属性落入分箱; 匹配到该箱真值的预测为TP
+- 匹配到其他分箱真值的预测在该箱中忽略 (既不算TP也不算FP)
+- 未匹配的预测按预测框自身的属性归箱记为FP (密度取所在图像的真值数)
+- 各类别合并计算 (本项目为单类别飞机, 整体结果与 ObbEvaluator.compute() 一致)
+"""
+
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from .evaluation import IOU_THRESHOLDS, ObbEvaluator, compute_ap, label_path_for, list_split_images
+from .inference import ObbDetections
+from .rotated_nms import polygons_to_xywhr
+
+try:
+    from PIL import Image
+except ImportError:  # 退化为cv2完整解码
+    Image = None
+
+# 分箱边界 (左闭右开) 与名称; 面积为原图像素
+STRATA: Dict[str, Tuple[Tuple[float, ...], Tuple[str, ...]]] = {
+    'area': ((0, 16 ** 2, 32 ** 2, 96 ** 2, np.inf), ('tiny', 'small', 'medium', 'large')),
+    'aspect': ((1.0, 1.5, 2.5, np.inf), ('1-1.5', '1.5-2.5', '2.5+')),
+    'angle': ((0, 30, 60, 90, 120, 150, 180), ('0-30', '30-60', '60-90', '90-120', '120-150', '150-180')),
+    'density': ((1, 6, 21, 51, np.inf), ('1-5', '6-20', '21-50', '51+')),
+}
+CROSS = ('area', 'density')
+CROSS_KEY = '_x_'.join(CROSS)
+DEFAULT_CONF = 0.25
+
+
+def box_attributes(xywhr: np.ndarray, density: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    旋转框属性 (向量化)
+
+    Args:
+        xywhr: (N, 5) 像素坐标, density: (N,) 所在图像的真值目标数
+
+    Returns:
+        {'area', 'aspect' (长边/短边 >= 1), 'angle' (长边方向, 度, [0, 180)), 'density'}
+    """
+    xywhr = np.asarray(xywhr, dtype=np.float64).reshape(-1, 5)
+    w, h, r = xywhr[:, 2], xywhr[:, 3], xywhr[:, 4]
+    long_side, short_side = np.maximum(w, h), np.minimum(w, h)
+    angle = np.degrees(np.where(w >= h, r, r + np.pi / 2)) % 180.0
+    return {
+        'area': w * h,
+        'aspect': long_side / np.maximum(short_side, 1e-9),
+        'angle': angle,
+        'density': np.asarray(density, dtype=np.float64),
+    }
+
+
+def assign_bins(attrs: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """各属性的分箱序号 (超出边界的归入首/末箱)"""
+    bins = {}
+    for name, (edges, labels) in STRATA.items():
+        idx = np.digitize(attrs[name], edges[1:-1], right=False)
+        bins[name] = np.clip(idx, 0, len(labels) - 1)
+    bins[CROSS_KEY] = bins[CROSS[0]] * len(STRATA[CROSS[1]][1]) + bins[CROSS[1]]
+    return bins
+
+
+def bin_labels() -> Dict[str, List[str]]:
+    labels = {name: list(lab) for name, (_, lab) in STRATA.items()}
+    labels[CROSS_KEY] = [f'{a}|{d}' for a in STRATA[CROSS[0]][1] for d in STRATA[CROSS[1]][1]]
+    return labels
+
+
+def bin_metrics(conf: np.ndarray, matched_bin: np.ndarray, pred_bin: np.ndarray, gt_bin: np.ndarray,
+                n_bins: int, conf_thres: float = DEFAULT_CONF) -> List[Dict[str, float]]:
+    """
+    每个分箱的指标
+
+    Args:
+        conf: (N,) 已按降序排列
+        matched_bin: (N, T) 各阈值下匹配真值的分箱序号, 未匹配为-1
+        pred_bin: (N,) 预测框自身属性的分箱, gt_bin: (M,)
+    """
+    n_gt = np.bincount(gt_bin, minlength=n_bins)
+    unmatched = matched_bin < 0
+    keep = conf >= conf_thres
+    out = []
+    for b in range(n_bins):
+        tp = matched_bin == b                                   # (N, T)
+        fp = unmatched & (pred_bin == b)[:, None]
+        ap = np.zeros(tp.shape[1])
+        if n_gt[b]:
+            for t in range(tp.shape[1]):
+                valid = tp[:, t] | fp[:, t]
+                tpc = np.cumsum(tp[valid, t])
+                if len(tpc):
+                    ap[t] = compute_ap(tpc / n_gt[b], tpc / np.arange(1, len(tpc) + 1))
+        tp_at = int(tp[keep, 0].sum())
+        fp_at = int(fp[keep, 0].sum())
+        out.append({
+            'n_gt': int(n_gt[b]),
+            'n_pred': tp_at + fp_at,
+            'recall': float(tp_at / n_gt[b]) if n_gt[b] else 0.0,
+            'precision': tp_at / (tp_at + fp_at) if tp_at + fp_at else 0.0,
+            'AP50': float(ap[0]),
+            'AP50_95': float(ap.mean()),
+        })
+    return out
+
+
+class StratifiedEvaluator(ObbEvaluator):
+    """保存逐图像匹配关系与框参数的 ObbEvaluator, breakdown() 给出分层指标"""
+
+    def __init__(self, thresholds: np.ndarray = IOU_THRESHOLDS):
+        super().__init__(thresholds)
+        self.matched: List[np.ndarray] = []
+        self.pred_xywhr: List[np.ndarray] = []
+        self.gt_xywhr: List[np.ndarray] = []
+
+    def update(self, dets: ObbDetections, gt_xywhr: np.ndarray, gt_cls: np.ndarray) -> np.ndarray:
+        dets, tp, matched = self._match(dets, gt_xywhr, gt_cls)
+        self.tp.append(tp)
+        self.conf.append(dets.conf.astype(np.float64))
+        self.pred_cls.append(dets.cls)
+        self.target_cls.append(np.asarray(gt_cls, dtype=np.int64))
+        self.matched.append(matched)
+        self.pred_xywhr.append(np.asarray(dets.xywhr, dtype=np.float64).reshape(-1, 5))
+        self.gt_xywhr.append(np.asarray(gt_xywhr, dtype=np.float64).reshape(-1, 5))
+        return tp
+
+    def breakdown(self, conf_thres: float = DEFAULT_CONF) -> Dict[str, object]:
+        """
+        分层指标
+
+        Returns:
+            {'conf_thres', 'overall': {...}, 'strata': {维度: {分箱名称: {...}}}}
+        """
+        n_t = len(self.thresholds)
+        gt_counts = np.array([len(g) for g in self.gt_xywhr], dtype=np.int64)
+        pred_counts = np.array([len(p) for p in self.pred_xywhr], dtype=np.int64)
+        gt_offset = np.concatenate(([0], np.cumsum(gt_counts)[:-1])) if len(gt_counts) else np.zeros(0, int)
+
+        gt = np.concatenate(self.gt_xywhr) if self.gt_xywhr else np.zeros((0, 5))
+        pred = np.concatenate(self.pred_xywhr) if self.pred_xywhr else np.zeros((0, 5))
+        conf = np.concatenate(self.conf) if self.conf else np.zeros(0)
+        matched = np.concatenate(self.matched) if self.matched else np.zeros((0, n_t), dtype=np.int64)
+        # 图像内的真值序号 -> 全局序号
+        matched = np.where(matched >= 0, matched + np.repeat(gt_offset, pred_counts)[:, None], -1)
+
+        gt_bins = assign_bins(box_attributes(gt, np.repeat(gt_counts, gt_counts)))
+        pred_bins = assign_bins(box_attributes(pred, np.repeat(gt_counts, pred_counts)))
+        order = np.argsort(-conf, kind='stable')
+        conf, matched = conf[order], matched[order]
+
+        strata = {}
+        for name, labels in bin_labels().items():
+            gb = gt_bins[name]
+            matched_bin = np.where(matched >= 0, gb[np.maximum(matched, 0)] if len(gb) else -1, -1)
+            rows = bin_metrics(conf, matched_bin, pred_bins[name][order], gb, len(labels), conf_thres)
+            strata[name] = dict(zip(labels, rows))
+
+        overall = bin_metrics(conf, np.where(matched >= 0, 0, -1), np.zeros(len(conf), dtype=np.int64),
+                              np.zeros(len(gt), dtype=np.int64), 1, conf_thres)[0]
+        return {'conf_thres': conf_thres, 'overall': overall, 'strata': strata}
+
+
+def _image_size(path: Path) -> Tuple[int, int]:
+    if Image is not None:
+        with Image.open(path) as img:
+            return img.size
+    import cv2
+
+    image = cv2.imread(str(path))
+    if image is None:
+        raise ValueError(f'无法读取图像: {path}')
+    h, w = image.shape[:2]
+    return w, h
+
+
+def dataset_strata(img_dir: Path) -> Dict[str, Dict[str, int]]:
+    """
+    划分内全部标注目标的分箱计数 (只读图像尺寸, 不解码像素)
+
+    标注先按图像拼接为一个 (M, 8) 数组, 再整体换算为像素xywhr并分箱。
+    """
+    polys, counts = [], []
+    for path in list_split_images(img_dir):
+        label = label_path_for(path)
+        rows = np.loadtxt(label, ndmin=2, usecols=range(1, 9)) if label.exists() and label.stat().st_size else \
+            np.zeros((0, 8))
+        w, h = _image_size(path)
+        polys.append(rows * np.tile([w, h], 4))
+        counts.append(len(rows))
+    xywhr = polygons_to_xywhr(np.concatenate(polys)) if polys else np.zeros((0, 5))
+    counts = np.asarray(counts, dtype=np.int64)
+    bins = assign_bins(box_attributes(xywhr, np.repeat(counts, counts)))
+    return {name: dict(zip(labels, np.bincount(bins[name], minlength=len(labels)).tolist()))
+            for name, labels in bin_labels().items()}
+
+
+def breakdown_table(breakdowns: Dict[str, Dict], metric: str = 'recall',
+                    dimensions: Sequence[str] = tuple(STRATA)) -> Tuple[List[str], List[str], np.ndarray]:
+    """多模型分层结果 -> (行: 模型, 列: 维度/分箱, 值矩阵), 无真值的分箱为NaN"""
+    columns = [f'{dim}:{label}' for dim in dimensions for label in bin_labels()[dim]]
+    models = list(breakdowns)
+    values = np.full((len(models), len(columns)), np.nan)
+    for i, model in enumerate(models):
+        j = 0
+        for dim in dimensions:
+            for label in bin_labels()[dim]:
+                cell = breakdowns[model]['strata'][dim][label]
+                if cell['n_gt']:
+                    values[i, j] = cell[metric]
+                j += 1
+    return models, columns, values
+
+
+if __name__ == '__main__':
+    import time
+
+    # 与逐目标循环的分箱结果一致, 并测量大规模数据的耗时
+    rng = np.random.default_rng(0)
+    n = 200_000
+    xywhr = np.column_stack([rng.uniform(0, 1000, (n, 2)), rng.uniform(4, 200, (n, 2)),
+                             rng.uniform(-np.pi / 2, np.pi, n)])
+    density = rng.integers(1, 80, n)
+    t0 = time.perf_counter()
+    bins = assign_bins(box_attributes(xywhr, density))
+    elapsed = time.perf_counter() - t0
+    for i in rng.choice(n, 500, replace=False):
+        x, y, w, h, r = xywhr[i]
+        area = w * h
+        ang = np.degrees(r if w >= h else r + np.pi / 2) % 180
+        expect = {
+            'area': sum(area >= e for e in STRATA['area'][0][1:-1]),
+            'aspect': sum(max(w, h) / min(w, h) >= e for e in STRATA['aspect'][0][1:-1]),
+            'angle': sum(ang >= e for e in STRATA['angle'][0][1:-1]),
+            'density': sum(density[i] >= e for e in STRATA['density'][0][1:-1]),
+        }
+        assert all(bins[k][i] == v for k, v in expect.items()), (i, expect)
+    print(f"binned {n} objects in {elapsed * 1000:.1f} ms")
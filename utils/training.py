@@ -0,0 +1,792 @@
+"""
+训练环境配置模块 - 按主机选择训练参数、预解码图像缓存与逐epoch耗时拆分
+Host-aware Training Profiles, Pre-decoded Image Cache and Epoch Timing
+
+功能:
+1. 训练配置 (profile): 'gpu' / 'cpu' / 'auto', 按主机选择 device / 线程数 / dataloader workers / batch,
+   以及图像缓存方式 (CPU主机默认使用磁盘缓存)
+2. 图像缓存: 训练集图像只解码一次并按imgsz缩放 (长边=imgsz, 与 ultralytics load_image 一致)
+   - 'disk': 存为 npy_<imgsz>/xxx.npy (与 images/、labels/ 同级), 不同imgsz互不覆盖, 跨训练复用;
+     图像比缓存新时重新生成
+   - 'ram':  使用 ultralytics 内置的RAM缓存 (每次训练开始时解码并缩放一次)
+3. EpochTimer: 训练回调, 每个epoch的耗时拆分为 数据加载 / 计算 / 验证,
+   打印并写入 <save_dir>/epoch_timing.csv;
+   StepTimer: 每个iteration拆分为 数据 / 前向 / 损失 / 反向 / 参数更新, 每个epoch的分位数写入 <save_dir>/step_timing.csv
+4. ASOROBBTrainer: 训练时旋转框回归的IoU项使用 ASOR-Loss (消融实验的 asor / full 模型)
+5. ProgressiveResize: 渐进分辨率训练 (小imgsz起步, 按日程增大到目标imgsz, batch随像素数放大, 名义batch不变)
+6. ASCCheckpoint: 训练用模型的 C2f_ASC 打开梯度检查点 (高分辨率训练省显存)
+
+用法 (见 scripts/train_real.py):
+    model = YOLO('yolov8n-obb.pt')
+    model.train(data=..., epochs=100, imgsz=640, **configure_training(model, 'cpu', imgsz=640))
+"""
+
+import itertools
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from copy import copy
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+import torch
+import yaml
+
+from ultralytics.models.yolo.obb import OBBTrainer
+from ultralytics.utils import LOCAL_RANK
+from ultralytics.utils.loss import RotatedBboxLoss
+from ultralytics.utils.torch_utils import unwrap_model
+
+from models.improved.asc_module import set_asc_checkpoint
+from models.improved.kpr_loss import ASORLoss, kfiou_loss, probiou_loss
+
+PROFILES = ('auto', 'gpu', 'cpu')
+CACHE_MODES = ('none', 'ram', 'disk')
+GPU_BATCH = 16
+CPU_BATCH_640 = 8  # imgsz=640 时的CPU batch, 其他尺寸按像素数缩放
+TMP_SUFFIX = '.tmp.npy'  # 图像缓存写入中的临时文件
+STALE_TMP_SECONDS = 3600  # 超过该时间未更新的临时文件视为残留
+
+
+def host_cpus() -> int:
+    """当前进程可用的CPU核数 (考虑容器/taskset限制)"""
+    if hasattr(os, 'sched_getaffinity'):
+        return max(1, len(os.sched_getaffinity(0)))
+    return max(1, os.cpu_count() or 1)
+
+
+def resolve_profile(profile: str = 'auto', imgsz: int = 640, batch: Optional[int] = None,
+                    cache: Optional[str] = None) -> Dict[str, object]:
+    """
+    按主机确定训练参数
+
+    Args:
+        profile: 'gpu' / 'cpu' / 'auto' (有CUDA时为gpu, 否则为cpu)
+        imgsz: 训练尺寸, 用于确定CPU batch
+        batch: 指定时覆盖配置的batch
+        cache: 'none' / 'ram' / 'disk', 指定时覆盖配置的缓存方式
+
+    Returns:
+        {'profile', 'device', 'threads', 'workers', 'batch', 'cache'}
+    """
+    if profile not in PROFILES:
+        raise ValueError(f'Unknown profile: {profile} (choices: {PROFILES})')
+    if profile == 'auto':
+        profile = 'gpu' if torch.cuda.is_available() else 'cpu'
+    cpus = host_cpus()
+
+    if profile == 'gpu':
+        if not torch.cuda.is_available():
+            raise RuntimeError("profile 'gpu' requires CUDA; use --profile cpu on this host")
+        settings = {'device': 0, 'threads': torch.get_num_threads(), 'workers': min(8, cpus), 'batch': GPU_BATCH,
+                    'cache': 'none'}
+    else:
+        # 卷积计算占用大部分核, 只留少量worker做增强; 缓存后解码不再是瓶颈
+        workers = min(4, cpus // 4)
+        scaled = int(round(CPU_BATCH_640 * (640 / imgsz) ** 2))
+        settings = {'device': 'cpu', 'threads': max(1, cpus - workers), 'workers': workers,
+                    'batch': int(np.clip(scaled, 2, 32)), 'cache': 'disk'}
+
+    if batch:
+        settings['batch'] = batch
+    if cache:
+        if cache not in CACHE_MODES:
+            raise ValueError(f'Unknown cache mode: {cache} (choices: {CACHE_MODES})')
+        settings['cache'] = cache
+    settings['profile'] = profile
+    return settings
+
+
+# ==================== 预解码图像缓存 ====================
+
+def cache_path_for(img_path: Path, imgsz: int) -> Path:
+    """images/xxx.jpg -> npy_<imgsz>/xxx.npy"""
+    img_path = Path(img_path)
+    return img_path.parent.parent / f'npy_{imgsz}' / (img_path.stem + '.npy')
+
+
+def _resize_long_side(im: np.ndarray, imgsz: int) -> np.ndarray:
+    """与 ultralytics BaseDataset.load_image (rect_mode) 相同的缩放: 长边缩放到imgsz, 保持长宽比"""
+    h0, w0 = im.shape[:2]
+    r = imgsz / max(h0, w0)
+    if r != 1:
+        w, h = min(int(np.ceil(w0 * r)), imgsz), min(int(np.ceil(h0 * r)), imgsz)
+        im = cv2.resize(im, (w, h), interpolation=cv2.INTER_LINEAR)
+    return im
+
+
+def _cache_one(img_path: Path, imgsz: int) -> int:
+    """缓存单张图像, 返回写入的字节数 (缓存已是最新时为0)"""
+    out = cache_path_for(img_path, imgsz)
+    if out.exists() and out.stat().st_mtime >= Path(img_path).stat().st_mtime:
+        return 0
+    im = cv2.imread(str(img_path))
+    if im is None:
+        raise FileNotFoundError(f'Image Not Found {img_path}')
+    im = _resize_long_side(im, imgsz)
+    # 每次写入使用独立的临时文件 (多个训练进程可能同时构建同一份缓存), 写完后原子替换,
+    # 中断时不留下不完整的缓存; 异常时删除临时文件
+    fd, tmp = tempfile.mkstemp(prefix=f'{out.stem}.', suffix=TMP_SUFFIX, dir=out.parent)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.save(f, im, allow_pickle=False)
+        os.replace(tmp, out)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return im.nbytes
+
+
+def _sweep_stale_tmp(cache_dir: Path) -> int:
+    """删除进程被强制结束时残留的临时文件 (只删较旧的, 其他进程正在写的不受影响)"""
+    removed = 0
+    now = time.time()
+    for tmp in cache_dir.glob(f'*{TMP_SUFFIX}'):
+        try:
+            if now - tmp.stat().st_mtime > STALE_TMP_SECONDS:
+                tmp.unlink()
+                removed += 1
+        except FileNotFoundError:  # 已被写入进程替换或删除
+            pass
+    return removed
+
+
+def build_image_cache(img_files: Sequence[str], imgsz: int, workers: int = 0) -> List[Path]:
+    """
+    将图像解码并缩放后存为npy (已是最新的缓存直接跳过)
+
+    Args:
+        img_files: 图像路径 (ultralytics 数据集的 im_files)
+        imgsz: 缩放尺寸 (长边)
+        workers: 线程数, 0时使用全部可用核
+
+    Returns:
+        与 img_files 一一对应的npy路径
+    """
+    paths = [Path(f) for f in img_files]
+    for d in {cache_path_for(p, imgsz).parent for p in paths}:
+        d.mkdir(parents=True, exist_ok=True)
+        _sweep_stale_tmp(d)
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers or host_cpus()) as pool:  # cv2解码/缩放会释放GIL
+        written = list(pool.map(lambda p: _cache_one(p, imgsz), paths))
+    n_new = sum(1 for b in written if b)
+    if n_new:
+        print(f'[INFO] Cached {n_new}/{len(paths)} images at imgsz={imgsz} '
+              f'({sum(written) / 2 ** 20:.0f} MB, {time.perf_counter() - t0:.1f}s)')
+    else:
+        print(f'[INFO] Image cache up to date: {len(paths)} images at imgsz={imgsz}')
+    return [cache_path_for(p, imgsz) for p in paths]
+
+
+class CachedOBBTrainer(OBBTrainer):
+    """
+    cache='disk' 时训练集读取 npy_<imgsz>/ 下预解码缓存的 OBB Trainer
+
+    ultralytics 的 load_image 优先读取 dataset.npy_files 中比原图新的npy, 这里把训练集的
+    npy_files 指向按imgsz缩放后的缓存, 缩放比例为1时不再resize; 验证集保持读取原图,
+    原图尺寸 (ori_shape) 不变, 验证指标与不缓存时一致。
+    构建数据集时对ultralytics关闭其自带的磁盘缓存 (原图尺寸的npy, 写在图像旁边);
+    cache 为其他值时与 OBBTrainer 相同
+    """
+
+    def build_dataset(self, img_path, mode='train', batch=None):
+        if self.args.cache != 'disk':
+            return super().build_dataset(img_path, mode, batch)
+        self.args.cache = False
+        try:
+            dataset = super().build_dataset(img_path, mode, batch)
+        finally:
+            self.args.cache = 'disk'
+        if mode == 'train':
+            dataset.npy_files = build_image_cache(dataset.im_files, self.args.imgsz)
+        return dataset
+
+
+class WarmOBBTrainer(CachedOBBTrainer):
+    """
+    同一进程内连续训练时复用数据集的 OBB Trainer (供 scripts/run_configs.py 的训练队列使用)
+
+    数据集按 (路径, 模式, imgsz, batch, stride, 缓存方式, fraction, single_cls, classes) 保存在类属性中;
+    再次命中时跳过标签读取/校验与图像缓存, 只按本次训练的超参数重建数据增强 (transforms);
+    cache='ram' 时已解码缩放的图像也一直留在内存中
+    """
+
+    _datasets: Dict[tuple, object] = {}
+
+    def build_dataset(self, img_path, mode='train', batch=None):
+        a = self.args
+        key = (str(img_path), mode, a.imgsz, batch if (mode == 'val' or a.rect) else None, self.stride,
+               a.cache, a.fraction, a.single_cls, str(a.classes))
+        dataset = self._datasets.get(key)
+        if dataset is None:
+            dataset = super().build_dataset(img_path, mode, batch)
+            self._datasets[key] = dataset
+            return dataset
+
+        dataset.buffer = []
+        if a.cache != 'ram':  # mosaic缓冲区中的图像不跨训练保留
+            dataset.ims = [None] * dataset.ni
+            dataset.im_hw0, dataset.im_hw = [None] * dataset.ni, [None] * dataset.ni
+        dataset.transforms = dataset.build_transforms(hyp=copy(a))
+        self.reused_datasets = getattr(self, 'reused_datasets', []) + [mode]
+        return dataset
+
+
+# ==================== ASOR-Loss 训练 ====================
+
+class ASORBboxLoss(RotatedBboxLoss):
+    """
+    旋转框回归损失: IoU项换为 ASOR-Loss (models.improved.kpr_loss, ProbIoU与KFIoU的自适应加权),
+    DFL项与 ultralytics RotatedBboxLoss 相同; 按目标分数加权求和的方式也与原损失一致
+    """
+
+    def __init__(self, reg_max: int, total_epochs: int, phase_epochs: Optional[List[int]] = None):
+        super().__init__(reg_max)
+        self.asor = ASORLoss(alpha=0.6, dynamic_weight=True, total_epochs=total_epochs, phase_epochs=phase_epochs)
+
+    def forward(self, pred_dist, pred_bboxes, anchor_points, target_bboxes, target_scores, target_scores_sum,
+                fg_mask, imgsz, stride):
+        _, loss_dfl = super().forward(pred_dist, pred_bboxes, anchor_points, target_bboxes, target_scores,
+                                      target_scores_sum, fg_mask, imgsz, stride)
+        weight = target_scores[fg_mask].sum(-1)
+        pred, target = pred_bboxes[fg_mask].float(), target_bboxes[fg_mask].float()
+        alpha = self.asor.get_dynamic_alpha()
+        loss = alpha * probiou_loss(pred, target) + (1 - alpha) * kfiou_loss(pred, target)
+        return (loss * weight).sum() / target_scores_sum, loss_dfl
+
+
+def _use_asor_loss(trainer):
+    """每个epoch开始时确认训练模型的损失使用 ASORBboxLoss (损失在首个batch才创建, 续训/OOM重试时会重建)"""
+    model = unwrap_model(trainer.model)
+    if getattr(model, 'criterion', None) is None:
+        model.criterion = model.init_criterion()
+    criterion = model.criterion
+    if not isinstance(criterion.bbox_loss, ASORBboxLoss):
+        phases = getattr(trainer, 'asor_phases', None)  # ProgressiveResize(align_asor=True) 设置
+        criterion.bbox_loss = ASORBboxLoss(criterion.reg_max, trainer.epochs, phases).to(trainer.device)
+    criterion.bbox_loss.asor.set_epoch(trainer.epoch)
+
+
+class ASOROBBTrainer(CachedOBBTrainer):
+    """
+    回归损失使用 ASOR-Loss 的 OBB Trainer (消融实验的 asor / full 模型, 见 scripts/train_ablation.py)
+
+    只替换训练模型的损失; EMA模型验证时的 val 损失仍为 ultralytics 的 ProbIoU, 各消融模型的验证损失可直接比较,
+    保存的权重中也不包含自定义的类
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.add_callback('on_train_epoch_start', _use_asor_loss)
+
+
+# ==================== 渐进分辨率 ====================
+
+# 尺寸:起始 (尺寸 <= 1 为目标imgsz的比例, 起始 < 1 为总epoch数的比例)
+DEFAULT_PROGRESSIVE = '0.5:0,0.75:0.3,1:0.6'
+
+
+def parse_progressive(spec: str, imgsz: int, epochs: int, stride: int = 32) -> List[Tuple[int, int]]:
+    """
+    渐进分辨率日程: '0.5:0,0.75:0.3,1:0.6' (imgsz=640, epochs=100) -> [(0, 320), (30, 480), (60, 640)]
+
+    每段为 尺寸:起始epoch; 尺寸 <= 1 时为目标imgsz的比例, 否则为像素, 取stride的整数倍;
+    起始 < 1 时为总epoch数的比例。第一段从epoch 0开始, 最后一段必须是目标imgsz (验证始终在目标尺寸上进行)
+    """
+    phases = []
+    for item in spec.split(','):
+        size, sep, start = item.partition(':')
+        if not sep:
+            raise ValueError(f'Bad progressive phase: {item} (expected size:start)')
+        size, start = float(size), float(start)
+        px = imgsz * size if size <= 1 else size
+        phases.append((int(round(start * epochs)) if start < 1 else int(start),
+                       max(stride, int(px / stride + 0.5) * stride)))
+    phases.sort()
+    if phases[0][0] != 0:
+        raise ValueError(f'Progressive schedule must start at epoch 0: {spec}')
+    if phases[-1][1] != imgsz:
+        raise ValueError(f'Progressive schedule must end at imgsz={imgsz}: {spec}')
+    return phases
+
+
+class ProgressiveResize:
+    """
+    训练回调: 渐进分辨率训练 (前期在较小的imgsz上训练, 按日程逐段增大到目标imgsz)
+
+    - 进入新阶段时按该阶段的imgsz重建训练集dataloader, batch按像素数放大 (× (目标imgsz / 阶段imgsz)²,
+      不超过训练集图像数), 每步显存与目标尺寸相近; 梯度累积按 nbs / batch 重算, 每次参数更新的名义batch仍为 nbs
+    - 各阶段每个epoch的iteration数不同, ultralytics 在训练开始时按 len(train_loader) 算出的 warmup 步数不再成立:
+      这里关闭其 warmup (_get_warmup_iterations 返回0), 在 on_train_batch_start 按 epoch进度 (epoch + i / nb)
+      做同样的 lr / momentum / 梯度累积插值, warmup 仍在 warmup_epochs 个epoch处结束
+    - 验证集与 args.imgsz 保持目标尺寸: 各epoch的mAP与固定分辨率训练可直接比较, 保存的权重推理默认使用目标尺寸
+    - cache='disk' 时每个阶段尺寸各有一份 npy_<imgsz>/ 缓存
+    - align_asor=True 时把各阶段起始epoch交给 ASOROBBTrainer, ASOR-Loss 的 alpha 按阶段取值
+    - multi_scale 的尺寸范围仍以目标imgsz为准
+    """
+
+    def __init__(self, schedule: str = DEFAULT_PROGRESSIVE, align_asor: bool = False):
+        self.schedule = schedule
+        self.align_asor = align_asor
+        self.phases: List[Tuple[int, int]] = []
+        self._phase: Optional[int] = None
+        self._loader = None  # 本回调构建的dataloader
+        self._base = 0  # 目标尺寸的batch (_setup_train 确定, 含 batch=-1 自动选择)
+        self._nb = 1  # 当前epoch的iteration数
+        self._i = 0  # 当前epoch已开始的iteration数
+
+    def attach(self, model) -> 'ProgressiveResize':
+        """注册到 ultralytics YOLO 模型 (在 model.train 之前调用)"""
+        for event in ('on_pretrain_routine_start', 'on_pretrain_routine_end', 'on_train_epoch_start',
+                      'on_train_batch_start', 'on_train_end'):
+            model.add_callback(event, getattr(self, event))
+        return self
+
+    def on_pretrain_routine_start(self, trainer):
+        self.phases = parse_progressive(self.schedule, int(trainer.args.imgsz), trainer.epochs)
+        self._phase, self._loader = None, None
+        if self.align_asor:
+            trainer.asor_phases = [start for start, _ in self.phases]
+        print('[INFO] Progressive resize: ' + ', '.join(f'epoch {s + 1}+ imgsz={sz}' for s, sz in self.phases))
+
+    def on_pretrain_routine_end(self, trainer):
+        trainer._get_warmup_iterations = lambda num_batches: 0  # warmup 由 on_train_batch_start 按epoch进度进行
+
+    def on_train_epoch_start(self, trainer):
+        if trainer.train_loader is not self._loader:
+            # 训练开始或首个epoch OOM重试 (batch减半) 时, trainer 按 trainer.batch_size 在目标尺寸上建了dataloader
+            self._base = trainer.batch_size if self._loader is None else max(self._base // 2, 1)
+            self._phase = None
+        self._i = 0
+        phase = max(i for i, (start, _) in enumerate(self.phases) if start <= trainer.epoch)
+        if phase != self._phase:
+            self._switch(trainer, phase)
+        self._nb = len(trainer.train_loader)
+        trainer.accumulate = max(round(trainer.args.nbs / trainer.batch_size), 1)
+
+    def _switch(self, trainer, phase: int) -> None:
+        imgsz = self.phases[phase][1]
+        target = int(trainer.args.imgsz)
+        self._phase = phase
+        if self._loader is None and imgsz == target:
+            self._loader = trainer.train_loader  # 已是目标尺寸 (续训到最后阶段), 沿用已建好的dataloader
+            return
+
+        n_images = len(trainer.train_loader.dataset)
+        batch = min(max(int(round(self._base * (target / imgsz) ** 2)), self._base), max(n_images, self._base))
+        if hasattr(trainer.train_loader, 'close'):
+            trainer.train_loader.close()
+        trainer.args.imgsz = imgsz  # 只在构建训练集时使用阶段尺寸
+        try:
+            trainer.train_loader = trainer.get_dataloader(
+                trainer.data['train'], batch_size=batch // max(trainer.world_size, 1), rank=LOCAL_RANK, mode='train')
+        finally:
+            trainer.args.imgsz = target
+        trainer.batch_size = batch
+        self._loader = trainer.train_loader
+        if trainer.args.close_mosaic and trainer.epoch >= trainer.epochs - trainer.args.close_mosaic:
+            trainer._close_dataloader_mosaic()
+        print(f'[INFO] Progressive resize: epoch {trainer.epoch + 1} imgsz={imgsz} '
+              f'({len(trainer.train_loader)} batches of {batch}, '
+              f'accumulate {max(round(trainer.args.nbs / batch), 1)})')
+
+    def on_train_batch_start(self, trainer):
+        """与 ultralytics 的 warmup 相同的插值, 进度按epoch计 (各阶段每个epoch的iteration数不同)"""
+        warmup = min(trainer.args.warmup_epochs, max(trainer.epochs - 1, 0))
+        progress = trainer.epoch + self._i / self._nb
+        self._i += 1
+        if progress >= warmup:
+            return
+        xi, x = [0, warmup], progress
+        trainer.accumulate = max(1, int(np.interp(x, xi, [1, trainer.args.nbs / trainer.batch_size]).round()))
+        for group in trainer.optimizer.param_groups:
+            start = trainer.args.warmup_bias_lr if group.get('param_group') == 'bias' else 0.0
+            group['lr'] = float(np.interp(x, xi, [start, group['initial_lr'] * trainer.lf(trainer.epoch)]))
+            if 'momentum' in group:
+                group['momentum'] = float(np.interp(x, xi, [trainer.args.warmup_momentum, trainer.args.momentum]))
+
+    def on_train_end(self, trainer):
+        trainer.__dict__.pop('_get_warmup_iterations', None)
+        self._loader = None
+
+
+# ==================== ASC梯度检查点 ====================
+
+class ASCCheckpoint:
+    """
+    训练回调: 训练用模型中所有 ASCModule 打开梯度检查点 (models.improved.set_asc_checkpoint)
+
+    trainer 在 setup_model 中按YAML/权重重新构建模型, 训练前直接对 YOLO 对象调用 set_asc_checkpoint
+    不会带到训练用模型上; 因此在 on_pretrain_routine_end (模型已构建、EMA已复制) 设置。
+    EMA 模型只用于验证 (eval), 不受影响。
+    """
+
+    def attach(self, model) -> 'ASCCheckpoint':
+        """注册到 ultralytics YOLO 模型 (在 model.train 之前调用)"""
+        model.add_callback('on_pretrain_routine_end', self.on_pretrain_routine_end)
+        return self
+
+    def on_pretrain_routine_end(self, trainer):
+        n = set_asc_checkpoint(unwrap_model(trainer.model), True)
+        if n:
+            print(f'[INFO] ASC gradient checkpointing: {n} modules')
+        else:
+            print('[WARN] ASC gradient checkpointing requested, but the model has no ASCModule')
+
+
+# ==================== 逐epoch耗时 ====================
+
+class EpochTimer:
+    """
+    训练回调: 每个epoch的耗时拆分
+
+    - data:    等待dataloader产出batch的时间 (解码 / 增强 / collate 未被worker掩盖的部分)
+    - compute: batch开始到结束 (预处理、前向、反向、优化器步)
+    - val:     训练循环结束到本epoch验证与保存完成
+    """
+
+    COLUMNS = ('epoch', 'data_s', 'compute_s', 'val_s', 'total_s', 'data_frac', 'images_per_s')
+
+    def __init__(self, threads: Optional[int] = None, workers: Optional[int] = None):
+        self.threads = threads
+        self.workers = workers
+        self.rows: List[Dict[str, float]] = []
+        self._mark = self._start = 0.0
+        self._train_end: Optional[float] = None
+        self._data = self._compute = 0.0
+
+    def attach(self, model) -> 'EpochTimer':
+        """注册到 ultralytics YOLO 模型 (在 model.train 之前调用)"""
+        for event in ('on_pretrain_routine_start', 'on_train_epoch_start', 'on_train_batch_start',
+                      'on_train_batch_end', 'on_train_epoch_end', 'on_fit_epoch_end'):
+            model.add_callback(event, getattr(self, event))
+        return self
+
+    @staticmethod
+    def _sync(trainer):
+        if trainer.device.type == 'cuda':
+            torch.cuda.synchronize(trainer.device)
+
+    def on_pretrain_routine_start(self, trainer):
+        # ultralytics 选择CPU设备时会把workers置0、线程数重设为 min(8, 核数-1), 这里按配置恢复
+        if self.workers is not None:
+            trainer.args.workers = self.workers
+        if self.threads and trainer.device.type == 'cpu':
+            torch.set_num_threads(self.threads)
+
+    def on_train_epoch_start(self, trainer):
+        self._start = self._mark = time.perf_counter()
+        self._data = self._compute = 0.0
+
+    def on_train_batch_start(self, trainer):
+        now = time.perf_counter()
+        self._data += now - self._mark
+        self._mark = now
+
+    def on_train_batch_end(self, trainer):
+        self._sync(trainer)
+        now = time.perf_counter()
+        self._compute += now - self._mark
+        self._mark = now
+
+    def on_train_epoch_end(self, trainer):
+        self._train_end = time.perf_counter()
+
+    def on_fit_epoch_end(self, trainer):
+        if self._train_end is None:  # 训练结束后对best.pt的最终验证也会触发, 不计入
+            return
+        now = time.perf_counter()
+        train_s = self._train_end - self._start
+        n_images = len(trainer.train_loader.dataset)
+        row = {
+            'epoch': trainer.epoch + 1,
+            'data_s': self._data,
+            'compute_s': self._compute,
+            'val_s': now - self._train_end,
+            'total_s': now - self._start,
+            'data_frac': self._data / train_s if train_s > 0 else 0.0,
+            'images_per_s': n_images / train_s if train_s > 0 else 0.0,
+        }
+        self.rows.append(row)
+        self._train_end = None
+        print(f"[TIME] epoch {row['epoch']}: data {row['data_s']:.1f}s | compute {row['compute_s']:.1f}s | "
+              f"val {row['val_s']:.1f}s | total {row['total_s']:.1f}s "
+              f"(data {row['data_frac'] * 100:.0f}%, {row['images_per_s']:.1f} img/s)")
+
+        csv_path = Path(trainer.save_dir) / 'epoch_timing.csv'
+        new = not csv_path.exists()
+        with open(csv_path, 'a', encoding='utf-8') as f:
+            if new:
+                f.write(','.join(self.COLUMNS) + '\n')
+            f.write(','.join(f'{row[c]:.4f}' if c != 'epoch' else str(row[c]) for c in self.COLUMNS) + '\n')
+
+
+class StepTimer:
+    """
+    训练回调: 每个iteration的耗时拆分, 用于判断改进模型变慢来自 C2f_ASC (前向/反向)、ASOR-Loss (损失)
+    还是 mixup / copy_paste 等增强 (数据)
+
+    - data:      上一个iteration结束到网络前向开始 (等待dataloader, 以及 preprocess_batch 的拷贝/归一化)
+    - forward:   网络前向, 到检测头输出
+    - loss:      检测头输出到损失计算完成 (model.loss 中的 criterion)
+    - backward:  反向传播 (梯度累积、本iteration不更新参数时也包含其后的日志)
+    - optimizer: optimizer_step (梯度裁剪 / 参数更新 / EMA更新), 不更新参数的iteration为0
+    - other:     参数更新之后的日志与进度条
+
+    CUDA上在GPU时间线上用 torch.cuda.Event 打点, 不在阶段之间同步 (上一个iteration的事件在本iteration结束时读取);
+    其他设备用 time.perf_counter。每个epoch各阶段的 P50/P90/P99 与占比写入 <save_dir>/step_timing.csv
+    (与 results.csv 同目录), overhead_frac 为本回调自身的耗时占比。使用 compile=True 时损失在模型调用之外计算,
+    会计入 backward
+    """
+
+    PHASES = ('data', 'forward', 'loss', 'backward', 'optimizer', 'other')
+    QUANTILES = (50, 90, 99)
+
+    def __init__(self):
+        self._cuda = False
+        self._active = False
+        self._hooks = []
+        self._marks: Dict[str, object] = {}
+        self._pending: Optional[Dict[str, object]] = None
+        self._steps: List[tuple] = []
+        self._overhead = 0.0
+
+    def attach(self, model) -> 'StepTimer':
+        """注册到 ultralytics YOLO 模型 (在 model.train 之前调用)"""
+        for event in ('on_pretrain_routine_end', 'on_train_epoch_start', 'on_train_batch_start',
+                      'on_train_batch_end', 'on_train_epoch_end', 'on_train_end'):
+            model.add_callback(event, getattr(self, event))
+        return self
+
+    def _mark(self, name: str) -> None:
+        t0 = time.perf_counter()
+        if self._cuda:
+            event = torch.cuda.Event(enable_timing=True)
+            event.record()
+            self._marks[name] = event
+        else:
+            self._marks[name] = t0
+        self._overhead += time.perf_counter() - t0
+
+    def _elapsed(self, a, b) -> float:
+        return a.elapsed_time(b) / 1000 if self._cuda else b - a
+
+    def _durations(self, m: Dict[str, object]) -> Optional[tuple]:
+        if not {'start', 'fwd', 'head', 'loss', 'end'} <= m.keys():
+            return None  # 被中断的iteration (OOM重试等)
+        d = self._elapsed
+        stepped = 'opt1' in m
+        return (d(m['start'], m['fwd']), d(m['fwd'], m['head']), d(m['head'], m['loss']),
+                d(m['loss'], m['opt0'] if stepped else m['end']),
+                d(m['opt0'], m['opt1']) if stepped else 0.0,
+                d(m['opt1'], m['end']) if stepped else 0.0)
+
+    def _resolve_pending(self) -> None:
+        if self._pending is None:
+            return
+        if self._cuda:
+            self._pending['end'].synchronize()
+        steps = self._durations(self._pending)
+        if steps is not None:
+            self._steps.append(steps)
+        self._pending = None
+
+    def on_pretrain_routine_end(self, trainer):
+        self._cuda = trainer.device.type == 'cuda'
+        model = unwrap_model(trainer.model)
+
+        def forward_start(module, args):
+            if self._active:
+                self._mark('fwd')
+
+        def head_end(module, args, output):
+            if self._active:
+                self._mark('head')
+
+        def loss_end(module, args, output):
+            if self._active:
+                self._mark('loss')
+
+        self._hooks = [trainer.model.register_forward_pre_hook(forward_start),
+                       model.model[-1].register_forward_hook(head_end),
+                       trainer.model.register_forward_hook(loss_end)]
+
+        optimizer_step = trainer.optimizer_step
+
+        def timed_optimizer_step():
+            self._mark('opt0')
+            optimizer_step()
+            self._mark('opt1')
+
+        trainer.optimizer_step = timed_optimizer_step
+
+    def on_train_epoch_start(self, trainer):
+        self._steps, self._overhead, self._pending = [], 0.0, None
+        self._marks = {}
+        self._mark('start')
+
+    def on_train_batch_start(self, trainer):
+        self._active = True
+
+    def on_train_batch_end(self, trainer):
+        self._mark('end')
+        self._active = False
+        t0 = time.perf_counter()
+        self._resolve_pending()
+        self._pending, self._marks = self._marks, {'start': self._marks['end']}
+        self._overhead += time.perf_counter() - t0
+
+    def on_train_epoch_end(self, trainer):
+        t0 = time.perf_counter()
+        self._active = False
+        self._resolve_pending()
+        if not self._steps:
+            return
+        steps = np.asarray(self._steps) * 1000  # ms
+        totals = steps.sum(0)
+        iter_ms = steps.sum(1)
+        row = {'epoch': trainer.epoch + 1, 'iters': len(steps),
+               'iter_p50_ms': float(np.percentile(iter_ms, 50)), 'iter_p99_ms': float(np.percentile(iter_ms, 99))}
+        for i, phase in enumerate(self.PHASES):
+            for q, v in zip(self.QUANTILES, np.percentile(steps[:, i], self.QUANTILES)):
+                row[f'{phase}_p{q}_ms'] = float(v)
+            row[f'{phase}_frac'] = float(totals[i] / max(totals.sum(), 1e-9))
+        self._overhead += time.perf_counter() - t0
+        row['overhead_frac'] = self._overhead / max(totals.sum() / 1000, 1e-9)
+
+        print(f"[STEP] epoch {row['epoch']}: "
+              + ' | '.join(f"{p} {row[f'{p}_frac'] * 100:.0f}%" for p in self.PHASES)
+              + f" (iter p50 {row['iter_p50_ms']:.0f}ms, p99 {row['iter_p99_ms']:.0f}ms, "
+                f"overhead {row['overhead_frac'] * 100:.2f}%)")
+        csv_path = Path(trainer.save_dir) / 'step_timing.csv'
+        new = not csv_path.exists()
+        with open(csv_path, 'a', encoding='utf-8') as f:
+            if new:
+                f.write(','.join(row) + '\n')
+            f.write(','.join(str(v) if k in ('epoch', 'iters') else f'{v:.4f}' for k, v in row.items()) + '\n')
+
+    def on_train_end(self, trainer):
+        for hook in self._hooks:
+            hook.remove()
+        self._hooks = []
+        trainer.__dict__.pop('optimizer_step', None)
+
+
+def configure_training(model, profile: str = 'auto', imgsz: int = 640, batch: Optional[int] = None,
+                       cache: Optional[str] = None, step_timing: bool = False,
+                       progressive: Optional[str] = None, asc_checkpoint: bool = False) -> Dict[str, object]:
+    """
+    按配置准备训练: 注册 EpochTimer (step_timing=True 时还注册 StepTimer, 指定 progressive 日程时注册
+    ProgressiveResize, asc_checkpoint=True 时注册 ASCCheckpoint), 返回需要传给 model.train 的参数
+
+    Returns:
+        {'device', 'workers', 'batch', 'cache', 'trainer'}
+    """
+    settings = resolve_profile(profile, imgsz, batch, cache)
+    print(f"[INFO] Profile {settings['profile']}: device={settings['device']} threads={settings['threads']} "
+          f"workers={settings['workers']} batch={settings['batch']} cache={settings['cache']}")
+    if settings['device'] == 'cpu':
+        torch.set_num_threads(settings['threads'])
+    EpochTimer(settings['threads'], settings['workers']).attach(model)
+    if step_timing:
+        StepTimer().attach(model)
+    if progressive:
+        ProgressiveResize(progressive).attach(model)
+    if asc_checkpoint:
+        ASCCheckpoint().attach(model)
+
+    return {'device': settings['device'], 'workers': settings['workers'], 'batch': settings['batch'],
+            'cache': False if settings['cache'] == 'none' else settings['cache'], 'trainer': CachedOBBTrainer}
+
+
+# ==================== 训练配置文件 ====================
+
+def _parse_value(text: str):
+    """命令行中的值按YAML解析: '0.01' / '1e-3' -> float, 'false' -> False, 'SGD' -> 'SGD'"""
+    value = yaml.safe_load(text) if text else ''
+    if isinstance(value, str):
+        try:
+            return float(value)  # YAML 1.1 不把 '1e-3' 解析为数字
+        except ValueError:
+            return value
+    return value
+
+
+def parse_overrides(items: Sequence[str]) -> Dict[str, object]:
+    """['epochs=50', 'mixup=0.1'] -> {'epochs': 50, 'mixup': 0.1}"""
+    overrides = {}
+    for item in items or ():
+        key, sep, value = item.partition('=')
+        if not sep or not key:
+            raise ValueError(f'Bad override: {item} (expected key=value)')
+        overrides[key.strip()] = _parse_value(value.strip())
+    return overrides
+
+
+def expand_sweep(items: Sequence[str]) -> List[Dict[str, object]]:
+    """
+    网格展开: ['lr0=0.01,0.005', 'mixup=0,0.15'] -> 4组参数 (按参数出现顺序的笛卡尔积)
+    没有扫描参数时返回 [{}]
+    """
+    axes = []
+    for item in items or ():
+        key, sep, values = item.partition('=')
+        if not sep or not key:
+            raise ValueError(f'Bad sweep: {item} (expected key=v1,v2,...)')
+        axes.append([(key.strip(), _parse_value(v.strip())) for v in values.split(',')])
+    return [dict(combo) for combo in itertools.product(*axes)]
+
+
+def _resolve_path(value: str, root: Path) -> str:
+    """相对路径在存在时按项目根目录解析 ('yolov8n-obb.pt' 等不存在的名称保持原样, 由ultralytics下载)"""
+    path = Path(value)
+    if path.is_absolute():
+        return value
+    return str(root / path) if (root / path).exists() else value
+
+
+def load_train_config(path, root: Path) -> Dict[str, object]:
+    """
+    读取训练配置 (configs/*_train.yaml), model / data 解析为项目根目录下的路径, 相对的 project 同样以根目录为准
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f) or {}
+    for key in ('model', 'data'):
+        if isinstance(config.get(key), str):
+            config[key] = _resolve_path(config[key], root)
+    if config.get('project') and not Path(config['project']).is_absolute():
+        config['project'] = str(root / config['project'])
+    return config
+
+
+def resolve_dataset_yaml(data, out_dir: Path, root: Path) -> Path:
+    """
+    数据集配置中相对的 path 以该YAML所在目录为基准 (configs/dataset.yaml 的 ../data 即 <根目录>/data),
+    而ultralytics以当前目录或其数据集目录为基准; 这里写出 path 为绝对路径的副本并检查各划分目录存在
+
+    Returns:
+        解析后的数据集YAML路径 (out_dir/<名称>.resolved.yaml)
+    """
+    src = Path(_resolve_path(str(data), root))
+    with open(src, 'r', encoding='utf-8') as f:
+        cfg = yaml.safe_load(f)
+    base = Path(cfg.get('path') or src.parent)
+    if not base.is_absolute():
+        base = (src.parent / base).resolve()
+    cfg['path'] = str(base)
+    for split in ('train', 'val'):
+        entries = cfg.get(split)
+        for entry in ([entries] if isinstance(entries, str) else entries or []):
+            if not (base / entry).exists():
+                raise FileNotFoundError(f'{src.name}: {split} split not found: {base / entry}')
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    out = out_dir / f'{src.stem}.resolved.yaml'
+    with open(out, 'w', encoding='utf-8') as f:
+        yaml.safe_dump(cfg, f, allow_unicode=True, sort_keys=False)
+    return out
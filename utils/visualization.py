@@ -303,6 +303,99 @@ class ResultVisualizer:
         plt.close()
         print(f"[INFO] PR curve saved: {save_path}")
 
+    def plot_pr_curves(self, curves: Dict[str, Dict], save_name: str = 'pr_curve.png'):
+        """
+        绘制多模型实测PR曲线与F1-置信度曲线
+
+        Args:
+            curves: {模型名称: {'recall', 'precision', 'f1', 'threshold', 'ap', 'best_conf'}}
+                    (由 utils.metrics.pr_f1_curves 计算)
+        """
+        fig, (ax_pr, ax_f1) = plt.subplots(1, 2, figsize=(15, 6.5))
+        colors = plt.cm.tab10(np.arange(len(curves)) % 10)
+
+        for color, (name, c) in zip(colors, curves.items()):
+            ax_pr.plot(c['recall'], c['precision'], '-', color=color, linewidth=2,
+                       label=f"{name} (AP50={c['ap'] * 100:.1f}%)")
+            ax_f1.plot(c['threshold'], c['f1'], '-', color=color, linewidth=2,
+                       label=f"{name} (best F1={max(c['f1'], default=0):.3f} @ {c['best_conf']:.3f})")
+            ax_f1.axvline(c['best_conf'], color=color, linestyle='--', linewidth=1, alpha=0.6)
+
+        ax_pr.set_xlabel('Recall', fontsize=13)
+        ax_pr.set_ylabel('Precision', fontsize=13)
+        ax_pr.set_title('Precision-Recall Curve (IoU=0.5)', fontsize=14, fontweight='bold')
+        ax_pr.set_xlim(0, 1.0)
+        ax_pr.set_ylim(0, 1.05)
+        ax_f1.set_xlabel('Confidence Threshold', fontsize=13)
+        ax_f1.set_ylabel('F1', fontsize=13)
+        ax_f1.set_title('F1-Confidence Curve', fontsize=14, fontweight='bold')
+        ax_f1.set_xlim(0, 1.0)
+        ax_f1.set_ylim(0, 1.05)
+        for ax in (ax_pr, ax_f1):
+            ax.legend(fontsize=10, loc='lower left')
+            ax.grid(True, alpha=0.3)
+
+        plt.tight_layout()
+        save_path = self.output_dir / save_name
+        plt.savefig(save_path, dpi=300, bbox_inches='tight')
+        plt.close()
+        print(f"[INFO] PR / F1 curves saved: {save_path}")
+
+    def plot_stratified_heatmap(self, breakdowns: Dict[str, Dict], metric: str = 'recall',
+                                save_name: str = 'stratified_recall.png'):
+        """
+        分层指标热力图: 上方为 模型 × 分箱 总表, 下方为各模型的 面积 × 密度 交叉表
+
+        Args:
+            breakdowns: {模型名称: StratifiedEvaluator.breakdown() 结果}
+        """
+        from .stratified import CROSS, CROSS_KEY, STRATA, bin_labels, breakdown_table
+
+        models, columns, values = breakdown_table(breakdowns, metric)
+        rows_lab, cols_lab = STRATA[CROSS[0]][1], STRATA[CROSS[1]][1]
+        fig = plt.figure(figsize=(max(14, len(columns) * 0.7), 4 + 0.5 * len(models) + 3.5))
+        grid = fig.add_gridspec(2, max(len(models), 1), height_ratios=[0.6 * len(models) + 1, 3.5])
+
+        ax = fig.add_subplot(grid[0, :])
+        im = ax.imshow(values, cmap='RdYlGn', vmin=0, vmax=1, aspect='auto')
+        ax.set_xticks(range(len(columns)))
+        ax.set_xticklabels(columns, rotation=45, ha='right', fontsize=9)
+        ax.set_yticks(range(len(models)))
+        ax.set_yticklabels(models, fontsize=11)
+        for i in range(len(models)):
+            for j in range(len(columns)):
+                if not np.isnan(values[i, j]):
+                    ax.text(j, i, f'{values[i, j]:.2f}', ha='center', va='center', fontsize=8)
+        ax.set_title(f'{metric} by Object Size / Aspect / Angle / Image Density', fontsize=14, fontweight='bold')
+        fig.colorbar(im, ax=ax, fraction=0.02, pad=0.01)
+
+        for k, model in enumerate(models):
+            cells = breakdowns[model]['strata'][CROSS_KEY]
+            labels = bin_labels()[CROSS_KEY]
+            cross = np.array([cells[lab][metric] if cells[lab]['n_gt'] else np.nan for lab in labels])
+            cross = cross.reshape(len(rows_lab), len(cols_lab))
+            n_gt = np.array([cells[lab]['n_gt'] for lab in labels]).reshape(cross.shape)
+            ax = fig.add_subplot(grid[1, k])
+            ax.imshow(cross, cmap='RdYlGn', vmin=0, vmax=1)
+            ax.set_xticks(range(len(cols_lab)))
+            ax.set_xticklabels(cols_lab, fontsize=9)
+            ax.set_yticks(range(len(rows_lab)))
+            ax.set_yticklabels(rows_lab, fontsize=9)
+            ax.set_xlabel('objects per image', fontsize=10)
+            if k == 0:
+                ax.set_ylabel('object size', fontsize=10)
+            for i in range(cross.shape[0]):
+                for j in range(cross.shape[1]):
+                    if n_gt[i, j]:
+                        ax.text(j, i, f'{cross[i, j]:.2f}\nn={n_gt[i, j]}', ha='center', va='center', fontsize=7)
+            ax.set_title(model, fontsize=11)
+
+        plt.tight_layout()
+        save_path = self.output_dir / save_name
+        plt.savefig(save_path, dpi=300, bbox_inches='tight')
+        plt.close()
+        print(f"[INFO] Stratified heatmap saved: {save_path}")
+
     def plot_mAP_bar_chart(self, metrics: Dict[str, Dict],
                             save_name: str = 'map_bar_chart.png'):
         """绘制mAP柱状图对比"""